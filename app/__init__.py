@@ -38,7 +38,9 @@ def create_app():
     app.config.from_object(Config)
 
     db.init_app(app)
-    cors.init_app(app) # Importante para que el Frontend pueda llamar al Backend
+    # Importante para que el Frontend pueda llamar al Backend; los headers propios
+    # (GET condicional, paginación por fechas) se exponen para que pueda leerlos
+    cors.init_app(app, expose_headers=['ETag', 'X-Siguiente-Desde'])
     
     # Configurar logging
     setup_logging(app)
@@ -61,6 +63,10 @@ def create_app():
     app.register_blueprint(talonarios_bp)
     app.register_blueprint(sync_bp, url_prefix='/api')
     app.register_blueprint(kardex_bp, url_prefix='/api')
+
+    # --- COMANDOS CLI ---
+    from app.commands import register_commands
+    register_commands(app)
     
     # --- MANEJADORES DE ERROR GLOBALES ---
     @app.errorhandler(404)
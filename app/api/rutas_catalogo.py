@@ -1924,64 +1924,65 @@ def estadisticas_revision_piezas():
 @catalogo_bp.route('/catalogo/receta-color', methods=['GET'])
 def obtener_receta_color():
     """
-    Devuelve los pigmentos sugeridos para un color, basados en el
-    promedio ponderado acumulado de OPs anteriores.
+    Devuelve los pigmentos sugeridos para uno o varios colores, basados en el
+    promedio ponderado acumulado de OPs anteriores (con caché por worker).
 
     Query params:
-        color_id    (int, requerido)
+        color_id    (int)  — un color: responde el objeto de ese color
+        color_ids   (str)  — varios colores "1,2,3": responde {'recetas', 'no_encontrados'}
         producto_sku (str, opcional) — busca receta específica primero
         meta_kg     (float, opcional) — calcula gramos absolutos si se envía
     """
-    from app.models.receta_color import RecetaColorNormalizada
+    from app.services.receta_color_service import prefill_recetas
+
+    producto_sku = request.args.get('producto_sku') or None
+    meta_kg = request.args.get('meta_kg', type=float)
+
+    if request.args.get('color_ids'):
+        try:
+            color_ids = [int(c) for c in request.args['color_ids'].split(',') if c.strip()]
+        except ValueError:
+            return jsonify({'error': 'color_ids debe ser una lista de enteros separados por coma'}), 400
+        recetas, no_encontrados = prefill_recetas(color_ids, producto_sku, meta_kg)
+        return jsonify({'recetas': recetas, 'no_encontrados': no_encontrados}), 200
 
     color_id = request.args.get('color_id', type=int)
     if not color_id:
         return jsonify({'error': 'color_id requerido'}), 400
 
-    producto_sku = request.args.get('producto_sku') or None
-    meta_kg = request.args.get('meta_kg', type=float)
-
-    color = db.session.get(ColorProducto, color_id)
-    if not color:
+    recetas, _ = prefill_recetas([color_id], producto_sku, meta_kg)
+    if not recetas:
         return jsonify({'error': f'Color {color_id} no encontrado'}), 404
+    return jsonify(recetas[0]), 200
 
-    # Estrategia: buscar receta específica primero, luego genérica como fallback
-    if producto_sku:
-        especificas = RecetaColorNormalizada.query.filter_by(
-            color_id=color_id, producto_sku=producto_sku
-        ).all()
-        genericas = RecetaColorNormalizada.query.filter_by(
-            color_id=color_id, producto_sku=None
-        ).all()
-        con_especifica = {r.colorante_id for r in especificas}
-        recetas = especificas + [r for r in genericas if r.colorante_id not in con_especifica]
-        sku_usado = producto_sku if especificas else None
-    else:
-        recetas = RecetaColorNormalizada.query.filter_by(
-            color_id=color_id, producto_sku=None
-        ).all()
-        sku_usado = None
+@catalogo_bp.route('/catalogo/receta-color/reconstruir', methods=['POST'])
+def reconstruir_receta_color():
+    """
+    Recalcula todas las recetas normalizadas desde el histórico de OPs
+    (SeColorea ⨝ LoteColor) y reemplaza la tabla de forma atómica.
 
-    if not recetas:
-        return jsonify({
-            'color_id': color_id,
-            'color_nombre': color.nombre,
-            'producto_sku': sku_usado,
-            'tiene_receta': False,
-            'n_muestras_min': 0,
-            'pigmentos': []
-        }), 200
+    Body (opcional):
+        dry_run    (bool) — solo reporta nuevas / modificadas / eliminadas
+        chunk_size (int)  — pigmentos leídos por bloque
+    """
+    from app.services.receta_color_service import reconstruir_recetas, CHUNK_DEFAULT
+
+    data = request.get_json(silent=True) or {}
+    try:
+        chunk_size = int(data.get('chunk_size', CHUNK_DEFAULT))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'chunk_size debe ser entero'}), 400
+    if chunk_size <= 0:
+        return jsonify({'error': 'chunk_size debe ser positivo'}), 400
 
-    n_muestras_min = min(r.n_muestras for r in recetas)
+    dry_run = bool(data.get('dry_run', False))
+    try:
+        stats = reconstruir_recetas(chunk_size=chunk_size, aplicar=not dry_run)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'success': True, 'dry_run': dry_run, **stats}), 200
 
-    return jsonify({
-        'color_id': color_id,
-        'color_nombre': color.nombre,
-        'producto_sku': sku_usado,
-        'tiene_receta': True,
-        'n_muestras_min': n_muestras_min,
-        'pigmentos': [r.to_dict(meta_kg=meta_kg) for r in recetas]
-    }), 200
 
 @catalogo_bp.route('/catalogo/lineas', methods=['GET'])
 def listar_lineas():
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, make_response, Response, stream_with_context
 from app.extensions import db
 from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
 from app.models.lote import LoteColor
@@ -7,94 +7,31 @@ from app.models.materiales import MateriaPrima, Colorante
 from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
 from app.models.producto import PiezaColor
 from app.models.producto import ProductoTerminado, ProductoPieza, ColorProducto
-from app.models.molde import Molde, Pieza
+from app.models.molde import Pieza
 from datetime import datetime, timezone
-from app.models.receta_color import RecetaColorNormalizada
 
 # Definimos el "Blueprint" (un grupo de rutas)
 produccion_bp = Blueprint('produccion', __name__)
 
 
 # ---------------------------------------------------------------------------
-# HELPER: Aprender de la OP recién creada (poblamiento dinámico del catálogo)
+# HELPER: GET condicional (ETag / If-None-Match)
 # ---------------------------------------------------------------------------
 
-def _aprender_de_op(orden):
-    """
-    Side-effect post-commit de crear_orden:
-      A) Si la OP usó snapshot manual + molde_id existente → crear Molde/Pieza
-         en catálogo SOLO SI NO EXISTEN. Nunca sobreescribe.
-      B) Por cada lote con pigmentos → upsert en RecetaColorNormalizada
-         usando promedio ponderado de gr/kg.
-    Debe llamarse dentro de una transacción activa.
-    """
-
-    # ---- A. Upsert de Molde desde snapshot manual -------------------------
-    molde_id = orden.molde_id
-    if molde_id:
-        molde_existente = db.session.get(Molde, molde_id)
-        if not molde_existente:
-            # Calcular peso_tiro_gr desde los snaps (neto + colada)
-            peso_tiro = orden.calculo_peso_tiro_gr or 0.0
-            tiempo_ciclo = orden.snapshot_tiempo_ciclo or 30.0
-            nuevo_molde = Molde(
-                codigo=molde_id,
-                nombre=orden.molde or molde_id,
-                peso_tiro_gr=peso_tiro,
-                tiempo_ciclo_std=tiempo_ciclo,
-                activo=True,
-                notas='Auto-creado desde OP ' + orden.numero_op
-            )
-            db.session.add(nuevo_molde)
-            db.session.flush()
+def _no_modificado(etag):
+    """304 si el cliente ya tiene esta versión; None para seguir con la respuesta completa."""
+    if request.if_none_match.contains_weak(etag):
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+    return None
 
-        # Crear Pieza solo para piezas que no existan aún
-        for snap in orden.snapshot_composicion:
-            if not snap.pieza_sku:
-                continue
-            existe = Pieza.query.filter_by(
-                molde_id=molde_id,
-                pieza_sku=snap.pieza_sku
-            ).first()
-            if not existe:
-                db.session.add(Pieza(
-                    molde_id=molde_id,
-                    pieza_sku=snap.pieza_sku,
-                    cavidades=snap.cavidades,
-                    peso_unitario_gr=snap.peso_unit_gr,
-                ))
 
-    # ---- B. Upsert de RecetaColorNormalizada --------------------------------
-    for lote in orden.lotes:
-        meta_kg = lote.meta_kg or 0.0
-        if meta_kg <= 0 or not lote.color_id:
-            continue
-
-        for colorea in lote.colorantes:
-            gramos = colorea.gramos or 0.0
-            if gramos <= 0:
-                continue
-
-            gr_por_kg = gramos / meta_kg
-
-            # Receta específica (con producto)
-            RecetaColorNormalizada.upsert(
-                session=db.session,
-                color_id=lote.color_id,
-                colorante_id=colorea.colorante_id,
-                producto_sku=lote.producto_sku_output,
-                gr_por_kg_nuevo=gr_por_kg,
-            )
-
-            # Receta genérica (sin producto) — siempre actualizar
-            if lote.producto_sku_output:
-                RecetaColorNormalizada.upsert(
-                    session=db.session,
-                    color_id=lote.color_id,
-                    colorante_id=colorea.colorante_id,
-                    producto_sku=None,
-                    gr_por_kg_nuevo=gr_por_kg,
-                )
+def _con_etag(resp, etag):
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 
 @produccion_bp.route('/ordenes', methods=['POST'])
@@ -260,17 +197,14 @@ def crear_orden():
         # 4. Calcular todo en cascada y guardar
         # ----------------------------------------------------------------
         nueva_orden.actualizar_metricas()
-        db.session.commit()
 
         # ----------------------------------------------------------------
-        # 5. SIDE-EFFECTS: Poblamiento dinámico del catálogo (best-effort)
+        # 5. SIDE-EFFECTS: Poblamiento dinámico del catálogo → cola durable
+        #    (lo procesa el worker `flask procesar-aprendizaje`)
         # ----------------------------------------------------------------
-        try:
-            _aprender_de_op(nueva_orden)
-            db.session.commit()
-        except Exception as e_learn:
-            db.session.rollback()
-            print(f"[WARN] Side-effects post-OP fallaron (OP guardada igual): {e_learn}")
+        from app.services.aprendizaje_service import encolar_aprendizaje
+        encolar_aprendizaje([nueva_orden.numero_op])
+        db.session.commit()
 
         return jsonify(nueva_orden.to_dict()), 201
 
@@ -278,31 +212,247 @@ def crear_orden():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@produccion_bp.route('/ordenes/bulk', methods=['POST'])
+def crear_ordenes_bulk_endpoint():
+    """
+    Crea varias Órdenes de Producción en una sola llamada (planificación semanal).
+    Cada OP usa el mismo payload que POST /ordenes. Los catálogos (colores,
+    materias primas, colorantes, piezas de molde) se resuelven por conjunto.
+
+    Payload: { "ordenes": [ {...}, {...} ] }
+    Respuesta: resultado por OP en el mismo orden del payload.
+    """
+    from app.services.creacion_ordenes_service import crear_ordenes_bulk
+
+    data = request.get_json()
+    if not data or not isinstance(data.get('ordenes'), list) or not data['ordenes']:
+        return jsonify({'error': 'Se requiere "ordenes": [...] con al menos una OP'}), 400
+
+    try:
+        resultados, creadas = crear_ordenes_bulk(data['ordenes'])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    n_errores = len(resultados) - len(creadas)
+    return jsonify({
+        'success': n_errores == 0,
+        'message': f"Creadas {len(creadas)} órdenes, {n_errores} con errores",
+        'resultados': resultados,
+    }), 201 if creadas else 400
+
+
+@produccion_bp.route('/ordenes/simular', methods=['POST'])
+def simular_orden():
+    """
+    Simulación what-if de una OP: evalúa N configuraciones sin tocar la BD.
+
+    Payload:
+    {
+        "base": { ...mismos campos técnicos que POST /ordenes
+                  (snapshot_composicion, snapshot_tiempo_ciclo, lotes, ...) },
+        "escenarios": [{"tiempo_ciclo": 28, "cavidades": 3}, ...],        # opcional
+        "variaciones": {"tiempo_ciclo": [25, 30], "metas_kg": [[500, 300]]}, # opcional, producto cartesiano
+        "ordenar_por": "dias",        # opcional
+        "limite": 20,                 # opcional
+        "incluir_lotes": true         # opcional
+    }
+    """
+    from app.services.simulacion_service import simular
+
+    data = request.get_json(silent=True) or {}
+    base = data.get('base')
+    if not isinstance(base, dict):
+        return jsonify({'error': 'Payload requerido: {"base": {...}}'}), 400
+
+    limite = data.get('limite')
+    if limite is not None:
+        # 5 o "5"; no bool, float ni negativos (un slice [:-1] descartaría escenarios)
+        texto = str(limite).strip() if isinstance(limite, (int, str)) and not isinstance(limite, bool) else ''
+        if not texto.isdigit() or int(texto) < 1:
+            return jsonify({'error': 'limite debe ser un entero positivo'}), 400
+        limite = int(texto)
+
+    try:
+        resultados = simular(
+            base,
+            escenarios=data.get('escenarios'),
+            variaciones=data.get('variaciones'),
+            ordenar_por=data.get('ordenar_por'),
+            limite=limite,
+            incluir_lotes=data.get('incluir_lotes', True),
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'count': len(resultados), 'resultados': resultados}), 200
+
+
 @produccion_bp.route('/ordenes', methods=['GET'])
 def obtener_ordenes():
     """
-    Vista Principal: Devuelve todas las órdenes con sus lotes y cálculos.
+    Vista Principal: Devuelve las órdenes con sus lotes y cálculos.
     Equivale a abrir tu Excel de 'Control de Producción'.
+
+    Paginación por cursor (keyset) sobre fecha_creacion DESC, numero_op DESC.
+    Query params:
+        - limit: órdenes por página (default 50, máx 200)
+        - cursor: next_cursor devuelto por la página anterior
+        - activa: true/false
+        - maquina_id: int
+        - desde / hasta: YYYY-MM-DD (sobre fecha_creacion, inclusive)
+        - fields: campos de cabecera, separados por coma (ej. numero_op,maquina,activa)
+        - include: lotes,composicion,avance (por defecto todo si no se pasa fields)
     """
-    # 1. Consultar BD (Select * from ordenes)
-    lista_ordenes = OrdenProduccion.query.order_by(OrdenProduccion.fecha_creacion.desc()).all()
-    
-    # 2. Convertir a JSON usando los métodos que acabamos de crear
-    respuesta = [orden.to_dict() for orden in lista_ordenes]
-    
-    # 3. Responder
-    return jsonify(respuesta), 200
+    from app.services.produccion_service import listar_ordenes_paginadas, parsear_campos_orden
+
+    activa_str = request.args.get('activa', '').strip().lower()
+    activa = {'true': True, 'false': False}.get(activa_str)
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato YYYY-MM-DD'}), 400
+
+    try:
+        fields, include = parsear_campos_orden(request.args.get('fields'), request.args.get('include'))
+        lista_ordenes, next_cursor = listar_ordenes_paginadas(
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor') or None,
+            activa=activa,
+            maquina_id=request.args.get('maquina_id', type=int),
+            desde=desde,
+            hasta=hasta,
+            fields=fields,
+            include=include,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'ordenes': [orden.to_dict(fields, include) for orden in lista_ordenes],
+        'pagination': {
+            'count': len(lista_ordenes),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+        }
+    }), 200
+
+
+@produccion_bp.route('/ordenes/export', methods=['GET'])
+def exportar_ordenes():
+    """
+    Exporta el histórico de OPs con lotes y recetas para BI, en streaming.
+
+    Query params:
+        - format: ndjson (default, una OP por línea) | csv (una fila por ítem de receta)
+        - activa: true/false
+        - maquina_id: int
+        - desde / hasta: YYYY-MM-DD (sobre fecha_creacion, inclusive)
+    """
+    from app.services.exportacion_service import (
+        FORMATOS, iterar_ordenes, generar_ndjson, generar_csv
+    )
+
+    formato = request.args.get('format', 'ndjson').strip().lower()
+    if formato not in FORMATOS:
+        return jsonify({'error': f"format debe ser uno de: {', '.join(FORMATOS)}"}), 400
+
+    activa_str = request.args.get('activa', '').strip().lower()
+    activa = {'true': True, 'false': False}.get(activa_str)
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato YYYY-MM-DD'}), 400
+
+    ordenes = iterar_ordenes(
+        activa=activa,
+        maquina_id=request.args.get('maquina_id', type=int),
+        desde=desde,
+        hasta=hasta,
+    )
+
+    if formato == 'csv':
+        cuerpo, mimetype = generar_csv(ordenes), 'text/csv; charset=utf-8'
+    else:
+        cuerpo, mimetype = generar_ndjson(ordenes), 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(cuerpo),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=ordenes.{formato}'},
+    )
+
+
+@produccion_bp.route('/programacion/timeline', methods=['GET'])
+def timeline_programacion():
+    """
+    Timeline de capacidad de la planta: cola de OPs activas por máquina con
+    inicio / fin proyectado, conflictos del plan y huecos ociosos.
+
+    Query params:
+        - desde / hasta: ISO datetime de la ventana (default: hoy + 30 días)
+        - maquina_id: int (solo esa máquina)
+    """
+    from app.services.programacion_service import timeline_planta
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato ISO (YYYY-MM-DD[THH:MM])'}), 400
+
+    try:
+        resultado = timeline_planta(
+            desde=desde,
+            hasta=hasta,
+            maquina_id=request.args.get('maquina_id', type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(resultado), 200
 
 
 @produccion_bp.route('/ordenes/<numero_op>', methods=['GET'])
 def obtener_orden(numero_op):
     """
     Retorna los detalles de una orden específica.
+    Acepta ?fields= e ?include= igual que GET /ordenes.
+
+    Responde con ETag (versión de la OP); si el cliente envía If-None-Match
+    con la versión vigente se devuelve 304 sin cargar la orden.
     """
-    orden = db.session.get(OrdenProduccion, numero_op)
+    from app.services.produccion_service import (
+        opciones_carga_orden, parsear_campos_orden, version_orden, etag_orden
+    )
+
+    try:
+        fields, include = parsear_campos_orden(request.args.get('fields'), request.args.get('include'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    version = version_orden(numero_op)
+    if version is None:
+        return jsonify({'error': 'Orden no encontrada'}), 404
+
+    etag = etag_orden(numero_op, version, request.query_string.decode())
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
+
+    orden = (
+        OrdenProduccion.query
+        .options(*opciones_carga_orden(fields, include))
+        .filter_by(numero_op=numero_op)
+        .first()
+    )
     if not orden:
         return jsonify({'error': 'Orden no encontrada'}), 404
-    return jsonify(orden.to_dict()), 200
+    return _con_etag(jsonify(orden.to_dict(fields, include)), etag), 200
 
 
 @produccion_bp.route('/ordenes/<numero_op>/estado', methods=['PUT'])
@@ -458,101 +608,197 @@ def listar_registros(numero_op):
     """
     Retorna la lista de Registros Diarios, simulando la vista del Excel de Producción.
     Incluye todos los cálculos y datos "repetidos" de la orden para completar la vista.
+
+    Query params:
+        - desde / hasta: YYYY-MM-DD (sobre fecha, inclusive). Con `hasta`, el
+          header X-Siguiente-Desde trae la primera fecha con registros
+          posterior al rango (ausente si no hay más): paginación por fechas.
+        - detalles: false para omitir los detalles horarios
+
+    Número fijo de consultas: versión, registros + máquina (JOIN) y todos
+    los detalles en un único IN (más una para X-Siguiente-Desde).
+
+    Responde con ETag (versión de la OP, que sube con cada registro, detalle
+    o pesaje); con If-None-Match vigente devuelve 304 sin leer los registros.
     """
-    orden = db.session.get(OrdenProduccion, numero_op)
-    if not orden:
+    from app.services.produccion_service import version_orden, etag_orden
+    from app.services.registro_service import registros_de_orden
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato YYYY-MM-DD'}), 400
+    con_detalles = request.args.get('detalles', 'true').strip().lower() not in ('false', '0', 'no')
+
+    version = version_orden(numero_op)
+    if version is None:
         return jsonify({'error': 'Orden no encontrada'}), 404
-        
+
+    etag = etag_orden(numero_op, version, f'registros|{desde}|{hasta}|{con_detalles}')
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
+
+    registros, detalles, siguiente_desde = registros_de_orden(numero_op, desde, hasta, con_detalles)
+
     resultados = []
-    
-    # Iterar sobre registros (asumiendo que están ordenados por fecha/turno o ID)
-    registros = RegistroDiarioProduccion.query.filter_by(orden_id=numero_op).all()
-    
     for r in registros:
-        # Calcular fecha desglosada
-        mes = r.fecha.month if r.fecha else None
-        ano = r.fecha.year if r.fecha else None
-        semana = r.fecha.isocalendar()[1] if r.fecha else None
-        
-        # Recuperar datos que vienen de la máquina (aunque ahora está en registro, el user pide Tipo Maq)
-        tipo_maquina = r.maquina.tipo if r.maquina else None
-        nombre_maquina = r.maquina.nombre if r.maquina else None
-        
-        # Snapshots vs Live Data (usamos snapshots del registro para consistencia histórica)
-        cav_reg = r.snapshot_cavidades
-        ciclo_reg = r.tiempo_ciclo_reportado
-        peso_unit_reg = r.snapshot_peso_neto_gr # Asumiendo peso neto es el unitario
-        
-        # Construir fila plana tipo Excel
-        # Construir fila plana tipo Excel (AHORA RESUMIDA PORQUE ES HEADER)
+        # Construir fila plana tipo Excel (resumida: es la cabecera)
         fila = {
             "ID Registro": r.id,
             "FECHA": r.fecha.isoformat() if r.fecha else None,
             "Turno": r.turno,
-            "Maquina": nombre_maquina,
+            "Maquina": r.maquina.nombre if r.maquina else None,
             "Hora Inicio": r.hora_inicio,
             "Colada Ini": r.colada_inicial,
             "Colada Fin": r.colada_final,
             "Total Coladas (Calc)": r.total_coladas_calculada,
             "Total Piezas (Est)": r.total_piezas_buenas,
             "Total Kg (Est)": r.total_kg_real,
-            
-            # Detalles anidados para el frontend
-            "detalles": [d.to_dict() for d in r.detalles]
         }
+        if con_detalles:
+            # Detalles anidados para el frontend
+            fila["detalles"] = [d.to_dict() for d in detalles.get(r.id, ())]
         resultados.append(fila)
-        
-    return jsonify(resultados), 200
+
+    resp = _con_etag(jsonify(resultados), etag)
+    if siguiente_desde is not None:
+        resp.headers['X-Siguiente-Desde'] = siguiente_desde.isoformat()
+    return resp, 200
 
 
 @produccion_bp.route('/registros', methods=['GET'])
 def obtener_todos_registros():
     """
-    Obtiene todos los registros diarios de producción (para dashboard y vista global).
-    Soporta filtros: ?fecha=YYYY-MM-DD&orden_id=OP-XXX&limit=N
+    Registros diarios de producción (para dashboard y vista global).
+
+    Paginación por cursor (keyset) sobre fecha DESC, id DESC.
+    Query params:
+        - limit: registros por página (default 200, máx 1000)
+        - cursor: next_cursor devuelto por la página anterior
+        - desde / hasta: YYYY-MM-DD (sobre fecha, inclusive); fecha=YYYY-MM-DD equivale a ambos
+        - maquina_id: int
+        - turno: DIURNO / NOCTURNO / ...
+        - orden_id: OP-XXX
+        - activa: true/false (estado de la OP)
+        - aggregate: dia | maquina | orden → en vez de filas, totales
+          (registros, kg, coladas, piezas) agrupados y calculados en SQL
     """
-    from datetime import date
-    
-    query = RegistroDiarioProduccion.query
-    
-    # Filtros opcionales
-    fecha_str = request.args.get('fecha')
-    if fecha_str:
-        try:
-            fecha_filter = datetime.fromisoformat(fecha_str).date()
-            query = query.filter(RegistroDiarioProduccion.fecha == fecha_filter)
-        except:
-            pass
-    
-    orden_id = request.args.get('orden_id')
-    if orden_id:
-        query = query.filter(RegistroDiarioProduccion.orden_id == orden_id)
-    
-    limit = request.args.get('limit', type=int)
-    
-    query = query.order_by(RegistroDiarioProduccion.fecha.desc(), RegistroDiarioProduccion.id.desc())
-    
-    if limit:
-        registros = query.limit(limit).all()
-    else:
-        registros = query.all()
-    
-    resultados = []
-    for r in registros:
-        fila = {
-            "id": r.id,
-            "orden_id": r.orden_id,
-            "fecha": r.fecha.isoformat() if r.fecha else None,
-            "turno": r.turno,
-            "maquina_id": r.maquina_id,
-            "total_coladas": r.total_coladas_calculada,
-            "total_kg": r.total_kg_real,
-            "total_piezas": r.total_piezas_buenas,
-            "orden_activa": r.orden.activa if r.orden else True
+    from app.services.registro_service import agregar_registros, listar_registros_paginados
+
+    activa_str = request.args.get('activa', '').strip().lower()
+
+    try:
+        fecha = datetime.fromisoformat(request.args['fecha']).date() if request.args.get('fecha') else None
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else fecha
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else fecha
+    except ValueError:
+        return jsonify({'error': 'fecha/desde/hasta deben tener formato YYYY-MM-DD'}), 400
+
+    filtros = {
+        'desde': desde,
+        'hasta': hasta,
+        'maquina_id': request.args.get('maquina_id', type=int),
+        'turno': request.args.get('turno') or None,
+        'orden_id': request.args.get('orden_id') or None,
+        'activa': {'true': True, 'false': False}.get(activa_str),
+    }
+
+    try:
+        agrupar = request.args.get('aggregate')
+        if agrupar:
+            return jsonify(agregar_registros(agrupar.strip().lower(), **filtros)), 200
+
+        registros, next_cursor = listar_registros_paginados(
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor') or None,
+            **filtros,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'registros': registros,
+        'pagination': {
+            'count': len(registros),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         }
-        resultados.append(fila)
-        
-    return jsonify(resultados), 200
+    }), 200
+
+@produccion_bp.route('/dashboard/produccion', methods=['GET'])
+def dashboard_produccion():
+    """
+    Tablero de producción: coladas, piezas, kg teórico vs pesado, bultos y
+    horas con producción, leídos solo del resumen día × máquina × OP × turno.
+
+    Query params:
+        - agrupar: combinación separada por comas de dia | maquina | orden | turno (default dia)
+        - desde / hasta: YYYY-MM-DD (inclusive)
+        - maquina_id: int
+        - orden_id: OP-XXX
+        - turno: DIURNO / NOCTURNO / ...
+    """
+    from app.services.resumen_service import consultar_resumen, parsear_agrupacion
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato YYYY-MM-DD'}), 400
+
+    try:
+        agrupar = parsear_agrupacion(request.args.get('agrupar'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    data = consultar_resumen(
+        agrupar,
+        desde=desde,
+        hasta=hasta,
+        maquina_id=request.args.get('maquina_id', type=int),
+        orden_id=request.args.get('orden_id') or None,
+        turno=request.args.get('turno') or None,
+    )
+    data.update(desde=desde.isoformat() if desde else None, hasta=hasta.isoformat() if hasta else None)
+    return jsonify(data), 200
+
+@produccion_bp.route('/dashboard/oee', methods=['GET'])
+def dashboard_oee():
+    """
+    Rendimiento por máquina (tipo OEE): disponibilidad, rendimiento contra el
+    ciclo estándar de la OP y calidad (kg pesado vs teórico), calculados en
+    SQL desde los registros diarios.
+
+    Query params:
+        - desde / hasta: YYYY-MM-DD (inclusive)
+        - agrupar: además de máquina, turno y/o dia (ej. turno,dia)
+        - maquina_id: int
+        - turno: DIURNO / NOCTURNO / ...
+    """
+    from app.services.rendimiento_service import parsear_agrupacion_rendimiento, rendimiento_maquinas
+
+    try:
+        desde = datetime.fromisoformat(request.args['desde']).date() if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']).date() if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'desde/hasta deben tener formato YYYY-MM-DD'}), 400
+
+    try:
+        agrupar = parsear_agrupacion_rendimiento(request.args.get('agrupar'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    data = rendimiento_maquinas(
+        agrupar,
+        desde=desde,
+        hasta=hasta,
+        maquina_id=request.args.get('maquina_id', type=int),
+        turno=request.args.get('turno') or None,
+    )
+    data.update(desde=desde.isoformat() if desde else None, hasta=hasta.isoformat() if hasta else None)
+    return jsonify(data), 200
 
 @produccion_bp.route('/ordenes/<numero_op>/registros', methods=['POST'])
 def crear_registro(numero_op):
@@ -609,19 +855,11 @@ def crear_registro(numero_op):
             snapshot_peso_colada_gr = orden.snapshot_peso_colada_gr,
             snapshot_peso_extra_gr  = 0.0,
         )
-        
-        # Calcular totales cabecera
-        cabecera.actualizar_totales()
-        db.session.add(cabecera)
-        db.session.flush() # Para tener ID
-        
-        # Procesar Detalles
-        detalles_data = data.get('detalles', [])
+
+        # Procesar Detalles (se enlazan por la relación: un solo flush en el commit)
         peso_tiro = (cabecera.snapshot_peso_neto_gr * cabecera.snapshot_cavidades)
-        
-        for d in detalles_data:
+        for d in data.get('detalles', []):
             detalle = DetalleProduccionHora(
-                registro_id=cabecera.id,
                 hora=d.get('hora'),
                 maquinista=d.get('maquinista'),
                 color=d.get('color'),
@@ -630,8 +868,12 @@ def crear_registro(numero_op):
             )
             # Calcular metricas del detalle
             detalle.calcular_metricas(cabecera.snapshot_cavidades, peso_tiro)
-            db.session.add(detalle)
-            
+            cabecera.detalles.append(detalle)
+
+        # Calcular totales cabecera (con los detalles ya en memoria)
+        cabecera.actualizar_totales()
+        db.session.add(cabecera)
+
         db.session.commit()
         return jsonify(cabecera.to_dict()), 201
         
@@ -640,6 +882,37 @@ def crear_registro(numero_op):
         return jsonify({'error': str(e)}), 500
 
 
+@produccion_bp.route('/registros/bulk', methods=['POST'])
+def crear_registros_bulk_endpoint():
+    """
+    Crea varias hojas RDP (de una o varias OPs) en una sola llamada:
+    digitalización de un talonario completo.
+
+    Payload: { "registros": [ {"numero_op": "OP-...", ...mismo payload que
+               POST /ordenes/<op>/registros...}, ... ] }
+    Respuesta: resultado por hoja en el mismo orden del payload. Todas se
+    validan antes de escribir; las hojas con error no se insertan.
+    """
+    from app.services.creacion_registros_service import crear_registros_bulk
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('registros'), list) or not data['registros']:
+        return jsonify({'error': 'Se requiere "registros": [...] con al menos una hoja'}), 400
+
+    try:
+        resultados, creados = crear_registros_bulk(data['registros'])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    n_errores = len(resultados) - creados
+    return jsonify({
+        'success': n_errores == 0,
+        'message': f"Creados {creados} registros, {n_errores} con errores",
+        'resultados': resultados,
+    }), 201 if creados else 400
+
+
 # ==================== OCR ENDPOINTS ====================
 
 @produccion_bp.route('/ocr/scan-registro', methods=['POST'])
@@ -709,7 +982,8 @@ def agregar_bulto(registro_id):
     if not data:
         return jsonify({'error': 'Payload JSON requerido'}), 400
         
-    registro = db.session.get(RegistroDiarioProduccion, registro_id)
+    # Bloqueado: las estadísticas de pesaje se leen y escriben en esta transacción
+    registro = db.session.get(RegistroDiarioProduccion, registro_id, with_for_update=True)
     if not registro:
         return jsonify({'error': 'Registro no encontrado'}), 404
         
@@ -722,6 +996,8 @@ def agregar_bulto(registro_id):
             hora_registro=datetime.now(timezone.utc)
         )
         db.session.add(nuevo_bulto)
+        # Solo las estadísticas: total_kg_real (teórico) es lo que valida /validacion-peso
+        registro.absorber_pesos([nuevo_bulto.peso_real_kg])
         db.session.commit()
         
         return jsonify(nuevo_bulto.to_dict()), 201
@@ -742,7 +1018,10 @@ def eliminar_bulto(bulto_id):
         return jsonify({'error': 'Bulto no encontrado'}), 404
         
     try:
+        registro = db.session.get(RegistroDiarioProduccion, bulto.registro_id, with_for_update=True)
         db.session.delete(bulto)
+        db.session.flush()  # retirar_peso relee min / max sin este bulto
+        registro.retirar_peso(bulto.peso_real_kg)
         db.session.commit()
         return jsonify({'message': 'Bulto eliminado'}), 200
     except Exception as e:
@@ -753,15 +1032,12 @@ def validar_peso_registro(registro_id):
     """
     Compara el peso total reportado en la cabecera vs la suma de bultos pesados.
     """
-    from app.models.control_peso import ControlPeso
-    
     registro = db.session.get(RegistroDiarioProduccion, registro_id)
     if not registro:
         return jsonify({'error': 'Registro no encontrado'}), 404
         
-    # Sumar pesos de bultos
-    bultos = ControlPeso.query.filter_by(registro_id=registro_id).all()
-    total_pesado_kg = sum(b.peso_real_kg for b in bultos)
+    # Suma de bultos mantenida en línea (pesaje_*), sin cargar los ControlPeso
+    total_pesado_kg = registro.pesaje_suma_kg or 0.0
     
     # Peso reportado por maquinista (teórico o manual si existiera campo manual total)
     # Usamos total_kg_real que es el calculado en base a coladas x peso_tiro
@@ -774,7 +1050,8 @@ def validar_peso_registro(registro_id):
         'total_pesado_kg': round(total_pesado_kg, 2),
         'peso_teorico_kg': round(peso_teorico_kg, 2),
         'diferencia_kg': round(diferencia, 2),
-        'coincide': abs(diferencia) < 5.0 # Margen de tolerancia ejemplo 5kg
+        'coincide': abs(diferencia) < 5.0, # Margen de tolerancia ejemplo 5kg
+        'pesajes': registro.estadisticas_pesaje(),
     }), 200
 
 
@@ -784,7 +1061,13 @@ def actualizar_metricas_orden(numero_op):
     """
     Permite editar metricas tecnicas de una orden ACTIVA.
     Caso de uso: Molde Dañado (reduccion de cavidades), ajuste de ciclo real.
+
+    Solo se recalculan los calculo_* que dependen de los campos editados
+    (ver metricas_service.DEPENDENCIAS) y la respuesta trae únicamente
+    los valores que cambiaron.
     """
+    from app.services.metricas_service import recalcular_incremental
+
     orden = db.session.get(OrdenProduccion, numero_op)
     if not orden:
         return jsonify({'error': 'Orden no encontrada'}), 404
@@ -795,20 +1078,90 @@ def actualizar_metricas_orden(numero_op):
         
     try:
         # Solo permitimos editar ciertos campos tecnicos
-        if 'snapshot_tiempo_ciclo' in data:
-            orden.snapshot_tiempo_ciclo = data['snapshot_tiempo_ciclo']
+        modificados = []
+        for campo in ('snapshot_tiempo_ciclo', 'snapshot_horas_turno', 'snapshot_peso_colada_gr'):
+            if campo in data and getattr(orden, campo) != data[campo]:
+                setattr(orden, campo, data[campo])
+                modificados.append(f'orden.{campo}')
 
-        if 'snapshot_horas_turno' in data:
-            orden.snapshot_horas_turno = data['snapshot_horas_turno']
+        cambios = recalcular_incremental(orden, modificados)
+        db.session.commit()
 
-        if 'snapshot_peso_colada_gr' in data:
-            orden.snapshot_peso_colada_gr = data['snapshot_peso_colada_gr']
+        if 'calculo_fecha_fin' in cambios['orden'] and cambios['orden']['calculo_fecha_fin']:
+            cambios['orden']['calculo_fecha_fin'] = cambios['orden']['calculo_fecha_fin'].isoformat()
 
-        # Recalcular todo en cascada
-        orden.actualizar_metricas()
-        db.session.commit()
+        return jsonify({
+            'numero_op': orden.numero_op,
+            'campos_modificados': [m.split('.', 1)[1] for m in modificados],
+            'cambios': cambios,
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@produccion_bp.route('/admin/recalcular-metricas', methods=['POST'])
+def recalcular_metricas_masivo_endpoint():
+    """
+    Recalcula en bloque (vectorizado) los calculo_* de órdenes, lotes y materiales.
+    Uso: después de un cambio de fórmula. Equivale a `flask recalcular-metricas`.
 
-        return jsonify(orden.to_dict()), 200
+    Payload (opcional):
+    {
+        "numero_ops": ["OP-001", ...],   # default: todas
+        "chunk_size": 1000,
+        "dry_run": false
+    }
+    """
+    from app.services.recalculo_service import recalcular_metricas_masivo, CHUNK_DEFAULT
+
+    data = request.get_json(silent=True) or {}
+    numero_ops = data.get('numero_ops')
+    if numero_ops is not None and not isinstance(numero_ops, list):
+        return jsonify({'error': 'numero_ops debe ser una lista'}), 400
+
+    try:
+        stats = recalcular_metricas_masivo(
+            numero_ops=numero_ops,
+            chunk_size=int(data.get('chunk_size') or CHUNK_DEFAULT),
+            aplicar=not data.get('dry_run', False),
+        )
+        return jsonify({'success': True, 'dry_run': bool(data.get('dry_run', False)), **stats}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+
+@produccion_bp.route('/aprendizaje/trabajos', methods=['GET'])
+def listar_trabajos_aprendizaje():
+    """
+    Estado de la cola de aprendizaje de catálogo (side-effects de crear OP).
+
+    Query params:
+        - estado: PENDIENTE | FALLIDO | COMPLETADO (repetible; default PENDIENTE y FALLIDO)
+        - limit: int (default 100, máx 1000)
+    """
+    from app.models.trabajo_aprendizaje import TrabajoAprendizaje
+    from app.services.aprendizaje_service import resumen_trabajos
+
+    estados = [e.strip().upper() for e in request.args.getlist('estado') if e.strip()]
+    invalidos = set(estados) - set(TrabajoAprendizaje.ESTADOS)
+    if invalidos:
+        return jsonify({'error': f"estado debe ser uno de: {', '.join(TrabajoAprendizaje.ESTADOS)}"}), 400
+
+    limite = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify(resumen_trabajos(estados=estados or ('PENDIENTE', 'FALLIDO'), limite=limite)), 200
+
+
+@produccion_bp.route('/aprendizaje/trabajos/<int:trabajo_id>/reintentar', methods=['POST'])
+def reintentar_trabajo_aprendizaje(trabajo_id):
+    """Devuelve a la cola un trabajo FALLIDO."""
+    from app.services.aprendizaje_service import reintentar_trabajo
+
+    try:
+        trabajo = reintentar_trabajo(trabajo_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo.to_dict()), 200
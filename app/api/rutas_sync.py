@@ -1,10 +1,10 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, url_for
 from app.extensions import db
-from app.models.registro import RegistroDiarioProduccion
-from app.models.control_peso import ControlPeso
-from app.models.maquina import Maquina
-from app.models.orden import OrdenProduccion
-from datetime import datetime
+from app.models.carga_sincronizacion import CargaSincronizacion
+from app.services.sincronizacion_service import (
+    CHUNK_NDJSON_DEFAULT, CHUNK_NDJSON_MAXIMO, CursorInvalido,
+    encolar_pesajes, estado_trabajo_sync, leer_lineas, sincronizar_ndjson, sincronizar_pesajes,
+)
 
 sync_bp = Blueprint('sync', __name__)
 
@@ -12,110 +12,47 @@ sync_bp = Blueprint('sync', __name__)
 def sync_pesajes():
     """
     Recibe pesajes desde el Scale Module y los inserta como ControlPeso.
-    Si el RDP no existe, lo crea.
+    Si el RDP no existe, lo crea. El lote se procesa por conjunto
+    (ver sincronizacion_service); los errores se reportan por pesaje.
+
+    Idempotente por (dispositivo_id, local_id): los pesajes ya recibidos
+    vuelven en `synced` con `ya_sincronizado: true` y no se reinsertan, así
+    que el cliente puede reenviar toda su cola pendiente.
+
+    Con Content-Type application/x-ndjson (y opcionalmente Content-Encoding:
+    gzip) el cuerpo se procesa en streaming; ver _sync_pesajes_ndjson.
+
+    Con `async` (query param ?async=1 o "async": true en el body) el lote
+    solo se acepta en staging y se responde 202 con el job_id; el worker
+    `flask procesar-sync` lo procesa y GET /api/sync/jobs/<id> devuelve el
+    resultado de cada pesaje.
     """
+    if request.mimetype == 'application/x-ndjson':
+        return _sync_pesajes_ndjson()
+
     data = request.get_json()
     if not data or 'pesajes' not in data:
         return jsonify({'error': 'Invalid payload'}), 400
-    
-    synced_ids = []
-    errors = []
-    
-    # Pre-cargar maquinas para resolucion rapida
-    try:
-        maquinas = {m.nombre.upper(): m.id for m in Maquina.query.all()}
-    except Exception as e:
-        return jsonify({'error': f'Error cargando maquinas: {str(e)}'}), 500
-    
-    # Track impacted RDPs to recalculate once at end (optimization) or loop?
-    # Doing inside loop is safer for now.
-    
-    for p in data['pesajes']:
+
+    if _es_async(data):
+        if not isinstance(data['pesajes'], list):
+            return jsonify({'error': 'pesajes debe ser una lista'}), 400
         try:
-            # 1. Resolver Maquina
-            maq_nombre = p.get('maquina', '').upper()
-            maq_id = maquinas.get(maq_nombre)
-            
-            # Fallback simple: si maquinas esta vacio o no encuentra,
-            # intenta buscar por query directo o error.
-            if not maq_id:
-                m_obj = Maquina.query.filter_by(nombre=maq_nombre).first()
-                if m_obj: 
-                    maq_id = m_obj.id
-                    maquinas[maq_nombre] = maq_id
-            
-            if not maq_id:
-                errors.append({'local_id': p['local_id'], 'error': f"Maquina {maq_nombre} no encontrada en Central"})
-                continue
-                
-            # 2. Buscar/Crear RDP
-            # Scale envia fecha_ot en ISO string (YYYY-MM-DD)
-            fecha_str = p.get('fecha_ot')
-            fecha_ot = datetime.fromisoformat(fecha_str).date() if fecha_str else datetime.now().date()
-            turno = p.get('turno', 'DIURNO')
-            orden_id = p.get('nro_op')
-            
-            # Buscar existente
-            rdp = RegistroDiarioProduccion.query.filter_by(
-                orden_id=orden_id,
-                maquina_id=maq_id,
-                fecha=fecha_ot,
-                turno=turno
-            ).first()
-            
-            if not rdp:
-                # Buscar Orden para snapshots
-                orden = db.session.get(OrdenProduccion, orden_id)
-                if not orden:
-                    errors.append({'local_id': p['local_id'], 'error': f"Orden {orden_id} no encontrada"})
-                    continue
-
-                # Crear RDP on-the-fly con snapshots desde caché de la orden
-                rdp = RegistroDiarioProduccion(
-                    orden_id=orden_id,
-                    maquina_id=maq_id,
-                    fecha=fecha_ot,
-                    turno=turno,
-                    hora_inicio="00:00",
-                    colada_inicial=0,
-                    colada_final=0,
-                    # Snapshots del nuevo modelo (de campos cacheados)
-                    snapshot_cavidades      = orden.calculo_cavidades_totales or 1,
-                    snapshot_peso_neto_gr   = orden.calculo_peso_neto_golpe or 0.0,
-                    snapshot_peso_colada_gr = orden.snapshot_peso_colada_gr or 0.0,
-                    tiempo_ciclo_reportado  = orden.snapshot_tiempo_ciclo or 0.0,
-                )
-                db.session.add(rdp)
-                db.session.flush() # Para obtener ID
-            
-            # 3. Insertar ControlPeso
-            # Chequear duplicidad simple? (Opcional, Scale deberia manejarlo)
-            # Pesaje ID local no se guarda en Central por ahora en modelo ControlPeso
-            # Guardamos la data
-            
-            nuevo_peso = ControlPeso(
-                registro_id=rdp.id,
-                peso_real_kg=float(p.get('peso_kg', 0)),
-                color_nombre=p.get('color'),
-                # Parsear fecha_hora con info de timezone si viene
-                hora_registro=datetime.fromisoformat(p['fecha_hora']) if p.get('fecha_hora') else None
-            )
-            db.session.add(nuevo_peso)
-            # Flush para persistir ID y FK
-            db.session.flush()
-            
-            # Invalidar cache de la relacion para que se recargue con el nuevo item
-            db.session.expire(rdp, ['controles_peso'])
-            
-            # 4. Actualizar Totales del RDP
-            rdp.actualizar_totales()
-            
-            synced_ids.append({'local_id': p['local_id']})
-            
+            trabajo = encolar_pesajes(data['pesajes'], data.get('dispositivo_id'))
+            db.session.commit()
         except Exception as e:
-            errors.append({'local_id': p.get('local_id'), 'error': str(e)})
-            
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 500
+        return jsonify({
+            'success': True,
+            'message': f"Aceptados {trabajo.total_pesajes} pesajes",
+            'job_id': trabajo.id,
+            'estado': trabajo.estado,
+            'status_url': url_for('sync.estado_trabajo', trabajo_id=trabajo.id),
+        }), 202
+
     try:
+        synced_ids, errors = sincronizar_pesajes(data['pesajes'], data.get('dispositivo_id'))
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -125,5 +62,95 @@ def sync_pesajes():
         'success': True,
         'message': f"Procesados {len(synced_ids)} pesajes",
         'synced': synced_ids,
+        'ya_sincronizados': sum(1 for s in synced_ids if s.get('ya_sincronizado')),
         'errors': errors
     })
+
+
+def _es_async(data):
+    valor = request.args.get('async', data.get('async', False))
+    if isinstance(valor, str):
+        return valor.lower() in ('1', 'true', 'si', 'yes')
+    return bool(valor)
+
+
+@sync_bp.route('/sync/jobs/<int:trabajo_id>', methods=['GET'])
+def estado_trabajo(trabajo_id):
+    """
+    Estado de un lote aceptado en modo async y resultado por pesaje (en el
+    orden enviado). Los ítems SINCRONIZADO / YA_SINCRONIZADO pueden marcarse
+    como subidos; los ERROR traen el motivo; si el trabajo queda FALLIDO sus
+    ítems siguen PENDIENTE y el lote puede reenviarse (es idempotente).
+    """
+    estado = estado_trabajo_sync(trabajo_id)
+    if estado is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(estado)
+
+
+def _sync_pesajes_ndjson():
+    """
+    Subida de backlog grande: un pesaje JSON por línea, leído del stream
+    (gzip si Content-Encoding: gzip) y commiteado cada `chunk_size` líneas.
+
+    Query params / headers:
+        upload_id (o X-Upload-Id)      — identifica la subida para reanudarla
+        dispositivo_id (o X-Dispositivo-Id)
+        cursor (int)                   — línea del archivo con la que empieza el cuerpo
+        chunk_size (int)               — líneas por bloque (1..CHUNK_NDJSON_MAXIMO)
+
+    La respuesta trae `cursor`: líneas confirmadas. Si la subida se corta,
+    se reenvía desde esa línea (o el archivo entero con el mismo upload_id:
+    lo ya confirmado se saltea). Un stream truncado / gzip dañado responde
+    400 con el cursor hasta donde quedó commiteado.
+    """
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        chunk_size = int(request.args.get('chunk_size', CHUNK_NDJSON_DEFAULT))
+    except ValueError:
+        return jsonify({'error': 'cursor y chunk_size deben ser enteros'}), 400
+    if cursor < 0 or not 1 <= chunk_size <= CHUNK_NDJSON_MAXIMO:
+        return jsonify({'error': f'cursor >= 0 y chunk_size entre 1 y {CHUNK_NDJSON_MAXIMO}'}), 400
+
+    upload_id = request.args.get('upload_id') or request.headers.get('X-Upload-Id')
+    if upload_id and len(upload_id) > 64:
+        return jsonify({'error': 'upload_id admite hasta 64 caracteres'}), 400
+    dispositivo_id = request.args.get('dispositivo_id') or request.headers.get('X-Dispositivo-Id')
+    comprimido = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+
+    try:
+        resumen = sincronizar_ndjson(
+            leer_lineas(request.stream, comprimido), upload_id=upload_id,
+            dispositivo_id=dispositivo_id, cursor=cursor, chunk_size=chunk_size,
+        )
+    except CursorInvalido as e:
+        db.session.rollback()
+        carga = db.session.get(CargaSincronizacion, upload_id)
+        return jsonify({'success': False, 'message': str(e),
+                        'cursor': carga.lineas_confirmadas if carga else 0}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    completo = resumen['completo']
+    return jsonify({
+        'success': completo,
+        'message': (f"Procesados {resumen['synced'] + resumen['ya_sincronizados']} pesajes"
+                    if completo else f"Subida interrumpida: {resumen['error_stream']}"),
+        'cursor': resumen['cursor'],
+        'completo': completo,
+        'bloques': resumen['bloques'],
+        'synced': resumen['synced'],
+        'ya_sincronizados': resumen['ya_sincronizados'],
+        'errors': resumen['errors'],
+        'carga': resumen['carga'],
+    }), 200 if completo else 400
+
+
+@sync_bp.route('/sync/cargas/<upload_id>', methods=['GET'])
+def estado_carga(upload_id):
+    """Progreso de una subida NDJSON (cursor para reanudarla)."""
+    carga = db.session.get(CargaSincronizacion, upload_id)
+    if carga is None:
+        return jsonify({'error': 'Carga no encontrada'}), 404
+    return jsonify(carga.to_dict())
@@ -0,0 +1,215 @@
+"""
+Comandos CLI de mantenimiento.
+Se ejecutan con `flask --app run <comando>` (o FLASK_APP=run.py).
+"""
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('verificar-avance')
+@click.option('--dry-run', is_flag=True, help='Solo reporta diferencias, no las corrige.')
+@with_appcontext
+def verificar_avance_command(dry_run):
+    """Reconstruye el avance real de todas las OPs desde sus registros diarios."""
+    from app.services.produccion_service import reconstruir_avance_ordenes
+
+    diferencias = reconstruir_avance_ordenes(aplicar=not dry_run)
+
+    for d in diferencias:
+        click.echo(
+            f"{d['numero_op']}: kg {d['kg_persistido']} -> {d['kg_real']:.4f}, "
+            f"coladas {d['coladas_persistidas']} -> {d['coladas_reales']}"
+        )
+
+    if not diferencias:
+        click.echo('✅ Avance real consistente en todas las OPs')
+    elif dry_run:
+        click.echo(f'⚠️  {len(diferencias)} OPs con diferencias (dry-run, sin cambios)')
+    else:
+        click.echo(f'✅ {len(diferencias)} OPs corregidas')
+
+
+@click.command('verificar-pesajes')
+@click.option('--dry-run', is_flag=True, help='Solo reporta diferencias, no las corrige.')
+@click.option('--recalcular-totales', is_flag=True,
+              help='Re-deriva también los totales (total_kg_real y avance de la OP) de los registros corregidos.')
+@with_appcontext
+def verificar_pesajes_command(dry_run, recalcular_totales):
+    """Contrasta las estadísticas de pesaje de cada registro con sus bultos (control_peso)."""
+    from app.services.produccion_service import reconstruir_estadisticas_pesaje
+
+    diferencias = reconstruir_estadisticas_pesaje(aplicar=not dry_run, recalcular_totales=recalcular_totales)
+
+    for d in diferencias:
+        p, r = d['persistido'], d['real']
+        click.echo(
+            f"Registro {d['registro_id']}: n {p['pesaje_n']} -> {r['pesaje_n']}, "
+            f"suma {p['pesaje_suma_kg']} -> {r['pesaje_suma_kg']:.4f} kg"
+        )
+
+    if not diferencias:
+        click.echo('✅ Estadísticas de pesaje consistentes en todos los registros')
+    elif dry_run:
+        click.echo(f'⚠️  {len(diferencias)} registros con diferencias (dry-run, sin cambios)')
+    else:
+        click.echo(f'✅ {len(diferencias)} registros corregidos')
+
+
+@click.command('recalcular-metricas')
+@click.option('--op', 'numero_ops', multiple=True, help='OP a recalcular (repetible). Por defecto todas.')
+@click.option('--chunk-size', default=1000, show_default=True, help='OPs por bloque/commit.')
+@click.option('--dry-run', is_flag=True, help='Calcula sin escribir en la BD.')
+@with_appcontext
+def recalcular_metricas_command(numero_ops, chunk_size, dry_run):
+    """Recalcula en bloque los calculo_* de órdenes, lotes y materiales."""
+    from app.services.recalculo_service import recalcular_metricas_masivo
+
+    stats = recalcular_metricas_masivo(
+        numero_ops=list(numero_ops) or None,
+        chunk_size=chunk_size,
+        aplicar=not dry_run,
+    )
+    prefijo = '(dry-run) ' if dry_run else ''
+    click.echo(
+        f"✅ {prefijo}{stats['ordenes']} órdenes, {stats['lotes']} lotes, "
+        f"{stats['materiales']} materiales recalculados en {stats['bloques']} bloques"
+    )
+
+
+@click.command('recalcular-registros')
+@click.option('--chunk-size', default=1000, show_default=True, help='Registros por bloque/commit.')
+@click.option('--dry-run', is_flag=True, help='Solo reporta diferencias, no las corrige.')
+@click.option('--desde-cero', is_flag=True, help='Ignora el checkpoint de una ejecución interrumpida.')
+@with_appcontext
+def recalcular_registros_command(chunk_size, dry_run, desde_cero):
+    """Recalcula coladas / piezas / kg de los registros diarios desde detalles y bultos."""
+    from app.services.recalculo_service import recalcular_totales_registros
+
+    stats, diferencias = recalcular_totales_registros(
+        chunk_size=chunk_size, aplicar=not dry_run, reanudar=not desde_cero,
+    )
+    if stats['desde_id']:
+        click.echo(f"↪️  Reanudado desde el registro {stats['desde_id']}")
+
+    for d in diferencias:
+        p, r = d['persistido'], d['real']
+        click.echo(
+            f"Registro {d['registro_id']} ({d['orden_id']}): coladas {p['coladas']} -> {r['coladas']}, "
+            f"piezas {p['piezas']} -> {r['piezas']}, kg {p['kg']} -> {r['kg']:.4f}"
+        )
+
+    if not diferencias:
+        click.echo(f"✅ {stats['registros']} registros consistentes en {stats['bloques']} bloques")
+    elif dry_run:
+        click.echo(f'⚠️  {len(diferencias)} registros con diferencias (dry-run, sin cambios)')
+    else:
+        click.echo(f"✅ {stats['corregidos']} registros corregidos en {stats['bloques']} bloques")
+
+
+@click.command('reconstruir-resumen')
+@click.option('--dias-por-bloque', default=31, show_default=True, help='Días de registros por bloque/commit.')
+@click.option('--dry-run', is_flag=True, help='Solo reporta diferencias, no las corrige.')
+@with_appcontext
+def reconstruir_resumen_command(dias_por_bloque, dry_run):
+    """Regenera el resumen de producción (día × máquina × OP × turno) desde los registros."""
+    from app.services.resumen_service import reconstruir_resumen
+
+    stats = reconstruir_resumen(dias_por_bloque=dias_por_bloque, aplicar=not dry_run)
+    cambios = stats['nuevas'] + stats['modificadas'] + stats['eliminadas']
+    detalle = (f"{stats['nuevas']} nuevas, {stats['modificadas']} modificadas, "
+               f"{stats['eliminadas']} eliminadas")
+
+    if not cambios:
+        click.echo(f"✅ Resumen consistente: {stats['claves']} claves en {stats['bloques']} bloques")
+    elif dry_run:
+        click.echo(f'⚠️  {detalle} (dry-run, sin cambios)')
+    else:
+        click.echo(f"✅ Resumen reconstruido: {stats['claves']} claves ({detalle})")
+
+
+@click.command('procesar-aprendizaje')
+@click.option('--lote', default=100, show_default=True, help='Trabajos por pasada.')
+@click.option('--continuo', is_flag=True, help='Queda escuchando la cola (worker).')
+@click.option('--intervalo', default=5.0, show_default=True, help='Segundos de espera con la cola vacía.')
+@with_appcontext
+def procesar_aprendizaje_command(lote, continuo, intervalo):
+    """Procesa la cola de aprendizaje de catálogo (moldes y recetas de color)."""
+    import time
+    from app.services.aprendizaje_service import procesar_trabajos
+
+    while True:
+        stats = procesar_trabajos(lote=lote)
+        if stats['procesados']:
+            click.echo(
+                f"✅ {stats['completados']} completados, {stats['reintentar']} a reintentar, "
+                f"{stats['fallidos']} fallidos"
+            )
+        if not continuo:
+            if not stats['procesados']:
+                click.echo('✅ Cola de aprendizaje vacía')
+            break
+        if stats['procesados'] < lote:
+            time.sleep(intervalo)
+
+
+@click.command('procesar-sync')
+@click.option('--lote', default=10, show_default=True, help='Trabajos por pasada.')
+@click.option('--continuo', is_flag=True, help='Queda escuchando la cola (worker).')
+@click.option('--intervalo', default=2.0, show_default=True, help='Segundos de espera con la cola vacía.')
+@click.option('--retencion-dias', default=7, show_default=True, help='Días que se conservan los trabajos terminados.')
+@click.option('--purgar-cada', default=6.0, show_default=True,
+              help='Horas entre purgas de trabajos terminados (con --continuo).')
+@with_appcontext
+def procesar_sync_command(lote, continuo, intervalo, retencion_dias, purgar_cada):
+    """Procesa la cola de sincronización async de pesajes (POST /api/sync/pesajes?async=1)."""
+    import time
+    from app.services.sincronizacion_service import procesar_trabajos_sync, purgar_trabajos_sync
+
+    ultima_purga = None
+    while True:
+        if ultima_purga is None or time.monotonic() - ultima_purga >= purgar_cada * 3600:
+            borrados = purgar_trabajos_sync(dias=retencion_dias)
+            if borrados:
+                click.echo(f"🧹 {borrados} trabajos de sincronización purgados")
+            ultima_purga = time.monotonic()
+        stats = procesar_trabajos_sync(lote=lote)
+        if stats['procesados']:
+            click.echo(
+                f"✅ {stats['completados']} completados ({stats['pesajes']} pesajes), "
+                f"{stats['reintentar']} a reintentar, {stats['fallidos']} fallidos"
+            )
+        if not continuo:
+            if not stats['procesados']:
+                click.echo('✅ Cola de sincronización vacía')
+            break
+        if stats['procesados'] < lote:
+            time.sleep(intervalo)
+
+
+@click.command('reconstruir-recetas-color')
+@click.option('--chunk-size', default=5000, show_default=True, help='Pigmentos leídos por bloque.')
+@click.option('--dry-run', is_flag=True, help='Solo reporta diferencias, no reemplaza la tabla.')
+@with_appcontext
+def reconstruir_recetas_color_command(chunk_size, dry_run):
+    """Recalcula RecetaColorNormalizada desde el histórico completo de OPs."""
+    from app.services.receta_color_service import reconstruir_recetas
+
+    stats = reconstruir_recetas(chunk_size=chunk_size, aplicar=not dry_run)
+    prefijo = '(dry-run) ' if dry_run else ''
+    click.echo(
+        f"✅ {prefijo}{stats['pigmentos']} pigmentos en {stats['bloques']} bloques → "
+        f"{stats['recetas']} recetas ({stats['nuevas']} nuevas, {stats['modificadas']} modificadas, "
+        f"{stats['eliminadas']} eliminadas)"
+    )
+
+
+def register_commands(app):
+    """Registra los comandos CLI en la app Flask."""
+    app.cli.add_command(verificar_avance_command)
+    app.cli.add_command(verificar_pesajes_command)
+    app.cli.add_command(recalcular_metricas_command)
+    app.cli.add_command(recalcular_registros_command)
+    app.cli.add_command(reconstruir_resumen_command)
+    app.cli.add_command(procesar_aprendizaje_command)
+    app.cli.add_command(reconstruir_recetas_color_command)
+    app.cli.add_command(procesar_sync_command)
@@ -11,3 +11,8 @@ from app.models.molde import Molde, Pieza
 from app.models.talonario import Talonario
 from app.models.historial_estado import HistorialEstadoOrden
 from app.models.receta_color import RecetaColorNormalizada
+from app.models.trabajo_aprendizaje import TrabajoAprendizaje
+from app.models.carga_sincronizacion import CargaSincronizacion
+from app.models.trabajo_sincronizacion import TrabajoSincronizacion, PesajeEnCola
+from app.models.checkpoint_proceso import CheckpointProceso
+from app.models.resumen_produccion import ResumenProduccion
@@ -0,0 +1,49 @@
+"""
+Modelo CargaSincronizacion: progreso de una subida NDJSON de pesajes
+(POST /api/sync/pesajes con Content-Type application/x-ndjson).
+"""
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class CargaSincronizacion(db.Model):
+    """
+    Una por upload_id (lo genera el cliente). `lineas_confirmadas` es el
+    cursor: líneas del archivo ya procesadas y commiteadas. Se actualiza en
+    la misma transacción que cada bloque de pesajes, así que tras un corte
+    la subida se retoma exactamente desde el último bloque confirmado.
+
+    Estados: EN_CURSO → COMPLETADA.
+    """
+    __tablename__ = 'carga_sincronizacion'
+
+    ESTADOS = ('EN_CURSO', 'COMPLETADA')
+
+    id             = db.Column(db.String(64), primary_key=True)   # upload_id del cliente
+    dispositivo_id = db.Column(db.String(64), nullable=False, default='')
+    estado         = db.Column(db.String(20), nullable=False, default='EN_CURSO')
+
+    lineas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    sincronizados      = db.Column(db.Integer, nullable=False, default=0)
+    ya_sincronizados   = db.Column(db.Integer, nullable=False, default=0)
+    errores            = db.Column(db.Integer, nullable=False, default=0)
+
+    fecha_creacion      = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    fecha_actualizacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                                    onupdate=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'dispositivo_id': self.dispositivo_id,
+            'estado': self.estado,
+            'cursor': self.lineas_confirmadas,
+            'sincronizados': self.sincronizados,
+            'ya_sincronizados': self.ya_sincronizados,
+            'errores': self.errores,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+        }
+
+    def __repr__(self):
+        return f'<CargaSincronizacion {self.id} {self.estado} cursor={self.lineas_confirmadas}>'
@@ -0,0 +1,43 @@
+"""
+Modelo CheckpointProceso: progreso de los procesos de mantenimiento por
+bloques (ej. `flask recalcular-registros`) para poder reanudarlos.
+"""
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class CheckpointProceso(db.Model):
+    """
+    Uno por proceso (`nombre`). `ultimo_id` es la última clave del keyset ya
+    procesada y commiteada: se actualiza en la misma transacción que cada
+    bloque, así que tras un corte el proceso sigue desde el bloque siguiente.
+
+    Estados: EN_CURSO → COMPLETADO.
+    """
+    __tablename__ = 'checkpoint_proceso'
+
+    ESTADOS = ('EN_CURSO', 'COMPLETADO')
+
+    nombre     = db.Column(db.String(64), primary_key=True)
+    estado     = db.Column(db.String(20), nullable=False, default='EN_CURSO')
+    ultimo_id  = db.Column(db.Integer, nullable=False, default=0)
+    procesados = db.Column(db.Integer, nullable=False, default=0)
+    corregidos = db.Column(db.Integer, nullable=False, default=0)
+
+    fecha_inicio        = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    fecha_actualizacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                                    onupdate=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'nombre': self.nombre,
+            'estado': self.estado,
+            'ultimo_id': self.ultimo_id,
+            'procesados': self.procesados,
+            'corregidos': self.corregidos,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+        }
+
+    def __repr__(self):
+        return f'<CheckpointProceso {self.nombre} {self.estado} ultimo_id={self.ultimo_id}>'
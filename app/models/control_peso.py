@@ -7,6 +7,12 @@ class ControlPeso(db.Model):
     Se asocia a un RegistroDiarioProduccion para validación cruzada.
     """
     __tablename__ = 'control_peso'
+    __table_args__ = (
+        # Un pesaje de origen se inserta una sola vez: los reintentos de sync no duplican bultos
+        db.Index('uq_control_peso_origen', 'dispositivo_id', 'origen_id', unique=True,
+                 postgresql_where=db.text('origen_id IS NOT NULL'),
+                 sqlite_where=db.text('origen_id IS NOT NULL')),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     
@@ -21,6 +27,11 @@ class ControlPeso(db.Model):
     color_nombre = db.Column(db.String(50), nullable=True) 
     color_id = db.Column(db.Integer, db.ForeignKey('color_producto.id'), nullable=True)
     
+    # Origen (sync): ID local del pesaje en el dispositivo que lo registró.
+    # dispositivo_id '' = cliente que no se identifica (balanza única)
+    origen_id = db.Column(db.String(64), nullable=True)
+    dispositivo_id = db.Column(db.String(64), nullable=False, default='')
+
     # Auditoría
     hora_registro = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     usuario_id = db.Column(db.Integer, nullable=True) # Quien pesó (opcional por ahora)
@@ -34,5 +45,7 @@ class ControlPeso(db.Model):
             'registro_id': self.registro_id,
             'peso_real_kg': self.peso_real_kg,
             'color': self.color_nombre,
+            'origen_id': self.origen_id,
+            'dispositivo_id': self.dispositivo_id,
             'hora': self.hora_registro.isoformat() if self.hora_registro else None
         }
@@ -1,4 +1,5 @@
 from app.extensions import db
+from app.services import calculo_orden as calculo
 
 
 class LoteColor(db.Model):
@@ -50,18 +51,14 @@ class LoteColor(db.Model):
 
         peso_neto_golpe = orden_padre.calculo_peso_neto_golpe or 0.0
 
-        if peso_neto_golpe > 0:
-            self.calculo_coladas = (self.meta_kg * 1000) / peso_neto_golpe
-            self.calculo_kg_real = self.calculo_coladas * peso_neto_golpe / 1000
-        else:
-            self.calculo_coladas = 0.0
-            self.calculo_kg_real = 0.0
+        self.calculo_coladas = calculo.coladas_lote(self.meta_kg, peso_neto_golpe)
+        self.calculo_kg_real = calculo.kg_real_lote(self.calculo_coladas, peso_neto_golpe)
 
         # HORAS HOMBRE: proporcional a los días de la orden
         n_colores = orden_padre.calculo_colores_activos or 1
         dias_orden  = orden_padre.calculo_dias or 0.0
-        horas_turno = orden_padre.snapshot_horas_turno or 24.0
-        self.calculo_horas_hombre = (dias_orden * horas_turno * self.personas) / n_colores
+        horas_turno = orden_padre.snapshot_horas_turno or calculo.HORAS_TURNO_DEFAULT_LOTE
+        self.calculo_horas_hombre = calculo.horas_hombre_lote(dias_orden, horas_turno, self.personas, n_colores)
 
         # CASCADE a recetas de materiales
         for receta in self.materias_primas:
@@ -1,5 +1,6 @@
 from app.extensions import db
-from datetime import datetime, timezone, timedelta
+from app.services import calculo_orden as calculo
+from datetime import datetime, timezone
 
 
 # =============================================================================
@@ -77,6 +78,13 @@ class OrdenProduccion(db.Model):
     # --- ESTADO ---
     activa = db.Column(db.Boolean, default=True)
 
+    # Índices: paginación por cursor (keyset) del listado principal y
+    # carga de colas por máquina del timeline de programación
+    __table_args__ = (
+        db.Index('ix_orden_fecha_creacion_op', 'fecha_creacion', 'numero_op'),
+        db.Index('ix_orden_maquina_activa', 'maquina_id', 'activa'),
+    )
+
     # --- RELACIONES ---
     snapshot_composicion = db.relationship(
         'SnapshotComposicionMolde',
@@ -111,6 +119,17 @@ class OrdenProduccion(db.Model):
     calculo_colores_activos = db.Column(db.Integer, default=1)
     calculo_familia_color   = db.Column(db.String(50), nullable=True)
 
+    # Avance real acumulado de los RegistroDiarioProduccion de la OP.
+    # Se mantiene incrementalmente en cada flush (ver registro.py);
+    # `flask verificar-avance` lo reconstruye desde cero.
+    calculo_avance_real_kg      = db.Column(db.Float, default=0.0)
+    calculo_avance_real_coladas = db.Column(db.Integer, default=0)
+
+    # Versión del árbol de la OP (orden, snapshot, lotes, recetas, registros,
+    # detalles y pesajes). Sube en cada flush que toca cualquiera de ellos
+    # (ver _incrementar_version_ordenes) y alimenta el ETag de los GET.
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     # -------------------------------------------------------------------------
     # PROPIEDADES DERIVADAS (desde snapshot_composicion)
     # -------------------------------------------------------------------------
@@ -150,52 +169,41 @@ class OrdenProduccion(db.Model):
         Recalcula y persiste todos los valores calculo_*.
         Debe llamarse siempre que cambien datos técnicos de la OP.
         Dispara en cascada a LoteColor hijos.
+        Las fórmulas viven en app.services.calculo_orden (sin ORM).
         """
         # 0. Composición del golpe (desde snapshot)
-        peso_neto   = self.peso_neto_golpe_gr
+        composicion = [(s.cavidades, s.peso_unit_gr) for s in self.snapshot_composicion]
+        peso_neto   = calculo.peso_neto_golpe(composicion)
         peso_colada = self.snapshot_peso_colada_gr or 0.0
         peso_tiro   = peso_neto + peso_colada
 
         self.calculo_peso_neto_golpe   = peso_neto
         self.calculo_peso_tiro_gr      = peso_tiro
-        self.calculo_cavidades_totales = self.cavidades_totales
+        self.calculo_cavidades_totales = calculo.cavidades_totales(composicion)
 
         # 0b. Colores activos
-        count = len(self.lotes)
-        self.calculo_colores_activos = count if count > 0 else 1
+        self.calculo_colores_activos = calculo.colores_activos(len(self.lotes))
 
         # 1. PESO PRODUCCIÓN = suma de meta_kg de cada lote
         self.calculo_peso_produccion = sum((l.meta_kg or 0.0) for l in self.lotes)
         peso_total_kg = self.calculo_peso_produccion
 
         # 2. MERMA (solo colada / runner)
-        merma_pct = 0.0
-        if peso_tiro > 0:
-            merma_pct = (peso_tiro - peso_neto) / peso_tiro
+        merma_pct = calculo.merma_pct(peso_tiro, peso_neto)
         self.calculo_merma_pct = merma_pct
 
         # 3. MERMA NATURAL en kg
-        peso_inc_merma = peso_total_kg * (1 + merma_pct) if peso_tiro > 0 else 0.0
+        peso_inc_merma = calculo.peso_inc_merma(peso_total_kg, merma_pct, peso_tiro)
         self.calculo_peso_inc_merma  = peso_inc_merma
         self.calculo_merma_natural_kg = peso_inc_merma - peso_total_kg
 
         # 4. TIEMPOS
-        horas = 0.0
-        dias  = 0.0
-        if peso_tiro > 0 and self.snapshot_tiempo_ciclo:
-            golpes   = (peso_total_kg * 1000) / peso_tiro
-            segundos = golpes * self.snapshot_tiempo_ciclo
-            horas    = segundos / 3600
-            if self.snapshot_horas_turno and self.snapshot_horas_turno > 0:
-                dias = horas / self.snapshot_horas_turno
+        horas = calculo.horas_produccion(peso_total_kg, peso_tiro, self.snapshot_tiempo_ciclo)
+        dias  = calculo.dias_produccion(horas, self.snapshot_horas_turno)
 
         self.calculo_horas = horas
         self.calculo_dias  = dias
-
-        fecha_fin = None
-        if self.fecha_inicio and dias > 0:
-            fecha_fin = self.fecha_inicio + timedelta(days=dias)
-        self.calculo_fecha_fin = fecha_fin
+        self.calculo_fecha_fin = calculo.fecha_fin(self.fecha_inicio, dias)
 
         # 5. FAMILIA COLOR (cache desde Producto)
         self.calculo_familia_color = None
@@ -227,38 +235,73 @@ class OrdenProduccion(db.Model):
             'Familia Color':          self.calculo_familia_color,
         }
 
-    def to_dict(self):
-        avance_real_kg     = sum(r.total_kg_real or 0.0 for r in self.registros_diarios)
-        avance_real_coladas = sum(r.total_coladas_calculada or 0 for r in self.registros_diarios)
+    # Campos de cabecera seleccionables con ?fields= y relaciones con ?include=
+    CAMPOS_CABECERA = (
+        'numero_op', 'producto', 'maquina', 'tipo_maquina', 'fecha', 'fecha_inicio',
+        'molde', 'activa', 'snapshot_tecnico', 'resumen_totales',
+    )
+    INCLUDES = ('lotes', 'composicion', 'avance')
 
-        return {
-            'numero_op':    self.numero_op,
-            'producto':     self.producto,
-            'maquina':      self.maquina_ref.nombre if self.maquina_ref else None,
-            'tipo_maquina': self.maquina_ref.tipo   if self.maquina_ref else None,
-            'fecha':        self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            'fecha_inicio': self.fecha_inicio.isoformat()   if self.fecha_inicio   else None,
-            'molde':        self.molde,
-            'activa':       self.activa,
-
-            # Snapshot técnico completo
-            'snapshot_tecnico': {
+    def to_dict(self, fields=None, include=None):
+        """
+        Serializa la OP. Sin argumentos devuelve el árbol completo.
+
+        Args:
+            fields: campos de cabecera a incluir (subconjunto de CAMPOS_CABECERA);
+                    None = todos
+            include: relaciones a incluir (subconjunto de INCLUDES); None = todas
+                     si tampoco se pasó `fields`, ninguna en caso contrario.
+                     Las relaciones no incluidas no se tocan (no se cargan).
+        """
+        if include is None:
+            include = self.INCLUDES if fields is None else ()
+        if fields is None:
+            fields = self.CAMPOS_CABECERA
+
+        data = {}
+        if 'numero_op' in fields:
+            data['numero_op'] = self.numero_op
+        if 'producto' in fields:
+            data['producto'] = self.producto
+        if 'maquina' in fields:
+            data['maquina'] = self.maquina_ref.nombre if self.maquina_ref else None
+        if 'tipo_maquina' in fields:
+            data['tipo_maquina'] = self.maquina_ref.tipo if self.maquina_ref else None
+        if 'fecha' in fields:
+            data['fecha'] = self.fecha_creacion.isoformat() if self.fecha_creacion else None
+        if 'fecha_inicio' in fields:
+            data['fecha_inicio'] = self.fecha_inicio.isoformat() if self.fecha_inicio else None
+        if 'molde' in fields:
+            data['molde'] = self.molde
+        if 'activa' in fields:
+            data['activa'] = self.activa
+
+        # Snapshot técnico (la composición viaja solo con include=composicion)
+        if 'snapshot_tecnico' in fields:
+            data['snapshot_tecnico'] = {
                 'tiempo_ciclo_seg':    self.snapshot_tiempo_ciclo,
                 'horas_turno':         self.snapshot_horas_turno,
                 'peso_colada_gr':      self.snapshot_peso_colada_gr,
-                'es_multipieza':       self.es_multipieza,
                 'peso_neto_golpe_gr':  self.calculo_peso_neto_golpe,
                 'peso_tiro_gr':        self.calculo_peso_tiro_gr,
                 'cavidades_totales':   self.calculo_cavidades_totales,
-                'composicion': [s.to_dict() for s in self.snapshot_composicion],
-            },
+            }
+        if 'composicion' in include:
+            data.setdefault('snapshot_tecnico', {}).update({
+                'es_multipieza': self.es_multipieza,
+                'composicion':   [s.to_dict() for s in self.snapshot_composicion],
+            })
 
-            'lotes':           [lote.to_dict() for lote in self.lotes],
-            'resumen_totales': self._round_dict(self.resumen_totales),
+        if 'lotes' in include:
+            data['lotes'] = [lote.to_dict() for lote in self.lotes]
+        if 'resumen_totales' in fields:
+            data['resumen_totales'] = self._round_dict(self.resumen_totales)
 
-            'avance_real_kg':      round(avance_real_kg, 2),
-            'avance_real_coladas': avance_real_coladas,
-        }
+        if 'avance' in include:
+            data['avance_real_kg'] = round(self.calculo_avance_real_kg or 0.0, 2)
+            data['avance_real_coladas'] = self.calculo_avance_real_coladas or 0
+
+        return data
 
     def _round_dict(self, data):
         rounded = {}
@@ -267,4 +310,99 @@ class OrdenProduccion(db.Model):
                 rounded[k] = round(v, 4) if ('%' in k or ('Merma' in k and v < 1)) else round(v, 2)
             else:
                 rounded[k] = v
-        return rounded
\ No newline at end of file
+        return rounded
+
+# =============================================================================
+# VERSIÓN DE LA OP (mantenimiento en cada flush)
+# =============================================================================
+
+def _ops_de(session, obj):
+    """
+    numero_op de las OPs cuyo árbol contiene `obj`, tanto con el valor actual
+    de su FK como con el previo (por si el objeto cambió de padre).
+    """
+    from app.models.lote import LoteColor
+    from app.models.recetas import SeCompone, SeColorea
+    from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora, _valor_previo
+    from app.models.control_peso import ControlPeso
+    from app.models.historial_estado import HistorialEstadoOrden
+
+    # (clase, FK a la OP, relación al padre)
+    directos = (
+        (SnapshotComposicionMolde, 'orden_id', 'orden'),
+        (LoteColor, 'numero_op', 'orden'),
+        (RegistroDiarioProduccion, 'orden_id', 'orden'),
+        (HistorialEstadoOrden, 'numero_op', 'orden'),
+    )
+    # (clase, FK al intermedio, relación al intermedio, clase intermedia)
+    indirectos = (
+        (SeCompone, 'lote_id', 'lote', LoteColor),
+        (SeColorea, 'lote_id', 'lote', LoteColor),
+        (DetalleProduccionHora, 'registro_id', 'cabecera', RegistroDiarioProduccion),
+        (ControlPeso, 'registro_id', 'registro', RegistroDiarioProduccion),
+    )
+
+    def _fks(o, fk, rel):
+        # Solo se usa la relación si ya está en memoria (objetos pendientes): nunca dispara lazy-loads
+        valores = {getattr(o, fk), _valor_previo(o, fk)}
+        padre = o.__dict__.get(rel)
+        return valores, padre
+
+    for clase, fk, rel in directos:
+        if isinstance(obj, clase):
+            ops, orden = _fks(obj, fk, rel)
+            if orden is not None:
+                ops.add(orden.numero_op)
+            return ops
+
+    for clase, fk, rel, clase_padre in indirectos:
+        if isinstance(obj, clase):
+            ids, padre = _fks(obj, fk, rel)
+            padres = {session.get(clase_padre, i) for i in ids if i is not None}
+            padres.add(padre)
+            ops = set()
+            for p in padres:
+                if p is not None:
+                    ops |= _ops_de(session, p)
+            return ops
+
+    return set()
+
+
+def _incrementar_version_ordenes(session, flush_context, instances):
+    """
+    Sube OrdenProduccion.version (una vez por flush) para toda OP cuyo árbol
+    tenga altas, ediciones o bajas pendientes. Se usa `version = version + 1`
+    para que workers concurrentes no se pisen.
+
+    Las OPs insertadas en la transacción en curso nadie las ha leído todavía:
+    se omiten (ahorra un SELECT + UPDATE por OP en la creación en lote).
+    """
+    insertadas = session.info.setdefault('ordenes_insertadas', set())
+    insertadas.update(o.numero_op for o in session.new if isinstance(o, OrdenProduccion))
+
+    ops = set()
+    for obj in list(session.new) + list(session.deleted):
+        ops |= _ops_de(session, obj)
+    for obj in list(session.dirty):
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, OrdenProduccion):
+            ops.add(obj.numero_op)
+        else:
+            ops |= _ops_de(session, obj)
+
+    for numero_op in ops - insertadas - {None}:
+        orden = session.get(OrdenProduccion, numero_op)
+        if orden is None or orden in session.deleted:
+            continue
+        orden.version = OrdenProduccion.version + 1
+
+
+def _olvidar_ordenes_insertadas(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('ordenes_insertadas', None)
+
+
+db.event.listen(db.session, 'before_flush', _incrementar_version_ordenes)
+db.event.listen(db.session, 'after_transaction_end', _olvidar_ordenes_insertadas)
@@ -71,6 +71,9 @@ class ColorProducto(db.Model):
     nombre = db.Column(db.String(50), nullable=False) # e.g. "Rojo", "Azul"
     codigo = db.Column(db.Integer, nullable=False)    # e.g. 5
     familia_id = db.Column(db.Integer, db.ForeignKey('familia_color.id'), nullable=True)
+
+    # Sube con cada cambio en sus RecetaColorNormalizada: valida la caché de prefill
+    version_receta = db.Column(db.Integer, nullable=False, default=1)
     
     familia = db.relationship('FamiliaColor', backref='colores')
 
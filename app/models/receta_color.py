@@ -2,11 +2,21 @@
 Receta de Color Normalizada
 Acumula la dosis de pigmentos en gr/kg de producto por combinación (color, colorante).
 Se actualiza automáticamente cada vez que se crea una Orden de Producción.
+Todo cambio sube ColorProducto.version_receta del color afectado (caché de prefill).
 """
+from sqlalchemy import and_, or_, tuple_
+
 from app.extensions import db
+from app.models.producto import ColorProducto
 from datetime import datetime, timezone
 
 
+# Clave del advisory lock (PostgreSQL) que serializa las escrituras por lote de
+# recetas (absorber_muestras) con la reconstrucción: mientras se reconstruye no
+# se absorben muestras nuevas, y dos lotes no se pisan las claves nuevas.
+LOCK_RECETAS = 0x52435F4E  # 'RC_N'
+
+
 class RecetaColorNormalizada(db.Model):
     """
     Conocimiento acumulado: cuántos gramos de un colorante se usan
@@ -42,10 +52,15 @@ class RecetaColorNormalizada(db.Model):
     colorante = db.relationship('Colorante', backref='recetas_normalizadas')
     producto  = db.relationship('ProductoTerminado', backref='recetas_color')
 
-    # Restricción única: una sola receta por combinación
+    # Restricción única: una sola receta por combinación.
+    # NULL no choca en un UNIQUE, así que la receta genérica (producto_sku NULL)
+    # necesita su propio índice parcial (también es el target de ON CONFLICT).
     __table_args__ = (
         db.UniqueConstraint('color_id', 'colorante_id', 'producto_sku',
                             name='uq_receta_color_normalizada'),
+        db.Index('uq_receta_color_generica', 'color_id', 'colorante_id', unique=True,
+                 postgresql_where=db.text('producto_sku IS NULL'),
+                 sqlite_where=db.text('producto_sku IS NULL')),
     )
 
     # -----------------------------------------------------------------------
@@ -93,22 +108,223 @@ class RecetaColorNormalizada(db.Model):
 
         return receta
 
+    @staticmethod
+    def agregar_muestras(muestras, agregadas=None):
+        """
+        Agrupa muestras (color_id, colorante_id, producto_sku, gr_por_kg) por
+        clave → {clave: (promedio, n)}. El promedio se acumula con la misma
+        fórmula que absorber_nueva_muestra, muestra a muestra y en orden.
+        `agregadas` permite seguir acumulando sobre un resultado previo.
+        """
+        agregadas = {} if agregadas is None else agregadas
+        for color_id, colorante_id, producto_sku, gr_por_kg in muestras:
+            clave = (color_id, colorante_id, producto_sku)
+            actual = agregadas.get(clave)
+            if actual is None:
+                agregadas[clave] = (gr_por_kg, 1)
+            else:
+                promedio, n = actual
+                agregadas[clave] = ((promedio * n + gr_por_kg) / (n + 1), n + 1)
+        return agregadas
+
+    @classmethod
+    def _filtro_claves(cls, claves):
+        """
+        WHERE de las recetas con (color_id, colorante_id, producto_sku) en
+        `claves`; las genéricas (producto_sku None) se comparan con IS NULL.
+        """
+        especificas = [clave for clave in claves if clave[2] is not None]
+        genericas = [clave[:2] for clave in claves if clave[2] is None]
+        condiciones = []
+        if especificas:
+            condiciones.append(tuple_(cls.color_id, cls.colorante_id, cls.producto_sku).in_(especificas))
+        if genericas:
+            condiciones.append(and_(
+                tuple_(cls.color_id, cls.colorante_id).in_(genericas), cls.producto_sku.is_(None)
+            ))
+        return or_(*condiciones)
+
+    @classmethod
+    def absorber_muestras(cls, session, muestras):
+        """
+        Upsert por conjunto de muchas muestras (no hace commit).
+
+        Las filas existentes de las claves del lote se leen con un único
+        SELECT ... FOR UPDATE y sirven de punto de partida de
+        agregar_muestras, que pliega el lote muestra a muestra: el resultado
+        es bit a bit el de absorber_nueva_muestra en secuencia. Después se
+        escriben los valores absolutos.
+
+        FOR UPDATE no bloquea claves que aún no existen: dos llamadas
+        concurrentes que crean la misma receta perderían muestras. Por eso
+        primero se toma bloquear_recetas (hasta el fin de la transacción).
+
+        PostgreSQL / SQLite: un INSERT ... ON CONFLICT DO UPDATE para recetas
+        específicas y otro para genéricas (índice parcial producto_sku IS NULL).
+        Otros motores: INSERT de las claves nuevas + UPDATE por id de las existentes.
+
+        Returns:
+            int: cantidad de recetas (claves) afectadas
+        """
+        muestras = list(muestras)
+        if not muestras:
+            return 0
+
+        session.flush()
+        bloquear_recetas(session)
+        ahora = datetime.now(timezone.utc)
+        dialecto = session.get_bind().dialect.name
+        tabla = cls.__table__
+
+        claves = {(color_id, colorante_id, producto_sku) for color_id, colorante_id, producto_sku, _ in muestras}
+        existentes = {
+            (color_id, colorante_id, producto_sku): (receta_id, gr_por_kg, n or 0)
+            for receta_id, color_id, colorante_id, producto_sku, gr_por_kg, n in session.execute(
+                db.select(tabla.c.id, tabla.c.color_id, tabla.c.colorante_id, tabla.c.producto_sku,
+                          tabla.c.gr_por_kg, tabla.c.n_muestras)
+                .where(cls._filtro_claves(claves))
+                .with_for_update()
+            )
+        }
+        agregadas = cls.agregar_muestras(
+            muestras, {clave: (gr_por_kg, n) for clave, (_, gr_por_kg, n) in existentes.items()}
+        )
+        filas = [
+            {
+                'color_id': color_id, 'colorante_id': colorante_id, 'producto_sku': producto_sku,
+                'gr_por_kg': promedio, 'n_muestras': n, 'ultima_actualizacion': ahora,
+            }
+            for (color_id, colorante_id, producto_sku), (promedio, n) in agregadas.items()
+        ]
+
+        if dialecto in ('postgresql', 'sqlite'):
+            if dialecto == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            especificas = [f for f in filas if f['producto_sku'] is not None]
+            genericas = [f for f in filas if f['producto_sku'] is None]
+
+            for lote, target, where in (
+                (especificas, ['color_id', 'colorante_id', 'producto_sku'], None),
+                (genericas, ['color_id', 'colorante_id'], tabla.c.producto_sku.is_(None)),
+            ):
+                if not lote:
+                    continue
+                stmt = insert(tabla)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=target,
+                    index_where=where,
+                    set_={
+                        'gr_por_kg': stmt.excluded.gr_por_kg,
+                        'n_muestras': stmt.excluded.n_muestras,
+                        'ultima_actualizacion': stmt.excluded.ultima_actualizacion,
+                    },
+                )
+                session.execute(stmt, lote)
+        else:
+            nuevas, actualizadas = [], []
+            for fila in filas:
+                existente = existentes.get((fila['color_id'], fila['colorante_id'], fila['producto_sku']))
+                if existente is None:
+                    nuevas.append(fila)
+                else:
+                    actualizadas.append({
+                        'receta_id': existente[0], 'gr_por_kg': fila['gr_por_kg'],
+                        'n_muestras': fila['n_muestras'], 'ultima_actualizacion': ahora,
+                    })
+            if nuevas:
+                session.execute(db.insert(tabla), nuevas)
+            if actualizadas:
+                session.execute(
+                    db.update(tabla).where(tabla.c.id == db.bindparam('receta_id')).values(
+                        gr_por_kg=db.bindparam('gr_por_kg'), n_muestras=db.bindparam('n_muestras'),
+                        ultima_actualizacion=db.bindparam('ultima_actualizacion'),
+                    ),
+                    actualizadas,
+                )
+
+        # Las instancias ya cargadas en la sesión quedaron desactualizadas
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, cls):
+                session.expire(obj)
+        incrementar_version_recetas(session, {clave[0] for clave in agregadas})
+        return len(agregadas)
+
     # -----------------------------------------------------------------------
     # SERIALIZACIÓN
     # -----------------------------------------------------------------------
 
-    def to_dict(self, meta_kg: float | None = None):
+    @staticmethod
+    def pigmento_dict(colorante_id, nombre, gr_por_kg, n_muestras, meta_kg=None):
         d = {
-            'colorante_id': self.colorante_id,
-            'nombre':        self.colorante.nombre if self.colorante else None,
-            'gr_por_kg':     round(self.gr_por_kg, 4),
-            'n_muestras':    self.n_muestras,
+            'colorante_id': colorante_id,
+            'nombre':        nombre,
+            'gr_por_kg':     round(gr_por_kg, 4),
+            'n_muestras':    n_muestras,
         }
         if meta_kg is not None and meta_kg > 0:
-            d['gramos'] = round(self.gr_por_kg * meta_kg, 2)
+            d['gramos'] = round(gr_por_kg * meta_kg, 2)
         return d
 
+    def to_dict(self, meta_kg: float | None = None):
+        return self.pigmento_dict(
+            self.colorante_id,
+            self.colorante.nombre if self.colorante else None,
+            self.gr_por_kg,
+            self.n_muestras,
+            meta_kg,
+        )
+
     def __repr__(self):
         return (f'<RecetaColor color={self.color_id} '
                 f'colorante={self.colorante_id} '
                 f'gr_kg={self.gr_por_kg:.4f} n={self.n_muestras}>')
+
+
+# ---------------------------------------------------------------------------
+# LOCK DE RECETAS
+# ---------------------------------------------------------------------------
+
+def bloquear_recetas(session):
+    """Toma el advisory lock de recetas hasta el fin de la transacción (no-op fuera de PostgreSQL)."""
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(db.text('SELECT pg_advisory_xact_lock(:k)'), {'k': LOCK_RECETAS})
+
+
+# ---------------------------------------------------------------------------
+# VERSIÓN POR COLOR (invalidación de la caché de prefill entre workers)
+# ---------------------------------------------------------------------------
+
+def incrementar_version_recetas(session, color_ids=None):
+    """
+    Sube ColorProducto.version_receta de `color_ids` (todos si es None).
+    Para escrituras por Core (upserts / reconstrucción) que no pasan por el flush.
+    """
+    stmt = db.update(ColorProducto).values(version_receta=ColorProducto.version_receta + 1)
+    if color_ids is not None:
+        if not color_ids:
+            return
+        stmt = stmt.where(ColorProducto.id.in_(color_ids))
+    session.execute(stmt, execution_options={'synchronize_session': False})
+
+
+def _incrementar_version_por_flush(session, flush_context, instances):
+    """Altas, ediciones y bajas de recetas vía ORM (upsert / absorber_nueva_muestra)."""
+    color_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, RecetaColorNormalizada):
+            color_ids.add(obj.color_id)
+    for obj in list(session.dirty):
+        if isinstance(obj, RecetaColorNormalizada) and session.is_modified(obj, include_collections=False):
+            color_ids.add(obj.color_id)
+
+    for color_id in color_ids - {None}:
+        color = session.get(ColorProducto, color_id)
+        if color is None or color in session.deleted:
+            continue
+        color.version_receta = ColorProducto.version_receta + 1
+
+
+db.event.listen(db.session, 'before_flush', _incrementar_version_por_flush)
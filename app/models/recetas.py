@@ -1,4 +1,5 @@
 from app.extensions import db
+from app.services import calculo_orden as calculo
 
 # Rombo "Se Compone" (Lote <-> Materia Prima)
 class SeCompone(db.Model):
@@ -33,8 +34,7 @@ class SeCompone(db.Model):
         if orden:
             merma_pct = orden.calculo_merma_pct or 0.0
 
-        peso_total = meta_kg * (1 + merma_pct)
-        self.calculo_peso_kg = peso_total * self.fraccion
+        self.calculo_peso_kg = calculo.peso_material_kg(meta_kg, merma_pct, self.fraccion)
 
     @property
     def peso_kg(self):
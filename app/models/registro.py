@@ -11,12 +11,19 @@ class RegistroDiarioProduccion(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     
     # RELACIONES FK
-    orden_id = db.Column(db.String(20), db.ForeignKey('orden_produccion.numero_op'), nullable=False)
-    maquina_id = db.Column(db.Integer, db.ForeignKey('maquina.id'), nullable=False)
+    # active_history: el hook de avance necesita el valor anterior aunque el atributo esté expirado
+    orden_id = db.column_property(
+        db.Column(db.String(20), db.ForeignKey('orden_produccion.numero_op'), nullable=False),
+        active_history=True
+    )
+    # active_history (también fecha / turno): el resumen de producción necesita la clave anterior
+    maquina_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('maquina.id'), nullable=False), active_history=True
+    )
     
     # INPUTS: DATOS GENERALES (CABECERA)
-    fecha = db.Column(db.Date, nullable=False)
-    turno = db.Column(db.String(20))          # DIURNO, NOCTURNO, EXTRA
+    fecha = db.column_property(db.Column(db.Date, nullable=False), active_history=True)
+    turno = db.column_property(db.Column(db.String(20)), active_history=True)   # DIURNO, NOCTURNO, EXTRA
     hora_inicio = db.Column(db.String(10))    # 07:00
     hora_fin = db.Column(db.String(10))       # 19:00 (Opcional/Calculado)
     
@@ -37,70 +44,166 @@ class RegistroDiarioProduccion(db.Model):
     snapshot_peso_extra_gr = db.Column(db.Float, default=0.0)     # Otros pesos
     
     # TOTALIZADORES (Calculados)
-    total_coladas_calculada = db.Column(db.Integer, default=0)     # Final - Inicial
+    total_coladas_calculada = db.column_property(                  # Final - Inicial
+        db.Column(db.Integer, default=0), active_history=True
+    )
     total_piezas_buenas = db.Column(db.Integer, default=0)         # Suma de detalles o (Coladas * Cav)
-    total_kg_real = db.Column(db.Float, default=0.0)               # Suma de los pesos por hora? O input manual total? 
+    total_kg_real = db.column_property(                            # Suma de los pesos por hora? O input manual total? 
+        db.Column(db.Float, default=0.0), active_history=True
+    )
                                                                    # En muchos reportes se pesa el total al final. 
                                                                    # Asumiremos input manual o suma según requiera user.
                                                                    # Por ahora calcularemos basado en coladas * pesos.
 
+    # ESTADÍSTICAS DE PESAJE (ControlPeso), mantenidas en la misma transacción
+    # que agrega / borra bultos (ver absorber_pesos / retirar_peso).
+    # `flask verificar-pesajes` las contrasta con las filas de control_peso.
+    pesaje_n = db.Column(db.Integer, nullable=False, default=0)
+    pesaje_suma_kg = db.Column(db.Float, nullable=False, default=0.0)
+    pesaje_min_kg = db.Column(db.Float, nullable=True)
+    pesaje_max_kg = db.Column(db.Float, nullable=True)
+    pesaje_media_kg = db.Column(db.Float, nullable=False, default=0.0)
+    pesaje_m2 = db.Column(db.Float, nullable=False, default=0.0)   # Σ (x - media)² (Welford)
+
     # Relaciones
     orden = db.relationship('OrdenProduccion', backref='registros_diarios', lazy=True)
     maquina = db.relationship('Maquina', backref='registros_diarios', lazy=True)
     detalles = db.relationship('DetalleProduccionHora', backref='cabecera', cascade="all, delete-orphan", lazy=True)
     controles_peso = db.relationship('ControlPeso', backref='registro', cascade="all, delete-orphan", lazy=True)
+
+    # Vista global: keyset (fecha, id) y filtros por máquina / rango de fechas
+    __table_args__ = (
+        db.Index('ix_registro_fecha_id', 'fecha', 'id'),
+        db.Index('ix_registro_maquina_fecha', 'maquina_id', 'fecha'),
+    )
     
     def actualizar_totales(self):
         """
         Recalcula totales basados en contadores y detalles.
         Si los contadores son 0, usa la suma de los detalles horarios.
+        El kg pesado sale de pesaje_suma_kg (sin consultar control_peso).
+        """
+        (self.total_coladas_calculada,
+         self.total_piezas_buenas,
+         self.total_kg_real) = self.calcular_totales(
+            self.colada_inicial, self.colada_final,
+            [d.coladas_realizadas for d in self.detalles] if self.detalles else (),
+            self.snapshot_cavidades, self.snapshot_peso_neto_gr, self.snapshot_peso_colada_gr,
+            self.pesaje_suma_kg,
+        )
+
+    @staticmethod
+    def calcular_totales(colada_inicial, colada_final, coladas_detalles, cavidades,
+                         peso_neto_gr, peso_colada_gr, suma_pesos_kg=0.0):
+        """
+        Núcleo de actualizar_totales sin ORM (lo usa también la carga masiva
+        de hojas, que calcula en memoria antes de insertar).
+
+        Returns:
+            (total_coladas, total_piezas, total_kg)
         """
         # 1. Calcular desde contadores
         diff_contadores = 0
-        if self.colada_final is not None and self.colada_inicial is not None:
-             if self.colada_final >= self.colada_inicial:
-                diff_contadores = self.colada_final - self.colada_inicial
-             
+        if colada_final is not None and colada_inicial is not None:
+            if colada_final >= colada_inicial:
+                diff_contadores = colada_final - colada_inicial
+
         # 2. Calcular desde suma de horas (Fallback)
-        sum_detalles = 0
-        if self.detalles:
-             sum_detalles = sum([d.coladas_realizadas or 0 for d in self.detalles])
-        
-        # Calcular suma de Pesajes (ControlPeso) via Query directo para ver datos flushed
-        from app.models.control_peso import ControlPeso
-        from sqlalchemy import func
-        
-        sum_pesos_control = 0.0
-        # Check ID existence to avoid query on transient object if needed
-        if self.id:
-            q_sum = db.session.query(func.sum(ControlPeso.peso_real_kg)).filter(ControlPeso.registro_id == self.id).scalar()
-            sum_pesos_control = q_sum or 0.0
-            
-        print(f"DEBUG: updating totals query. ID: {self.id}, Sum: {sum_pesos_control}")
+        sum_detalles = sum(c or 0 for c in coladas_detalles)
 
         # 3. Decidir cuál usar para COLADAS
-        if diff_contadores > 0:
-            self.total_coladas_calculada = diff_contadores
-        else:
-            self.total_coladas_calculada = sum_detalles
-             
+        total_coladas = diff_contadores if diff_contadores > 0 else sum_detalles
+
         # Producción teórica (Piezas)
-        cavs = self.snapshot_cavidades or 1
-        self.total_piezas_buenas = self.total_coladas_calculada * cavs
-        
+        total_piezas = total_coladas * (cavidades or 1)
+
         # 4. Decidir KG REAL
         # Prioridad 1: Pesajes Reales (ControlPeso)
-        if sum_pesos_control > 0:
-            self.total_kg_real = sum_pesos_control
-        else:
-            # Prioridad 2: Cálculo por Coladas × Peso Tiro
-            # snapshot_peso_neto_gr = peso neto TOTAL del golpe (ya incluye todas cav)
-            # snapshot_peso_colada_gr = ramal
-            p_neto   = self.snapshot_peso_neto_gr   or 0.0
-            p_colada = self.snapshot_peso_colada_gr or 0.0
-            peso_tiro_gr = p_neto + p_colada
+        if (suma_pesos_kg or 0.0) > 0:
+            return total_coladas, total_piezas, suma_pesos_kg
+        # Prioridad 2: Cálculo por Coladas × Peso Tiro
+        # peso_neto_gr = peso neto TOTAL del golpe (ya incluye todas cav)
+        # peso_colada_gr = ramal
+        peso_tiro_gr = (peso_neto_gr or 0.0) + (peso_colada_gr or 0.0)
+        return total_coladas, total_piezas, (total_coladas * peso_tiro_gr) / 1000.0
+
+    # -----------------------------------------------------------------------
+    # ESTADÍSTICAS DE PESAJE
+    # -----------------------------------------------------------------------
+
+    @property
+    def pesaje_varianza_kg(self):
+        """Varianza muestral de los bultos (0 con menos de dos)."""
+        n = self.pesaje_n or 0
+        return (self.pesaje_m2 or 0.0) / (n - 1) if n > 1 else 0.0
+
+    def _reiniciar_pesajes(self):
+        self.pesaje_n = 0
+        self.pesaje_suma_kg = 0.0
+        self.pesaje_min_kg = None
+        self.pesaje_max_kg = None
+        self.pesaje_media_kg = 0.0
+        self.pesaje_m2 = 0.0
+
+    def absorber_pesos(self, pesos):
+        """
+        Suma bultos nuevos a las estadísticas: el bloque se resume aparte y se
+        combina con lo acumulado (Chan et al.), equivalente a Welford bulto a bulto.
+        """
+        pesos = [float(p) for p in pesos]
+        if not pesos:
+            return
+        n_b = len(pesos)
+        suma_b = sum(pesos)
+        media_b = suma_b / n_b
+        m2_b = sum((p - media_b) ** 2 for p in pesos)
+
+        n_a = self.pesaje_n or 0
+        media_a = self.pesaje_media_kg or 0.0
+        n = n_a + n_b
+        delta = media_b - media_a
+        self.pesaje_media_kg = media_a + delta * n_b / n
+        self.pesaje_m2 = (self.pesaje_m2 or 0.0) + m2_b + delta ** 2 * n_a * n_b / n
+        self.pesaje_n = n
+        self.pesaje_suma_kg = (self.pesaje_suma_kg or 0.0) + suma_b
+        minimo, maximo = min(pesos), max(pesos)
+        self.pesaje_min_kg = minimo if self.pesaje_min_kg is None else min(self.pesaje_min_kg, minimo)
+        self.pesaje_max_kg = maximo if self.pesaje_max_kg is None else max(self.pesaje_max_kg, maximo)
+
+    def retirar_peso(self, peso):
+        """
+        Descuenta un bulto borrado (Welford inverso). Llamar con el ControlPeso
+        ya eliminado en la BD (flush): si era el mínimo o el máximo, los
+        extremos se vuelven a leer de las filas restantes.
+        """
+        peso = float(peso or 0.0)
+        n = (self.pesaje_n or 0) - 1
+        if n <= 0:
+            self._reiniciar_pesajes()
+            return
+        media_a = self.pesaje_media_kg or 0.0
+        media = (media_a * (n + 1) - peso) / n
+        self.pesaje_m2 = max((self.pesaje_m2 or 0.0) - (peso - media_a) * (peso - media), 0.0)
+        self.pesaje_media_kg = media
+        self.pesaje_n = n
+        self.pesaje_suma_kg = (self.pesaje_suma_kg or 0.0) - peso
 
-            self.total_kg_real = (self.total_coladas_calculada * peso_tiro_gr) / 1000.0
+        if peso <= (self.pesaje_min_kg or 0.0) or peso >= (self.pesaje_max_kg or 0.0):
+            from app.models.control_peso import ControlPeso
+            self.pesaje_min_kg, self.pesaje_max_kg = db.session.execute(
+                db.select(db.func.min(ControlPeso.peso_real_kg), db.func.max(ControlPeso.peso_real_kg))
+                .where(ControlPeso.registro_id == self.id)
+            ).one()
+
+    def estadisticas_pesaje(self):
+        return {
+            'n': self.pesaje_n or 0,
+            'suma_kg': self.pesaje_suma_kg or 0.0,
+            'min_kg': self.pesaje_min_kg,
+            'max_kg': self.pesaje_max_kg,
+            'media_kg': self.pesaje_media_kg if self.pesaje_n else None,
+            'varianza_kg': self.pesaje_varianza_kg,
+        }
 
     def to_dict(self):
         return {
@@ -122,10 +225,107 @@ class RegistroDiarioProduccion(db.Model):
                  'piezas': self.total_piezas_buenas,
                  'kg_total': self.total_kg_real
             },
+            'pesajes': self.estadisticas_pesaje(),
             'detalles': [d.to_dict() for d in self.detalles]
         }
 
 
+# =============================================================================
+# AVANCE REAL DE LA ORDEN (mantenimiento incremental)
+# =============================================================================
+
+def _valor_previo(obj, attr):
+    """Valor persistido de `attr` antes de los cambios pendientes del flush."""
+    hist = db.inspect(obj).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    if hist.unchanged:
+        return hist.unchanged[0]
+    return None
+
+
+def _acumular_avance_pendiente(session, flush_context, instances):
+    """
+    Traduce los cambios pendientes de RegistroDiarioProduccion (altas, ediciones
+    y bajas) en deltas de OrdenProduccion.calculo_avance_real_*.
+    Las órdenes persistidas se actualizan con `col = col + delta` para que
+    workers concurrentes no se pisen.
+    """
+    from app.models.orden import OrdenProduccion
+
+    deltas = {}  # orden_id -> [delta_kg, delta_coladas]
+
+    def _sumar(orden_id, kg, coladas, signo):
+        if not orden_id:
+            return
+        d = deltas.setdefault(orden_id, [0.0, 0])
+        d[0] += signo * (kg or 0.0)
+        d[1] += signo * (coladas or 0)
+
+    for obj in session.new:
+        if isinstance(obj, RegistroDiarioProduccion):
+            _sumar(obj.orden_id, obj.total_kg_real, obj.total_coladas_calculada, +1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, RegistroDiarioProduccion):
+            continue
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        _sumar(_valor_previo(obj, 'orden_id'),
+               _valor_previo(obj, 'total_kg_real'),
+               _valor_previo(obj, 'total_coladas_calculada'), -1)
+        _sumar(obj.orden_id, obj.total_kg_real, obj.total_coladas_calculada, +1)
+
+    for obj in session.deleted:
+        if isinstance(obj, RegistroDiarioProduccion):
+            _sumar(_valor_previo(obj, 'orden_id'),
+                   _valor_previo(obj, 'total_kg_real'),
+                   _valor_previo(obj, 'total_coladas_calculada'), -1)
+
+    for orden_id, (delta_kg, delta_coladas) in deltas.items():
+        if delta_kg == 0 and delta_coladas == 0:
+            continue
+        orden = session.get(OrdenProduccion, orden_id)
+        if orden is None or orden in session.deleted:
+            continue
+        if orden in session.new:
+            orden.calculo_avance_real_kg = (orden.calculo_avance_real_kg or 0.0) + delta_kg
+            orden.calculo_avance_real_coladas = (orden.calculo_avance_real_coladas or 0) + delta_coladas
+        else:
+            orden.calculo_avance_real_kg = OrdenProduccion.calculo_avance_real_kg + delta_kg
+            orden.calculo_avance_real_coladas = OrdenProduccion.calculo_avance_real_coladas + delta_coladas
+
+
+db.event.listen(db.session, 'before_flush', _acumular_avance_pendiente)
+
+
+def sumar_avance_ordenes(session, deltas):
+    """
+    Aplica deltas {orden_id: (kg, coladas)} al avance real de las OPs y sube
+    su versión, con un único UPDATE executemany. Para escrituras por lote
+    (INSERT / UPDATE Core) que no pasan por _acumular_avance_pendiente.
+    """
+    from app.models.orden import OrdenProduccion
+
+    filas = [
+        {'b_op': orden_id, 'b_kg': kg, 'b_coladas': coladas}
+        for orden_id, (kg, coladas) in deltas.items() if orden_id
+    ]
+    if not filas:
+        return
+    t = OrdenProduccion.__table__
+    session.execute(
+        db.update(t)
+        .where(t.c.numero_op == db.bindparam('b_op'))
+        .values(
+            calculo_avance_real_kg=db.func.coalesce(t.c.calculo_avance_real_kg, 0.0) + db.bindparam('b_kg'),
+            calculo_avance_real_coladas=db.func.coalesce(t.c.calculo_avance_real_coladas, 0) + db.bindparam('b_coladas'),
+            version=t.c.version + 1,
+        ),
+        filas,
+    )
+
+
 class DetalleProduccionHora(db.Model):
     """
     DETALLE: Tabla interna del reporte (hora a hora).
@@ -145,6 +345,12 @@ class DetalleProduccionHora(db.Model):
     # Calculados (Helper)
     cantidad_piezas = db.Column(db.Integer, default=0) # Coladas * Cavs
     kg_producidos = db.Column(db.Float, default=0.0)   # Coladas * PesoTiro / 1000
+
+    # La vista por OP carga los detalles de todos sus registros con un IN;
+    # /dashboard/oee cuenta horas con producción por registro sin leer la tabla (cubriente)
+    __table_args__ = (
+        db.Index('ix_detalle_registro_produccion', 'registro_id', 'coladas_realizadas', 'hora'),
+    )
     
     def calcular_metricas(self, cavidades, peso_tiro_gr):
         self.cantidad_piezas = self.coladas_realizadas * cavidades
@@ -0,0 +1,269 @@
+"""
+Modelo ResumenProduccion: rollup de producción por día × máquina × OP × turno
+para los tableros (GET /api/dashboard/produccion), que no leen las tablas crudas.
+
+Se mantiene en línea: cada transacción que toca registros diarios (o sus
+detalles horarios / bultos, que pasan por las estadísticas pesaje_* del
+registro) recalcula antes del commit solo las claves afectadas, bajo un
+advisory lock por clave (PostgreSQL) para que dos transacciones que escriben
+registros de la misma clave no se pisen los totales.
+`flask reconstruir-resumen` lo regenera desde cero.
+"""
+import zlib
+from datetime import datetime, timezone
+
+from app.extensions import db
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora, _valor_previo
+
+
+# Claves por sentencia al recalcular / borrar (tuple IN)
+BLOQUE_CLAVES = 500
+
+# Primera mitad del advisory lock por clave del resumen (PostgreSQL):
+# pg_advisory_xact_lock(LOCK_RESUMEN, crc32 de la clave)
+LOCK_RESUMEN = 0x52534D4E  # 'RSMN'
+
+
+class ResumenProduccion(db.Model):
+    """
+    Una fila por (fecha, maquina_id, orden_id, turno) con registros. turno
+    NULL del registro se guarda como '' (forma parte de la PK).
+
+    kg_teorico = coladas × peso de tiro (aunque haya bultos pesados);
+    kg_pesado = suma de los bultos de control_peso (pesaje_suma_kg);
+    horas_produccion = horas del detalle horario con al menos una colada.
+    """
+    __tablename__ = 'resumen_produccion'
+
+    fecha      = db.Column(db.Date, primary_key=True)
+    maquina_id = db.Column(db.Integer, db.ForeignKey('maquina.id'), primary_key=True)
+    orden_id   = db.Column(db.String(20), db.ForeignKey('orden_produccion.numero_op'), primary_key=True)
+    turno      = db.Column(db.String(20), primary_key=True, default='')
+
+    registros        = db.Column(db.Integer, nullable=False, default=0)
+    coladas          = db.Column(db.Integer, nullable=False, default=0)
+    piezas           = db.Column(db.Integer, nullable=False, default=0)
+    kg_teorico       = db.Column(db.Float, nullable=False, default=0.0)
+    kg_pesado        = db.Column(db.Float, nullable=False, default=0.0)
+    bultos           = db.Column(db.Integer, nullable=False, default=0)
+    horas_produccion = db.Column(db.Integer, nullable=False, default=0)
+
+    fecha_actualizacion = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # La PK ya sirve a los rangos de fechas; estos, a los filtros por máquina / OP
+    __table_args__ = (
+        db.Index('ix_resumen_maquina_fecha', 'maquina_id', 'fecha'),
+        db.Index('ix_resumen_orden_fecha', 'orden_id', 'fecha'),
+    )
+
+    CLAVE = ('fecha', 'maquina_id', 'orden_id', 'turno')
+    VALORES = ('registros', 'coladas', 'piezas', 'kg_teorico', 'kg_pesado', 'bultos', 'horas_produccion')
+
+    def __repr__(self):
+        return f'<ResumenProduccion {self.fecha} maq={self.maquina_id} {self.orden_id} {self.turno}>'
+
+
+# =============================================================================
+# CÁLCULO DESDE LOS REGISTROS
+# =============================================================================
+
+def clave_registro():
+    """Columnas de RegistroDiarioProduccion que forman la clave del resumen."""
+    R = RegistroDiarioProduccion
+    return R.fecha, R.maquina_id, R.orden_id, db.func.coalesce(R.turno, '')
+
+
+def select_resumen(*filtros):
+    """
+    SELECT agrupado (clave + ResumenProduccion.VALORES) de los registros que
+    cumplen `filtros`. Las horas con producción salen de una subconsulta
+    sobre los detalles de esos mismos registros (CTE con sus ids).
+    """
+    R, D = RegistroDiarioProduccion, DetalleProduccionHora
+    objetivo = db.select(R.id).where(*filtros).cte('registros_objetivo')
+    horas = (
+        db.select(D.registro_id, db.func.count(db.distinct(D.hora)).label('horas'))
+        .where(D.coladas_realizadas > 0, D.registro_id.in_(db.select(objetivo.c.id)))
+        .group_by(D.registro_id)
+        .subquery()
+    )
+    fecha, maquina_id, orden_id, turno = clave_registro()
+    coladas = db.func.coalesce(R.total_coladas_calculada, 0)
+    peso_tiro = db.func.coalesce(R.snapshot_peso_neto_gr, 0.0) + db.func.coalesce(R.snapshot_peso_colada_gr, 0.0)
+    return (
+        db.select(
+            fecha, maquina_id, orden_id, turno.label('turno'),
+            db.func.count(R.id).label('registros'),
+            db.func.sum(coladas).label('coladas'),
+            db.func.sum(db.func.coalesce(R.total_piezas_buenas, 0)).label('piezas'),
+            db.func.sum(coladas * peso_tiro / 1000.0).label('kg_teorico'),
+            db.func.sum(db.func.coalesce(R.pesaje_suma_kg, 0.0)).label('kg_pesado'),
+            db.func.sum(db.func.coalesce(R.pesaje_n, 0)).label('bultos'),
+            db.func.sum(db.func.coalesce(horas.c.horas, 0)).label('horas_produccion'),
+        )
+        .join(objetivo, objetivo.c.id == R.id)
+        .outerjoin(horas, horas.c.registro_id == R.id)
+        .group_by(fecha, maquina_id, orden_id, turno)
+    )
+
+
+def guardar_resumen(session, filas, eliminar=()):
+    """
+    Escribe filas del resumen (dicts con CLAVE + VALORES) y borra las claves
+    de `eliminar`. PostgreSQL / SQLite: INSERT ... ON CONFLICT DO UPDATE;
+    otros motores: DELETE + INSERT de esas claves.
+    """
+    T = ResumenProduccion.__table__
+    clave = db.tuple_(*(T.c[c] for c in ResumenProduccion.CLAVE))
+    ahora = datetime.now(timezone.utc)
+    filas = [{**f, 'fecha_actualizacion': ahora} for f in filas]
+
+    dialecto = session.get_bind().dialect.name
+    eliminar = list(eliminar)
+    if dialecto not in ('postgresql', 'sqlite'):
+        eliminar += [tuple(f[c] for c in ResumenProduccion.CLAVE) for f in filas]
+    for i in range(0, len(eliminar), BLOQUE_CLAVES):
+        session.execute(db.delete(T).where(clave.in_(eliminar[i:i + BLOQUE_CLAVES])))
+    if not filas:
+        return
+
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        session.execute(db.insert(T), filas)
+        return
+    stmt = insert(T)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ResumenProduccion.CLAVE),
+        set_={c: stmt.excluded[c] for c in ResumenProduccion.VALORES + ('fecha_actualizacion',)},
+    )
+    session.execute(stmt, filas)
+
+
+def _hash_clave(clave):
+    """crc32 de la clave como entero de 32 bits con signo (hash() de str cambia entre procesos)."""
+    fecha, maquina_id, orden_id, turno = clave
+    h = zlib.crc32(f'{fecha}|{maquina_id}|{orden_id}|{turno or ""}'.encode())
+    return h - (1 << 32) if h >= 1 << 31 else h
+
+
+def bloquear_claves(session, claves):
+    """
+    Advisory lock de cada clave hasta el fin de la transacción, en orden
+    (sin interbloqueos entre transacciones). No-op fuera de PostgreSQL.
+    """
+    if session.get_bind().dialect.name != 'postgresql' or not claves:
+        return
+    session.execute(
+        db.text(
+            'SELECT pg_advisory_xact_lock(:clase, h) '
+            'FROM (SELECT unnest(CAST(:hashes AS integer[])) AS h ORDER BY 1) AS claves'
+        ),
+        {'clase': LOCK_RESUMEN, 'hashes': sorted({_hash_clave(c) for c in claves})},
+    )
+
+
+def actualizar_resumen(session, claves):
+    """
+    Recalcula las claves (fecha, maquina_id, orden_id, turno) desde los
+    registros: las que ya no tienen registros se borran del resumen.
+    Un SELECT agrupado + un upsert por bloque de claves.
+
+    Se escriben valores absolutos: antes de leer se toma el lock de cada
+    clave, así una transacción concurrente sobre la misma clave espera a que
+    esta haga commit y su SELECT (READ COMMITTED) ya ve estos registros.
+    """
+    claves = [c for c in claves if None not in c[:3]]
+    bloquear_claves(session, claves)
+    for i in range(0, len(claves), BLOQUE_CLAVES):
+        bloque = claves[i:i + BLOQUE_CLAVES]
+        fechas = {c[0] for c in bloque}
+        filas = [
+            fila._asdict()
+            for fila in session.execute(select_resumen(
+                RegistroDiarioProduccion.fecha.in_(fechas),   # acota por ix_registro_fecha_id
+                db.tuple_(*clave_registro()).in_(bloque),
+            ))
+        ]
+        presentes = {tuple(f[c] for c in ResumenProduccion.CLAVE) for f in filas}
+        guardar_resumen(session, filas, eliminar=[c for c in bloque if c not in presentes])
+
+
+# =============================================================================
+# MANTENIMIENTO EN LÍNEA
+# =============================================================================
+# session.info['resumen_registros']: ids de registros tocados (su clave se
+# resuelve al commit); session.info['resumen_claves']: claves viejas de
+# registros borrados o movidos de día / máquina / OP / turno.
+
+def marcar_resumen(session, registro_ids=(), claves=()):
+    """
+    Para escrituras por lote (INSERT / UPDATE Core) que no pasan por el flush:
+    ids de registros tocados y/o claves (fecha, maquina_id, orden_id, turno).
+    """
+    session.info.setdefault('resumen_registros', set()).update(registro_ids)
+    session.info.setdefault('resumen_claves', set()).update((f, m, o, t or '') for f, m, o, t in claves)
+
+
+def _clave_previa(obj):
+    turno = _valor_previo(obj, 'turno')
+    return (_valor_previo(obj, 'fecha'), _valor_previo(obj, 'maquina_id'),
+            _valor_previo(obj, 'orden_id'), turno or '')
+
+
+def _marcar_resumen_pendiente(session, flush_context, instances):
+    ids = session.info.setdefault('resumen_registros', set())
+    claves = session.info.setdefault('resumen_claves', set())
+    for obj in session.deleted:
+        if isinstance(obj, RegistroDiarioProduccion):
+            claves.add(_clave_previa(obj))
+        elif isinstance(obj, DetalleProduccionHora):
+            ids.add(obj.registro_id)
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, RegistroDiarioProduccion):
+            claves.add(_clave_previa(obj))
+            ids.add(obj.id)
+        elif isinstance(obj, DetalleProduccionHora):
+            ids.add(obj.registro_id)
+    for obj in session.new:
+        # Los registros nuevos aún no tienen id: se marcan en el after_flush
+        if isinstance(obj, DetalleProduccionHora):
+            if obj.registro_id is None and obj.cabecera is not None:
+                ids.add(obj.cabecera.id)
+            else:
+                ids.add(obj.registro_id)
+
+
+def _marcar_registros_insertados(session, flush_context):
+    session.info.setdefault('resumen_registros', set()).update(
+        obj.id for obj in session.new if isinstance(obj, RegistroDiarioProduccion)
+    )
+
+
+def _actualizar_resumen_pendiente(session):
+    """Antes de cada commit: recalcula las claves que tocó la transacción."""
+    session.flush()
+    ids = list(session.info.pop('resumen_registros', set()) - {None})
+    claves = session.info.pop('resumen_claves', set())
+    for i in range(0, len(ids), BLOQUE_CLAVES):
+        claves.update(session.execute(
+            db.select(*clave_registro()).where(RegistroDiarioProduccion.id.in_(ids[i:i + BLOQUE_CLAVES]))
+        ).tuples())
+    if claves:
+        actualizar_resumen(session, list(claves))
+
+
+def _olvidar_resumen_pendiente(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('resumen_registros', None)
+        session.info.pop('resumen_claves', None)
+
+
+db.event.listen(db.session, 'before_flush', _marcar_resumen_pendiente)
+db.event.listen(db.session, 'after_flush', _marcar_registros_insertados)
+db.event.listen(db.session, 'before_commit', _actualizar_resumen_pendiente)
+db.event.listen(db.session, 'after_transaction_end', _olvidar_resumen_pendiente)
@@ -0,0 +1,50 @@
+"""
+Modelo TrabajoAprendizaje: cola durable (en BD) del poblamiento dinámico
+del catálogo (Molde / Pieza / RecetaColorNormalizada) al crear OPs.
+"""
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class TrabajoAprendizaje(db.Model):
+    """
+    Un trabajo por OP creada. Se inserta en la misma transacción que la OP
+    y lo procesa el worker (`flask procesar-aprendizaje`) fuera del request.
+
+    Estados: PENDIENTE → COMPLETADO, o PENDIENTE → (reintentos) → FALLIDO.
+    """
+    __tablename__ = 'trabajo_aprendizaje'
+
+    ESTADOS = ('PENDIENTE', 'COMPLETADO', 'FALLIDO')
+
+    id        = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    numero_op = db.Column(db.String(20), db.ForeignKey('orden_produccion.numero_op', ondelete='CASCADE'),
+                          nullable=False)
+
+    estado          = db.Column(db.String(20), nullable=False, default='PENDIENTE')
+    intentos        = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error    = db.Column(db.Text, nullable=True)
+
+    fecha_creacion  = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    proximo_intento = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    fecha_procesado = db.Column(db.DateTime, nullable=True)
+
+    # El worker toma los pendientes vencidos en orden de llegada
+    __table_args__ = (
+        db.Index('ix_trabajo_aprendizaje_estado', 'estado', 'proximo_intento', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'numero_op': self.numero_op,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'ultimo_error': self.ultimo_error,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'proximo_intento': self.proximo_intento.isoformat() if self.proximo_intento else None,
+            'fecha_procesado': self.fecha_procesado.isoformat() if self.fecha_procesado else None,
+        }
+
+    def __repr__(self):
+        return f'<TrabajoAprendizaje {self.numero_op} {self.estado} intentos={self.intentos}>'
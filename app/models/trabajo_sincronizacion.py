@@ -0,0 +1,91 @@
+"""
+Modelos de la sincronización asíncrona de pesajes (POST /api/sync/pesajes
+con async): TrabajoSincronizacion (un lote aceptado) y PesajeEnCola (staging
+de sus pesajes con el resultado por ítem).
+"""
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class TrabajoSincronizacion(db.Model):
+    """
+    Un trabajo por lote recibido en modo async. El request solo inserta el
+    trabajo y sus pesajes en staging (commit) y responde 202 con el id; el
+    worker (`flask procesar-sync`) los procesa con sincronizar_pesajes.
+
+    Estados: PENDIENTE → COMPLETADO, o PENDIENTE → (reintentos) → FALLIDO.
+    """
+    __tablename__ = 'trabajo_sincronizacion'
+
+    ESTADOS = ('PENDIENTE', 'COMPLETADO', 'FALLIDO')
+
+    id             = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    dispositivo_id = db.Column(db.String(64), nullable=True)
+
+    estado       = db.Column(db.String(20), nullable=False, default='PENDIENTE')
+    intentos     = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text, nullable=True)
+
+    # Contadores (se completan al procesar)
+    total_pesajes    = db.Column(db.Integer, nullable=False, default=0)
+    sincronizados    = db.Column(db.Integer, nullable=False, default=0)
+    ya_sincronizados = db.Column(db.Integer, nullable=False, default=0)
+    errores          = db.Column(db.Integer, nullable=False, default=0)
+
+    fecha_creacion  = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    proximo_intento = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    fecha_procesado = db.Column(db.DateTime, nullable=True)
+
+    pesajes = db.relationship('PesajeEnCola', backref='trabajo', lazy='dynamic',
+                              cascade='all, delete-orphan', passive_deletes=True,
+                              order_by='PesajeEnCola.posicion')
+
+    # El worker toma los pendientes vencidos en orden de llegada
+    __table_args__ = (
+        db.Index('ix_trabajo_sincronizacion_estado', 'estado', 'proximo_intento', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'dispositivo_id': self.dispositivo_id,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'ultimo_error': self.ultimo_error,
+            'total_pesajes': self.total_pesajes,
+            'sincronizados': self.sincronizados,
+            'ya_sincronizados': self.ya_sincronizados,
+            'errores': self.errores,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'proximo_intento': self.proximo_intento.isoformat() if self.proximo_intento else None,
+            'fecha_procesado': self.fecha_procesado.isoformat() if self.fecha_procesado else None,
+        }
+
+    def __repr__(self):
+        return f'<TrabajoSincronizacion {self.id} {self.estado} pesajes={self.total_pesajes}>'
+
+
+class PesajeEnCola(db.Model):
+    """
+    Pesaje tal como llegó (JSON en `payload`) y, una vez procesado, su
+    resultado: SINCRONIZADO, YA_SINCRONIZADO o ERROR (con `error`).
+    """
+    __tablename__ = 'pesaje_en_cola'
+
+    RESULTADOS = ('SINCRONIZADO', 'YA_SINCRONIZADO', 'ERROR')
+
+    id         = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    trabajo_id = db.Column(db.Integer, db.ForeignKey('trabajo_sincronizacion.id', ondelete='CASCADE'),
+                           nullable=False)
+    posicion   = db.Column(db.Integer, nullable=False)        # índice en el payload
+    payload    = db.Column(db.Text, nullable=False)
+
+    resultado  = db.Column(db.String(20), nullable=True)      # NULL = pendiente
+    error      = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_pesaje_en_cola_trabajo', 'trabajo_id', 'posicion'),
+    )
+
+    def __repr__(self):
+        return f'<PesajeEnCola {self.trabajo_id}#{self.posicion} {self.resultado or "PENDIENTE"}>'
@@ -0,0 +1,254 @@
+"""
+Servicio de aprendizaje de catálogo (poblamiento dinámico) a partir de OPs.
+
+Al crear una OP solo se encola un TrabajoAprendizaje en la misma
+transacción; el worker (`flask procesar-aprendizaje`) toma los pendientes
+por bloques y, en una sola pasada por bloque:
+  A) crea Molde / Pieza (forma, enlazada a la PiezaColor del snapshot)
+     desde el snapshot manual SOLO SI NO EXISTEN
+  B) acumula las muestras de pigmento en RecetaColorNormalizada
+     con RecetaColorNormalizada.absorber_muestras (promedio ponderado de gr/kg)
+
+Si el bloque falla se reintenta OP por OP para aislar la que rompe;
+esa se reprograma con backoff exponencial hasta MAX_INTENTOS.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import selectinload
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.lote import LoteColor
+from app.models.molde import Molde, Pieza
+from app.models.producto import PiezaColor
+from app.models.receta_color import RecetaColorNormalizada
+from app.models.trabajo_aprendizaje import TrabajoAprendizaje
+from app.services.receta_color_service import muestras_pigmento
+
+
+LOTE_DEFAULT = 100
+MAX_INTENTOS = 5
+RETRASO_BASE_SEG = 30
+
+
+# ---------------------------------------------------------------------------
+# ENCOLADO
+# ---------------------------------------------------------------------------
+
+def encolar_aprendizaje(numero_ops):
+    """
+    Encola un trabajo por OP (un solo INSERT multi-fila). No hace commit:
+    el trabajo queda en la misma transacción que crea la OP.
+    """
+    if not numero_ops:
+        return
+    db.session.execute(
+        db.insert(TrabajoAprendizaje),
+        [{'numero_op': op, 'estado': 'PENDIENTE', 'intentos': 0} for op in numero_ops],
+    )
+
+
+# ---------------------------------------------------------------------------
+# APRENDIZAJE (por conjunto)
+# ---------------------------------------------------------------------------
+
+def _muestras_receta(orden):
+    """(color_id, colorante_id, producto_sku, gr_por_kg) en el orden en que se absorben."""
+    for lote in orden.lotes:
+        for colorea in lote.colorantes:
+            yield from muestras_pigmento(
+                lote.color_id, colorea.colorante_id, lote.producto_sku_output, lote.meta_kg, colorea.gramos
+            )
+
+
+def aprender_de_ordenes(ordenes):
+    """
+    Aplica los side-effects de catálogo de varias OPs con una consulta por
+    tabla en vez de una por pieza / pigmento. No hace commit.
+    """
+    # ---- A. Molde / Pieza desde snapshot manual (nunca sobreescribe) -------
+    molde_ids = {o.molde_id for o in ordenes if o.molde_id}
+    if molde_ids:
+        moldes = set(db.session.scalars(
+            db.select(Molde.codigo).where(Molde.codigo.in_(molde_ids))
+        ))
+        piezas = set(db.session.execute(
+            db.select(Pieza.molde_id, Pieza.nombre).where(Pieza.molde_id.in_(molde_ids))
+        ).all())
+        skus = {
+            snap.pieza_sku
+            for o in ordenes if o.molde_id
+            for snap in o.snapshot_composicion if snap.pieza_sku
+        }
+        variantes = {
+            pc.sku: pc
+            for pc in db.session.scalars(db.select(PiezaColor).where(PiezaColor.sku.in_(skus)))
+        } if skus else {}
+
+        for orden in ordenes:
+            molde_id = orden.molde_id
+            if not molde_id:
+                continue
+            if molde_id not in moldes:
+                db.session.add(Molde(
+                    codigo=molde_id,
+                    nombre=orden.molde or molde_id,
+                    peso_tiro_gr=orden.calculo_peso_tiro_gr or 0.0,
+                    tiempo_ciclo_std=orden.snapshot_tiempo_ciclo or 30.0,
+                    activo=True,
+                    notas='Auto-creado desde OP ' + orden.numero_op
+                ))
+                moldes.add(molde_id)
+
+            # Forma (Pieza) del molde para cada SKU del snapshot que aún no tenga una
+            for snap in orden.snapshot_composicion:
+                variante = variantes.get(snap.pieza_sku)
+                if variante is None or variante.pieza_id is not None:
+                    continue
+                nombre = variante.piezas or variante.sku
+                if (molde_id, nombre) in piezas:
+                    continue
+                pieza = Pieza(
+                    molde_id=molde_id,
+                    nombre=nombre,
+                    linea_id=variante.linea_id,
+                    familia_id=variante.familia_id,
+                    cavidades=snap.cavidades,
+                    peso_unitario_gr=snap.peso_unit_gr,
+                )
+                db.session.add(pieza)
+                variante.pieza_rel = pieza
+                piezas.add((molde_id, nombre))
+
+    # ---- B. RecetaColorNormalizada (un upsert por conjunto) ---------------
+    RecetaColorNormalizada.absorber_muestras(
+        db.session, [m for orden in ordenes for m in _muestras_receta(orden)]
+    )
+
+
+# ---------------------------------------------------------------------------
+# WORKER
+# ---------------------------------------------------------------------------
+
+def _registrar_fallo(trabajo, error, ahora, definitivo=False):
+    trabajo.intentos = (trabajo.intentos or 0) + 1
+    trabajo.ultimo_error = str(error)[:2000]
+    if definitivo or trabajo.intentos >= MAX_INTENTOS:
+        trabajo.estado = 'FALLIDO'
+    else:
+        trabajo.proximo_intento = ahora + timedelta(seconds=RETRASO_BASE_SEG * 2 ** (trabajo.intentos - 1))
+
+
+def _completar(trabajo, ahora):
+    trabajo.estado = 'COMPLETADO'
+    trabajo.intentos = (trabajo.intentos or 0) + 1
+    trabajo.ultimo_error = None
+    trabajo.fecha_procesado = ahora
+
+
+def procesar_trabajos(lote=LOTE_DEFAULT, ahora=None):
+    """
+    Procesa hasta `lote` trabajos pendientes vencidos y hace commit.
+
+    En PostgreSQL los trabajos se bloquean con SKIP LOCKED, así que varios
+    workers pueden correr en paralelo sin tomar la misma OP. Solo la
+    absorción de muestras (absorber_muestras) toma el advisory lock de
+    recetas, hasta el commit: ahí los workers se serializan entre sí y con
+    reconstruir_recetas, que no cuenta las OPs cuyo trabajo aún no está
+    COMPLETADO.
+
+    Returns:
+        dict: {'procesados', 'completados', 'reintentar', 'fallidos'}
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    trabajos = db.session.scalars(
+        db.select(TrabajoAprendizaje)
+        .where(TrabajoAprendizaje.estado == 'PENDIENTE', TrabajoAprendizaje.proximo_intento <= ahora)
+        .order_by(TrabajoAprendizaje.id)
+        .limit(lote)
+        .with_for_update(skip_locked=True)
+    ).all()
+    stats = {'procesados': len(trabajos), 'completados': 0, 'reintentar': 0, 'fallidos': 0}
+    if not trabajos:
+        db.session.commit()
+        return stats
+
+    ordenes = {
+        o.numero_op: o
+        for o in db.session.scalars(
+            db.select(OrdenProduccion)
+            .where(OrdenProduccion.numero_op.in_({t.numero_op for t in trabajos}))
+            .options(
+                selectinload(OrdenProduccion.snapshot_composicion),
+                selectinload(OrdenProduccion.lotes).selectinload(LoteColor.colorantes),
+            )
+        )
+    }
+
+    validos = []
+    for t in trabajos:
+        if t.numero_op in ordenes:
+            validos.append(t)
+        else:
+            _registrar_fallo(t, f'OP {t.numero_op} no existe', ahora, definitivo=True)
+
+    try:
+        with db.session.begin_nested():
+            aprender_de_ordenes([ordenes[t.numero_op] for t in validos])
+        for t in validos:
+            _completar(t, ahora)
+    except Exception:
+        # Aislar la(s) OP(s) que rompen el bloque
+        for t in validos:
+            try:
+                with db.session.begin_nested():
+                    aprender_de_ordenes([ordenes[t.numero_op]])
+                _completar(t, ahora)
+            except Exception as e:
+                _registrar_fallo(t, e, ahora)
+
+    for t in trabajos:
+        if t.estado == 'COMPLETADO':
+            stats['completados'] += 1
+        elif t.estado == 'FALLIDO':
+            stats['fallidos'] += 1
+        else:
+            stats['reintentar'] += 1
+    db.session.commit()
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# CONSULTA
+# ---------------------------------------------------------------------------
+
+def resumen_trabajos(estados=('PENDIENTE', 'FALLIDO'), limite=100):
+    """Conteo por estado y los `limite` trabajos más antiguos en `estados`."""
+    conteo = dict(db.session.execute(
+        db.select(TrabajoAprendizaje.estado, db.func.count())
+        .group_by(TrabajoAprendizaje.estado)
+    ).all())
+    trabajos = db.session.scalars(
+        db.select(TrabajoAprendizaje)
+        .where(TrabajoAprendizaje.estado.in_(estados))
+        .order_by(TrabajoAprendizaje.id)
+        .limit(limite)
+    )
+    return {
+        'resumen': {estado: conteo.get(estado, 0) for estado in TrabajoAprendizaje.ESTADOS},
+        'trabajos': [t.to_dict() for t in trabajos],
+    }
+
+
+def reintentar_trabajo(trabajo_id):
+    """Vuelve a PENDIENTE un trabajo FALLIDO (intentos a cero). None si no existe."""
+    trabajo = db.session.get(TrabajoAprendizaje, trabajo_id)
+    if trabajo is None:
+        return None
+    if trabajo.estado != 'FALLIDO':
+        raise ValueError(f'Solo se reintentan trabajos FALLIDO (estado actual: {trabajo.estado})')
+    trabajo.estado = 'PENDIENTE'
+    trabajo.intentos = 0
+    trabajo.proximo_intento = datetime.now(timezone.utc)
+    db.session.commit()
+    return trabajo
@@ -0,0 +1,194 @@
+"""
+Núcleo de cálculo de una Orden de Producción, sin ORM ni BD.
+
+Contiene las fórmulas de planificación (peso del golpe, merma, tiempos,
+coladas, horas-hombre y kg de material) como funciones puras sobre números.
+OrdenProduccion / LoteColor / SeCompone delegan aquí sus actualizar_metricas()
+y POST /api/ordenes/simular las usa para evaluar escenarios hipotéticos sin
+crear objetos de sesión.
+
+Las clases de entrada / salida usan __slots__: una simulación crea miles de
+instancias por request.
+"""
+from datetime import timedelta
+
+
+HORAS_TURNO_DEFAULT_LOTE = 24.0
+
+
+# ---------------------------------------------------------------------------
+# ESTRUCTURAS
+# ---------------------------------------------------------------------------
+
+class ParametrosLote:
+    """Entrada de un lote (color): meta en kg, personas y fracciones de su receta."""
+    __slots__ = ('meta_kg', 'personas', 'fracciones')
+
+    def __init__(self, meta_kg=0.0, personas=1, fracciones=()):
+        self.meta_kg = meta_kg
+        self.personas = personas
+        self.fracciones = fracciones
+
+
+class ParametrosOrden:
+    """
+    Entrada de una OP.
+    composicion: secuencia de (cavidades, peso_unit_gr), una por pieza del golpe.
+    """
+    __slots__ = ('composicion', 'peso_colada_gr', 'tiempo_ciclo', 'horas_turno',
+                 'fecha_inicio', 'lotes')
+
+    def __init__(self, composicion=(), peso_colada_gr=0.0, tiempo_ciclo=0.0,
+                 horas_turno=24.0, fecha_inicio=None, lotes=()):
+        self.composicion = composicion
+        self.peso_colada_gr = peso_colada_gr
+        self.tiempo_ciclo = tiempo_ciclo
+        self.horas_turno = horas_turno
+        self.fecha_inicio = fecha_inicio
+        self.lotes = lotes
+
+
+class ResultadoLote:
+    __slots__ = ('coladas', 'kg_real', 'horas_hombre', 'pesos_material_kg')
+
+    def __init__(self, coladas, kg_real, horas_hombre, pesos_material_kg):
+        self.coladas = coladas
+        self.kg_real = kg_real
+        self.horas_hombre = horas_hombre
+        self.pesos_material_kg = pesos_material_kg
+
+    def to_dict(self):
+        return {
+            'coladas':           self.coladas,
+            'kg_real':           self.kg_real,
+            'horas_hombre':      self.horas_hombre,
+            'pesos_material_kg': list(self.pesos_material_kg),
+        }
+
+
+class ResultadoOrden:
+    __slots__ = ('peso_neto_golpe', 'peso_tiro_gr', 'cavidades_totales', 'colores_activos',
+                 'peso_produccion', 'merma_pct', 'peso_inc_merma', 'merma_natural_kg',
+                 'horas', 'dias', 'fecha_fin', 'lotes')
+
+    def to_dict(self):
+        return {
+            'peso_neto_golpe':   self.peso_neto_golpe,
+            'peso_tiro_gr':      self.peso_tiro_gr,
+            'cavidades_totales': self.cavidades_totales,
+            'colores_activos':   self.colores_activos,
+            'peso_produccion':   self.peso_produccion,
+            'merma_pct':         self.merma_pct,
+            'peso_inc_merma':    self.peso_inc_merma,
+            'merma_natural_kg':  self.merma_natural_kg,
+            'horas':             self.horas,
+            'dias':              self.dias,
+            'fecha_fin':         self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'lotes':             [l.to_dict() for l in self.lotes],
+        }
+
+
+# ---------------------------------------------------------------------------
+# FÓRMULAS (funciones puras)
+# ---------------------------------------------------------------------------
+
+def peso_neto_golpe(composicion):
+    """Suma de (cavidades × peso_unit_gr) de todas las piezas del golpe."""
+    return sum((cav or 0) * (peso or 0.0) for cav, peso in composicion)
+
+
+def cavidades_totales(composicion):
+    return sum(cav for cav, _ in composicion) or 1
+
+
+def colores_activos(n_lotes):
+    return n_lotes if n_lotes > 0 else 1
+
+
+def merma_pct(peso_tiro, peso_neto):
+    """Merma de colada (runner) sobre el peso del tiro."""
+    if peso_tiro > 0:
+        return (peso_tiro - peso_neto) / peso_tiro
+    return 0.0
+
+
+def peso_inc_merma(peso_produccion, merma, peso_tiro):
+    return peso_produccion * (1 + merma) if peso_tiro > 0 else 0.0
+
+
+def horas_produccion(peso_produccion, peso_tiro, tiempo_ciclo):
+    """Horas máquina para producir `peso_produccion` kg."""
+    if peso_tiro > 0 and tiempo_ciclo:
+        golpes = (peso_produccion * 1000) / peso_tiro
+        segundos = golpes * tiempo_ciclo
+        return segundos / 3600
+    return 0.0
+
+
+def dias_produccion(horas, horas_turno):
+    if horas_turno and horas_turno > 0:
+        return horas / horas_turno
+    return 0.0
+
+
+def fecha_fin(fecha_inicio, dias):
+    if fecha_inicio and dias > 0:
+        return fecha_inicio + timedelta(days=dias)
+    return None
+
+
+def coladas_lote(meta_kg, peso_neto):
+    """Golpes necesarios (Float, sin redondeo) para la meta del lote."""
+    return (meta_kg * 1000) / peso_neto if peso_neto > 0 else 0.0
+
+
+def kg_real_lote(coladas, peso_neto):
+    return coladas * peso_neto / 1000 if peso_neto > 0 else 0.0
+
+
+def horas_hombre_lote(dias, horas_turno, personas, n_colores):
+    """Horas-hombre del lote, proporcionales a los días de la OP."""
+    return (dias * horas_turno * personas) / n_colores
+
+
+def peso_material_kg(meta_kg, merma, fraccion):
+    """Kg de una materia prima: meta del lote con merma de colada × fracción."""
+    return (meta_kg * (1 + merma)) * fraccion
+
+
+# ---------------------------------------------------------------------------
+# EVALUACIÓN COMPLETA
+# ---------------------------------------------------------------------------
+
+def calcular_orden(p):
+    """
+    Evalúa una OP completa (cabecera, lotes y materiales) desde ParametrosOrden.
+    Mismo resultado que OrdenProduccion.actualizar_metricas() con esos datos.
+    """
+    r = ResultadoOrden()
+    r.peso_neto_golpe = peso_neto_golpe(p.composicion)
+    r.peso_tiro_gr = r.peso_neto_golpe + (p.peso_colada_gr or 0.0)
+    r.cavidades_totales = cavidades_totales(p.composicion)
+    r.colores_activos = colores_activos(len(p.lotes))
+    r.peso_produccion = sum((l.meta_kg or 0.0) for l in p.lotes)
+    r.merma_pct = merma_pct(r.peso_tiro_gr, r.peso_neto_golpe)
+    r.peso_inc_merma = peso_inc_merma(r.peso_produccion, r.merma_pct, r.peso_tiro_gr)
+    r.merma_natural_kg = r.peso_inc_merma - r.peso_produccion
+    r.horas = horas_produccion(r.peso_produccion, r.peso_tiro_gr, p.tiempo_ciclo)
+    r.dias = dias_produccion(r.horas, p.horas_turno)
+    r.fecha_fin = fecha_fin(p.fecha_inicio, r.dias)
+
+    horas_turno_lote = p.horas_turno or HORAS_TURNO_DEFAULT_LOTE
+    lotes = []
+    for l in p.lotes:
+        coladas = coladas_lote(l.meta_kg, r.peso_neto_golpe)
+        lotes.append(ResultadoLote(
+            coladas=coladas,
+            kg_real=kg_real_lote(coladas, r.peso_neto_golpe),
+            horas_hombre=horas_hombre_lote(r.dias, horas_turno_lote, l.personas, r.colores_activos),
+            pesos_material_kg=[
+                peso_material_kg(l.meta_kg or 0.0, r.merma_pct, f) for f in l.fracciones
+            ],
+        ))
+    r.lotes = lotes
+    return r
@@ -0,0 +1,335 @@
+"""
+Servicio de creación masiva de Órdenes de Producción (POST /api/ordenes/bulk).
+
+Mismo payload por OP que POST /api/ordenes, pero resuelve todos los catálogos
+referenciados (colores, materias primas, colorantes, piezas de molde, productos)
+con unas pocas consultas por conjunto, arma el grafo completo en memoria y lo
+inserta con un único flush. Las métricas se calculan una vez por OP.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone, SeColorea
+from app.models.materiales import MateriaPrima, Colorante
+from app.models.maquina import Maquina
+from app.models.molde import Molde, Pieza
+from app.models.producto import ProductoTerminado, ProductoPieza, ColorProducto
+from app.services.aprendizaje_service import encolar_aprendizaje
+
+
+def _validar_estructura(data, vistos):
+    """Validaciones sin BD de una OP del lote. Retorna mensaje de error o None."""
+    if not isinstance(data, dict):
+        return 'Cada orden debe ser un objeto JSON'
+    numero_op = data.get('numero_op')
+    if not numero_op:
+        return 'Número de OP requerido'
+    if numero_op in vistos:
+        return f'OP {numero_op} repetida en el lote'
+    if not data.get('maquina_id'):
+        return 'Máquina requerida'
+    if not data.get('auto_snapshot_molde', False) and not data.get('snapshot_composicion'):
+        return 'Se requiere auto_snapshot_molde:true o snapshot_composicion[]'
+    if data.get('auto_snapshot_molde', False) and not data.get('molde_id'):
+        return 'molde_id requerido para auto_snapshot_molde'
+    if data.get('fecha_inicio'):
+        try:
+            datetime.fromisoformat(data['fecha_inicio'])
+        except (TypeError, ValueError):
+            return f"fecha_inicio inválida: {data['fecha_inicio']}"
+    return None
+
+
+def _resolver_colores(validas):
+    """
+    Resuelve color_nombre de todos los lotes en una consulta (+1 MAX(codigo)
+    si hay colores nuevos); los color_id ya se validaron. Retorna por_nombre.
+    """
+    nombres = {}
+    for _, data in validas:
+        for l_data in data.get('lotes', []):
+            if not l_data.get('color_id') and l_data.get('color_nombre'):
+                nombres.setdefault(l_data['color_nombre'].upper(), l_data['color_nombre'])
+
+    por_nombre = {}
+    if nombres:
+        for c in ColorProducto.query.filter(func.upper(ColorProducto.nombre).in_(list(nombres))):
+            por_nombre.setdefault(c.nombre.upper(), c)
+
+        faltantes = [n for n in nombres if n not in por_nombre]
+        if faltantes:
+            max_codigo = db.session.query(func.max(ColorProducto.codigo)).scalar() or 0
+            for i, nombre in enumerate(faltantes, start=1):
+                nuevo = ColorProducto(nombre=nombre, codigo=max_codigo + i)
+                db.session.add(nuevo)
+                por_nombre[nombre] = nuevo
+    return por_nombre
+
+
+def _faltantes(data, colores_por_id, moldes, productos):
+    """Referencias de la OP (FK) que no existen en catálogo. Retorna mensaje de error o None."""
+    if data.get('molde_id') and data['molde_id'] not in moldes:
+        return f"Molde {data['molde_id']} no encontrado"
+    if data.get('producto_sku') and data['producto_sku'] not in productos:
+        return f"Producto {data['producto_sku']} no encontrado"
+    for l_data in data.get('lotes', []):
+        if l_data.get('color_id') and l_data['color_id'] not in colores_por_id:
+            return f"Color {l_data['color_id']} no encontrado"
+    return None
+
+
+def _resolver_por_nombre(modelo, nombres, crear):
+    """SELECT ... WHERE nombre IN (...) y alta de los que falten (sin flush)."""
+    if not nombres:
+        return {}
+    encontrados = {}
+    for obj in modelo.query.filter(modelo.nombre.in_(list(nombres))):
+        encontrados.setdefault(obj.nombre, obj)
+    for nombre, extra in nombres.items():
+        if nombre not in encontrados:
+            obj = crear(nombre, extra)
+            db.session.add(obj)
+            encontrados[nombre] = obj
+    return encontrados
+
+
+def _mapa_sku_por_familia(familia_ids, pieza_skus):
+    """
+    Candidatos de SKU de salida: {(familia_color_id, pieza_sku): cod_sku_pt}.
+    Equivale al auto-discover de crear_orden, en una sola consulta.
+    """
+    if not familia_ids or not pieza_skus:
+        return {}
+    filas = (
+        db.session.query(ProductoTerminado.cod_sku_pt, ProductoTerminado.familia_color_id, ProductoPieza.pieza_sku)
+        .join(ProductoPieza, ProductoPieza.producto_terminado_id == ProductoTerminado.cod_sku_pt)
+        .filter(
+            ProductoPieza.pieza_sku.in_(list(pieza_skus)),
+            ProductoTerminado.familia_color_id.in_(list(familia_ids)),
+        )
+        .order_by(ProductoTerminado.cod_sku_pt)
+        .all()
+    )
+    mapa = {}
+    for sku, fam_id, pieza_sku in filas:
+        mapa.setdefault((fam_id, pieza_sku), sku)
+    return mapa
+
+
+def crear_ordenes_bulk(lista):
+    """
+    Crea N órdenes en una sola transacción.
+
+    Args:
+        lista: list[dict] con el mismo payload que POST /api/ordenes
+
+    Returns:
+        (resultados, creadas): resultados es una lista alineada con `lista`
+        ({'index', 'numero_op', 'success', 'error'?}); creadas son las
+        OrdenProduccion persistidas (ya con commit).
+    """
+    resultados = [None] * len(lista)
+
+    def _error(idx, numero_op, mensaje):
+        resultados[idx] = {'index': idx, 'numero_op': numero_op, 'success': False, 'error': mensaje}
+
+    # ------------------------------------------------------------------
+    # 1. Validación estructural (sin BD)
+    # ------------------------------------------------------------------
+    candidatas, vistos = [], set()
+    for idx, data in enumerate(lista):
+        err = _validar_estructura(data, vistos)
+        numero_op = data.get('numero_op') if isinstance(data, dict) else None
+        if err:
+            _error(idx, numero_op, err)
+            continue
+        vistos.add(numero_op)
+        candidatas.append((idx, data))
+
+    # ------------------------------------------------------------------
+    # 2. Validaciones contra BD, una consulta por conjunto
+    # ------------------------------------------------------------------
+    ops = [d['numero_op'] for _, d in candidatas]
+    existentes = set(
+        db.session.execute(db.select(OrdenProduccion.numero_op).where(OrdenProduccion.numero_op.in_(ops))).scalars()
+    ) if ops else set()
+
+    maq_ids = {d['maquina_id'] for _, d in candidatas}
+    maquinas = set(
+        db.session.execute(db.select(Maquina.id).where(Maquina.id.in_(maq_ids))).scalars()
+    ) if maq_ids else set()
+
+    molde_ids = {d['molde_id'] for _, d in candidatas if d.get('molde_id')}
+    moldes = set(
+        db.session.execute(db.select(Molde.codigo).where(Molde.codigo.in_(molde_ids))).scalars()
+    ) if molde_ids else set()
+
+    # Productos (también para calculo_familia_color): quedan en el identity map
+    skus_orden = {d['producto_sku'] for _, d in candidatas if d.get('producto_sku')}
+    productos = {
+        p.cod_sku_pt for p in ProductoTerminado.query.options(joinedload(ProductoTerminado.familia_color_rel))
+        .filter(ProductoTerminado.cod_sku_pt.in_(skus_orden))
+    } if skus_orden else set()
+
+    color_ids = {
+        l_data['color_id'] for _, d in candidatas for l_data in d.get('lotes', []) if l_data.get('color_id')
+    }
+    colores_por_id = {
+        c.id: c for c in ColorProducto.query.filter(ColorProducto.id.in_(color_ids))
+    } if color_ids else {}
+
+    moldes_auto = {d['molde_id'] for _, d in candidatas if d.get('auto_snapshot_molde')}
+    piezas_por_molde = {}
+    if moldes_auto:
+        for p in Pieza.query.filter(Pieza.molde_id.in_(moldes_auto)).order_by(Pieza.id):
+            piezas_por_molde.setdefault(p.molde_id, []).append(p)
+
+    validas = []
+    for idx, data in candidatas:
+        numero_op = data['numero_op']
+        faltante = _faltantes(data, colores_por_id, moldes, productos)
+        if numero_op in existentes:
+            _error(idx, numero_op, f'OP {numero_op} ya existe')
+        elif data['maquina_id'] not in maquinas:
+            _error(idx, numero_op, f"Máquina {data['maquina_id']} no encontrada")
+        elif faltante:
+            _error(idx, numero_op, faltante)
+        elif data.get('auto_snapshot_molde') and not piezas_por_molde.get(data['molde_id']):
+            _error(idx, numero_op, f"Molde {data['molde_id']} no tiene piezas en catálogo (Pieza)")
+        else:
+            validas.append((idx, data))
+
+    if not validas:
+        return resultados, []
+
+    # Sin autoflush: los catálogos nuevos y el grafo completo se insertan en el flush final
+    with db.session.no_autoflush:
+        construidas = _armar_ordenes(validas, piezas_por_molde, colores_por_id, _error)
+
+    # ------------------------------------------------------------------
+    # 5. Un único flush (INSERTs por lote), métricas una vez por OP,
+    #    trabajos de aprendizaje de catálogo en la misma transacción, commit
+    # ------------------------------------------------------------------
+    db.session.flush()
+    for _, _, orden, _ in construidas:
+        orden.actualizar_metricas()
+    encolar_aprendizaje([data['numero_op'] for _, data, _, _ in construidas])
+    db.session.commit()
+
+    creadas = []
+    for idx, data, orden, _ in construidas:
+        resultados[idx] = {'index': idx, 'numero_op': data['numero_op'], 'success': True}
+        creadas.append(orden)
+    return resultados, creadas
+
+
+def _armar_ordenes(validas, piezas_por_molde, colores_por_id, _error):
+    """Resuelve catálogos en bloque y arma en memoria el grafo de cada OP válida."""
+    # ------------------------------------------------------------------
+    # 3. Resolución de catálogos en bloque
+    # ------------------------------------------------------------------
+    colores_por_nombre = _resolver_colores(validas)
+
+    nombres_mp, nombres_pig = {}, {}
+    for _, data in validas:
+        for l_data in data.get('lotes', []):
+            for m in l_data.get('materiales', []):
+                nombres_mp.setdefault(m.get('nombre'), m.get('tipo', 'VIRGEN'))
+            for p in l_data.get('pigmentos', []):
+                nombres_pig.setdefault(p.get('nombre'), None)
+    materias = _resolver_por_nombre(
+        MateriaPrima, nombres_mp, lambda nombre, tipo: MateriaPrima(nombre=nombre, tipo=tipo))
+    colorantes = _resolver_por_nombre(
+        Colorante, nombres_pig, lambda nombre, _: Colorante(nombre=nombre))
+
+    # ------------------------------------------------------------------
+    # 4. Armado del grafo en memoria
+    # ------------------------------------------------------------------
+    def _snapshots(data):
+        if data.get('auto_snapshot_molde'):
+            return [
+                SnapshotComposicionMolde(
+                    pieza_sku=mp.pieza_sku, cavidades=mp.cavidades, peso_unit_gr=mp.peso_unitario_gr)
+                for mp in piezas_por_molde[data['molde_id']]
+            ]
+        return [
+            SnapshotComposicionMolde(
+                pieza_sku=item.get('pieza_sku'),
+                cavidades=item.get('cavidades', 1),
+                peso_unit_gr=item.get('peso_unit_gr', 0.0))
+            for item in data['snapshot_composicion']
+        ]
+
+    construidas = []
+    for idx, data in validas:
+        try:
+            orden = OrdenProduccion(
+                numero_op               = data.get('numero_op'),
+                maquina_id              = data.get('maquina_id'),
+                producto                = data.get('producto'),
+                producto_sku            = data.get('producto_sku'),
+                molde                   = data.get('molde'),
+                molde_id                = data.get('molde_id'),
+                snapshot_tiempo_ciclo   = data.get('snapshot_tiempo_ciclo', 0.0),
+                snapshot_horas_turno    = data.get('snapshot_horas_turno', 24.0),
+                snapshot_peso_colada_gr = data.get('snapshot_peso_colada_gr', 0.0),
+                tipo_cambio             = data.get('tipo_cambio'),
+                fecha_inicio            = (
+                    datetime.fromisoformat(data['fecha_inicio'])
+                    if data.get('fecha_inicio') else datetime.now(timezone.utc)
+                ),
+            )
+            orden.snapshot_composicion = _snapshots(data)
+            piezas_molde = [s.pieza_sku for s in orden.snapshot_composicion if s.pieza_sku]
+            construidas.append((idx, data, orden, piezas_molde))
+        except Exception as e:
+            _error(idx, data.get('numero_op'), str(e))
+
+    # Auto-discover de SKU de salida para todas las OPs en una consulta
+    familias = {c.familia_id for c in list(colores_por_id.values()) + list(colores_por_nombre.values())
+                if c.familia_id}
+    todas_piezas = {sku for *_, piezas in construidas for sku in piezas}
+    sku_por_familia = _mapa_sku_por_familia(familias, todas_piezas)
+
+    for idx, data, orden, piezas_molde in construidas:
+        for l_data in data.get('lotes', []):
+            color = None
+            if l_data.get('color_id'):
+                color = colores_por_id.get(l_data['color_id'])
+            elif l_data.get('color_nombre'):
+                color = colores_por_nombre.get(l_data['color_nombre'].upper())
+
+            computed_sku = orden.producto_sku
+            if not computed_sku and orden.molde_id and color is not None and color.familia_id:
+                computed_sku = next(
+                    (sku_por_familia[(color.familia_id, p)] for p in piezas_molde
+                     if (color.familia_id, p) in sku_por_familia),
+                    None,
+                )
+
+            lote = LoteColor(
+                color_id            = l_data.get('color_id'),
+                producto_sku_output = computed_sku,
+                personas            = l_data.get('personas', 1),
+                meta_kg             = l_data.get('meta_kg', 0.0),
+            )
+            if color is not None:
+                lote.color_rel = color
+            lote.materias_primas = [
+                SeCompone(materia=materias[m.get('nombre')], fraccion=m.get('fraccion', 0.0))
+                for m in l_data.get('materiales', [])
+            ]
+            lote.colorantes = [
+                SeColorea(pigmento=colorantes[p.get('nombre')], gramos=p.get('gramos', 0.0))
+                for p in l_data.get('pigmentos', [])
+            ]
+            orden.lotes.append(lote)
+
+        db.session.add(orden)
+
+    return construidas
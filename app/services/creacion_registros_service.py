@@ -0,0 +1,205 @@
+"""
+Servicio de carga masiva de Registros Diarios de Producción (POST
+/api/registros/bulk): un talonario de hojas RDP de varias OPs digitalizado
+de una vez.
+
+Mismo payload por hoja que POST /api/ordenes/<op>/registros (más numero_op).
+Todas las hojas se validan antes de escribir (OPs y máquinas con una
+consulta cada una), los totales se calculan en memoria desde los contadores
+y los detalles, y cabeceras / detalles se insertan por lote en una sola
+transacción. El avance real y la versión de las OPs se actualizan con un
+UPDATE por lote (el INSERT masivo no pasa por los hooks del flush).
+"""
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora, sumar_avance_ordenes
+from app.models.resumen_produccion import marcar_resumen
+
+
+def _entero(data, campo, default=0):
+    valor = data.get(campo, default)
+    try:
+        return int(valor if valor is not None else default)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} debe ser entero: {valor!r}")
+
+
+def _decimal(data, campo, default=0.0):
+    valor = data.get(campo, default)
+    try:
+        return float(valor if valor is not None else default)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} debe ser numérico: {valor!r}")
+
+
+def _parsear_hoja(data):
+    """Validaciones sin BD de una hoja. Retorna la hoja normalizada o lanza ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError('Cada hoja debe ser un objeto JSON')
+    numero_op = data.get('numero_op') or data.get('orden_id')
+    if not numero_op:
+        raise ValueError('Número de OP requerido')
+    if 'maquina_id' not in data or 'fecha' not in data:
+        raise ValueError('Faltan campos obligatorios (maquina_id, fecha)')
+    try:
+        fecha = datetime.fromisoformat(data['fecha']).date()
+    except (TypeError, ValueError):
+        raise ValueError(f"fecha inválida: {data['fecha']!r}")
+
+    detalles = data.get('detalles') or []
+    if not isinstance(detalles, list) or not all(isinstance(d, dict) for d in detalles):
+        raise ValueError('detalles debe ser una lista de objetos')
+    for i, d in enumerate(detalles):
+        if not d.get('hora'):
+            raise ValueError(f'Detalle {i}: hora requerida')
+
+    return {
+        'numero_op': numero_op,
+        'maquina_id': _entero(data, 'maquina_id'),
+        'fecha': fecha,
+        'turno': data.get('turno'),
+        'hora_inicio': data.get('hora_inicio'),
+        'colada_inicial': _entero(data, 'colada_inicial'),
+        'colada_final': _entero(data, 'colada_final'),
+        'tiempo_ciclo_reportado': _decimal(data, 'tiempo_ciclo'),
+        'tiempo_enfriamiento': _decimal(data, 'tiempo_enfriamiento'),
+        'cantidad_por_hora_meta': _entero(data, 'meta_hora'),
+        'detalles': [
+            {
+                'hora': d['hora'],
+                'maquinista': d.get('maquinista'),
+                'color': d.get('color'),
+                'observacion': d.get('observacion'),
+                'coladas_realizadas': _entero(d, 'coladas'),
+            }
+            for d in detalles
+        ],
+    }
+
+
+def _armar_filas(hoja, orden):
+    """(fila de cabecera con snapshots y totales, filas de detalle sin registro_id)."""
+    cavidades = orden.calculo_cavidades_totales
+    peso_neto = orden.calculo_peso_neto_golpe
+    peso_colada = orden.snapshot_peso_colada_gr
+    detalles = hoja['detalles']
+    coladas, piezas, kg = RegistroDiarioProduccion.calcular_totales(
+        hoja['colada_inicial'], hoja['colada_final'], [d['coladas_realizadas'] for d in detalles],
+        cavidades, peso_neto, peso_colada,
+    )
+    cabecera = {
+        'orden_id': hoja['numero_op'],
+        **{k: v for k, v in hoja.items() if k not in ('numero_op', 'detalles')},
+        # Snapshots desde los valores cacheados de la Orden
+        'snapshot_cavidades': cavidades,
+        'snapshot_peso_neto_gr': peso_neto,
+        'snapshot_peso_colada_gr': peso_colada,
+        'snapshot_peso_extra_gr': 0.0,
+        'total_coladas_calculada': coladas,
+        'total_piezas_buenas': piezas,
+        'total_kg_real': kg,
+    }
+    # Igual que DetalleProduccionHora.calcular_metricas en POST /ordenes/<op>/registros
+    peso_tiro = (peso_neto or 0.0) * (cavidades or 0)
+    filas_detalle = [
+        {**d,
+         'cantidad_piezas': d['coladas_realizadas'] * (cavidades or 0),
+         'kg_producidos': (d['coladas_realizadas'] * peso_tiro) / 1000.0}
+        for d in detalles
+    ]
+    return cabecera, filas_detalle
+
+
+def crear_registros_bulk(hojas):
+    """
+    Crea N hojas RDP en una sola transacción. Las hojas con error se
+    reportan y no se insertan; el resto se commitea.
+
+    Returns:
+        (resultados, creadas): resultados alineados con `hojas`
+        ({'index', 'numero_op', 'success', 'id'?, 'total_coladas'?, 'total_kg'?,
+        'error'?}); creadas es la cantidad de hojas insertadas.
+    """
+    resultados = [None] * len(hojas)
+
+    def _error(idx, numero_op, mensaje):
+        resultados[idx] = {'index': idx, 'numero_op': numero_op, 'success': False, 'error': mensaje}
+
+    # ---- 1. Estructura (sin BD) ------------------------------------------
+    validas = []
+    for idx, data in enumerate(hojas):
+        try:
+            validas.append((idx, _parsear_hoja(data)))
+        except ValueError as e:
+            _error(idx, data.get('numero_op') or data.get('orden_id') if isinstance(data, dict) else None, str(e))
+
+    # ---- 2. OPs y máquinas: una consulta cada una -------------------------
+    ops = {h['numero_op'] for _, h in validas}
+    ordenes = {
+        o.numero_op: o
+        for o in db.session.execute(
+            select(OrdenProduccion.numero_op, OrdenProduccion.activa, OrdenProduccion.calculo_cavidades_totales,
+                   OrdenProduccion.calculo_peso_neto_golpe, OrdenProduccion.snapshot_peso_colada_gr)
+            .where(OrdenProduccion.numero_op.in_(ops))
+        )
+    } if ops else {}
+    maquina_ids = {h['maquina_id'] for _, h in validas}
+    maquinas = set(db.session.scalars(select(Maquina.id).where(Maquina.id.in_(maquina_ids)))) if maquina_ids else set()
+
+    cabeceras, detalles, indices = [], [], []
+    for idx, hoja in validas:
+        orden = ordenes.get(hoja['numero_op'])
+        if orden is None:
+            _error(idx, hoja['numero_op'], 'Orden no encontrada')
+        elif not orden.activa:
+            _error(idx, hoja['numero_op'], 'No se pueden crear registros para una Orden cerrada')
+        elif hoja['maquina_id'] not in maquinas:
+            _error(idx, hoja['numero_op'], f"Máquina {hoja['maquina_id']} no encontrada")
+        else:
+            cabecera, filas_detalle = _armar_filas(hoja, orden)
+            cabeceras.append(cabecera)
+            detalles.append(filas_detalle)
+            indices.append(idx)
+    if not cabeceras:
+        db.session.rollback()
+        return resultados, 0
+
+    # ---- 3. Cabeceras y detalles por lote ---------------------------------
+    # RETURNING en el orden del lote para enlazar los detalles
+    ids = db.session.execute(
+        insert(RegistroDiarioProduccion).returning(RegistroDiarioProduccion.id, sort_by_parameter_order=True),
+        cabeceras,
+    ).scalars().all()
+    filas_detalle = [
+        {**d, 'registro_id': registro_id}
+        for registro_id, filas in zip(ids, detalles)
+        for d in filas
+    ]
+    if filas_detalle:
+        db.session.execute(insert(DetalleProduccionHora), filas_detalle)
+
+    # ---- 4. Avance real y versión de las OPs (un UPDATE por lote) ----------
+    deltas = {}
+    for cabecera in cabeceras:
+        d = deltas.setdefault(cabecera['orden_id'], [0.0, 0])
+        d[0] += cabecera['total_kg_real']
+        d[1] += cabecera['total_coladas_calculada']
+    sumar_avance_ordenes(db.session, deltas)
+    marcar_resumen(db.session, claves={(c['fecha'], c['maquina_id'], c['orden_id'], c['turno']) for c in cabeceras})
+    db.session.commit()
+
+    for idx, registro_id, cabecera in zip(indices, ids, cabeceras):
+        resultados[idx] = {
+            'index': idx,
+            'numero_op': cabecera['orden_id'],
+            'success': True,
+            'id': registro_id,
+            'total_coladas': cabecera['total_coladas_calculada'],
+            'total_kg': cabecera['total_kg_real'],
+        }
+    return resultados, len(ids)
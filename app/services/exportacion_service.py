@@ -0,0 +1,112 @@
+"""
+Servicio de exportación masiva de Órdenes de Producción (BI).
+Recorre las OPs con un cursor del lado del servidor (yield_per) y genera
+la salida fila a fila (NDJSON o CSV), liberando la sesión tras cada bloque
+para que la memoria no crezca con el tamaño del histórico.
+"""
+import csv
+import io
+import json
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.services.produccion_service import opciones_carga_orden, filtrar_ordenes
+
+
+BLOQUE_DEFAULT = 500
+
+FORMATOS = ('ndjson', 'csv')
+
+# Una fila por ítem de receta (material o pigmento) de cada lote.
+# OPs sin lotes y lotes sin receta salen igual, con las columnas vacías.
+COLUMNAS_CSV = [
+    'numero_op', 'fecha_creacion', 'fecha_inicio', 'maquina', 'producto', 'molde', 'activa',
+    'tiempo_ciclo_seg', 'peso_tiro_gr', 'cavidades_totales',
+    'peso_produccion_kg', 'merma_pct', 'horas', 'dias', 'fecha_fin', 'familia_color',
+    'avance_real_kg', 'avance_real_coladas',
+    'lote_id', 'color', 'meta_kg', 'coladas', 'kg_real', 'personas', 'horas_hombre',
+    'item_tipo', 'item_nombre', 'materia_tipo', 'fraccion', 'peso_kg', 'gramos',
+]
+
+
+def iterar_ordenes(activa=None, maquina_id=None, desde=None, hasta=None, bloque=BLOQUE_DEFAULT):
+    """
+    Genera las OPs (con lotes, recetas, composición y máquina ya cargados)
+    en orden fecha_creacion, numero_op.
+
+    Cada bloque de `bloque` filas se carga con sus relaciones (selectinload
+    por bloque) y se expulsa de la sesión antes de leer el siguiente.
+    """
+    stmt = filtrar_ordenes(
+        db.select(OrdenProduccion).options(*opciones_carga_orden()),
+        activa, maquina_id, desde, hasta,
+    ).order_by(OrdenProduccion.fecha_creacion, OrdenProduccion.numero_op)
+
+    resultado = db.session.execute(stmt.execution_options(yield_per=bloque))
+    try:
+        for particion in resultado.scalars().partitions():
+            yield from particion
+            # expunge_all() invalidaría el identity map que usa el cursor abierto:
+            # se expulsan los objetos uno a uno (la exportación es de solo lectura)
+            for obj in list(db.session.identity_map.values()):
+                if obj in db.session:  # puede haber salido ya en cascada
+                    db.session.expunge(obj)
+    finally:
+        resultado.close()
+
+
+def _iso(valor):
+    return valor.isoformat() if valor else None
+
+
+def _filas_csv(orden):
+    """Aplana una OP en filas de COLUMNAS_CSV."""
+    cabecera = [
+        orden.numero_op, _iso(orden.fecha_creacion), _iso(orden.fecha_inicio),
+        orden.maquina_ref.nombre if orden.maquina_ref else None,
+        orden.producto, orden.molde, orden.activa,
+        orden.snapshot_tiempo_ciclo, orden.calculo_peso_tiro_gr, orden.calculo_cavidades_totales,
+        orden.calculo_peso_produccion, orden.calculo_merma_pct, orden.calculo_horas,
+        orden.calculo_dias, _iso(orden.calculo_fecha_fin), orden.calculo_familia_color,
+        orden.calculo_avance_real_kg, orden.calculo_avance_real_coladas,
+    ]
+    if not orden.lotes:
+        yield cabecera + [None] * 13
+        return
+
+    for lote in orden.lotes:
+        datos_lote = [
+            lote.id, lote.color_rel.nombre if lote.color_rel else None,
+            lote.meta_kg, lote.calculo_coladas, lote.calculo_kg_real,
+            lote.personas, lote.calculo_horas_hombre,
+        ]
+        items = [
+            ['MATERIAL', m.materia.nombre, m.materia.tipo, m.fraccion, m.calculo_peso_kg, None]
+            for m in lote.materias_primas
+        ] + [
+            ['PIGMENTO', p.pigmento.nombre, None, None, None, p.gramos]
+            for p in lote.colorantes
+        ]
+        for item in items or [[None] * 6]:
+            yield cabecera + datos_lote + item
+
+
+def generar_ndjson(ordenes):
+    """Una OP por línea: el mismo árbol que GET /api/ordenes/<op>."""
+    for orden in ordenes:
+        yield json.dumps(orden.to_dict(), ensure_ascii=False, default=str) + '\n'
+
+
+def generar_csv(ordenes):
+    """CSV con encabezado; se emite un fragmento por OP."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(COLUMNAS_CSV)
+    yield buffer.getvalue()
+
+    for orden in ordenes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_filas_csv(orden))
+        yield buffer.getvalue()
@@ -0,0 +1,163 @@
+"""
+Servicio de recálculo incremental de métricas de una OP.
+
+Declara el grafo de dependencias entre los campos de entrada de
+OrdenProduccion / LoteColor / SeCompone y sus valores calculo_*, de modo que
+al editar un campo solo se recalculen (y escriban) las salidas afectadas.
+Ej.: cambiar snapshot_tiempo_ciclo solo toca horas, días, fecha fin y
+horas-hombre de los lotes; merma, coladas y kg de material no se recalculan.
+
+Cada nodo usa las mismas funciones de app.services.calculo_orden que los
+métodos actualizar_metricas() de los modelos, así el resultado incremental
+es idéntico al recálculo completo.
+"""
+from graphlib import TopologicalSorter
+
+from app.services import calculo_orden as calculo
+
+
+# ---------------------------------------------------------------------------
+# GRAFO DE DEPENDENCIAS
+# ---------------------------------------------------------------------------
+# Los nodos se nombran '<nivel>.<campo>' con nivel ∈ {orden, lote, componente}.
+# Las entradas (campos editables o colecciones) no tienen entrada propia en el dict.
+
+DEPENDENCIAS = {
+    # --- OrdenProduccion ---
+    'orden.calculo_peso_neto_golpe':   ('orden.snapshot_composicion',),
+    'orden.calculo_cavidades_totales': ('orden.snapshot_composicion',),
+    'orden.calculo_peso_tiro_gr':      ('orden.calculo_peso_neto_golpe', 'orden.snapshot_peso_colada_gr'),
+    'orden.calculo_colores_activos':   ('orden.lotes',),
+    'orden.calculo_peso_produccion':   ('orden.lotes', 'lote.meta_kg'),
+    'orden.calculo_merma_pct':         ('orden.calculo_peso_tiro_gr', 'orden.calculo_peso_neto_golpe'),
+    'orden.calculo_peso_inc_merma':    ('orden.calculo_peso_produccion', 'orden.calculo_merma_pct',
+                                        'orden.calculo_peso_tiro_gr'),
+    'orden.calculo_merma_natural_kg':  ('orden.calculo_peso_inc_merma', 'orden.calculo_peso_produccion'),
+    'orden.calculo_horas':             ('orden.calculo_peso_produccion', 'orden.calculo_peso_tiro_gr',
+                                        'orden.snapshot_tiempo_ciclo'),
+    'orden.calculo_dias':              ('orden.calculo_horas', 'orden.snapshot_horas_turno'),
+    'orden.calculo_fecha_fin':         ('orden.fecha_inicio', 'orden.calculo_dias'),
+    'orden.calculo_familia_color':     ('orden.producto_sku',),
+
+    # --- LoteColor ---
+    'lote.calculo_coladas':      ('lote.meta_kg', 'orden.calculo_peso_neto_golpe'),
+    'lote.calculo_kg_real':      ('lote.calculo_coladas', 'orden.calculo_peso_neto_golpe'),
+    'lote.calculo_horas_hombre': ('orden.calculo_colores_activos', 'orden.calculo_dias',
+                                  'orden.snapshot_horas_turno', 'lote.personas'),
+
+    # --- SeCompone ---
+    'componente.calculo_peso_kg': ('lote.meta_kg', 'orden.calculo_merma_pct', 'componente.fraccion'),
+}
+
+# Orden de evaluación (las dependencias siempre antes que sus dependientes)
+ORDEN_CALCULO = [n for n in TopologicalSorter(DEPENDENCIAS).static_order() if n in DEPENDENCIAS]
+
+# Grafo inverso: nodo -> salidas que lo usan
+_DEPENDIENTES = {}
+for _salida, _entradas in DEPENDENCIAS.items():
+    for _entrada in _entradas:
+        _DEPENDIENTES.setdefault(_entrada, set()).add(_salida)
+
+
+def salidas_afectadas(entradas):
+    """
+    Conjunto de salidas calculo_* alcanzables desde las entradas modificadas.
+
+    Args:
+        entradas: iterable de nodos '<nivel>.<campo>' (ej. 'orden.snapshot_tiempo_ciclo')
+    """
+    afectadas, pendientes = set(), list(entradas)
+    while pendientes:
+        for salida in _DEPENDIENTES.get(pendientes.pop(), ()):
+            if salida not in afectadas:
+                afectadas.add(salida)
+                pendientes.append(salida)
+    return afectadas
+
+
+# ---------------------------------------------------------------------------
+# FÓRMULAS (una por nodo, sobre los valores persistidos; delegan en calculo_orden)
+# ---------------------------------------------------------------------------
+
+def _familia_color(o):
+    if o.producto_ref:
+        if o.producto_ref.familia_color_rel:
+            return o.producto_ref.familia_color_rel.nombre
+        if o.producto_ref.familia_color:
+            return o.producto_ref.familia_color
+    return None
+
+
+FORMULAS = {
+    'orden.calculo_peso_neto_golpe':   lambda o: o.peso_neto_golpe_gr,
+    'orden.calculo_cavidades_totales': lambda o: o.cavidades_totales,
+    'orden.calculo_peso_tiro_gr':      lambda o: (o.calculo_peso_neto_golpe or 0.0) + (o.snapshot_peso_colada_gr or 0.0),
+    'orden.calculo_colores_activos':   lambda o: calculo.colores_activos(len(o.lotes)),
+    'orden.calculo_peso_produccion':   lambda o: sum((l.meta_kg or 0.0) for l in o.lotes),
+    'orden.calculo_merma_pct':         lambda o: calculo.merma_pct(
+        o.calculo_peso_tiro_gr or 0.0, o.calculo_peso_neto_golpe or 0.0),
+    'orden.calculo_peso_inc_merma':    lambda o: calculo.peso_inc_merma(
+        o.calculo_peso_produccion or 0.0, o.calculo_merma_pct or 0.0, o.calculo_peso_tiro_gr or 0.0),
+    'orden.calculo_merma_natural_kg':  lambda o: (o.calculo_peso_inc_merma or 0.0) - (o.calculo_peso_produccion or 0.0),
+    'orden.calculo_horas':             lambda o: calculo.horas_produccion(
+        o.calculo_peso_produccion or 0.0, o.calculo_peso_tiro_gr or 0.0, o.snapshot_tiempo_ciclo),
+    'orden.calculo_dias':              lambda o: calculo.dias_produccion(o.calculo_horas or 0.0, o.snapshot_horas_turno),
+    'orden.calculo_fecha_fin':         lambda o: calculo.fecha_fin(o.fecha_inicio, o.calculo_dias or 0.0),
+    'orden.calculo_familia_color':     _familia_color,
+    'lote.calculo_coladas':            lambda o, l: calculo.coladas_lote(l.meta_kg, o.calculo_peso_neto_golpe or 0.0),
+    'lote.calculo_kg_real':            lambda o, l: calculo.kg_real_lote(l.calculo_coladas, o.calculo_peso_neto_golpe or 0.0),
+    'lote.calculo_horas_hombre':       lambda o, l: calculo.horas_hombre_lote(
+        o.calculo_dias or 0.0, o.snapshot_horas_turno or calculo.HORAS_TURNO_DEFAULT_LOTE,
+        l.personas, o.calculo_colores_activos or 1),
+    'componente.calculo_peso_kg':      lambda o, l, c: calculo.peso_material_kg(
+        l.meta_kg or 0.0, o.calculo_merma_pct or 0.0, c.fraccion),
+}
+
+
+# ---------------------------------------------------------------------------
+# APLICACIÓN
+# ---------------------------------------------------------------------------
+
+def recalcular_incremental(orden, entradas):
+    """
+    Recalcula solo las salidas afectadas por `entradas` y escribe las que cambian.
+
+    Solo recorre lotes / materiales si alguna salida de ese nivel está afectada,
+    así un cambio a nivel OP no carga las recetas.
+
+    Args:
+        orden: OrdenProduccion (persistida o pendiente)
+        entradas: nodos de entrada modificados (ver DEPENDENCIAS)
+
+    Returns:
+        dict: {'orden': {campo: valor}, 'lotes': {id: {campo: valor}},
+               'materiales': {id: {campo: valor}}} con los valores que cambiaron
+    """
+    afectadas = salidas_afectadas(entradas)
+    cambios = {'orden': {}, 'lotes': {}, 'materiales': {}}
+
+    def _asignar(obj, campo, valor, destino):
+        if getattr(obj, campo) != valor:
+            setattr(obj, campo, valor)
+            destino[campo] = valor
+
+    for nodo in ORDEN_CALCULO:
+        if nodo not in afectadas:
+            continue
+        nivel, campo = nodo.split('.', 1)
+        formula = FORMULAS[nodo]
+
+        if nivel == 'orden':
+            _asignar(orden, campo, formula(orden), cambios['orden'])
+        elif nivel == 'lote':
+            for lote in orden.lotes:
+                _asignar(lote, campo, formula(orden, lote), cambios['lotes'].setdefault(lote.id, {}))
+        else:
+            for lote in orden.lotes:
+                for comp in lote.materias_primas:
+                    _asignar(comp, campo, formula(orden, lote, comp),
+                             cambios['materiales'].setdefault(comp.id, {}))
+
+    cambios['lotes'] = {k: v for k, v in cambios['lotes'].items() if v}
+    cambios['materiales'] = {k: v for k, v in cambios['materiales'].items() if v}
+    return cambios
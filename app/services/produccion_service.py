@@ -0,0 +1,371 @@
+"""
+Servicio de consultas de Órdenes de Producción.
+Centraliza la paginación por cursor (keyset) y el eager-loading del árbol
+de la OP para que los listados ejecuten un número fijo de queries,
+sin importar el tamaño de la página. Incluye también la reconstrucción
+del avance real persistido (calculo_avance_real_*) y de las estadísticas
+de pesaje de los registros diarios (pesaje_*).
+"""
+import base64
+import hashlib
+import json
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone, SeColorea
+from app.models.registro import RegistroDiarioProduccion
+from app.models.control_peso import ControlPeso
+
+
+LIMITE_DEFAULT = 50
+LIMITE_MAXIMO = 200
+
+# Diferencia máxima admitida entre el avance incremental y el recalculado
+TOLERANCIA_AVANCE_KG = 1e-6
+
+# Registros cargados por bloque al corregir estadísticas de pesaje
+BLOQUE_PESAJES = 500
+
+
+# ---------------------------------------------------------------------------
+# EAGER-LOADING
+# ---------------------------------------------------------------------------
+
+def opciones_carga_orden(fields=None, include=None):
+    """
+    Opciones de carga para serializar OrdenProduccion.to_dict() sin N+1.
+    Cada relación se resuelve con un único SELECT ... IN por página.
+
+    Recibe los mismos `fields` / `include` que to_dict(): solo se cargan las
+    relaciones que la serialización va a recorrer.
+    """
+    if include is None:
+        include = OrdenProduccion.INCLUDES if fields is None else ()
+    if fields is None:
+        fields = OrdenProduccion.CAMPOS_CABECERA
+
+    opciones = []
+    if 'maquina' in fields or 'tipo_maquina' in fields:
+        opciones.append(joinedload(OrdenProduccion.maquina_ref))
+    if 'composicion' in include:
+        opciones.append(
+            selectinload(OrdenProduccion.snapshot_composicion)
+                .joinedload(SnapshotComposicionMolde.pieza)
+        )
+    if 'lotes' in include:
+        opciones.append(
+            selectinload(OrdenProduccion.lotes).options(
+                joinedload(LoteColor.color_rel),
+                selectinload(LoteColor.materias_primas).joinedload(SeCompone.materia),
+                selectinload(LoteColor.colorantes).joinedload(SeColorea.pigmento),
+            )
+        )
+    return opciones
+
+
+def parsear_campos_orden(fields_param=None, include_param=None):
+    """
+    Interpreta ?fields=a,b y ?include=lotes,composicion,avance.
+
+    Returns:
+        (fields, include): tuplas o None si el parámetro no vino
+    Raises:
+        ValueError: si se pide un campo o relación desconocida
+    """
+    def _lista(valor, permitidos, nombre):
+        if valor is None:
+            return None
+        items = tuple(v.strip() for v in valor.split(',') if v.strip())
+        desconocidos = [v for v in items if v not in permitidos]
+        if desconocidos:
+            raise ValueError(
+                f"{nombre} desconocido(s): {', '.join(desconocidos)}. "
+                f"Permitidos: {', '.join(permitidos)}"
+            )
+        return items
+
+    return (
+        _lista(fields_param, OrdenProduccion.CAMPOS_CABECERA, 'fields'),
+        _lista(include_param, OrdenProduccion.INCLUDES, 'include'),
+    )
+
+
+# ---------------------------------------------------------------------------
+# VERSIÓN / ETAG
+# ---------------------------------------------------------------------------
+
+def version_orden(numero_op):
+    """Versión actual de la OP (un SELECT de una columna), None si no existe."""
+    return db.session.execute(
+        select(OrdenProduccion.version).where(OrdenProduccion.numero_op == numero_op)
+    ).scalar_one_or_none()
+
+
+def etag_orden(numero_op, version, variante=''):
+    """
+    ETag de una representación de la OP. `variante` distingue vistas distintas
+    del mismo árbol (ej. registros, o el query string con fields/include).
+    """
+    raw = f'{numero_op}|{version}|{variante}'.encode()
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+
+# ---------------------------------------------------------------------------
+# CURSOR (keyset sobre fecha_creacion DESC, numero_op DESC)
+# ---------------------------------------------------------------------------
+
+def codificar_cursor(orden):
+    """Genera el cursor opaco que apunta a la última OP de una página."""
+    payload = {
+        'f': orden.fecha_creacion.isoformat() if orden.fecha_creacion else None,
+        'n': orden.numero_op,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Inverso de codificar_cursor.
+    Retorna (fecha_creacion, numero_op). Lanza ValueError si el cursor es inválido.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        fecha = datetime.fromisoformat(payload['f']) if payload.get('f') else None
+        return fecha, str(payload['n'])
+    except Exception as e:
+        raise ValueError(f'Cursor inválido: {cursor}') from e
+
+
+# ---------------------------------------------------------------------------
+# LISTADO PAGINADO
+# ---------------------------------------------------------------------------
+
+def filtrar_ordenes(query, activa=None, maquina_id=None, desde=None, hasta=None):
+    """
+    Aplica los filtros comunes de listados / exportación sobre un Query o Select.
+    desde / hasta son date y forman un rango inclusivo sobre fecha_creacion.
+    """
+    if activa is not None:
+        query = query.filter(OrdenProduccion.activa == activa)
+    if maquina_id is not None:
+        query = query.filter(OrdenProduccion.maquina_id == maquina_id)
+    if desde is not None:
+        query = query.filter(OrdenProduccion.fecha_creacion >= datetime.combine(desde, datetime.min.time()))
+    if hasta is not None:
+        limite_sup = datetime.combine(hasta, datetime.min.time()) + timedelta(days=1)
+        query = query.filter(OrdenProduccion.fecha_creacion < limite_sup)
+    return query
+
+
+def listar_ordenes_paginadas(limit=LIMITE_DEFAULT, cursor=None, activa=None,
+                             maquina_id=None, desde=None, hasta=None,
+                             fields=None, include=None):
+    """
+    Retorna (ordenes, next_cursor) para una página del listado principal.
+
+    Args:
+        limit: tamaño de página (se acota a LIMITE_MAXIMO)
+        cursor: next_cursor de la página anterior (None = primera página)
+        activa: True/False para filtrar por estado, None = todas
+        maquina_id: filtra por máquina asignada
+        desde / hasta: date, rango inclusivo sobre fecha_creacion
+        fields / include: ver OrdenProduccion.to_dict(); definen qué relaciones se cargan
+    """
+    limit = max(1, min(limit or LIMITE_DEFAULT, LIMITE_MAXIMO))
+
+    query = filtrar_ordenes(OrdenProduccion.query, activa, maquina_id, desde, hasta)
+
+    if cursor:
+        fecha_cursor, op_cursor = decodificar_cursor(cursor)
+        query = query.filter(
+            db.or_(
+                OrdenProduccion.fecha_creacion < fecha_cursor,
+                db.and_(
+                    OrdenProduccion.fecha_creacion == fecha_cursor,
+                    OrdenProduccion.numero_op < op_cursor,
+                ),
+            )
+        )
+
+    # Pedimos una fila extra para saber si hay página siguiente
+    filas = (
+        query.options(*opciones_carga_orden(fields, include))
+        .order_by(OrdenProduccion.fecha_creacion.desc(), OrdenProduccion.numero_op.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    ordenes = filas[:limit]
+    next_cursor = codificar_cursor(ordenes[-1]) if len(filas) > limit else None
+    return ordenes, next_cursor
+
+
+# ---------------------------------------------------------------------------
+# AVANCE REAL (verificación / reconstrucción)
+# ---------------------------------------------------------------------------
+
+def reconstruir_avance_ordenes(aplicar=True):
+    """
+    Recalcula calculo_avance_real_kg / calculo_avance_real_coladas de todas las
+    OPs con un único SELECT agrupado sobre registro_diario_produccion y los
+    compara contra los valores persistidos.
+
+    Args:
+        aplicar: si es True, corrige las diferencias con un UPDATE por lotes y hace commit
+
+    Returns:
+        list[dict]: una entrada por OP cuyo avance persistido no coincidía
+    """
+    agregados = {
+        orden_id: (kg or 0.0, coladas or 0)
+        for orden_id, kg, coladas in db.session.query(
+            RegistroDiarioProduccion.orden_id,
+            func.sum(RegistroDiarioProduccion.total_kg_real),
+            func.sum(RegistroDiarioProduccion.total_coladas_calculada),
+        ).group_by(RegistroDiarioProduccion.orden_id)
+    }
+
+    diferencias = []
+    for numero_op, kg_actual, coladas_actual in db.session.query(
+        OrdenProduccion.numero_op,
+        OrdenProduccion.calculo_avance_real_kg,
+        OrdenProduccion.calculo_avance_real_coladas,
+    ):
+        kg_real, coladas_real = agregados.get(numero_op, (0.0, 0))
+        if (abs((kg_actual or 0.0) - kg_real) > TOLERANCIA_AVANCE_KG
+                or (coladas_actual or 0) != coladas_real
+                or kg_actual is None or coladas_actual is None):
+            diferencias.append({
+                'numero_op': numero_op,
+                'kg_persistido': kg_actual,
+                'kg_real': kg_real,
+                'coladas_persistidas': coladas_actual,
+                'coladas_reales': int(coladas_real),
+            })
+
+    if aplicar and diferencias:
+        db.session.execute(update(OrdenProduccion), [
+            {
+                'numero_op': d['numero_op'],
+                'calculo_avance_real_kg': d['kg_real'],
+                'calculo_avance_real_coladas': d['coladas_reales'],
+            } for d in diferencias
+        ])
+        db.session.execute(
+            update(OrdenProduccion)
+            .where(OrdenProduccion.numero_op.in_([d['numero_op'] for d in diferencias]))
+            .values(version=OrdenProduccion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    return diferencias
+
+
+# ---------------------------------------------------------------------------
+# ESTADÍSTICAS DE PESAJE (verificación / reconstrucción)
+# ---------------------------------------------------------------------------
+
+def _estadisticas_reales():
+    """
+    SELECT de (registro_id, n, suma, min, max, media, m2) por registro desde
+    control_peso. m2 = Σ (x - media)² con la media del propio grupo (dos
+    pasadas, estable aunque los pesos sean grandes).
+    """
+    base = (
+        select(
+            ControlPeso.registro_id.label('registro_id'),
+            func.count().label('n'),
+            func.sum(ControlPeso.peso_real_kg).label('suma'),
+            func.min(ControlPeso.peso_real_kg).label('minimo'),
+            func.max(ControlPeso.peso_real_kg).label('maximo'),
+            func.avg(ControlPeso.peso_real_kg).label('media'),
+        )
+        .group_by(ControlPeso.registro_id)
+        .subquery()
+    )
+    desvio = ControlPeso.peso_real_kg - base.c.media
+    return (
+        select(base, func.sum(desvio * desvio).label('m2'))
+        .join(ControlPeso, ControlPeso.registro_id == base.c.registro_id)
+        .group_by(base.c.registro_id, base.c.n, base.c.suma, base.c.minimo, base.c.maximo, base.c.media)
+        .subquery()
+    )
+
+
+def _coincide(persistido, real):
+    if persistido is None or real is None:
+        return persistido is None and real is None
+    return math.isclose(persistido, real, rel_tol=1e-9, abs_tol=TOLERANCIA_AVANCE_KG)
+
+
+def reconstruir_estadisticas_pesaje(aplicar=True, recalcular_totales=False):
+    """
+    Contrasta RegistroDiarioProduccion.pesaje_* (mantenidas en línea) con las
+    filas de control_peso, con un único SELECT agrupado para todos los registros.
+
+    Args:
+        aplicar: si es True corrige las columnas pesaje_* de los registros con
+            diferencias y hace commit
+        recalcular_totales: además re-deriva sus totales con actualizar_totales
+            (total_kg_real pasa a ser el pesado y el hook corrige el avance de
+            la OP). Apagado por defecto: los bultos manuales dejan
+            total_kg_real teórico para /validacion-peso
+
+    Returns:
+        list[dict]: una entrada por registro cuyas estadísticas no coincidían
+    """
+    reales = _estadisticas_reales()
+    R = RegistroDiarioProduccion
+    filas = db.session.execute(
+        select(
+            R.id, R.pesaje_n, R.pesaje_suma_kg, R.pesaje_min_kg, R.pesaje_max_kg, R.pesaje_media_kg, R.pesaje_m2,
+            reales.c.n, reales.c.suma, reales.c.minimo, reales.c.maximo, reales.c.media, reales.c.m2,
+        )
+        .outerjoin(reales, reales.c.registro_id == R.id)
+        .order_by(R.id)
+        .execution_options(yield_per=5000)
+    )
+
+    diferencias = []
+    for registro_id, n, suma, minimo, maximo, media, m2, n_r, suma_r, min_r, max_r, media_r, m2_r in filas:
+        real = {
+            'pesaje_n': n_r or 0,
+            'pesaje_suma_kg': suma_r or 0.0,
+            'pesaje_min_kg': min_r,
+            'pesaje_max_kg': max_r,
+            'pesaje_media_kg': media_r or 0.0,
+            'pesaje_m2': m2_r or 0.0,
+        }
+        persistido = {
+            'pesaje_n': n or 0, 'pesaje_suma_kg': suma, 'pesaje_min_kg': minimo,
+            'pesaje_max_kg': maximo, 'pesaje_media_kg': media, 'pesaje_m2': m2,
+        }
+        if persistido['pesaje_n'] != real['pesaje_n'] or not all(
+            _coincide(persistido[k], real[k]) for k in real if k != 'pesaje_n'
+        ):
+            diferencias.append({'registro_id': registro_id, 'persistido': persistido, 'real': real})
+
+    if aplicar and diferencias:
+        for i in range(0, len(diferencias), BLOQUE_PESAJES):
+            bloque = {d['registro_id']: d['real'] for d in diferencias[i:i + BLOQUE_PESAJES]}
+            stmt = select(R).where(R.id.in_(bloque))
+            if recalcular_totales:
+                stmt = stmt.options(selectinload(R.detalles))
+            for registro in db.session.scalars(stmt):
+                for campo, valor in bloque[registro.id].items():
+                    setattr(registro, campo, valor)
+                if recalcular_totales:
+                    # total_kg_real sale de pesaje_suma_kg: el hook de avance corrige la OP
+                    registro.actualizar_totales()
+        db.session.commit()
+
+    return diferencias
@@ -0,0 +1,267 @@
+"""
+Servicio de programación de planta (timeline de capacidad por máquina).
+
+Con las OPs activas de cada Maquina (fecha_inicio, calculo_horas,
+snapshot_horas_turno) arma la cola de cada prensa y calcula:
+  - inicio / fin proyectado (una máquina procesa una OP a la vez)
+  - conflictos: OPs cuyo plan original se solapa en la misma máquina
+  - huecos: tiempo ocioso dentro de la ventana consultada
+
+Cada máquina tiene un índice de intervalos (inicios ordenados + máximo de
+fines acumulado) para consultar solapamientos en O(log n + k). La carga es
+un único SELECT de columnas; el resto es cálculo en memoria.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.maquina import Maquina
+from app.services import calculo_orden as calculo
+
+
+VENTANA_DEFAULT_DIAS = 30
+VENTANA_MAXIMA_DIAS = 366
+
+
+# ---------------------------------------------------------------------------
+# ÍNDICE DE INTERVALOS
+# ---------------------------------------------------------------------------
+
+class IndiceIntervalos:
+    """
+    Índice estático de intervalos semiabiertos [inicio, fin).
+    Los intervalos se ordenan por inicio; `max_fin[i]` es el mayor fin entre
+    0..i, monótono, lo que permite descartar por bisección todo lo que termina
+    antes del rango consultado.
+    """
+    __slots__ = ('inicios', 'fines', 'datos', 'max_fin')
+
+    def __init__(self, intervalos):
+        """intervalos: iterable de (inicio, fin, dato)."""
+        ordenados = sorted(intervalos, key=lambda t: (t[0], t[1]))
+        self.inicios = [t[0] for t in ordenados]
+        self.fines = [t[1] for t in ordenados]
+        self.datos = [t[2] for t in ordenados]
+        self.max_fin = []
+        tope = None
+        for fin in self.fines:
+            tope = fin if tope is None or fin > tope else tope
+            self.max_fin.append(tope)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def solapados(self, desde, hasta, limite=None):
+        """
+        Posiciones de los intervalos que se solapan con [desde, hasta).
+        `limite` restringe la búsqueda a las posiciones < limite.
+        """
+        j = bisect_left(self.inicios, hasta)
+        if limite is not None:
+            j = min(j, limite)
+        i = bisect_right(self.max_fin, desde, 0, j)
+        return [k for k in range(i, j) if self.fines[k] > desde]
+
+
+# ---------------------------------------------------------------------------
+# MOTOR (sin BD)
+# ---------------------------------------------------------------------------
+
+def _naive_utc(fecha):
+    if fecha is not None and fecha.tzinfo is not None:
+        return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def _horas(delta):
+    return round(delta.total_seconds() / 3600, 2)
+
+
+def duracion_orden(horas, horas_turno):
+    """Duración calendario: horas máquina repartidas en turnos de `horas_turno` por día."""
+    dias = calculo.dias_produccion(horas or 0.0, horas_turno or calculo.HORAS_TURNO_DEFAULT_LOTE)
+    return timedelta(days=dias)
+
+
+def programar_maquina(ordenes, desde, hasta, ahora):
+    """
+    Programa la cola de una máquina.
+
+    Args:
+        ordenes: list[dict] con numero_op, fecha_inicio, fecha_creacion, horas, horas_turno
+        desde / hasta: ventana de análisis de huecos / ocupación
+        ahora: referencia para OPs sin fecha de inicio
+
+    Returns:
+        dict con 'ordenes' (en orden de cola), 'conflictos', 'huecos',
+        'libre_desde', 'horas_ocupadas' y el índice de lo proyectado.
+    """
+    # 1. Plan original → conflictos entre OPs con fecha de inicio
+    planificadas = []
+    for o in ordenes:
+        inicio = _naive_utc(o['fecha_inicio'])
+        o['_duracion'] = duracion_orden(o['horas'], o['horas_turno'])
+        if inicio is not None:
+            planificadas.append((inicio, inicio + o['_duracion'], o))
+    indice_plan = IndiceIntervalos(planificadas)
+
+    conflictos = []
+    for k in range(len(indice_plan)):
+        ini, fin, o = indice_plan.inicios[k], indice_plan.fines[k], indice_plan.datos[k]
+        for m in indice_plan.solapados(ini, fin, limite=k):
+            otro = indice_plan.datos[m]
+            desde_c, hasta_c = max(ini, indice_plan.inicios[m]), min(fin, indice_plan.fines[m])
+            if hasta_c > desde_c:
+                conflictos.append({
+                    'op_a': otro['numero_op'],
+                    'op_b': o['numero_op'],
+                    'desde': desde_c.isoformat(),
+                    'hasta': hasta_c.isoformat(),
+                    'horas': _horas(hasta_c - desde_c),
+                })
+
+    # 2. Cola: primero por fecha de inicio planificada, luego las que no tienen fecha
+    sin_fecha_ts = datetime.max
+    cola = sorted(
+        ordenes,
+        key=lambda o: (
+            _naive_utc(o['fecha_inicio']) or sin_fecha_ts,
+            _naive_utc(o['fecha_creacion']) or sin_fecha_ts,
+            o['numero_op'],
+        ),
+    )
+
+    # 3. Proyección secuencial
+    proyectadas, fin_anterior = [], None
+    for posicion, o in enumerate(cola, start=1):
+        plan = _naive_utc(o['fecha_inicio'])
+        inicio = plan or ahora
+        if fin_anterior is not None and fin_anterior > inicio:
+            inicio = fin_anterior
+        fin = inicio + o['_duracion']
+        fin_anterior = max(fin_anterior, fin) if fin_anterior else fin
+        proyectadas.append((inicio, fin, {
+            'numero_op':           o['numero_op'],
+            'posicion':            posicion,
+            'fecha_inicio_plan':   plan.isoformat() if plan else None,
+            'fecha_fin_plan':      (plan + o['_duracion']).isoformat() if plan else None,
+            'inicio_proyectado':   inicio.isoformat(),
+            'fin_proyectado':      fin.isoformat(),
+            'horas':               round(o['horas'] or 0.0, 2),
+            'retraso_horas':       _horas(inicio - plan) if plan else None,
+        }))
+    indice = IndiceIntervalos(proyectadas)
+
+    # 4. Huecos y ocupación dentro de la ventana
+    huecos, ocupadas = [], timedelta(0)
+    cursor = desde
+    for k in indice.solapados(desde, hasta):
+        ini, fin = max(indice.inicios[k], desde), min(indice.fines[k], hasta)
+        if ini > cursor:
+            huecos.append({'desde': cursor.isoformat(), 'hasta': ini.isoformat(), 'horas': _horas(ini - cursor)})
+        if fin > cursor:
+            ocupadas += fin - max(ini, cursor)
+            cursor = fin
+    if cursor < hasta:
+        huecos.append({'desde': cursor.isoformat(), 'hasta': hasta.isoformat(), 'horas': _horas(hasta - cursor)})
+
+    return {
+        'indice':         indice,
+        'conflictos':     conflictos,
+        'huecos':         huecos,
+        'horas_ocupadas': ocupadas,
+        'libre_desde':    max(fin_anterior, ahora) if fin_anterior else ahora,
+    }
+
+
+def programar_planta(maquinas, ordenes, desde, hasta, ahora):
+    """
+    Timeline de toda la planta.
+
+    Args:
+        maquinas: list[(id, nombre)]
+        ordenes: list[dict] (ver programar_maquina) con además 'maquina_id'
+    """
+    por_maquina = {}
+    for o in ordenes:
+        por_maquina.setdefault(o['maquina_id'], []).append(o)
+
+    horas_ventana = (hasta - desde).total_seconds() / 3600
+    resultado, total_conflictos, total_ociosas, total_ordenes = [], 0, 0.0, 0
+    for maquina_id, nombre in maquinas:
+        prog = programar_maquina(por_maquina.get(maquina_id, []), desde, hasta, ahora)
+        indice = prog['indice']
+        en_ventana = [indice.datos[k] for k in indice.solapados(desde, hasta)]
+        ociosas = sum(h['horas'] for h in prog['huecos'])
+
+        resultado.append({
+            'maquina_id':     maquina_id,
+            'maquina':        nombre,
+            'libre_desde':    prog['libre_desde'].isoformat(),
+            'ocupacion_pct':  round(100 * prog['horas_ocupadas'].total_seconds() / 3600 / horas_ventana, 2)
+                              if horas_ventana > 0 else 0.0,
+            'ordenes_en_cola': len(indice),
+            'ordenes':        en_ventana,
+            'conflictos':     prog['conflictos'],
+            'huecos':         prog['huecos'],
+        })
+        total_conflictos += len(prog['conflictos'])
+        total_ociosas += ociosas
+        total_ordenes += len(indice)
+
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'maquinas': resultado,
+        'resumen': {
+            'maquinas':      len(resultado),
+            'ordenes':       total_ordenes,
+            'conflictos':    total_conflictos,
+            'horas_ociosas': round(total_ociosas, 2),
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# CARGA DESDE BD
+# ---------------------------------------------------------------------------
+
+def timeline_planta(desde=None, hasta=None, maquina_id=None, ahora=None):
+    """
+    Carga máquinas y OPs activas (solo columnas) y arma el timeline.
+
+    Args:
+        desde / hasta: datetime de la ventana (default: hoy 00:00 + VENTANA_DEFAULT_DIAS)
+        maquina_id: limita a una máquina
+    """
+    ahora = _naive_utc(ahora or datetime.now(timezone.utc))
+    desde = _naive_utc(desde) or ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+    hasta = _naive_utc(hasta) or desde + timedelta(days=VENTANA_DEFAULT_DIAS)
+    if hasta <= desde:
+        raise ValueError('hasta debe ser posterior a desde')
+    if hasta - desde > timedelta(days=VENTANA_MAXIMA_DIAS):
+        raise ValueError(f'La ventana no puede superar {VENTANA_MAXIMA_DIAS} días')
+
+    q_maq = db.select(Maquina.id, Maquina.nombre).order_by(Maquina.nombre)
+    q_ops = db.select(
+        OrdenProduccion.numero_op,
+        OrdenProduccion.maquina_id,
+        OrdenProduccion.fecha_inicio,
+        OrdenProduccion.fecha_creacion,
+        OrdenProduccion.calculo_horas,
+        OrdenProduccion.snapshot_horas_turno,
+    ).where(OrdenProduccion.activa.is_(True), OrdenProduccion.maquina_id.isnot(None))
+    if maquina_id is not None:
+        q_maq = q_maq.where(Maquina.id == maquina_id)
+        q_ops = q_ops.where(OrdenProduccion.maquina_id == maquina_id)
+
+    maquinas = db.session.execute(q_maq).all()
+    ordenes = [
+        {
+            'numero_op': op, 'maquina_id': maq, 'fecha_inicio': ini, 'fecha_creacion': creada,
+            'horas': horas, 'horas_turno': turno,
+        }
+        for op, maq, ini, creada, horas, turno in db.session.execute(q_ops)
+    ]
+    return programar_planta(maquinas, ordenes, desde, hasta, ahora)
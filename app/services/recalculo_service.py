@@ -0,0 +1,414 @@
+"""
+Servicio de recálculo masivo de métricas de producción.
+Reproduce en forma vectorizada (numpy) la cascada
+OrdenProduccion.actualizar_metricas() → LoteColor → SeCompone, leyendo solo
+las columnas necesarias y escribiendo los calculo_* con UPDATEs por lotes.
+Pensado para recalcular todo el histórico tras un cambio de fórmula.
+
+IMPORTANTE: las operaciones siguen el mismo orden que los métodos de los
+modelos para que el resultado sea bit a bit idéntico al cálculo por objeto.
+
+recalcular_totales_registros hace lo mismo para los totales de
+RegistroDiarioProduccion (actualizar_totales) en SQL, por bloques de id
+con checkpoint reanudable.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import and_, case, func, select, update
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone
+from app.models.producto import ProductoTerminado, FamiliaColor
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora, sumar_avance_ordenes
+from app.models.control_peso import ControlPeso
+from app.models.checkpoint_proceso import CheckpointProceso
+from app.models.resumen_produccion import marcar_resumen
+
+
+CHUNK_DEFAULT = 1000
+
+# Checkpoint de `flask recalcular-registros`
+PROCESO_TOTALES_REGISTROS = 'recalcular_totales_registros'
+
+# Diferencia de kg por debajo de la cual un total se considera igual
+TOLERANCIA_KG = 1e-6
+
+
+def _arr(valores, default=np.nan):
+    """Lista de Python (con None) → array float64, None reemplazado por `default`."""
+    return np.array([default if v is None else v for v in valores], dtype=np.float64)
+
+
+# ---------------------------------------------------------------------------
+# NÚCLEO VECTORIZADO (sin acceso a BD)
+# ---------------------------------------------------------------------------
+
+def calcular_metricas_vectorizado(ordenes, snaps, lotes, componentes):
+    """
+    Calcula todos los calculo_* de un conjunto de órdenes.
+
+    Args:
+        ordenes: dict de listas paralelas: numero_op, peso_colada_gr, tiempo_ciclo,
+                 horas_turno, fecha_inicio, familia_nombre, familia_legacy
+        snaps: dict: orden_id, cavidades, peso_unit_gr (ordenados por id)
+        lotes: dict: id, numero_op, meta_kg, personas (ordenados por id)
+        componentes: dict: id, lote_id, fraccion
+
+    Returns:
+        (filas_ordenes, filas_lotes, filas_componentes): listas de dicts
+        listas para un UPDATE por lotes (clave primaria + columnas calculo_*).
+    """
+    n = len(ordenes['numero_op'])
+    pos_orden = {op: i for i, op in enumerate(ordenes['numero_op'])}
+
+    # --- 0. Composición del golpe (SUM por orden) -------------------------
+    idx_snap = np.fromiter((pos_orden[o] for o in snaps['orden_id']), dtype=np.intp,
+                           count=len(snaps['orden_id']))
+    cav = _arr(snaps['cavidades'], 0.0)
+    peso_unit = _arr(snaps['peso_unit_gr'], 0.0)
+    peso_neto = np.bincount(idx_snap, weights=cav * peso_unit, minlength=n)
+    cav_tot = np.bincount(idx_snap, weights=cav, minlength=n).astype(np.int64)
+    cav_tot[cav_tot == 0] = 1
+
+    peso_colada = _arr(ordenes['peso_colada_gr'], 0.0)
+    peso_tiro = peso_neto + peso_colada
+
+    # --- 0b / 1. Colores activos y peso de producción ---------------------
+    idx_lote = np.fromiter((pos_orden[o] for o in lotes['numero_op']), dtype=np.intp,
+                           count=len(lotes['numero_op']))
+    meta_kg = _arr(lotes['meta_kg'], 0.0)
+    n_lotes = np.bincount(idx_lote, minlength=n)
+    colores = np.where(n_lotes > 0, n_lotes, 1)
+    peso_prod = np.bincount(idx_lote, weights=meta_kg, minlength=n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # --- 2 / 3. Merma --------------------------------------------------
+        hay_tiro = peso_tiro > 0
+        merma_pct = np.where(hay_tiro, (peso_tiro - peso_neto) / peso_tiro, 0.0)
+        peso_inc_merma = np.where(hay_tiro, peso_prod * (1 + merma_pct), 0.0)
+        merma_natural = peso_inc_merma - peso_prod
+
+        # --- 4. Tiempos ----------------------------------------------------
+        ciclo = _arr(ordenes['tiempo_ciclo'], 0.0)
+        turno = _arr(ordenes['horas_turno'])
+        con_tiempo = hay_tiro & (ciclo != 0)
+        golpes = (peso_prod * 1000) / peso_tiro
+        segundos = golpes * ciclo
+        horas = np.where(con_tiempo, segundos / 3600, 0.0)
+        dias = np.where(con_tiempo & (turno > 0), horas / turno, 0.0)
+
+    # --- Lotes ---------------------------------------------------------------
+    neto_l = peso_neto[idx_lote]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coladas = np.where(neto_l > 0, (meta_kg * 1000) / neto_l, 0.0)
+        kg_real = np.where(neto_l > 0, coladas * neto_l / 1000, 0.0)
+    turno_l = turno[idx_lote]
+    turno_l = np.where(np.isnan(turno_l) | (turno_l == 0), 24.0, turno_l)
+    personas = _arr(lotes['personas'], 1.0)
+    horas_hombre = (dias[idx_lote] * turno_l * personas) / colores[idx_lote]
+
+    # --- Materias primas -----------------------------------------------------
+    pos_lote = {lid: i for i, lid in enumerate(lotes['id'])}
+    idx_comp = np.fromiter((pos_lote[l] for l in componentes['lote_id']), dtype=np.intp,
+                           count=len(componentes['lote_id']))
+    fraccion = _arr(componentes['fraccion'], 0.0)
+    merma_c = merma_pct[idx_lote[idx_comp]]
+    peso_kg = (meta_kg[idx_comp] * (1 + merma_c)) * fraccion
+
+    # --- Filas para UPDATE ---------------------------------------------------
+    filas_ordenes = []
+    for i, numero_op in enumerate(ordenes['numero_op']):
+        d = float(dias[i])
+        fecha_inicio = ordenes['fecha_inicio'][i]
+        filas_ordenes.append({
+            'numero_op':                 numero_op,
+            'calculo_peso_neto_golpe':   float(peso_neto[i]),
+            'calculo_peso_tiro_gr':      float(peso_tiro[i]),
+            'calculo_cavidades_totales': int(cav_tot[i]),
+            'calculo_colores_activos':   int(colores[i]),
+            'calculo_peso_produccion':   float(peso_prod[i]),
+            'calculo_merma_pct':         float(merma_pct[i]),
+            'calculo_peso_inc_merma':    float(peso_inc_merma[i]),
+            'calculo_merma_natural_kg':  float(merma_natural[i]),
+            'calculo_horas':             float(horas[i]),
+            'calculo_dias':              d,
+            'calculo_fecha_fin':         fecha_inicio + timedelta(days=d) if fecha_inicio and d > 0 else None,
+            'calculo_familia_color':     ordenes['familia_nombre'][i] or ordenes['familia_legacy'][i] or None,
+        })
+
+    filas_lotes = [
+        {
+            'id':                   lote_id,
+            'calculo_coladas':      c,
+            'calculo_kg_real':      k,
+            'calculo_horas_hombre': h,
+        }
+        for lote_id, c, k, h in zip(lotes['id'], coladas.tolist(), kg_real.tolist(), horas_hombre.tolist())
+    ]
+
+    filas_componentes = [
+        {'id': comp_id, 'calculo_peso_kg': p}
+        for comp_id, p in zip(componentes['id'], peso_kg.tolist())
+    ]
+
+    return filas_ordenes, filas_lotes, filas_componentes
+
+
+# ---------------------------------------------------------------------------
+# CARGA DE COLUMNAS
+# ---------------------------------------------------------------------------
+
+def _columnas(rows, nombres):
+    """Transpone filas de un SELECT a dict de listas paralelas."""
+    cols = {nombre: [] for nombre in nombres}
+    for row in rows:
+        for nombre, valor in zip(nombres, row):
+            cols[nombre].append(valor)
+    return cols
+
+
+def _cargar_chunk(numero_ops):
+    """Lee solo las columnas de entrada de la cascada para un grupo de OPs."""
+    session = db.session
+
+    ordenes = _columnas(session.execute(
+        select(
+            OrdenProduccion.numero_op,
+            OrdenProduccion.snapshot_peso_colada_gr,
+            OrdenProduccion.snapshot_tiempo_ciclo,
+            OrdenProduccion.snapshot_horas_turno,
+            OrdenProduccion.fecha_inicio,
+            FamiliaColor.nombre,
+            ProductoTerminado.familia_color,
+        )
+        .outerjoin(ProductoTerminado, ProductoTerminado.cod_sku_pt == OrdenProduccion.producto_sku)
+        .outerjoin(FamiliaColor, FamiliaColor.id == ProductoTerminado.familia_color_id)
+        .where(OrdenProduccion.numero_op.in_(numero_ops))
+        .order_by(OrdenProduccion.numero_op)
+    ), ['numero_op', 'peso_colada_gr', 'tiempo_ciclo', 'horas_turno',
+        'fecha_inicio', 'familia_nombre', 'familia_legacy'])
+
+    snaps = _columnas(session.execute(
+        select(
+            SnapshotComposicionMolde.orden_id,
+            SnapshotComposicionMolde.cavidades,
+            SnapshotComposicionMolde.peso_unit_gr,
+        )
+        .where(SnapshotComposicionMolde.orden_id.in_(numero_ops))
+        .order_by(SnapshotComposicionMolde.id)
+    ), ['orden_id', 'cavidades', 'peso_unit_gr'])
+
+    lotes = _columnas(session.execute(
+        select(LoteColor.id, LoteColor.numero_op, LoteColor.meta_kg, LoteColor.personas)
+        .where(LoteColor.numero_op.in_(numero_ops))
+        .order_by(LoteColor.id)
+    ), ['id', 'numero_op', 'meta_kg', 'personas'])
+
+    componentes = _columnas(session.execute(
+        select(SeCompone.id, SeCompone.lote_id, SeCompone.fraccion)
+        .join(LoteColor, LoteColor.id == SeCompone.lote_id)
+        .where(LoteColor.numero_op.in_(numero_ops))
+        .order_by(SeCompone.id)
+    ), ['id', 'lote_id', 'fraccion'])
+
+    return ordenes, snaps, lotes, componentes
+
+
+# ---------------------------------------------------------------------------
+# ORQUESTACIÓN
+# ---------------------------------------------------------------------------
+
+def recalcular_metricas_masivo(numero_ops=None, chunk_size=CHUNK_DEFAULT, aplicar=True):
+    """
+    Recalcula los calculo_* de OrdenProduccion, LoteColor y SeCompone.
+
+    Recorre las OPs por keyset (numero_op) en bloques de `chunk_size`, calcula
+    cada bloque en forma vectorizada y lo escribe con UPDATEs executemany
+    por clave primaria, con un commit por bloque.
+
+    Args:
+        numero_ops: lista de OPs a recalcular (None = todas)
+        chunk_size: OPs por bloque
+        aplicar: si es False, calcula sin escribir (dry-run)
+
+    Returns:
+        dict: contadores de filas procesadas
+    """
+    stats = {'ordenes': 0, 'lotes': 0, 'materiales': 0, 'bloques': 0}
+    ultimo_op = None
+
+    while True:
+        q = select(OrdenProduccion.numero_op).order_by(OrdenProduccion.numero_op).limit(chunk_size)
+        if numero_ops is not None:
+            q = q.where(OrdenProduccion.numero_op.in_(numero_ops))
+        if ultimo_op is not None:
+            q = q.where(OrdenProduccion.numero_op > ultimo_op)
+        chunk = db.session.execute(q).scalars().all()
+        if not chunk:
+            break
+        ultimo_op = chunk[-1]
+
+        filas_ordenes, filas_lotes, filas_componentes = calcular_metricas_vectorizado(*_cargar_chunk(chunk))
+
+        if aplicar:
+            db.session.execute(update(OrdenProduccion), filas_ordenes)
+            if filas_lotes:
+                db.session.execute(update(LoteColor), filas_lotes)
+            if filas_componentes:
+                db.session.execute(update(SeCompone), filas_componentes)
+            # Los UPDATE por lotes no pasan por el flush: la versión se sube aquí
+            db.session.execute(
+                update(OrdenProduccion)
+                .where(OrdenProduccion.numero_op.in_(chunk))
+                .values(version=OrdenProduccion.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+        stats['ordenes'] += len(filas_ordenes)
+        stats['lotes'] += len(filas_lotes)
+        stats['materiales'] += len(filas_componentes)
+        stats['bloques'] += 1
+
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# TOTALES DE REGISTROS DIARIOS
+# ---------------------------------------------------------------------------
+
+def _totales_sql(desde_id, hasta_id):
+    """
+    SELECT de (id, orden_id, totales persistidos, totales recalculados) de los
+    registros con desde_id < id <= hasta_id. Misma regla que
+    RegistroDiarioProduccion.calcular_totales, con la suma de detalles y la de
+    bultos como subconsultas agrupadas acotadas al mismo rango de ids.
+    """
+    R, D, C = RegistroDiarioProduccion, DetalleProduccionHora, ControlPeso
+    detalles = (
+        select(D.registro_id, func.sum(func.coalesce(D.coladas_realizadas, 0)).label('coladas'))
+        .where(D.registro_id > desde_id, D.registro_id <= hasta_id)
+        .group_by(D.registro_id)
+        .subquery()
+    )
+    pesos = (
+        select(C.registro_id, func.sum(C.peso_real_kg).label('kg'))
+        .where(C.registro_id > desde_id, C.registro_id <= hasta_id)
+        .group_by(C.registro_id)
+        .subquery()
+    )
+    # Contadores si avanzaron; si no, la suma de los detalles horarios
+    coladas = case(
+        (R.colada_final > R.colada_inicial, R.colada_final - R.colada_inicial),
+        else_=func.coalesce(detalles.c.coladas, 0),
+    )
+    piezas = coladas * func.coalesce(func.nullif(R.snapshot_cavidades, 0), 1)
+    # Bultos pesados si hay; si no, coladas × peso de tiro
+    peso_tiro = func.coalesce(R.snapshot_peso_neto_gr, 0.0) + func.coalesce(R.snapshot_peso_colada_gr, 0.0)
+    kg = case(
+        (func.coalesce(pesos.c.kg, 0.0) > 0, pesos.c.kg),
+        else_=coladas * peso_tiro / 1000.0,
+    )
+    return (
+        select(R.id, R.orden_id, R.total_coladas_calculada, R.total_piezas_buenas, R.total_kg_real,
+               coladas.label('coladas'), piezas.label('piezas'), kg.label('kg'))
+        .outerjoin(detalles, detalles.c.registro_id == R.id)
+        .outerjoin(pesos, pesos.c.registro_id == R.id)
+        .where(and_(R.id > desde_id, R.id <= hasta_id))
+        .order_by(R.id)
+    )
+
+
+def _difiere(fila):
+    if (fila.total_coladas_calculada or 0) != fila.coladas or (fila.total_piezas_buenas or 0) != fila.piezas:
+        return True
+    return not math.isclose(fila.total_kg_real or 0.0, fila.kg or 0.0, rel_tol=1e-9, abs_tol=TOLERANCIA_KG)
+
+
+def recalcular_totales_registros(chunk_size=CHUNK_DEFAULT, aplicar=True, reanudar=True):
+    """
+    Recalcula total_coladas_calculada / total_piezas_buenas / total_kg_real de
+    todos los registros diarios desde sus detalles y bultos.
+
+    Recorre los registros por keyset (id) en bloques de `chunk_size`; cada
+    bloque es un SELECT con los totales calculados en SQL y un UPDATE
+    executemany solo de las filas que cambian. El avance real de las OPs se
+    ajusta con los mismos deltas y el checkpoint avanza en la misma
+    transacción: un commit por bloque. Si el proceso se corta, la siguiente
+    ejecución sigue desde el último bloque commiteado (reanudar=False
+    empieza de cero).
+
+    Args:
+        aplicar: si es False solo reporta diferencias (dry-run, sin checkpoint)
+
+    Returns:
+        (dict, list[dict]): stats {'registros', 'corregidos', 'bloques',
+        'desde_id'} y una entrada por registro con diferencias
+    """
+    R = RegistroDiarioProduccion
+    ultimo_id = 0
+    checkpoint = None
+    if aplicar:
+        checkpoint = db.session.get(CheckpointProceso, PROCESO_TOTALES_REGISTROS)
+        if checkpoint is None:
+            checkpoint = CheckpointProceso(nombre=PROCESO_TOTALES_REGISTROS)
+            db.session.add(checkpoint)
+        if reanudar and checkpoint.estado == 'EN_CURSO' and checkpoint.ultimo_id:
+            ultimo_id = checkpoint.ultimo_id
+        else:
+            checkpoint.estado, checkpoint.ultimo_id = 'EN_CURSO', 0
+            checkpoint.procesados, checkpoint.corregidos = 0, 0
+            checkpoint.fecha_inicio = datetime.now(timezone.utc)
+        db.session.commit()
+
+    stats = {'registros': 0, 'corregidos': 0, 'bloques': 0, 'desde_id': ultimo_id}
+    diferencias = []
+    while True:
+        ids = select(R.id).where(R.id > ultimo_id).order_by(R.id).limit(chunk_size)
+        if aplicar:
+            ids = ids.with_for_update()   # nadie edita el bloque entre el SELECT y el UPDATE
+        ids = db.session.scalars(ids).all()
+        if not ids:
+            break
+
+        cambios, deltas = [], {}
+        for fila in db.session.execute(_totales_sql(ultimo_id, ids[-1])):
+            if not _difiere(fila):
+                continue
+            diferencias.append({
+                'registro_id': fila.id,
+                'orden_id': fila.orden_id,
+                'persistido': {'coladas': fila.total_coladas_calculada, 'piezas': fila.total_piezas_buenas,
+                               'kg': fila.total_kg_real},
+                'real': {'coladas': fila.coladas, 'piezas': fila.piezas, 'kg': fila.kg},
+            })
+            cambios.append({'id': fila.id, 'total_coladas_calculada': fila.coladas,
+                            'total_piezas_buenas': fila.piezas, 'total_kg_real': fila.kg})
+            d = deltas.setdefault(fila.orden_id, [0.0, 0])
+            d[0] += (fila.kg or 0.0) - (fila.total_kg_real or 0.0)
+            d[1] += (fila.coladas or 0) - (fila.total_coladas_calculada or 0)
+
+        if aplicar:
+            if cambios:
+                db.session.execute(update(R), cambios)
+                # El UPDATE por lotes no pasa por los hooks de avance ni de resumen
+                sumar_avance_ordenes(db.session, deltas)
+                marcar_resumen(db.session, registro_ids=[c['id'] for c in cambios])
+            checkpoint.ultimo_id = ids[-1]
+            checkpoint.procesados += len(ids)
+            checkpoint.corregidos += len(cambios)
+            db.session.commit()
+
+        ultimo_id = ids[-1]
+        stats['registros'] += len(ids)
+        stats['corregidos'] += len(cambios)
+        stats['bloques'] += 1
+
+    if aplicar:
+        checkpoint.estado = 'COMPLETADO'
+        db.session.commit()
+    return stats, diferencias
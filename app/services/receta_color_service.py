@@ -0,0 +1,285 @@
+"""
+Servicio de RecetaColorNormalizada (dosis de pigmento en gr/kg por color).
+
+- muestras_pigmento: regla única de qué muestras aporta un pigmento de un
+  lote (receta específica con producto + genérica sin producto).
+- reconstruir_recetas: recalcula todas las recetas desde el histórico de
+  SeColorea ⨝ LoteColor, leído en streaming por bloques, y reemplaza la
+  tabla en una sola transacción.
+- prefill_recetas: receta sugerida de uno o varios colores (específica +
+  genérica como fallback) con caché en memoria por worker, validada contra
+  ColorProducto.version_receta.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.lote import LoteColor
+from app.models.materiales import Colorante
+from app.models.producto import ColorProducto
+from app.models.recetas import SeColorea
+from app.models.receta_color import RecetaColorNormalizada, bloquear_recetas, incrementar_version_recetas
+from app.models.trabajo_aprendizaje import TrabajoAprendizaje
+
+
+CHUNK_DEFAULT = 5000
+
+# Entradas (color_id, producto_sku) que guarda la caché de prefill de cada worker
+CACHE_MAX_ENTRADAS = 4096
+
+
+def _receta_difiere(actual, previa):
+    if actual is None or previa is None:
+        return actual is not previa
+    (g, n), (g_previa, n_previa) = actual, previa
+    return n != n_previa or not math.isclose(g, g_previa, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def muestras_pigmento(color_id, colorante_id, producto_sku, meta_kg, gramos):
+    """
+    Muestras (color_id, colorante_id, producto_sku, gr_por_kg) que aporta un
+    pigmento de un lote. Sin meta, sin color o sin gramos no aporta nada.
+    """
+    meta_kg = meta_kg or 0.0
+    gramos = gramos or 0.0
+    if meta_kg <= 0 or not color_id or gramos <= 0:
+        return ()
+    gr_por_kg = gramos / meta_kg
+    # Receta específica (con producto) y genérica (sin producto)
+    if producto_sku:
+        return ((color_id, colorante_id, producto_sku, gr_por_kg),
+                (color_id, colorante_id, None, gr_por_kg))
+    return ((color_id, colorante_id, None, gr_por_kg),)
+
+
+# ---------------------------------------------------------------------------
+# RECONSTRUCCIÓN
+# ---------------------------------------------------------------------------
+
+def iterar_pigmentos_historicos(chunk_size=CHUNK_DEFAULT):
+    """
+    Genera bloques de filas (color_id, colorante_id, producto_sku, meta_kg, gramos)
+    en el mismo orden en que se aprendieron (creación de OP, lote, pigmento).
+
+    Solo columnas, con cursor del lado del servidor: la memoria no depende del
+    tamaño del histórico. Se excluyen las OPs cuyo aprendizaje aún no terminó
+    (PENDIENTE / FALLIDO): el worker las sumará cuando las procese.
+    """
+    sin_aprender = (
+        db.select(TrabajoAprendizaje.id)
+        .where(TrabajoAprendizaje.numero_op == LoteColor.numero_op,
+               TrabajoAprendizaje.estado != 'COMPLETADO')
+        .exists()
+    )
+    stmt = (
+        db.select(LoteColor.color_id, SeColorea.colorante_id, LoteColor.producto_sku_output,
+                  LoteColor.meta_kg, SeColorea.gramos)
+        .join(LoteColor, SeColorea.lote_id == LoteColor.id)
+        .join(OrdenProduccion, LoteColor.numero_op == OrdenProduccion.numero_op)
+        .where(~sin_aprender)
+        .order_by(OrdenProduccion.fecha_creacion, OrdenProduccion.numero_op, LoteColor.id, SeColorea.id)
+    )
+    resultado = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        yield from resultado.partitions()
+    finally:
+        resultado.close()
+
+
+def reconstruir_recetas(chunk_size=CHUNK_DEFAULT, aplicar=True):
+    """
+    Recalcula RecetaColorNormalizada desde cero con el histórico completo.
+
+    Cada muestra se acumula con RecetaColorNormalizada.agregar_muestras (la
+    fórmula de absorber_nueva_muestra) en el orden de aprendizaje; en memoria
+    solo vive un (promedio, n) por receta. Con aplicar=True la tabla se
+    reemplaza (DELETE + INSERT) en la misma transacción, bajo el lock de
+    recetas: los lectores ven la versión anterior hasta el commit.
+
+    Returns:
+        dict: {'pigmentos', 'muestras', 'recetas', 'nuevas', 'eliminadas', 'modificadas', 'bloques'}
+    """
+    bloquear_recetas(db.session)
+
+    acumulado = {}
+    stats = {'pigmentos': 0, 'bloques': 0}
+    for bloque in iterar_pigmentos_historicos(chunk_size):
+        stats['bloques'] += 1
+        stats['pigmentos'] += len(bloque)
+        RecetaColorNormalizada.agregar_muestras(
+            (m for fila in bloque for m in muestras_pigmento(*fila)), acumulado
+        )
+    stats['muestras'] = sum(n for _, n in acumulado.values())
+
+    previas = {
+        (c, p, sku): (g, n)
+        for c, p, sku, g, n in db.session.execute(db.select(
+            RecetaColorNormalizada.color_id, RecetaColorNormalizada.colorante_id,
+            RecetaColorNormalizada.producto_sku, RecetaColorNormalizada.gr_por_kg,
+            RecetaColorNormalizada.n_muestras,
+        ))
+    }
+    stats['recetas'] = len(acumulado)
+    stats['nuevas'] = len(acumulado.keys() - previas.keys())
+    stats['eliminadas'] = len(previas.keys() - acumulado.keys())
+    cambiadas = {
+        clave for clave in acumulado.keys() | previas.keys()
+        if _receta_difiere(acumulado.get(clave), previas.get(clave))
+    }
+    stats['modificadas'] = sum(1 for clave in cambiadas if clave in acumulado and clave in previas)
+
+    if not aplicar:
+        db.session.rollback()
+        return stats
+
+    db.session.execute(db.delete(RecetaColorNormalizada))
+    filas = [
+        {'color_id': c, 'colorante_id': p, 'producto_sku': sku, 'gr_por_kg': g, 'n_muestras': n}
+        for (c, p, sku), (g, n) in acumulado.items()
+    ]
+    for i in range(0, len(filas), chunk_size):
+        db.session.execute(db.insert(RecetaColorNormalizada), filas[i:i + chunk_size])
+    # Solo se invalidan los colores cuya receta realmente cambió
+    incrementar_version_recetas(db.session, {c for c, _, _ in cambiadas})
+    db.session.commit()
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# PREFILL CON CACHÉ
+# ---------------------------------------------------------------------------
+
+class CacheRecetas:
+    """
+    LRU acotado (color_id, producto_sku) -> (version_receta, sku_usado, pigmentos).
+
+    Vive en app.extensions, o sea uno por proceso (worker de Gunicorn). No
+    se invalida a mano: cada entrada guarda la version_receta del color con
+    que se armó y solo se usa mientras coincida con la de la base, así que
+    un upsert hecho en cualquier worker (o por el job de aprendizaje) la
+    descarta en la siguiente lectura.
+    """
+
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, version):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != version:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, entrada):
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def cache_recetas():
+    """Caché de prefill del proceso actual (una por app)."""
+    return current_app.extensions.setdefault('receta_color_cache', CacheRecetas())
+
+
+def _cargar_recetas(color_ids, producto_sku):
+    """
+    Pigmentos de varios colores en una consulta: específicas de `producto_sku`
+    primero y genéricas para los colorantes que no tengan específica.
+
+    Returns:
+        dict: color_id -> (sku_usado, ((colorante_id, nombre, gr_por_kg, n_muestras), ...))
+    """
+    R = RecetaColorNormalizada
+    filtro_sku = R.producto_sku.is_(None)
+    if producto_sku:
+        filtro_sku = db.or_(filtro_sku, R.producto_sku == producto_sku)
+    filas = db.session.execute(
+        db.select(R.color_id, R.colorante_id, Colorante.nombre, R.gr_por_kg, R.n_muestras, R.producto_sku)
+        .outerjoin(Colorante, R.colorante_id == Colorante.id)
+        .where(R.color_id.in_(color_ids), filtro_sku)
+        .order_by(R.id)
+    ).all()
+
+    especificas = {c: [] for c in color_ids}
+    genericas = {c: [] for c in color_ids}
+    for color_id, colorante_id, nombre, gr_por_kg, n_muestras, sku in filas:
+        destino = especificas if sku is not None else genericas
+        destino[color_id].append((colorante_id, nombre, gr_por_kg, n_muestras))
+
+    resultado = {}
+    for color_id in color_ids:
+        propias = especificas[color_id]
+        con_especifica = {p[0] for p in propias}
+        resultado[color_id] = (
+            producto_sku if propias else None,
+            tuple(propias + [p for p in genericas[color_id] if p[0] not in con_especifica]),
+        )
+    return resultado
+
+
+def prefill_recetas(color_ids, producto_sku=None, meta_kg=None):
+    """
+    Receta sugerida (pigmentos en gr/kg y, con meta_kg, gramos) por color.
+
+    Siempre hay una consulta a color_producto (nombre + version_receta); las
+    recetas solo se leen para los colores que no están en caché o cuya
+    versión cambió, todos juntos en una segunda consulta.
+
+    Returns:
+        (list[dict], list[int]): respuestas en el orden pedido y color_ids inexistentes
+    """
+    color_ids = list(dict.fromkeys(color_ids))
+    colores = {
+        cid: (nombre, version)
+        for cid, nombre, version in db.session.execute(
+            db.select(ColorProducto.id, ColorProducto.nombre, ColorProducto.version_receta)
+            .where(ColorProducto.id.in_(color_ids))
+        )
+    }
+
+    cache = cache_recetas()
+    entradas, faltantes = {}, []
+    for cid in colores:
+        entrada = cache.obtener((cid, producto_sku), colores[cid][1])
+        if entrada is None:
+            faltantes.append(cid)
+        else:
+            entradas[cid] = entrada
+
+    if faltantes:
+        # Se guarda con la versión leída ANTES de las recetas: si otro worker
+        # escribe entre ambas consultas, la entrada nace vieja y se recarga.
+        for cid, (sku_usado, pigmentos) in _cargar_recetas(faltantes, producto_sku).items():
+            entradas[cid] = (colores[cid][1], sku_usado, pigmentos)
+            cache.guardar((cid, producto_sku), entradas[cid])
+
+    respuestas = []
+    for cid in color_ids:
+        if cid not in colores:
+            continue
+        _, sku_usado, pigmentos = entradas[cid]
+        respuestas.append({
+            'color_id': cid,
+            'color_nombre': colores[cid][0],
+            'producto_sku': sku_usado,
+            'tiene_receta': bool(pigmentos),
+            'n_muestras_min': min((p[3] for p in pigmentos), default=0),
+            'pigmentos': [RecetaColorNormalizada.pigmento_dict(*p, meta_kg=meta_kg) for p in pigmentos],
+        })
+    return respuestas, [cid for cid in color_ids if cid not in colores]
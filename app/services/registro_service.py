@@ -0,0 +1,222 @@
+"""
+Servicio de consultas de Registros Diarios de Producción (vista global del
+dashboard, GET /api/registros).
+
+- listar_registros_paginados: keyset sobre (fecha DESC, id DESC), solo
+  columnas y con orden.activa en el mismo SELECT (JOIN), sin N+1.
+- agregar_registros: sumas / conteos agrupados por día, máquina u OP
+  calculados en SQL con los mismos filtros.
+- registros_de_orden: vista por OP (cabeceras + máquina + detalles horarios)
+  en un número fijo de consultas.
+"""
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+
+
+LIMITE_DEFAULT = 200
+LIMITE_MAXIMO = 1000
+
+AGRUPACIONES = ('dia', 'maquina', 'orden')
+
+
+# ---------------------------------------------------------------------------
+# FILTROS / CURSOR
+# ---------------------------------------------------------------------------
+
+def filtrar_registros(stmt, desde=None, hasta=None, maquina_id=None, turno=None,
+                      orden_id=None, activa=None):
+    """
+    Filtros comunes del listado y los agregados. desde / hasta son date
+    (rango inclusivo sobre fecha). `activa` filtra por el estado de la OP;
+    el Select debe traer OrdenProduccion en el JOIN.
+    """
+    R = RegistroDiarioProduccion
+    if desde is not None:
+        stmt = stmt.where(R.fecha >= desde)
+    if hasta is not None:
+        stmt = stmt.where(R.fecha <= hasta)
+    if maquina_id is not None:
+        stmt = stmt.where(R.maquina_id == maquina_id)
+    if turno:
+        stmt = stmt.where(R.turno == turno)
+    if orden_id:
+        stmt = stmt.where(R.orden_id == orden_id)
+    if activa is not None:
+        stmt = stmt.where(OrdenProduccion.activa == activa)
+    return stmt
+
+
+def codificar_cursor_registro(fecha, registro_id):
+    """Cursor opaco que apunta al último registro de una página."""
+    raw = json.dumps({'f': fecha.isoformat(), 'i': registro_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decodificar_cursor_registro(cursor):
+    """Retorna (fecha, id). Lanza ValueError si el cursor es inválido."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return date.fromisoformat(payload['f']), int(payload['i'])
+    except Exception as e:
+        raise ValueError(f'Cursor inválido: {cursor}') from e
+
+
+# ---------------------------------------------------------------------------
+# LISTADO PAGINADO
+# ---------------------------------------------------------------------------
+
+def listar_registros_paginados(limit=LIMITE_DEFAULT, cursor=None, **filtros):
+    """
+    Retorna (filas, next_cursor) para una página de la vista global.
+
+    Una sola consulta por página: columnas del registro + orden.activa por
+    LEFT JOIN (un registro sin OP cuenta como activo, como antes).
+
+    Args:
+        limit: tamaño de página (se acota a LIMITE_MAXIMO)
+        cursor: next_cursor de la página anterior (None = primera página)
+        **filtros: ver filtrar_registros
+    """
+    R = RegistroDiarioProduccion
+    limit = max(1, min(limit or LIMITE_DEFAULT, LIMITE_MAXIMO))
+
+    stmt = filtrar_registros(
+        select(R.id, R.orden_id, R.fecha, R.turno, R.maquina_id, R.total_coladas_calculada,
+               R.total_kg_real, R.total_piezas_buenas, OrdenProduccion.activa)
+        .outerjoin(OrdenProduccion, R.orden_id == OrdenProduccion.numero_op),
+        **filtros,
+    )
+    if cursor:
+        fecha_cursor, id_cursor = decodificar_cursor_registro(cursor)
+        stmt = stmt.where(db.or_(R.fecha < fecha_cursor, db.and_(R.fecha == fecha_cursor, R.id < id_cursor)))
+
+    # Una fila extra para saber si hay página siguiente
+    filas = db.session.execute(stmt.order_by(R.fecha.desc(), R.id.desc()).limit(limit + 1)).all()
+
+    pagina = [
+        {
+            "id": r.id,
+            "orden_id": r.orden_id,
+            "fecha": r.fecha.isoformat() if r.fecha else None,
+            "turno": r.turno,
+            "maquina_id": r.maquina_id,
+            "total_coladas": r.total_coladas_calculada,
+            "total_kg": r.total_kg_real,
+            "total_piezas": r.total_piezas_buenas,
+            "orden_activa": r.activa if r.activa is not None else True,
+        }
+        for r in filas[:limit]
+    ]
+    next_cursor = codificar_cursor_registro(filas[limit - 1].fecha, filas[limit - 1].id) if len(filas) > limit else None
+    return pagina, next_cursor
+
+
+# ---------------------------------------------------------------------------
+# AGREGADOS
+# ---------------------------------------------------------------------------
+
+def agregar_registros(agrupar, **filtros):
+    """
+    Totales de los registros filtrados agrupados por `agrupar`
+    ('dia' | 'maquina' | 'orden'), en un único SELECT ... GROUP BY.
+
+    Returns:
+        dict: {'aggregate', 'grupos': [{clave..., 'registros', 'total_kg',
+               'total_coladas', 'total_piezas'}], 'totales': {...}}
+    """
+    if agrupar not in AGRUPACIONES:
+        raise ValueError(f"aggregate debe ser uno de: {', '.join(AGRUPACIONES)}")
+    R = RegistroDiarioProduccion
+
+    if agrupar == 'dia':
+        claves = (R.fecha,)
+    elif agrupar == 'maquina':
+        claves = (R.maquina_id, Maquina.nombre)
+    else:
+        claves = (R.orden_id,)
+
+    stmt = (
+        select(*claves,
+               func.count(R.id).label('registros'),
+               func.coalesce(func.sum(R.total_kg_real), 0.0).label('total_kg'),
+               func.coalesce(func.sum(R.total_coladas_calculada), 0).label('total_coladas'),
+               func.coalesce(func.sum(R.total_piezas_buenas), 0).label('total_piezas'))
+        .outerjoin(OrdenProduccion, R.orden_id == OrdenProduccion.numero_op)
+    )
+    if agrupar == 'maquina':
+        stmt = stmt.outerjoin(Maquina, R.maquina_id == Maquina.id)
+    stmt = filtrar_registros(stmt, **filtros).group_by(*claves).order_by(*claves)
+
+    grupos = []
+    for fila in db.session.execute(stmt):
+        if agrupar == 'dia':
+            grupo = {'fecha': fila.fecha.isoformat() if fila.fecha else None}
+        elif agrupar == 'maquina':
+            grupo = {'maquina_id': fila.maquina_id, 'maquina': fila.nombre}
+        else:
+            grupo = {'orden_id': fila.orden_id}
+        grupo.update(registros=fila.registros, total_kg=fila.total_kg,
+                     total_coladas=fila.total_coladas, total_piezas=fila.total_piezas)
+        grupos.append(grupo)
+
+    totales = {
+        campo: sum(g[campo] for g in grupos)
+        for campo in ('registros', 'total_kg', 'total_coladas', 'total_piezas')
+    }
+    return {'aggregate': agrupar, 'grupos': grupos, 'totales': totales}
+
+
+# ---------------------------------------------------------------------------
+# VISTA POR OP
+# ---------------------------------------------------------------------------
+
+def registros_de_orden(numero_op, desde=None, hasta=None, con_detalles=True):
+    """
+    Registros de una OP (ordenados por fecha, id) con su máquina y, si se
+    piden, sus detalles horarios.
+
+    Consultas fijas sin importar cuántos turnos tenga la OP: registros +
+    máquina en un JOIN, los detalles de todos ellos en un único SELECT
+    (IN sobre la misma subconsulta, sin lista de IDs que partir en tandas)
+    y, con `hasta`, la fecha con que empieza la página siguiente.
+
+    Returns:
+        (list, dict, date | None): registros, registro_id -> [DetalleProduccionHora]
+        y siguiente_desde
+    """
+    R = RegistroDiarioProduccion
+    filtro = filtrar_registros(select(R.id).where(R.orden_id == numero_op), desde=desde, hasta=hasta)
+
+    registros = db.session.scalars(
+        filtrar_registros(
+            select(R).outerjoin(R.maquina).options(contains_eager(R.maquina))
+            .where(R.orden_id == numero_op),
+            desde=desde, hasta=hasta,
+        ).order_by(R.fecha, R.id)
+    ).all()
+
+    detalles = {}
+    if con_detalles and registros:
+        for d in db.session.scalars(
+            select(DetalleProduccionHora)
+            .where(DetalleProduccionHora.registro_id.in_(filtro))
+            .order_by(DetalleProduccionHora.registro_id, DetalleProduccionHora.id)
+        ):
+            detalles.setdefault(d.registro_id, []).append(d)
+
+    siguiente_desde = None
+    if hasta is not None:
+        siguiente_desde = db.session.execute(
+            select(func.min(R.fecha)).where(R.orden_id == numero_op, R.fecha > hasta)
+        ).scalar()
+    return registros, detalles, siguiente_desde
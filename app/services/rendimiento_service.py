@@ -0,0 +1,150 @@
+"""
+Servicio de rendimiento de máquinas (indicadores tipo OEE) desde los
+registros diarios (GET /api/dashboard/oee).
+
+Por máquina (y opcionalmente turno / día), sobre un rango de fechas:
+  - Disponibilidad: horas con producción / horas de la hoja (filas del
+    detalle horario).
+  - Rendimiento: coladas reales / coladas teóricas a snapshot_tiempo_ciclo
+    de la OP en las horas con producción.
+  - Calidad: kg pesados / kg teóricos (coladas × peso de tiro) de los
+    registros que tienen bultos.
+
+Las sumas salen de un único SELECT agrupado; los cocientes se calculan sobre
+esas sumas (nunca promediando porcentajes de registros).
+"""
+from sqlalchemy import case, func, select
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+
+
+AGRUPACIONES_RENDIMIENTO = ('maquina', 'turno', 'dia')
+
+SUMAS = (
+    'registros', 'horas_planificadas', 'horas_produccion', 'coladas_reales', 'coladas_teoricas',
+    'coladas_con_estandar', 'piezas', 'piezas_meta', 'kg_teorico', 'kg_teorico_pesado', 'kg_pesado',
+)
+
+
+def parsear_agrupacion_rendimiento(valor):
+    """'turno' / 'maquina,turno' -> ('maquina', 'turno'): siempre se agrupa por máquina."""
+    pedidas = [v.strip().lower() for v in (valor or '').split(',') if v.strip()]
+    invalidas = [a for a in pedidas if a not in AGRUPACIONES_RENDIMIENTO]
+    if invalidas:
+        raise ValueError(f"agrupar debe combinar: {', '.join(AGRUPACIONES_RENDIMIENTO)}")
+    return tuple(a for a in AGRUPACIONES_RENDIMIENTO if a == 'maquina' or a in pedidas)
+
+
+def _cociente(a, b):
+    return a / b if b else None
+
+
+def indicadores(sumas):
+    """Disponibilidad / rendimiento / calidad / OEE a partir de las sumas de un grupo."""
+    disponibilidad = _cociente(sumas['horas_produccion'], sumas['horas_planificadas'])
+    rendimiento = _cociente(sumas['coladas_con_estandar'], sumas['coladas_teoricas'])
+    calidad = _cociente(sumas['kg_pesado'], sumas['kg_teorico_pesado'])
+    oee = None
+    if None not in (disponibilidad, rendimiento, calidad):
+        # Sobre-rendimiento (ciclo estándar holgado) o sobrepeso no suman OEE
+        oee = disponibilidad * min(rendimiento, 1.0) * min(calidad, 1.0)
+    return {
+        'disponibilidad': disponibilidad,
+        'rendimiento': rendimiento,
+        'calidad': calidad,
+        'oee': oee,
+    }
+
+
+def rendimiento_maquinas(agrupar=('maquina',), desde=None, hasta=None, maquina_id=None, turno=None):
+    """
+    Indicadores por máquina (+ turno / día según `agrupar`) de los registros
+    con fecha en [desde, hasta].
+
+    Un SELECT: CTE con los registros del rango (ix_registro_maquina_fecha /
+    ix_registro_fecha_id), horas de la hoja y con producción por registro
+    desde detalle_produccion_hora (ix_detalle_registro_produccion, cubriente),
+    ciclo estándar de la OP por PK y todo agrupado.
+
+    Returns:
+        dict: {'agrupar', 'grupos': [{clave..., sumas..., ciclos, indicadores}], 'totales': {...}}
+    """
+    R, D, O = RegistroDiarioProduccion, DetalleProduccionHora, OrdenProduccion
+    filtros = []
+    if desde is not None:
+        filtros.append(R.fecha >= desde)
+    if hasta is not None:
+        filtros.append(R.fecha <= hasta)
+    if maquina_id is not None:
+        filtros.append(R.maquina_id == maquina_id)
+    if turno:
+        filtros.append(R.turno == turno)
+    objetivo = select(R.id).where(*filtros).cte('registros_rango')
+
+    horas = (
+        select(
+            D.registro_id,
+            func.count(D.id).label('planificadas'),
+            func.count(func.distinct(case((D.coladas_realizadas > 0, D.hora)))).label('produccion'),
+        )
+        .where(D.registro_id.in_(select(objetivo.c.id)))
+        .group_by(D.registro_id)
+        .subquery()
+    )
+    horas_plan = func.coalesce(horas.c.planificadas, 0)
+    horas_prod = func.coalesce(horas.c.produccion, 0)
+    coladas = func.coalesce(R.total_coladas_calculada, 0)
+    con_estandar = O.snapshot_tiempo_ciclo > 0
+    kg_teorico = coladas * (func.coalesce(R.snapshot_peso_neto_gr, 0.0)
+                            + func.coalesce(R.snapshot_peso_colada_gr, 0.0)) / 1000.0
+    pesado = R.pesaje_n > 0
+
+    columnas = {
+        'maquina': (R.maquina_id, Maquina.nombre),
+        'turno': (func.coalesce(R.turno, '').label('turno'),),
+        'dia': (R.fecha,),
+    }
+    claves = [c for a in agrupar for c in columnas[a]]
+    stmt = (
+        select(
+            *claves,
+            func.count(R.id).label('registros'),
+            func.sum(horas_plan).label('horas_planificadas'),
+            func.sum(horas_prod).label('horas_produccion'),
+            func.sum(coladas).label('coladas_reales'),
+            func.sum(case((con_estandar, horas_prod * 3600.0 / O.snapshot_tiempo_ciclo), else_=0.0)).label('coladas_teoricas'),
+            func.sum(case((con_estandar, coladas), else_=0)).label('coladas_con_estandar'),
+            func.sum(func.coalesce(R.total_piezas_buenas, 0)).label('piezas'),
+            func.sum(func.coalesce(R.cantidad_por_hora_meta, 0) * horas_plan).label('piezas_meta'),
+            func.sum(kg_teorico).label('kg_teorico'),
+            func.sum(case((pesado, kg_teorico), else_=0.0)).label('kg_teorico_pesado'),
+            func.sum(func.coalesce(R.pesaje_suma_kg, 0.0)).label('kg_pesado'),
+            func.avg(func.nullif(R.tiempo_ciclo_reportado, 0)).label('ciclo_reportado'),
+            func.avg(func.nullif(O.snapshot_tiempo_ciclo, 0)).label('ciclo_estandar'),
+        )
+        .join(objetivo, objetivo.c.id == R.id)
+        .join(Maquina, R.maquina_id == Maquina.id)
+        .outerjoin(O, R.orden_id == O.numero_op)
+        .outerjoin(horas, horas.c.registro_id == R.id)
+        .group_by(*claves)
+        .order_by(*claves)
+    )
+
+    grupos = []
+    for fila in db.session.execute(stmt):
+        grupo = {'maquina_id': fila.maquina_id, 'maquina': fila.nombre}
+        if 'turno' in agrupar:
+            grupo['turno'] = fila.turno or None
+        if 'dia' in agrupar:
+            grupo['fecha'] = fila.fecha.isoformat()
+        grupo.update({c: getattr(fila, c) or 0 for c in SUMAS})
+        grupo.update(ciclo_reportado=fila.ciclo_reportado, ciclo_estandar=fila.ciclo_estandar)
+        grupo.update(indicadores(grupo))
+        grupos.append(grupo)
+
+    totales = {c: sum(g[c] for g in grupos) for c in SUMAS}
+    totales.update(indicadores(totales))
+    return {'agrupar': list(agrupar), 'grupos': grupos, 'totales': totales}
@@ -0,0 +1,156 @@
+"""
+Servicio del resumen de producción (ResumenProduccion, día × máquina × OP × turno).
+
+- reconstruir_resumen: regenera el rollup desde los registros por ventanas
+  de fechas (backfill / verificación, `flask reconstruir-resumen`).
+- consultar_resumen: totales del tablero agrupados por día / máquina / OP /
+  turno leyendo solo el rollup (GET /api/dashboard/produccion).
+"""
+import math
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.registro import RegistroDiarioProduccion
+from app.models.resumen_produccion import ResumenProduccion, guardar_resumen, select_resumen
+
+
+DIAS_POR_BLOQUE = 31
+
+AGRUPACIONES_RESUMEN = ('dia', 'maquina', 'orden', 'turno')
+
+_ENTEROS = ('registros', 'coladas', 'piezas', 'bultos', 'horas_produccion')
+
+
+def _clave(fila):
+    return tuple(fila[c] for c in ResumenProduccion.CLAVE)
+
+
+def _iguales(a, b):
+    return all(
+        a[c] == b[c] if c in _ENTEROS else math.isclose(a[c] or 0.0, b[c] or 0.0, rel_tol=1e-9, abs_tol=1e-6)
+        for c in ResumenProduccion.VALORES
+    )
+
+
+# ---------------------------------------------------------------------------
+# RECONSTRUCCIÓN
+# ---------------------------------------------------------------------------
+
+def reconstruir_resumen(dias_por_bloque=DIAS_POR_BLOQUE, aplicar=True):
+    """
+    Recalcula el resumen completo desde registro_diario_produccion y
+    detalle_produccion_hora, una ventana de `dias_por_bloque` días por vez:
+    un SELECT agrupado, la lectura del rollup de esa ventana y solo se
+    escriben las claves nuevas / distintas / sobrantes. Un commit por ventana.
+
+    Returns:
+        dict: {'claves', 'nuevas', 'modificadas', 'eliminadas', 'bloques'}
+    """
+    R, T = RegistroDiarioProduccion, ResumenProduccion
+    # Rango de los registros y del rollup (para borrar claves huérfanas)
+    limites = [
+        f for f in (*db.session.execute(select(func.min(R.fecha), func.max(R.fecha))).one(),
+                    *db.session.execute(select(func.min(T.fecha), func.max(T.fecha))).one())
+        if f is not None
+    ]
+    stats = {'claves': 0, 'nuevas': 0, 'modificadas': 0, 'eliminadas': 0, 'bloques': 0}
+    if not limites:
+        return stats
+
+    desde, fin = min(limites), max(limites)
+    while desde <= fin:
+        hasta = desde + timedelta(days=dias_por_bloque)
+        reales = {
+            _clave(f): f
+            for f in (fila._asdict() for fila in db.session.execute(select_resumen(R.fecha >= desde, R.fecha < hasta)))
+        }
+        previas = {
+            _clave(f): f
+            for f in (fila._asdict() for fila in db.session.execute(
+                select(*(T.__table__.c[c] for c in T.CLAVE + T.VALORES)).where(T.fecha >= desde, T.fecha < hasta)
+            ))
+        }
+        nuevas = [f for k, f in reales.items() if k not in previas]
+        modificadas = [f for k, f in reales.items() if k in previas and not _iguales(f, previas[k])]
+        eliminadas = [k for k in previas if k not in reales]
+
+        stats['bloques'] += 1
+        stats['claves'] += len(reales)
+        stats['nuevas'] += len(nuevas)
+        stats['modificadas'] += len(modificadas)
+        stats['eliminadas'] += len(eliminadas)
+        if aplicar and (nuevas or modificadas or eliminadas):
+            guardar_resumen(db.session, nuevas + modificadas, eliminar=eliminadas)
+            db.session.commit()
+        desde = hasta
+
+    if not aplicar:
+        db.session.rollback()
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# TABLERO
+# ---------------------------------------------------------------------------
+
+def parsear_agrupacion(valor):
+    """'dia,maquina' -> ('dia', 'maquina'); ValueError si hay alguna desconocida."""
+    agrupar = tuple(dict.fromkeys(v.strip().lower() for v in (valor or 'dia').split(',') if v.strip()))
+    invalidas = [a for a in agrupar if a not in AGRUPACIONES_RESUMEN]
+    if invalidas or not agrupar:
+        raise ValueError(f"agrupar debe combinar: {', '.join(AGRUPACIONES_RESUMEN)}")
+    return agrupar
+
+
+def consultar_resumen(agrupar=('dia',), desde=None, hasta=None, maquina_id=None, orden_id=None, turno=None):
+    """
+    Totales del rollup agrupados por `agrupar` (combinación de 'dia',
+    'maquina', 'orden', 'turno'), en un único SELECT ... GROUP BY sobre
+    resumen_produccion: el costo depende de los días × máquinas × OPs del
+    rango, no de la cantidad de registros, detalles ni bultos.
+
+    Returns:
+        dict: {'agrupar', 'grupos': [{clave..., valores...}], 'totales': {...}}
+    """
+    T = ResumenProduccion
+    columnas = {
+        'dia': (T.fecha,),
+        'maquina': (T.maquina_id, Maquina.nombre),
+        'orden': (T.orden_id,),
+        'turno': (T.turno,),
+    }
+    claves = [c for a in agrupar for c in columnas[a]]
+    stmt = select(*claves, *(func.sum(getattr(T, c)).label(c) for c in T.VALORES))
+    if 'maquina' in agrupar:
+        stmt = stmt.outerjoin(Maquina, T.maquina_id == Maquina.id)
+    if desde is not None:
+        stmt = stmt.where(T.fecha >= desde)
+    if hasta is not None:
+        stmt = stmt.where(T.fecha <= hasta)
+    if maquina_id is not None:
+        stmt = stmt.where(T.maquina_id == maquina_id)
+    if orden_id:
+        stmt = stmt.where(T.orden_id == orden_id)
+    if turno is not None:
+        stmt = stmt.where(T.turno == turno)
+    stmt = stmt.group_by(*claves).order_by(*claves)
+
+    grupos = []
+    for fila in db.session.execute(stmt):
+        grupo = {}
+        if 'dia' in agrupar:
+            grupo['fecha'] = fila.fecha.isoformat()
+        if 'maquina' in agrupar:
+            grupo.update(maquina_id=fila.maquina_id, maquina=fila.nombre)
+        if 'orden' in agrupar:
+            grupo['orden_id'] = fila.orden_id
+        if 'turno' in agrupar:
+            grupo['turno'] = fila.turno or None
+        grupo.update({c: getattr(fila, c) or 0 for c in T.VALORES})
+        grupos.append(grupo)
+
+    totales = {c: sum(g[c] for g in grupos) for c in T.VALORES}
+    return {'agrupar': list(agrupar), 'grupos': grupos, 'totales': totales}
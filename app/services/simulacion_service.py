@@ -0,0 +1,184 @@
+"""
+Servicio de simulación (what-if) de Órdenes de Producción.
+Evalúa muchas configuraciones hipotéticas de una OP (ciclo, cavidades,
+colada, turno, meta por color) con el núcleo puro calculo_orden, sin
+crear objetos de sesión ni tocar la BD.
+"""
+import itertools
+from datetime import datetime
+
+from app.services.calculo_orden import ParametrosOrden, ParametrosLote, calcular_orden
+
+
+MAX_ESCENARIOS = 10000
+
+# Parámetros que un escenario puede sobrescribir sobre la base
+PARAMETROS_ESCENARIO = (
+    'tiempo_ciclo', 'horas_turno', 'peso_colada_gr', 'cavidades',
+    'composicion', 'metas_kg', 'fecha_inicio',
+)
+
+ORDENABLES = (
+    'peso_tiro_gr', 'peso_produccion', 'merma_pct', 'merma_natural_kg', 'horas', 'dias',
+)
+
+
+def _num(valor, nombre, entero=False):
+    if valor is None:
+        return None
+    try:
+        return int(valor) if entero else float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'{nombre} debe ser numérico, se recibió {valor!r}')
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'fecha_inicio inválida: {valor!r}')
+
+
+def _composicion(lista):
+    return [
+        (_num(s.get('cavidades', 1), 'cavidades', entero=True), _num(s.get('peso_unit_gr', 0.0), 'peso_unit_gr'))
+        for s in lista
+    ]
+
+
+def parametros_base(data):
+    """
+    ParametrosOrden desde un payload con los mismos nombres que POST /api/ordenes:
+    snapshot_composicion, snapshot_peso_colada_gr, snapshot_tiempo_ciclo,
+    snapshot_horas_turno, fecha_inicio y lotes [{meta_kg, personas, materiales: [{fraccion}]}].
+    """
+    lotes = [
+        ParametrosLote(
+            meta_kg=_num(l.get('meta_kg', 0.0), 'meta_kg'),
+            personas=_num(l.get('personas', 1), 'personas', entero=True),
+            fracciones=tuple(_num(m.get('fraccion', 0.0), 'fraccion') for m in l.get('materiales', [])),
+        )
+        for l in data.get('lotes', [])
+    ]
+    return ParametrosOrden(
+        composicion=_composicion(data.get('snapshot_composicion', [])),
+        peso_colada_gr=_num(data.get('snapshot_peso_colada_gr', 0.0), 'snapshot_peso_colada_gr'),
+        tiempo_ciclo=_num(data.get('snapshot_tiempo_ciclo', 0.0), 'snapshot_tiempo_ciclo'),
+        horas_turno=_num(data.get('snapshot_horas_turno', 24.0), 'snapshot_horas_turno'),
+        fecha_inicio=_fecha(data.get('fecha_inicio')),
+        lotes=lotes,
+    )
+
+
+def aplicar_escenario(base, cambios):
+    """Nueva ParametrosOrden = base + sobrescrituras del escenario (la base no se modifica)."""
+    desconocidos = set(cambios) - set(PARAMETROS_ESCENARIO)
+    if desconocidos:
+        raise ValueError(
+            f"Parámetro(s) de escenario desconocido(s): {', '.join(sorted(desconocidos))}. "
+            f"Permitidos: {', '.join(PARAMETROS_ESCENARIO)}"
+        )
+
+    p = ParametrosOrden(
+        composicion=base.composicion,
+        peso_colada_gr=base.peso_colada_gr,
+        tiempo_ciclo=base.tiempo_ciclo,
+        horas_turno=base.horas_turno,
+        fecha_inicio=base.fecha_inicio,
+        lotes=base.lotes,
+    )
+    if 'tiempo_ciclo' in cambios:
+        p.tiempo_ciclo = _num(cambios['tiempo_ciclo'], 'tiempo_ciclo')
+    if 'horas_turno' in cambios:
+        p.horas_turno = _num(cambios['horas_turno'], 'horas_turno')
+    if 'peso_colada_gr' in cambios:
+        p.peso_colada_gr = _num(cambios['peso_colada_gr'], 'peso_colada_gr')
+    if 'fecha_inicio' in cambios:
+        p.fecha_inicio = _fecha(cambios['fecha_inicio'])
+    if 'composicion' in cambios:
+        p.composicion = _composicion(cambios['composicion'])
+
+    if 'cavidades' in cambios:
+        # Entero: mismas cavidades para todas las piezas (ej. molde con cavidades tapadas)
+        # Lista: cavidades por pieza, en el orden de la composición
+        cav = cambios['cavidades']
+        if isinstance(cav, list):
+            if len(cav) != len(p.composicion):
+                raise ValueError('cavidades por pieza no coincide con la composición')
+            p.composicion = [(_num(c, 'cavidades', entero=True), peso) for c, (_, peso) in zip(cav, p.composicion)]
+        else:
+            c = _num(cav, 'cavidades', entero=True)
+            p.composicion = [(c, peso) for _, peso in p.composicion]
+
+    if 'metas_kg' in cambios:
+        # Una meta por color; los colores existentes conservan personas y receta
+        metas = cambios['metas_kg']
+        if not isinstance(metas, list):
+            raise ValueError('metas_kg debe ser una lista (una meta por color)')
+        p.lotes = [
+            ParametrosLote(
+                meta_kg=_num(meta, 'metas_kg'),
+                personas=base.lotes[i].personas if i < len(base.lotes) else 1,
+                fracciones=base.lotes[i].fracciones if i < len(base.lotes) else (),
+            )
+            for i, meta in enumerate(metas)
+        ]
+    return p
+
+
+def expandir_escenarios(escenarios=None, variaciones=None):
+    """
+    Lista de sobrescrituras a evaluar: los `escenarios` explícitos más el
+    producto cartesiano de `variaciones` ({parametro: [valores]}).
+    Sin ninguno de los dos se evalúa solo la base.
+    """
+    lista = list(escenarios or [])
+    if variaciones:
+        claves = list(variaciones)
+        for clave in claves:
+            if not isinstance(variaciones[clave], list) or not variaciones[clave]:
+                raise ValueError(f'variaciones.{clave} debe ser una lista no vacía')
+        total = 1
+        for clave in claves:
+            total *= len(variaciones[clave])
+        if len(lista) + total > MAX_ESCENARIOS:
+            raise ValueError(f'Máximo {MAX_ESCENARIOS} escenarios por request ({len(lista) + total} pedidos)')
+        lista.extend(dict(zip(claves, valores)) for valores in itertools.product(*(variaciones[c] for c in claves)))
+
+    if len(lista) > MAX_ESCENARIOS:
+        raise ValueError(f'Máximo {MAX_ESCENARIOS} escenarios por request ({len(lista)} pedidos)')
+    return lista or [{}]
+
+
+def simular(base_data, escenarios=None, variaciones=None, ordenar_por=None, limite=None, incluir_lotes=True):
+    """
+    Evalúa cada escenario sobre la base.
+
+    Returns:
+        list[dict]: {'indice', 'parametros', ...ResultadoOrden.to_dict()} por escenario,
+        ordenados por `ordenar_por` (ascendente) si se indica y recortados a `limite`.
+    """
+    if ordenar_por is not None and ordenar_por not in ORDENABLES:
+        raise ValueError(f"ordenar_por debe ser uno de: {', '.join(ORDENABLES)}")
+
+    base = parametros_base(base_data)
+    cambios_por_escenario = expandir_escenarios(escenarios, variaciones)
+
+    evaluados = [
+        (i, cambios, calcular_orden(aplicar_escenario(base, cambios)))
+        for i, cambios in enumerate(cambios_por_escenario)
+    ]
+    if ordenar_por:
+        evaluados.sort(key=lambda e: getattr(e[2], ordenar_por))
+    if limite:
+        evaluados = evaluados[:limite]
+
+    resultados = []
+    for i, cambios, r in evaluados:
+        fila = {'indice': i, 'parametros': cambios, **r.to_dict()}
+        if not incluir_lotes:
+            fila.pop('lotes')
+        resultados.append(fila)
+    return resultados
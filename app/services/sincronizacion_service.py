@@ -0,0 +1,527 @@
+"""
+Servicio de sincronización de pesajes desde el Scale Module.
+
+Tras un corte de red la balanza sube miles de pesajes de una vez; se
+procesan por conjunto:
+  0. Los reenvíos (mismo dispositivo_id + local_id ya guardado) se reconocen
+     con una sola búsqueda por el índice uq_control_peso_origen y se
+     reportan como ya sincronizados, sin reprocesarlos
+  1. Se validan y agrupan por (OP, máquina, fecha, turno)
+  2. Máquinas, RDPs existentes y OPs (para los RDPs faltantes) se resuelven
+     con una consulta cada uno
+  3. RDPs faltantes y ControlPeso se insertan en lote (Core executemany)
+  4. Las estadísticas de pesaje (n / suma / min / max / media / varianza) y
+     los totales se actualizan una vez por RDP afectado, sin releer sus bultos
+
+El resultado por ítem (synced / errors) es el mismo que el del proceso
+pesaje a pesaje. No hace commit.
+
+sincronizar_ndjson procesa subidas NDJSON (opcionalmente gzip) sin cargar
+el cuerpo entero: lee líneas del stream, las agrupa en bloques de tamaño
+fijo y commitea cada bloque junto con el cursor de su CargaSincronizacion.
+
+En modo async el request solo encola el lote (encolar_pesajes: trabajo +
+staging en PesajeEnCola) y el worker (`flask procesar-sync`) lo procesa con
+procesar_trabajos_sync, guardando el resultado de cada pesaje.
+"""
+import gzip
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, update, tuple_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.extensions import db
+from app.models.carga_sincronizacion import CargaSincronizacion
+from app.models.control_peso import ControlPeso
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+from app.models.trabajo_sincronizacion import TrabajoSincronizacion, PesajeEnCola
+
+
+# Estadísticas que el sync reescribe en cada RDP afectado. Se marcan todas
+# como modificadas para que el flush emita un único UPDATE executemany (el
+# ORM agrupa solo filas con el mismo SET). total_kg_real cambia con cada
+# pesaje y no se marca: el hook de avance necesita su historial real.
+COLUMNAS_PESAJE = (
+    'pesaje_n', 'pesaje_suma_kg', 'pesaje_min_kg', 'pesaje_max_kg', 'pesaje_media_kg', 'pesaje_m2',
+)
+
+# Líneas NDJSON por bloque (un commit por bloque)
+CHUNK_NDJSON_DEFAULT = 1000
+CHUNK_NDJSON_MAXIMO = 10000
+
+
+# Cola async: trabajos por pasada del worker, reintentos y retención
+LOTE_SYNC_DEFAULT = 10
+MAX_INTENTOS_SYNC = 5
+RETRASO_BASE_SEG = 30
+RETENCION_DIAS = 7
+
+
+class CursorInvalido(ValueError):
+    """El cuerpo empieza después de la última línea confirmada: quedaría un hueco."""
+
+
+def _parsear_pesaje(p, dispositivo_id):
+    """(local_id, nombre_maquina, (orden_id, fecha, turno), fila ControlPeso sin registro_id)."""
+    local_id = p['local_id']
+    if local_id is None:
+        raise ValueError('local_id requerido')
+    fecha_str = p.get('fecha_ot')
+    fecha_ot = datetime.fromisoformat(fecha_str).date() if fecha_str else datetime.now().date()
+    fila = {
+        'peso_real_kg': float(p.get('peso_kg', 0)),
+        'color_nombre': p.get('color'),
+        # Parsear fecha_hora con info de timezone si viene
+        'hora_registro': datetime.fromisoformat(p['fecha_hora']) if p.get('fecha_hora') else None,
+        'origen_id': str(local_id),
+        'dispositivo_id': str(p.get('dispositivo_id') or dispositivo_id or ''),
+    }
+    return local_id, (p.get('maquina') or '').upper(), (p.get('nro_op'), fecha_ot, p.get('turno', 'DIURNO')), fila
+
+
+def _fila_registro(orden, maquina_id, fecha, turno):
+    """RDP on-the-fly con snapshots desde los campos cacheados de la orden."""
+    return {
+        'orden_id': orden.numero_op,
+        'maquina_id': maquina_id,
+        'fecha': fecha,
+        'turno': turno,
+        'hora_inicio': "00:00",
+        'colada_inicial': 0,
+        'colada_final': 0,
+        'snapshot_cavidades': orden.calculo_cavidades_totales or 1,
+        'snapshot_peso_neto_gr': orden.calculo_peso_neto_golpe or 0.0,
+        'snapshot_peso_colada_gr': orden.snapshot_peso_colada_gr or 0.0,
+        'tiempo_ciclo_reportado': orden.snapshot_tiempo_ciclo or 0.0,
+    }
+
+
+def _ids_registros(grupos):
+    """clave -> id del RDP existente (el más antiguo si hubiera duplicados)."""
+    R = RegistroDiarioProduccion
+    ids = {}
+    for rdp_id, *clave in db.session.execute(
+        select(R.id, R.orden_id, R.maquina_id, R.fecha, R.turno)
+        .where(
+            R.orden_id.in_({c[0] for c in grupos}),
+            R.maquina_id.in_({c[1] for c in grupos}),
+            R.fecha.in_({c[2] for c in grupos}),
+        )
+        .order_by(R.id)
+    ):
+        clave = tuple(clave)
+        if clave in grupos:
+            ids.setdefault(clave, rdp_id)
+    return ids
+
+
+def _ya_sincronizados(origenes):
+    """Subconjunto de (dispositivo_id, origen_id) que ya tiene un ControlPeso."""
+    if not origenes:
+        return set()
+    return set(db.session.execute(
+        select(ControlPeso.dispositivo_id, ControlPeso.origen_id)
+        .where(tuple_(ControlPeso.dispositivo_id, ControlPeso.origen_id).in_(origenes))
+    ).all())
+
+
+def _insertar_controles(filas):
+    """
+    INSERT por lote de ControlPeso. En PostgreSQL / SQLite un reenvío que
+    llega en paralelo (y ganó la carrera) se descarta por el índice único
+    en vez de abortar el lote.
+
+    Returns:
+        list: (registro_id, peso_real_kg) de las filas realmente insertadas
+    """
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto not in ('postgresql', 'sqlite'):
+        db.session.execute(insert(ControlPeso), filas)
+        return [(f['registro_id'], f['peso_real_kg']) for f in filas]
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    return db.session.execute(
+        insert_dialecto(ControlPeso)
+        .on_conflict_do_nothing(
+            index_elements=['dispositivo_id', 'origen_id'],
+            index_where=ControlPeso.origen_id.isnot(None),
+        )
+        .returning(ControlPeso.registro_id, ControlPeso.peso_real_kg),
+        filas,
+    ).all()
+
+
+def sincronizar_pesajes(pesajes, dispositivo_id=None):
+    """
+    Inserta un lote de pesajes como ControlPeso, creando los RDPs que falten.
+    Idempotente: reenviar el lote (o parte) no duplica bultos.
+
+    dispositivo_id: identificador del cliente para todo el lote; cada pesaje
+    puede traer el suyo.
+
+    Returns:
+        (list, list): synced [{'local_id'} | {'local_id', 'ya_sincronizado': True}]
+        y errors [{'local_id', 'error'}], ambos en el orden del payload
+    """
+    return _separar(_sincronizar(pesajes, dispositivo_id))
+
+
+def _sincronizar(pesajes, dispositivo_id):
+    """Como sincronizar_pesajes, pero con un resultado por posición del payload."""
+    resultados = [None] * len(pesajes)   # índice -> dict de synced o de error
+    parseados = []                       # (índice, local_id, nombre_maquina, clave, fila)
+    for i, p in enumerate(pesajes):
+        try:
+            parseados.append((i, *_parsear_pesaje(p, dispositivo_id)))
+        except Exception as e:
+            resultados[i] = {'local_id': p.get('local_id') if isinstance(p, dict) else None, 'error': str(e)}
+
+    # ---- 0. Reenvíos: una búsqueda por índice para todo el lote ------------
+    origenes = {(fila['dispositivo_id'], fila['origen_id']) for *_, fila in parseados}
+    vistos = _ya_sincronizados(origenes)
+    validos = []
+    for item in parseados:
+        i, local_id, fila = item[0], item[1], item[-1]
+        origen = (fila['dispositivo_id'], fila['origen_id'])
+        if origen in vistos:
+            resultados[i] = {'local_id': local_id, 'ya_sincronizado': True}
+            continue
+        vistos.add(origen)  # repetido dentro del mismo lote: cuenta el primero
+        validos.append(item)
+
+    # ---- 1. Máquinas --------------------------------------------------------
+    nombres = {nombre for _, _, nombre, _, _ in validos}
+    maquinas = dict(db.session.execute(
+        select(func.upper(Maquina.nombre), Maquina.id).where(func.upper(Maquina.nombre).in_(nombres))
+    ).all()) if nombres else {}
+
+    grupos = {}   # (orden_id, maquina_id, fecha, turno) -> [(índice, local_id, fila)]
+    for i, local_id, nombre, (orden_id, fecha, turno), fila in validos:
+        maquina_id = maquinas.get(nombre)
+        if not maquina_id:
+            resultados[i] = {'local_id': local_id, 'error': f"Maquina {nombre} no encontrada en Central"}
+            continue
+        grupos.setdefault((orden_id, maquina_id, fecha, turno), []).append((i, local_id, fila))
+    if not grupos:
+        return resultados
+
+    # ---- 2. RDPs existentes ------------------------------------------------
+    registros = _ids_registros(grupos)
+
+    # ---- 3. RDPs faltantes (INSERT por lote y se releen sus IDs) ------------
+    faltantes = [clave for clave in grupos if clave not in registros]
+    if faltantes:
+        ordenes = {
+            o.numero_op: o
+            for o in db.session.scalars(
+                select(OrdenProduccion).where(OrdenProduccion.numero_op.in_({c[0] for c in faltantes if c[0]}))
+            )
+        }
+        filas = []
+        for clave in faltantes:
+            orden = ordenes.get(clave[0])
+            if orden is None:
+                for i, local_id, _ in grupos.pop(clave):
+                    resultados[i] = {'local_id': local_id, 'error': f"Orden {clave[0]} no encontrada"}
+                continue
+            filas.append(_fila_registro(orden, *clave[1:]))
+        if filas:
+            db.session.execute(insert(RegistroDiarioProduccion), filas)
+            registros = _ids_registros(grupos)
+
+    # ---- 4. ControlPeso en lote ---------------------------------------------
+    filas = []
+    for clave, items in grupos.items():
+        for i, local_id, fila in items:
+            filas.append({**fila, 'registro_id': registros[clave]})
+            resultados[i] = {'local_id': local_id}
+    if not filas:
+        return resultados
+    insertados = {}
+    for registro_id, peso in _insertar_controles(filas):
+        insertados.setdefault(registro_id, []).append(peso)
+
+    # ---- 5. Estadísticas de pesaje y totales, una vez por RDP ---------------
+    # Se cargan por el ORM (bloqueados) para que el hook de avance vea el delta de kg
+    for rdp in db.session.scalars(
+        select(RegistroDiarioProduccion)
+        .where(RegistroDiarioProduccion.id.in_(insertados))
+        .options(selectinload(RegistroDiarioProduccion.detalles))
+        .with_for_update(of=RegistroDiarioProduccion)
+        .execution_options(populate_existing=True)   # estadísticas leídas bajo el lock
+    ):
+        # Las filas nuevas no pasaron por el ORM: la colección quedó vieja
+        db.session.expire(rdp, ['controles_peso'])
+        rdp.absorber_pesos(insertados[rdp.id])
+        rdp.actualizar_totales()
+        for columna in COLUMNAS_PESAJE:
+            flag_modified(rdp, columna)
+
+    # El INSERT por lote no pasa por el flush: la versión de las OPs se sube aquí
+    db.session.execute(
+        update(OrdenProduccion)
+        .where(OrdenProduccion.numero_op.in_({clave[0] for clave in grupos}))
+        .values(version=OrdenProduccion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return resultados
+
+
+def _separar(resultados):
+    synced = [r for r in resultados if r is not None and 'error' not in r]
+    errors = [r for r in resultados if r is not None and 'error' in r]
+    return synced, errors
+
+
+def _estado_resultado(resultado):
+    if 'error' in resultado:
+        return 'ERROR'
+    return 'YA_SINCRONIZADO' if resultado.get('ya_sincronizado') else 'SINCRONIZADO'
+
+
+# ---------------------------------------------------------------------------
+# SUBIDA NDJSON EN STREAMING
+# ---------------------------------------------------------------------------
+
+def leer_lineas(stream, comprimido=False):
+    """Líneas (bytes) del cuerpo; con gzip se descomprime a medida que se lee."""
+    if comprimido:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    yield from stream
+
+
+def sincronizar_ndjson(lineas, upload_id=None, dispositivo_id=None, cursor=0,
+                       chunk_size=CHUNK_NDJSON_DEFAULT):
+    """
+    Sincroniza un pesaje por línea (mismo formato que los ítems de `pesajes`)
+    en bloques de `chunk_size` líneas, con un commit por bloque.
+
+    `cursor` es el número de línea (base 0) del archivo completo con el que
+    empieza este cuerpo. Con upload_id el progreso queda en
+    CargaSincronizacion: al reanudar, las líneas ya confirmadas que vengan
+    de nuevo en el cuerpo se saltean sin procesarlas. Sin upload_id el
+    cursor de la respuesta es igual de válido, pero lo guarda el cliente.
+
+    Si el stream se corta o el gzip está dañado, el bloque a medio leer se
+    descarta; lo confirmado hasta ahí queda commiteado y `cursor` indica
+    desde qué línea reenviar.
+
+    Raises:
+        CursorInvalido: si `cursor` es mayor que las líneas ya confirmadas
+
+    Returns:
+        dict: {'cursor', 'completo', 'synced', 'ya_sincronizados', 'errors',
+               'bloques', 'error_stream', 'carga'}
+    """
+    carga = None
+    if upload_id:
+        carga = db.session.get(CargaSincronizacion, upload_id)
+        if carga is None:
+            carga = CargaSincronizacion(id=upload_id, dispositivo_id=dispositivo_id or '',
+                                        lineas_confirmadas=0, sincronizados=0,
+                                        ya_sincronizados=0, errores=0)
+            db.session.add(carga)
+            db.session.commit()   # visible en /sync/cargas/<id> desde el primer bloque
+        dispositivo_id = dispositivo_id or carga.dispositivo_id or None
+        if cursor > carga.lineas_confirmadas:
+            raise CursorInvalido(
+                f"cursor {cursor} mayor que las líneas confirmadas ({carga.lineas_confirmadas})"
+            )
+    saltar = carga.lineas_confirmadas - cursor if carga is not None else 0
+
+    resumen = {'cursor': cursor + saltar, 'completo': False, 'synced': 0, 'ya_sincronizados': 0,
+               'errors': [], 'bloques': 0, 'error_stream': None}
+    pesajes, fallidas = [], []   # bloque actual: pesajes parseados y errores de parseo
+
+    def _confirmar(fin):
+        synced, errors = sincronizar_pesajes(pesajes, dispositivo_id)
+        errors = fallidas + errors
+        repetidos = sum(1 for s in synced if s.get('ya_sincronizado'))
+        if carga is not None:
+            carga.estado = 'EN_CURSO'
+            carga.lineas_confirmadas = fin
+            carga.sincronizados += len(synced) - repetidos
+            carga.ya_sincronizados += repetidos
+            carga.errores += len(errors)
+        db.session.commit()
+        resumen['cursor'] = fin
+        resumen['bloques'] += 1
+        resumen['synced'] += len(synced) - repetidos
+        resumen['ya_sincronizados'] += repetidos
+        resumen['errors'].extend(errors)
+        pesajes.clear()
+        fallidas.clear()
+
+    numero = cursor
+    leidas = 0   # líneas del bloque actual (incluye vacías y fallidas)
+    try:
+        for linea in lineas:
+            numero += 1
+            if numero <= cursor + saltar:
+                continue
+            leidas += 1
+            linea = linea.strip()
+            if linea:
+                try:
+                    pesaje = json.loads(linea)
+                    if not isinstance(pesaje, dict):
+                        raise ValueError('se esperaba un objeto JSON')
+                    pesajes.append(pesaje)
+                except ValueError as e:
+                    fallidas.append({'local_id': None, 'linea': numero, 'error': f"Línea inválida: {e}"})
+            if leidas == chunk_size:
+                _confirmar(numero)
+                leidas = 0
+    except (EOFError, OSError, zlib.error) as e:
+        db.session.rollback()
+        resumen['error_stream'] = str(e) or e.__class__.__name__
+    else:
+        if leidas:
+            _confirmar(numero)
+        resumen['completo'] = True
+        if carga is not None:
+            carga.estado = 'COMPLETADA'
+            db.session.commit()
+
+    resumen['carga'] = carga.to_dict() if carga is not None else None
+    return resumen
+
+
+# ---------------------------------------------------------------------------
+# MODO ASYNC (staging + worker)
+# ---------------------------------------------------------------------------
+
+def encolar_pesajes(pesajes, dispositivo_id=None):
+    """
+    Acepta un lote sin procesarlo: un TrabajoSincronizacion y un PesajeEnCola
+    por pesaje (INSERT multi-fila). No hace commit.
+    """
+    trabajo = TrabajoSincronizacion(dispositivo_id=dispositivo_id, estado='PENDIENTE', intentos=0,
+                                    total_pesajes=len(pesajes))
+    db.session.add(trabajo)
+    db.session.flush()
+    if pesajes:
+        db.session.execute(insert(PesajeEnCola), [
+            {'trabajo_id': trabajo.id, 'posicion': i, 'payload': json.dumps(p)}
+            for i, p in enumerate(pesajes)
+        ])
+    return trabajo
+
+
+def _procesar_trabajo(trabajo, ahora):
+    filas = db.session.execute(
+        select(PesajeEnCola.id, PesajeEnCola.payload)
+        .where(PesajeEnCola.trabajo_id == trabajo.id)
+        .order_by(PesajeEnCola.posicion)
+    ).all()
+    resultados = _sincronizar([json.loads(payload) for _, payload in filas], trabajo.dispositivo_id)
+
+    # Resultado por ítem: un UPDATE executemany por clave primaria
+    db.session.execute(update(PesajeEnCola), [
+        {'id': pesaje_id, 'resultado': _estado_resultado(r), 'error': r.get('error')}
+        for (pesaje_id, _), r in zip(filas, resultados)
+    ])
+    estados = [_estado_resultado(r) for r in resultados]
+    trabajo.sincronizados = estados.count('SINCRONIZADO')
+    trabajo.ya_sincronizados = estados.count('YA_SINCRONIZADO')
+    trabajo.errores = estados.count('ERROR')
+    trabajo.estado = 'COMPLETADO'
+    trabajo.intentos = (trabajo.intentos or 0) + 1
+    trabajo.ultimo_error = None
+    trabajo.fecha_procesado = ahora
+
+
+def _registrar_fallo(trabajo, error, ahora):
+    trabajo.intentos = (trabajo.intentos or 0) + 1
+    trabajo.ultimo_error = str(error)[:2000]
+    if trabajo.intentos >= MAX_INTENTOS_SYNC:
+        trabajo.estado = 'FALLIDO'
+    else:
+        trabajo.proximo_intento = ahora + timedelta(seconds=RETRASO_BASE_SEG * 2 ** (trabajo.intentos - 1))
+
+
+def procesar_trabajos_sync(lote=LOTE_SYNC_DEFAULT, ahora=None):
+    """
+    Procesa hasta `lote` trabajos pendientes vencidos, uno por transacción
+    (commit por trabajo: el cliente ve cada resultado en cuanto está).
+
+    En PostgreSQL cada trabajo se toma con SKIP LOCKED, así que varios
+    workers pueden correr en paralelo. Un error inesperado (no los errores
+    por pesaje, que quedan en cada ítem) revierte el trabajo completo y lo
+    reprograma con backoff exponencial hasta MAX_INTENTOS_SYNC.
+
+    Returns:
+        dict: {'procesados', 'completados', 'reintentar', 'fallidos', 'pesajes'}
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    stats = {'procesados': 0, 'completados': 0, 'reintentar': 0, 'fallidos': 0, 'pesajes': 0}
+    for _ in range(lote):
+        trabajo = db.session.scalars(
+            select(TrabajoSincronizacion)
+            .where(TrabajoSincronizacion.estado == 'PENDIENTE', TrabajoSincronizacion.proximo_intento <= ahora)
+            .order_by(TrabajoSincronizacion.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if trabajo is None:
+            db.session.commit()
+            break
+        stats['procesados'] += 1
+        try:
+            with db.session.begin_nested():
+                _procesar_trabajo(trabajo, ahora)
+            stats['completados'] += 1
+            stats['pesajes'] += trabajo.total_pesajes
+        except Exception as e:
+            _registrar_fallo(trabajo, e, ahora)
+            stats['fallidos' if trabajo.estado == 'FALLIDO' else 'reintentar'] += 1
+        db.session.commit()
+    return stats
+
+
+def estado_trabajo_sync(trabajo_id):
+    """
+    Estado del trabajo y resultado de cada pesaje en el orden del lote:
+    {'local_id', 'estado': PENDIENTE | SINCRONIZADO | YA_SINCRONIZADO | ERROR[, 'error']}.
+    None si el trabajo no existe.
+    """
+    trabajo = db.session.get(TrabajoSincronizacion, trabajo_id)
+    if trabajo is None:
+        return None
+    items = []
+    for payload, resultado, error in db.session.execute(
+        select(PesajeEnCola.payload, PesajeEnCola.resultado, PesajeEnCola.error)
+        .where(PesajeEnCola.trabajo_id == trabajo_id)
+        .order_by(PesajeEnCola.posicion)
+    ):
+        pesaje = json.loads(payload)
+        item = {'local_id': pesaje.get('local_id') if isinstance(pesaje, dict) else None,
+                'estado': resultado or 'PENDIENTE'}
+        if error:
+            item['error'] = error
+        items.append(item)
+    return {**trabajo.to_dict(), 'pesajes': items}
+
+
+def purgar_trabajos_sync(dias=RETENCION_DIAS, ahora=None):
+    """Borra los trabajos terminados hace más de `dias` días (y su staging). Hace commit."""
+    limite = (ahora or datetime.now(timezone.utc)) - timedelta(days=dias)
+    viejos = (
+        select(TrabajoSincronizacion.id)
+        .where(TrabajoSincronizacion.estado.in_(('COMPLETADO', 'FALLIDO')),
+               db.func.coalesce(TrabajoSincronizacion.fecha_procesado,
+                                TrabajoSincronizacion.fecha_creacion) < limite)
+    )
+    db.session.execute(db.delete(PesajeEnCola).where(PesajeEnCola.trabajo_id.in_(viejos)))
+    borrados = db.session.execute(
+        db.delete(TrabajoSincronizacion).where(TrabajoSincronizacion.id.in_(viejos))
+    ).rowcount
+    db.session.commit()
+    return borrados
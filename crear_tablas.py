@@ -288,6 +288,8 @@ def inicializar_bd():
                 color_nombre = col,
                 hora_registro= datetime.now(timezone.utc)
             ))
+        # Estadísticas de pesaje del registro, como al agregar bultos por la API
+        reg_header.absorber_pesos([peso for peso, _ in bultos_sample])
 
         db.session.commit()
 
@@ -0,0 +1,41 @@
+"""
+Migración: Columnas de avance real persistido en OrdenProduccion
+- calculo_avance_real_kg:      SUM(registro_diario_produccion.total_kg_real)
+- calculo_avance_real_coladas: SUM(registro_diario_produccion.total_coladas_calculada)
+
+Agrega las columnas y las rellena desde los registros existentes.
+Uso: python migrate_avance_real.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: avance real persistido en orden_produccion...")
+
+        try:
+            db.session.execute(text("""
+                ALTER TABLE orden_produccion
+                ADD COLUMN IF NOT EXISTS calculo_avance_real_kg DOUBLE PRECISION DEFAULT 0.0
+            """))
+            db.session.execute(text("""
+                ALTER TABLE orden_produccion
+                ADD COLUMN IF NOT EXISTS calculo_avance_real_coladas INTEGER DEFAULT 0
+            """))
+            db.session.commit()
+            print("✅ Columnas calculo_avance_real_* agregadas (o ya existían)")
+
+            # Backfill desde los registros diarios
+            from app.services.produccion_service import reconstruir_avance_ordenes
+            diferencias = reconstruir_avance_ordenes(aplicar=True)
+            print(f"✅ Avance real inicializado en {len(diferencias)} órdenes")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,39 @@
+"""
+Migración: Tabla carga_sincronizacion (cursor reanudable de las subidas
+NDJSON / gzip de pesajes en POST /api/sync/pesajes).
+
+Uso: python migrate_cargas_sincronizacion.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: tabla carga_sincronizacion...")
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS carga_sincronizacion (
+                    id VARCHAR(64) PRIMARY KEY,
+                    dispositivo_id VARCHAR(64) NOT NULL DEFAULT '',
+                    estado VARCHAR(20) NOT NULL DEFAULT 'EN_CURSO',
+                    lineas_confirmadas INTEGER NOT NULL DEFAULT 0,
+                    sincronizados INTEGER NOT NULL DEFAULT 0,
+                    ya_sincronizados INTEGER NOT NULL DEFAULT 0,
+                    errores INTEGER NOT NULL DEFAULT 0,
+                    fecha_creacion TIMESTAMP,
+                    fecha_actualizacion TIMESTAMP
+                )
+            """))
+            db.session.commit()
+            print("✅ Tabla 'carga_sincronizacion' creada o ya existe")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
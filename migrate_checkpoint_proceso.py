@@ -0,0 +1,37 @@
+"""
+Migración: Tabla checkpoint_proceso (progreso reanudable de los procesos por
+bloques, ej. `flask recalcular-registros`).
+
+Uso: python migrate_checkpoint_proceso.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: tabla checkpoint_proceso...")
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS checkpoint_proceso (
+                    nombre VARCHAR(64) PRIMARY KEY,
+                    estado VARCHAR(20) NOT NULL DEFAULT 'EN_CURSO',
+                    ultimo_id INTEGER NOT NULL DEFAULT 0,
+                    procesados INTEGER NOT NULL DEFAULT 0,
+                    corregidos INTEGER NOT NULL DEFAULT 0,
+                    fecha_inicio TIMESTAMP,
+                    fecha_actualizacion TIMESTAMP
+                )
+            """))
+            db.session.commit()
+            print("✅ Tabla 'checkpoint_proceso' creada o ya existe")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
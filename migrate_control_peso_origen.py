@@ -0,0 +1,46 @@
+"""
+Migración: Origen del pesaje en control_peso (sync idempotente)
+- origen_id: ID local del pesaje en el Scale Module / app
+- dispositivo_id: dispositivo que lo registró ('' si no se identifica)
+- uq_control_peso_origen: índice único parcial (dispositivo_id, origen_id);
+  los lotes reenviados se reconocen con una sola búsqueda por este índice.
+
+Los ControlPeso previos quedan con origen_id NULL (no participan del índice).
+
+Uso: python migrate_control_peso_origen.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: origen en control_peso...")
+
+        try:
+            db.session.execute(text("""
+                ALTER TABLE control_peso
+                ADD COLUMN IF NOT EXISTS origen_id VARCHAR(64)
+            """))
+            db.session.execute(text("""
+                ALTER TABLE control_peso
+                ADD COLUMN IF NOT EXISTS dispositivo_id VARCHAR(64) NOT NULL DEFAULT ''
+            """))
+            print("✅ Columnas origen_id / dispositivo_id agregadas (o ya existían)")
+
+            db.session.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_control_peso_origen
+                ON control_peso (dispositivo_id, origen_id)
+                WHERE origen_id IS NOT NULL
+            """))
+            db.session.commit()
+            print("✅ Índice uq_control_peso_origen creado (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,49 @@
+"""
+Migración: Estadísticas de pesaje en RegistroDiarioProduccion
+- pesaje_n / pesaje_suma_kg / pesaje_min_kg / pesaje_max_kg
+- pesaje_media_kg / pesaje_m2 (Welford: Σ (x - media)²)
+
+Se mantienen en línea al agregar / borrar bultos y al sincronizar pesajes.
+Agrega las columnas y las rellena desde control_peso (solo pesaje_*: los
+totales de los registros no se tocan).
+Uso: python migrate_estadisticas_pesaje.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+COLUMNAS = (
+    "pesaje_n INTEGER NOT NULL DEFAULT 0",
+    "pesaje_suma_kg DOUBLE PRECISION NOT NULL DEFAULT 0.0",
+    "pesaje_min_kg DOUBLE PRECISION",
+    "pesaje_max_kg DOUBLE PRECISION",
+    "pesaje_media_kg DOUBLE PRECISION NOT NULL DEFAULT 0.0",
+    "pesaje_m2 DOUBLE PRECISION NOT NULL DEFAULT 0.0",
+)
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: estadísticas de pesaje en registro_diario_produccion...")
+
+        try:
+            for columna in COLUMNAS:
+                db.session.execute(text(f"""
+                    ALTER TABLE registro_diario_produccion
+                    ADD COLUMN IF NOT EXISTS {columna}
+                """))
+            db.session.commit()
+            print("✅ Columnas pesaje_* agregadas (o ya existían)")
+
+            # Backfill desde control_peso (total_kg_real queda como estaba)
+            from app.services.produccion_service import reconstruir_estadisticas_pesaje
+            diferencias = reconstruir_estadisticas_pesaje(aplicar=True)
+            print(f"✅ Estadísticas de pesaje inicializadas en {len(diferencias)} registros")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,30 @@
+"""
+Migración: Índice (maquina_id, activa) en orden_produccion para la carga
+de colas por máquina de GET /api/programacion/timeline.
+
+Uso: python migrate_indice_programacion.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: índice ix_orden_maquina_activa...")
+
+        try:
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_orden_maquina_activa
+                ON orden_produccion (maquina_id, activa)
+            """))
+            db.session.commit()
+            print("✅ Índice ix_orden_maquina_activa creado (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,30 @@
+"""
+Migración: Índice compuesto para la paginación por cursor de GET /api/ordenes
+(fecha_creacion, numero_op) en orden_produccion.
+
+Uso: python migrate_indices_ordenes.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: índice ix_orden_fecha_creacion_op...")
+
+        try:
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_orden_fecha_creacion_op
+                ON orden_produccion (fecha_creacion, numero_op)
+            """))
+            db.session.commit()
+            print("✅ Índice ix_orden_fecha_creacion_op creado (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
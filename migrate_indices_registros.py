@@ -0,0 +1,39 @@
+"""
+Migración: Índices de las vistas de registros:
+- GET /api/registros: (fecha, id) para la paginación por cursor y
+  (maquina_id, fecha) para el filtro por máquina en registro_diario_produccion
+- GET /api/ordenes/<op>/registros: registro_id en detalle_produccion_hora
+  (cubriente con coladas_realizadas y hora, ver migrate_indices_rendimiento.py)
+
+Uso: python migrate_indices_registros.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+INDICES = {
+    'ix_registro_fecha_id': 'registro_diario_produccion (fecha, id)',
+    'ix_registro_maquina_fecha': 'registro_diario_produccion (maquina_id, fecha)',
+    'ix_detalle_registro_produccion': 'detalle_produccion_hora (registro_id, coladas_realizadas, hora)',
+}
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: índices de registros...")
+
+        try:
+            for nombre, columnas in INDICES.items():
+                db.session.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {nombre} ON {columnas}"
+                ))
+                print(f"✅ Índice {nombre} creado (o ya existía)")
+            db.session.commit()
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
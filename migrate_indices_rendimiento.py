@@ -0,0 +1,33 @@
+"""
+Migración: Índice cubriente de detalle_produccion_hora para GET /api/dashboard/oee
+(horas de la hoja y con producción por registro sin leer la tabla).
+Reemplaza a ix_detalle_registro_id, que queda como prefijo redundante.
+
+Uso: python migrate_indices_rendimiento.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: índices de rendimiento de máquinas...")
+
+        try:
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_detalle_registro_produccion "
+                "ON detalle_produccion_hora (registro_id, coladas_realizadas, hora)"
+            ))
+            print("✅ Índice ix_detalle_registro_produccion creado (o ya existía)")
+            db.session.execute(text("DROP INDEX IF EXISTS ix_detalle_registro_id"))
+            print("✅ Índice redundante ix_detalle_registro_id eliminado")
+            db.session.commit()
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
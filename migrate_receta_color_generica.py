@@ -0,0 +1,63 @@
+"""
+Migración: Índice único parcial para recetas genéricas (producto_sku NULL)
+en receta_color_normalizada. Es el target de ON CONFLICT de
+RecetaColorNormalizada.absorber_muestras.
+
+Antes de crearlo fusiona las genéricas duplicadas (NULL no choca en el
+UNIQUE original) combinando sus promedios ponderados por n_muestras.
+
+Uso: python migrate_receta_color_generica.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: índice uq_receta_color_generica...")
+
+        try:
+            duplicadas = db.session.execute(text("""
+                SELECT color_id, colorante_id
+                FROM receta_color_normalizada
+                WHERE producto_sku IS NULL
+                GROUP BY color_id, colorante_id
+                HAVING COUNT(*) > 1
+            """)).all()
+
+            for color_id, colorante_id in duplicadas:
+                filas = db.session.execute(text("""
+                    SELECT id, gr_por_kg, n_muestras FROM receta_color_normalizada
+                    WHERE producto_sku IS NULL AND color_id = :c AND colorante_id = :p
+                    ORDER BY id
+                """), {'c': color_id, 'p': colorante_id}).all()
+
+                n_total = sum(f.n_muestras or 0 for f in filas)
+                promedio = (
+                    sum(f.gr_por_kg * (f.n_muestras or 0) for f in filas) / n_total
+                    if n_total else filas[0].gr_por_kg
+                )
+                db.session.execute(text("""
+                    UPDATE receta_color_normalizada SET gr_por_kg = :g, n_muestras = :n WHERE id = :id
+                """), {'g': promedio, 'n': n_total, 'id': filas[0].id})
+                db.session.execute(text("""
+                    DELETE FROM receta_color_normalizada WHERE id IN :ids
+                """).bindparams(db.bindparam('ids', expanding=True)), {'ids': [f.id for f in filas[1:]]})
+            print(f"✅ {len(duplicadas)} recetas genéricas duplicadas fusionadas")
+
+            db.session.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_receta_color_generica
+                ON receta_color_normalizada (color_id, colorante_id)
+                WHERE producto_sku IS NULL
+            """))
+            db.session.commit()
+            print("✅ Índice uq_receta_color_generica creado (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
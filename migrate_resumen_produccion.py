@@ -0,0 +1,53 @@
+"""
+Migración: Tabla resumen_produccion (rollup día × máquina × OP × turno para
+GET /api/dashboard/produccion) y su carga inicial desde los registros.
+
+Uso: python migrate_resumen_produccion.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: tabla resumen_produccion...")
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS resumen_produccion (
+                    fecha DATE NOT NULL,
+                    maquina_id INTEGER NOT NULL REFERENCES maquina(id),
+                    orden_id VARCHAR(20) NOT NULL REFERENCES orden_produccion(numero_op),
+                    turno VARCHAR(20) NOT NULL DEFAULT '',
+                    registros INTEGER NOT NULL DEFAULT 0,
+                    coladas INTEGER NOT NULL DEFAULT 0,
+                    piezas INTEGER NOT NULL DEFAULT 0,
+                    kg_teorico FLOAT NOT NULL DEFAULT 0,
+                    kg_pesado FLOAT NOT NULL DEFAULT 0,
+                    bultos INTEGER NOT NULL DEFAULT 0,
+                    horas_produccion INTEGER NOT NULL DEFAULT 0,
+                    fecha_actualizacion TIMESTAMP,
+                    PRIMARY KEY (fecha, maquina_id, orden_id, turno)
+                )
+            """))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_resumen_maquina_fecha ON resumen_produccion (maquina_id, fecha)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_resumen_orden_fecha ON resumen_produccion (orden_id, fecha)"
+            ))
+            db.session.commit()
+            print("✅ Tabla 'resumen_produccion' creada o ya existe")
+
+            from app.services.resumen_service import reconstruir_resumen
+            stats = reconstruir_resumen()
+            print(f"✅ Resumen cargado: {stats['claves']} claves en {stats['bloques']} bloques")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,47 @@
+"""
+Migración: Tabla trabajo_aprendizaje (cola durable del poblamiento dinámico
+de catálogo al crear OPs). La procesa `flask procesar-aprendizaje`.
+
+Uso: python migrate_trabajos_aprendizaje.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: tabla trabajo_aprendizaje...")
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS trabajo_aprendizaje (
+                    id SERIAL PRIMARY KEY,
+                    numero_op VARCHAR(20) NOT NULL
+                        REFERENCES orden_produccion(numero_op) ON DELETE CASCADE,
+                    estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    fecha_creacion TIMESTAMP,
+                    proximo_intento TIMESTAMP,
+                    fecha_procesado TIMESTAMP
+                )
+            """))
+            print("✅ Tabla 'trabajo_aprendizaje' creada o ya existe")
+
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_trabajo_aprendizaje_estado
+                ON trabajo_aprendizaje (estado, proximo_intento, id)
+            """))
+            print("✅ Índice ix_trabajo_aprendizaje_estado creado (o ya existía)")
+
+            db.session.commit()
+            print("✅ Migración completada")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,70 @@
+"""
+Migración: Tablas trabajo_sincronizacion y pesaje_en_cola (sincronización
+async de pesajes: POST /api/sync/pesajes?async=1). Las procesa
+`flask procesar-sync`.
+
+Uso: python migrate_trabajos_sincronizacion.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: tablas trabajo_sincronizacion / pesaje_en_cola...")
+
+        try:
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS trabajo_sincronizacion (
+                    id SERIAL PRIMARY KEY,
+                    dispositivo_id VARCHAR(64),
+                    estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    total_pesajes INTEGER NOT NULL DEFAULT 0,
+                    sincronizados INTEGER NOT NULL DEFAULT 0,
+                    ya_sincronizados INTEGER NOT NULL DEFAULT 0,
+                    errores INTEGER NOT NULL DEFAULT 0,
+                    fecha_creacion TIMESTAMP,
+                    proximo_intento TIMESTAMP,
+                    fecha_procesado TIMESTAMP
+                )
+            """))
+            print("✅ Tabla 'trabajo_sincronizacion' creada o ya existe")
+
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_trabajo_sincronizacion_estado
+                ON trabajo_sincronizacion (estado, proximo_intento, id)
+            """))
+            print("✅ Índice ix_trabajo_sincronizacion_estado creado (o ya existía)")
+
+            db.session.execute(text("""
+                CREATE TABLE IF NOT EXISTS pesaje_en_cola (
+                    id SERIAL PRIMARY KEY,
+                    trabajo_id INTEGER NOT NULL
+                        REFERENCES trabajo_sincronizacion(id) ON DELETE CASCADE,
+                    posicion INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    resultado VARCHAR(20),
+                    error TEXT
+                )
+            """))
+            print("✅ Tabla 'pesaje_en_cola' creada o ya existe")
+
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_pesaje_en_cola_trabajo
+                ON pesaje_en_cola (trabajo_id, posicion)
+            """))
+            print("✅ Índice ix_pesaje_en_cola_trabajo creado (o ya existía)")
+
+            db.session.commit()
+            print("✅ Migración completada")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,31 @@
+"""
+Migración: Columna de versión en OrdenProduccion
+- version: sube con cada cambio en la OP o su árbol (lotes, recetas,
+  registros, detalles, pesajes). Se usa como ETag en los GET.
+
+Uso: python migrate_version_orden.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: version en orden_produccion...")
+
+        try:
+            db.session.execute(text("""
+                ALTER TABLE orden_produccion
+                ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1
+            """))
+            db.session.commit()
+            print("✅ Columna version agregada (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
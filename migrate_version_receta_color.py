@@ -0,0 +1,31 @@
+"""
+Migración: Columna version_receta en ColorProducto
+- version_receta: sube con cada cambio en las RecetaColorNormalizada del
+  color. La caché de prefill de cada worker la compara para invalidarse.
+
+Uso: python migrate_version_receta_color.py
+"""
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+app = create_app()
+
+def migrar():
+    with app.app_context():
+        print("🔄 Ejecutando migración: version_receta en color_producto...")
+
+        try:
+            db.session.execute(text("""
+                ALTER TABLE color_producto
+                ADD COLUMN IF NOT EXISTS version_receta INTEGER NOT NULL DEFAULT 1
+            """))
+            db.session.commit()
+            print("✅ Columna version_receta agregada (o ya existía)")
+
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            db.session.rollback()
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,74 @@
+"""
+Benchmark: POST /api/ordenes/bulk vs. N llamadas a POST /api/ordenes.
+Corre sobre SQLite en memoria; las cifras sirven para comparar, no como absoluto.
+
+Uso: python scripts/benchmark_ordenes_bulk.py [N]
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from app import create_app
+from app.extensions import db
+from app.models.maquina import Maquina
+
+
+def _payload(numero_op, maquina_id, i):
+    colores = ["ROJO", "AZUL", "VERDE", "AMARILLO", "NEGRO"]
+    return {
+        "numero_op": numero_op,
+        "maquina_id": maquina_id,
+        "producto": "BALDE",
+        "snapshot_tiempo_ciclo": 25.0,
+        "snapshot_peso_colada_gr": 12.0,
+        "snapshot_composicion": [{"cavidades": 2, "peso_unit_gr": 150.0}],
+        "lotes": [
+            {
+                "color_nombre": colores[(i + k) % len(colores)],
+                "meta_kg": 100.0 + k,
+                "materiales": [{"nombre": "PP HOMO", "fraccion": 0.8}, {"nombre": "MOLIDO", "fraccion": 0.2}],
+                "pigmentos": [{"nombre": f"PIG {colores[(i + k) % len(colores)]}", "gramos": 50.0}],
+            }
+            for k in range(3)
+        ],
+    }
+
+
+def _medir(n, bulk):
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        maq = Maquina(nombre="INY-BENCH", tipo="INYECTORA")
+        db.session.add(maq)
+        db.session.commit()
+        payloads = [_payload(f"OP-B{i:05d}", maq.id, i) for i in range(n)]
+
+        client = app.test_client()
+        inicio = time.perf_counter()
+        if bulk:
+            resp = client.post('/api/ordenes/bulk', json={'ordenes': payloads})
+            assert resp.status_code == 201, resp.get_json()
+        else:
+            for p in payloads:
+                resp = client.post('/api/ordenes', json=p)
+                assert resp.status_code == 201, resp.get_json()
+        segundos = time.perf_counter() - inicio
+        db.session.remove()
+        db.drop_all()
+    return segundos
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    t_loop = _medir(n, bulk=False)
+    t_bulk = _medir(n, bulk=True)
+    print(f"{n} OPs")
+    print(f"  POST /api/ordenes (x{n}): {t_loop:7.2f} s  ({n / t_loop:8.1f} OP/s)")
+    print(f"  POST /api/ordenes/bulk  : {t_bulk:7.2f} s  ({n / t_bulk:8.1f} OP/s)")
+    print(f"  Speedup: {t_loop / t_bulk:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: GET /api/ordenes completo vs. ?fields= / ?include= (sparse fieldsets).
+Genera un dataset sintético en SQLite en memoria y mide tamaño del payload,
+latencia y número de queries por página.
+
+Uso: python scripts/benchmark_ordenes_campos.py [N_ORDENES]
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone, SeColorea
+from app.models.materiales import MateriaPrima, Colorante
+from app.models.maquina import Maquina
+from app.models.producto import ColorProducto
+
+
+VARIANTES = [
+    ('completo', ''),
+    ('cabecera', 'fields=numero_op,producto,maquina,fecha,activa'),
+    ('cabecera+avance', 'fields=numero_op,producto,maquina,fecha,activa&include=avance'),
+    ('cabecera+lotes', 'fields=numero_op,producto,maquina&include=lotes'),
+]
+
+
+def _poblar(n):
+    maqs = [Maquina(nombre=f"INY-{i:02d}", tipo="INYECTORA") for i in range(10)]
+    colores = [ColorProducto(nombre=f"COLOR-{i}", codigo=i) for i in range(8)]
+    mps = [MateriaPrima(nombre=f"MP-{i}", tipo="VIRGEN") for i in range(4)]
+    pigs = [Colorante(nombre=f"PIG-{i}") for i in range(6)]
+    db.session.add_all(maqs + colores + mps + pigs)
+    db.session.flush()
+
+    for i in range(n):
+        numero_op = f"OP-{i:06d}"
+        db.session.add(OrdenProduccion(
+            numero_op=numero_op, producto=f"PRODUCTO {i % 50}", molde=f"MOLDE {i % 30}",
+            maquina_id=maqs[i % len(maqs)].id, snapshot_tiempo_ciclo=30.0,
+        ))
+        for k in range(2):
+            db.session.add(SnapshotComposicionMolde(orden_id=numero_op, cavidades=2 + k, peso_unit_gr=40.0))
+    db.session.flush()
+
+    lotes = []
+    for i in range(n):
+        for k in range(3):
+            lotes.append(LoteColor(numero_op=f"OP-{i:06d}", color_id=colores[(i + k) % 8].id, meta_kg=150.0))
+    db.session.add_all(lotes)
+    db.session.flush()
+    for j, lote in enumerate(lotes):
+        db.session.add(SeCompone(lote_id=lote.id, materia_prima_id=mps[j % 4].id, fraccion=0.7))
+        db.session.add(SeCompone(lote_id=lote.id, materia_prima_id=mps[(j + 1) % 4].id, fraccion=0.3))
+        db.session.add(SeColorea(lote_id=lote.id, colorante_id=pigs[j % 6].id, gramos=80.0))
+    db.session.commit()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeticiones = 5
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        _poblar(n)
+        client = app.test_client()
+
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.append(1))
+
+        print(f"{n} OPs, página de 200, {repeticiones} repeticiones")
+        print(f"{'variante':<18}{'bytes/página':>14}{'ms/página':>12}{'queries':>10}")
+        for nombre, params in VARIANTES:
+            url = f"/api/ordenes?limit=200&{params}"
+            client.get(url)  # calentamiento
+            queries.clear()
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                resp = client.get(url)
+            ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+            print(f"{nombre:<18}{len(resp.data):>14,}{ms:>12.1f}{len(queries) // repeticiones:>10}")
+
+
+if __name__ == '__main__':
+    main()
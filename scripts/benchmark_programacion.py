@@ -0,0 +1,83 @@
+"""
+Benchmark: GET /api/programacion/timeline con cientos de máquinas y miles de OPs.
+Genera un dataset sintético en SQLite en memoria y separa el tiempo de carga
+(SQL) del cálculo de colas / conflictos / huecos.
+
+Uso: python scripts/benchmark_programacion.py [N_MAQUINAS] [N_ORDENES]
+"""
+import sys
+import os
+import random
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from app import create_app
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.maquina import Maquina
+from app.services import programacion_service
+
+
+def _poblar(n_maquinas, n_ordenes, t0):
+    rnd = random.Random(1)
+    maqs = [Maquina(nombre=f"INY-{i:03d}", tipo="INYECTORA") for i in range(n_maquinas)]
+    db.session.add_all(maqs)
+    db.session.flush()
+    db.session.execute(db.insert(OrdenProduccion), [
+        {
+            'numero_op': f"OP-{i:06d}", 'producto': 'PRODUCTO', 'molde': 'MOLDE',
+            'maquina_id': maqs[rnd.randrange(n_maquinas)].id,
+            'fecha_inicio': t0 + timedelta(hours=rnd.uniform(-24 * 10, 24 * 60)),
+            'calculo_horas': rnd.uniform(4, 120), 'snapshot_horas_turno': rnd.choice([12.0, 22.0, 24.0]),
+            'activa': rnd.random() > 0.2,
+        }
+        for i in range(n_ordenes)
+    ])
+    db.session.commit()
+
+
+def main():
+    n_maquinas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n_ordenes = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    repeticiones = 5
+    t0 = datetime(2025, 6, 2)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        _poblar(n_maquinas, n_ordenes, t0)
+        client = app.test_client()
+
+        # Separar carga y cálculo: se mide programar_planta por fuera
+        original = programacion_service.programar_planta
+        calculo_ms = []
+
+        def _medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                calculo_ms.append((time.perf_counter() - inicio) * 1000)
+
+        programacion_service.programar_planta = _medido
+        url = f"/api/programacion/timeline?desde={t0.date().isoformat()}"
+        client.get(url)  # calentamiento
+        calculo_ms.clear()
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            resp = client.get(url)
+        total = (time.perf_counter() - inicio) * 1000 / repeticiones
+        programacion_service.programar_planta = original
+
+        resumen = resp.get_json()['resumen']
+        print(f"{n_maquinas} máquinas, {n_ordenes} OPs ({resumen['ordenes']} activas), ventana 30 días")
+        print(f"  request completo : {total:8.1f} ms")
+        print(f"  cálculo en memoria: {sum(calculo_ms) / len(calculo_ms):8.1f} ms")
+        print(f"  payload           : {len(resp.data):,} bytes, {resumen['conflictos']} conflictos")
+
+
+if __name__ == '__main__':
+    main()
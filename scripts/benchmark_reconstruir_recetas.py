@@ -0,0 +1,68 @@
+"""
+Benchmark: reconstrucción de RecetaColorNormalizada desde el histórico.
+Genera en SQLite en memoria N OPs × 3 lotes × 5 pigmentos (SeColorea) y mide
+tiempo total y pico de memoria de Python (tracemalloc) por chunk_size.
+
+Uso: python scripts/benchmark_reconstruir_recetas.py [N_ORDENES]
+"""
+import sys
+import os
+import random
+import time
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from app import create_app
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.lote import LoteColor
+from app.models.recetas import SeColorea
+from app.models.materiales import Colorante
+from app.models.producto import ColorProducto
+from app.services.receta_color_service import reconstruir_recetas
+
+
+def _poblar(n):
+    rnd = random.Random(1)
+    colores = [ColorProducto(nombre=f"COLOR-{i}", codigo=i) for i in range(40)]
+    pigs = [Colorante(nombre=f"PIG-{i}") for i in range(60)]
+    db.session.add_all(colores + pigs)
+    db.session.flush()
+
+    db.session.execute(db.insert(OrdenProduccion), [
+        {'numero_op': f"OP-{i:06d}", 'producto': 'PRODUCTO', 'molde': 'MOLDE'} for i in range(n)
+    ])
+    db.session.execute(db.insert(LoteColor), [
+        {'id': i * 3 + k + 1, 'numero_op': f"OP-{i:06d}", 'color_id': rnd.choice(colores).id,
+         'meta_kg': rnd.choice([100.0, 250.0, 500.0])}
+        for i in range(n) for k in range(3)
+    ])
+    db.session.execute(db.insert(SeColorea), [
+        {'lote_id': lote_id, 'colorante_id': pig.id, 'gramos': rnd.uniform(5, 200)}
+        for lote_id in range(1, n * 3 + 1) for pig in rnd.sample(pigs, 5)
+    ])
+    db.session.commit()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        _poblar(n)
+        print(f"{n} OPs, {SeColorea.query.count():,} pigmentos")
+        print(f"{'chunk_size':>10}{'segundos':>10}{'pico MB':>10}{'recetas':>10}")
+        for chunk in (1000, 5000, 20000):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            stats = reconstruir_recetas(chunk_size=chunk)
+            segundos = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{chunk:>10}{segundos:>10.2f}{pico / 1e6:>10.1f}{stats['recetas']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: GET /api/dashboard/oee sobre un año de registros sintéticos por
+máquina (2 turnos por día, 12 horas de detalle por turno, bultos en parte
+de los registros). Mide el año completo, un mes y una sola máquina, e
+imprime el plan de la consulta (SQLite) para ver qué índices usa.
+
+Uso: python scripts/benchmark_rendimiento_maquinas.py [N_MAQUINAS] [DIAS]
+"""
+import sys
+import os
+import random
+import time
+from datetime import date, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from app import create_app
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from app.services import rendimiento_service
+
+TURNOS = ('DIURNO', 'NOCTURNO')
+
+
+def _poblar(n_maquinas, dias, t0):
+    rnd = random.Random(1)
+    maqs = [Maquina(nombre=f"INY-{i:03d}", tipo="INYECTORA") for i in range(n_maquinas)]
+    db.session.add_all(maqs)
+    db.session.flush()
+    # Una OP por máquina y mes
+    ordenes = {}
+    filas_op = []
+    for m in maqs:
+        for mes in range(dias // 30 + 1):
+            numero_op = f"OP-{m.id:03d}-{mes:02d}"
+            ordenes[(m.id, mes)] = numero_op
+            filas_op.append({'numero_op': numero_op, 'maquina_id': m.id, 'producto': 'PRODUCTO',
+                             'snapshot_tiempo_ciclo': rnd.choice([18.0, 22.0, 30.0])})
+    db.session.execute(db.insert(OrdenProduccion), filas_op)
+
+    registros, detalles = [], []
+    registro_id = 0
+    for m in maqs:
+        for d in range(dias):
+            for turno in TURNOS:
+                registro_id += 1
+                horas = [rnd.choice([0, 0, 100, 120, 150, 160]) for _ in range(12)]
+                coladas = sum(horas)
+                n_bultos = rnd.choice([0, 0, 4])
+                registros.append({
+                    'id': registro_id, 'orden_id': ordenes[(m.id, d // 30)], 'maquina_id': m.id,
+                    'fecha': t0 + timedelta(days=d), 'turno': turno,
+                    'colada_inicial': 0, 'colada_final': 0, 'tiempo_ciclo_reportado': rnd.uniform(18, 32),
+                    'cantidad_por_hora_meta': 300, 'snapshot_cavidades': 2,
+                    'snapshot_peso_neto_gr': 40.0, 'snapshot_peso_colada_gr': 6.0,
+                    'total_coladas_calculada': coladas, 'total_piezas_buenas': coladas * 2,
+                    'total_kg_real': coladas * 46.0 / 1000.0,
+                    'pesaje_n': n_bultos, 'pesaje_suma_kg': coladas * 46.0 / 1000.0 * rnd.uniform(0.97, 1.05) if n_bultos else 0.0,
+                })
+                detalles.extend(
+                    {'registro_id': registro_id, 'hora': f"{(7 + h) % 24:02d}:00", 'coladas_realizadas': c}
+                    for h, c in enumerate(horas)
+                )
+    for i in range(0, len(registros), 5000):
+        db.session.execute(db.insert(RegistroDiarioProduccion), registros[i:i + 5000])
+    for i in range(0, len(detalles), 20000):
+        db.session.execute(db.insert(DetalleProduccionHora), detalles[i:i + 20000])
+    db.session.commit()
+    return maqs, len(registros), len(detalles)
+
+
+def _medir(client, url, repeticiones=5):
+    client.get(url)  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resp = client.get(url)
+    return (time.perf_counter() - inicio) * 1000 / repeticiones, resp.get_json()
+
+
+def main():
+    n_maquinas = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    t0 = date(2025, 1, 1)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        maqs, n_registros, n_detalles = _poblar(n_maquinas, dias, t0)
+        client = app.test_client()
+        print(f"{n_maquinas} máquinas × {dias} días: {n_registros:,} registros, {n_detalles:,} detalles")
+
+        fin = t0 + timedelta(days=dias - 1)
+        casos = [
+            ('año, por máquina', f"/api/dashboard/oee?desde={t0}&hasta={fin}"),
+            ('año, máquina × turno', f"/api/dashboard/oee?desde={t0}&hasta={fin}&agrupar=turno"),
+            ('un mes, por máquina', f"/api/dashboard/oee?desde={t0}&hasta={t0 + timedelta(days=29)}"),
+            ('año, una máquina por día', f"/api/dashboard/oee?desde={t0}&hasta={fin}&maquina_id={maqs[0].id}&agrupar=dia"),
+        ]
+        for nombre, url in casos:
+            ms, data = _medir(client, url)
+            t = data['totales']
+            print(f"  {nombre:26s}: {ms:8.1f} ms  ({len(data['grupos'])} grupos, "
+                  f"OEE {t['oee']:.3f} = D {t['disponibilidad']:.3f} × R {t['rendimiento']:.3f} × C {t['calidad']:.3f})")
+
+        # Plan de la consulta de un mes (qué índices usa SQLite)
+        stmt_capturado = []
+        original = db.session.execute
+
+        def _capturar(stmt, *args, **kwargs):
+            stmt_capturado.append(stmt)
+            return original(stmt, *args, **kwargs)
+
+        db.session.execute = _capturar
+        rendimiento_service.rendimiento_maquinas(desde=t0, hasta=t0 + timedelta(days=29))
+        db.session.execute = original
+        sql = str(stmt_capturado[0].compile(db.engine, compile_kwargs={'literal_binds': True}))
+        print("\nEXPLAIN QUERY PLAN (un mes):")
+        for fila in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")):
+            print(f"  {fila[-1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: POST /api/sync/pesajes con la carga acumulada tras un corte de red
+(10k pesajes repartidos en OPs × máquinas × días × turnos) contra subirlos de a uno,
+y la misma carga como NDJSON gzip en bloques de 1000 líneas (un commit por bloque).
+Corre sobre SQLite en memoria; las cifras sirven para comparar, no como absoluto.
+
+Uso: python scripts/benchmark_sync_pesajes.py [N_PESAJES] [N_ORDENES]
+"""
+import sys
+import os
+import gzip
+import json
+import random
+import time
+from contextlib import redirect_stdout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+
+
+def _pesajes(n, n_ordenes, n_maquinas, seed=1):
+    rnd = random.Random(seed)
+    return [
+        {
+            'local_id': i, 'peso_kg': round(rnd.uniform(5, 25), 3),
+            'nro_op': f"OP-{rnd.randrange(n_ordenes):05d}", 'maquina': f"INY-{rnd.randrange(n_maquinas):02d}",
+            'fecha_ot': f"2025-06-{rnd.randint(1, 7):02d}", 'turno': rnd.choice(["DIURNO", "NOCTURNO"]),
+            'fecha_hora': '2025-06-01T10:00:00', 'color': 'ROJO',
+        }
+        for i in range(n)
+    ]
+
+
+def _post_json(client, pesajes, por_request):
+    for i in range(0, len(pesajes), por_request):
+        resp = client.post('/api/sync/pesajes', json={'pesajes': pesajes[i:i + por_request]})
+        assert resp.status_code == 200 and not resp.get_json()['errors']
+
+
+def _post_ndjson(client, pesajes, chunk_size):
+    cuerpo = gzip.compress(''.join(json.dumps(p) + '\n' for p in pesajes).encode())
+    resp = client.post(f'/api/sync/pesajes?chunk_size={chunk_size}', data=cuerpo,
+                       content_type='application/x-ndjson', headers={'Content-Encoding': 'gzip'})
+    assert resp.status_code == 200 and not resp.get_json()['errors']
+    return len(cuerpo)
+
+
+def _medir(pesajes, n_ordenes, n_maquinas, subir):
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Maquina(nombre=f"INY-{i:02d}", tipo="INYECTORA") for i in range(n_maquinas))
+        db.session.execute(db.insert(OrdenProduccion), [
+            {'numero_op': f"OP-{i:05d}", 'maquina_id': 1, 'calculo_cavidades_totales': 2,
+             'calculo_peso_neto_golpe': 100.0, 'snapshot_tiempo_ciclo': 20.0}
+            for i in range(n_ordenes)
+        ])
+        db.session.commit()
+        client = app.test_client()
+
+        queries = []
+        contar = lambda *a: queries.append(1)
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        inicio = time.perf_counter()
+        with redirect_stdout(open(os.devnull, 'w')):
+            subir(client, pesajes)
+        total = time.perf_counter() - inicio
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+        registros = RegistroDiarioProduccion.query.count()
+        db.session.remove()
+        db.drop_all()
+        return total, len(queries), registros
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_ordenes = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    n_maquinas = 8
+    pesajes = _pesajes(n, n_ordenes, n_maquinas)
+
+    print(f"{n} pesajes, {n_ordenes} OPs, {n_maquinas} máquinas, 7 días × 2 turnos")
+    t, q, r = _medir(pesajes, n_ordenes, n_maquinas, lambda c, p: _post_json(c, p, n))
+    print(f"  un lote            : {t * 1000:9.1f} ms  {q:6d} queries  {r} RDPs")
+
+    bytes_gzip = []
+    t, q, r = _medir(pesajes, n_ordenes, n_maquinas, lambda c, p: bytes_gzip.append(_post_ndjson(c, p, 1000)))
+    print(f"  NDJSON gzip / 1000 : {t * 1000:9.1f} ms  {q:6d} queries  {r} RDPs"
+          f"  ({bytes_gzip[0] / 1024:.0f} KiB gzip vs {len(json.dumps(pesajes)) / 1024:.0f} KiB JSON)")
+
+    # Referencia: de a un pesaje por request (solo una muestra, se extrapola)
+    muestra = min(n, 1000)
+    t1, q1, _ = _medir(pesajes[:muestra], n_ordenes, n_maquinas, lambda c, p: _post_json(c, p, 1))
+    print(f"  de a uno ({muestra:>5d})   : {t1 * 1000:9.1f} ms  {q1:6d} queries"
+          f"  (≈ {t1 * n / muestra:.1f} s para {n})")
+
+
+if __name__ == '__main__':
+    main()
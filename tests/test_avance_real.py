@@ -0,0 +1,139 @@
+"""
+Tests del avance real persistido en OrdenProduccion (calculo_avance_real_*):
+se mantiene al crear/editar/borrar registros y al sincronizar pesajes,
+y `flask verificar-avance` lo reconstruye desde cero.
+"""
+import pytest
+from datetime import date
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.registro import RegistroDiarioProduccion
+from app.models.maquina import Maquina
+
+
+def _setup_orden(numero_op="OP-AVANCE"):
+    maq = Maquina(nombre="INY-AVANCE", tipo="INYECTORA")
+    db.session.add(maq)
+    db.session.flush()
+    op = OrdenProduccion(numero_op=numero_op, maquina_id=maq.id, snapshot_tiempo_ciclo=20.0)
+    db.session.add(op)
+    db.session.add(SnapshotComposicionMolde(orden_id=numero_op, cavidades=2, peso_unit_gr=50.0))
+    db.session.flush()
+    op.actualizar_metricas()
+    db.session.commit()
+    return maq.id
+
+
+def _avance(numero_op):
+    db.session.expire_all()
+    op = db.session.get(OrdenProduccion, numero_op)
+    return op.calculo_avance_real_kg, op.calculo_avance_real_coladas
+
+
+def test_avance_se_mantiene_en_alta_edicion_y_baja(client, app):
+    with app.app_context():
+        maq_id = _setup_orden()
+
+        # Alta via API: 100 coladas × 100g neto → 10 kg
+        resp = client.post('/api/ordenes/OP-AVANCE/registros', json={
+            "maquina_id": maq_id, "fecha": "2025-03-01", "turno": "DIURNO",
+            "colada_inicial": 0, "colada_final": 100,
+        })
+        assert resp.status_code == 201
+        reg_id = resp.get_json()['id']
+        assert _avance("OP-AVANCE") == (pytest.approx(10.0), 100)
+
+        # Segundo registro directo por ORM
+        reg2 = RegistroDiarioProduccion(
+            orden_id="OP-AVANCE", maquina_id=maq_id, fecha=date(2025, 3, 2), turno="NOCTURNO",
+            colada_inicial=0, colada_final=50, snapshot_peso_neto_gr=100.0,
+        )
+        reg2.actualizar_totales()
+        db.session.add(reg2)
+        db.session.commit()
+        assert _avance("OP-AVANCE") == (pytest.approx(15.0), 150)
+
+        # Edición de contadores
+        reg = db.session.get(RegistroDiarioProduccion, reg_id)
+        reg.colada_final = 300
+        reg.actualizar_totales()
+        db.session.commit()
+        assert _avance("OP-AVANCE") == (pytest.approx(35.0), 350)
+
+        # Baja
+        db.session.delete(db.session.get(RegistroDiarioProduccion, reg2.id))
+        db.session.commit()
+        assert _avance("OP-AVANCE") == (pytest.approx(30.0), 300)
+
+
+def test_avance_refleja_sync_pesajes(client, app):
+    with app.app_context():
+        _setup_orden("OP-AV-SYNC")
+
+        payload = {'pesajes': [
+            {'local_id': i, 'peso_kg': 12.5, 'nro_op': 'OP-AV-SYNC', 'turno': 'DIURNO',
+             'fecha_ot': '2025-03-05', 'maquina': 'INY-AVANCE', 'color': 'ROJO'}
+            for i in range(4)
+        ]}
+        resp = client.post('/api/sync/pesajes', json=payload)
+        assert resp.status_code == 200
+        assert len(resp.get_json()['synced']) == 4
+
+        kg, coladas = _avance("OP-AV-SYNC")
+        assert kg == pytest.approx(50.0)
+        assert coladas == 0
+
+
+def test_lectura_de_orden_no_carga_registros(client, app):
+    with app.app_context():
+        maq_id = _setup_orden()
+        for t in range(30):
+            db.session.add(RegistroDiarioProduccion(
+                orden_id="OP-AVANCE", maquina_id=maq_id, fecha=date(2025, 4, 1 + t % 28),
+                turno=f"T{t}", total_kg_real=1.0, total_coladas_calculada=10,
+            ))
+        db.session.commit()
+        db.session.expire_all()
+
+        statements = []
+        listener = lambda conn, cur, stmt, *a: statements.append(stmt)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            data = client.get('/api/ordenes/OP-AVANCE').get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert data['avance_real_kg'] == pytest.approx(30.0)
+        assert data['avance_real_coladas'] == 300
+        assert not any('registro_diario_produccion' in s for s in statements)
+
+
+def test_comando_verificar_avance_reconstruye(app, runner):
+    with app.app_context():
+        maq_id = _setup_orden()
+        db.session.add(RegistroDiarioProduccion(
+            orden_id="OP-AVANCE", maquina_id=maq_id, fecha=date(2025, 5, 1),
+            turno="DIURNO", total_kg_real=7.5, total_coladas_calculada=75,
+        ))
+        db.session.commit()
+
+        # Corromper el valor persistido a propósito
+        db.session.execute(
+            db.update(OrdenProduccion)
+            .where(OrdenProduccion.numero_op == "OP-AVANCE")
+            .values(calculo_avance_real_kg=999.0, calculo_avance_real_coladas=1)
+        )
+        db.session.commit()
+
+        result = runner.invoke(args=['verificar-avance', '--dry-run'])
+        assert 'OP-AVANCE' in result.output
+        assert _avance("OP-AVANCE") == (pytest.approx(999.0), 1)
+
+        result = runner.invoke(args=['verificar-avance'])
+        assert result.exit_code == 0
+        assert _avance("OP-AVANCE") == (pytest.approx(7.5), 75)
+
+        result = runner.invoke(args=['verificar-avance'])
+        assert 'consistente' in result.output
@@ -0,0 +1,181 @@
+"""
+Tests para POST /api/ordenes/bulk:
+  1. Resultado idéntico a crear cada OP con POST /api/ordenes
+  2. Resolución de catálogos por conjunto (colores nuevos / existentes, materiales, pigmentos)
+  3. Errores por OP sin afectar al resto del lote (también color / molde /
+     producto inexistentes, que de otro modo romperían el flush por FK)
+  4. Número de queries independiente de la cantidad de OPs
+"""
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.maquina import Maquina
+from app.models.materiales import MateriaPrima, Colorante
+from app.models.producto import ColorProducto
+from app.services.creacion_ordenes_service import crear_ordenes_bulk
+
+
+def _payload(numero_op, maquina_id, color="ROJO", meta=(120.0, 80.0)):
+    return {
+        "numero_op": numero_op,
+        "maquina_id": maquina_id,
+        "producto": "BALDE",
+        "molde": "MOLDE BALDE",
+        "snapshot_tiempo_ciclo": 25.0,
+        "snapshot_horas_turno": 23.0,
+        "snapshot_peso_colada_gr": 12.0,
+        "fecha_inicio": "2025-06-01T07:00:00",
+        "snapshot_composicion": [
+            {"cavidades": 2, "peso_unit_gr": 150.0},
+            {"cavidades": 1, "peso_unit_gr": 40.0},
+        ],
+        "lotes": [
+            {
+                "color_nombre": color, "meta_kg": meta[0], "personas": 2,
+                "materiales": [{"nombre": "PP HOMO", "fraccion": 0.8}, {"nombre": "MOLIDO", "tipo": "SEGUNDA", "fraccion": 0.2}],
+                "pigmentos": [{"nombre": "ROJO 3B", "gramos": 150.0}],
+            },
+            {
+                "color_nombre": "azul", "meta_kg": meta[1],
+                "materiales": [{"nombre": "PP HOMO", "fraccion": 1.0}],
+                "pigmentos": [{"nombre": "AZUL FTALO", "gramos": 60.0}],
+            },
+        ],
+    }
+
+
+@pytest.fixture
+def maquina_id(app):
+    with app.app_context():
+        maq = Maquina(nombre="INY-BULK", tipo="INYECTORA")
+        db.session.add(maq)
+        db.session.add(ColorProducto(nombre="Azul", codigo=7))
+        db.session.commit()
+        return maq.id
+
+
+def _sin_volatiles(d):
+    d = dict(d)
+    d.pop('numero_op')
+    d.pop('fecha')
+    for lote in d['lotes']:
+        lote.pop('id')
+    return d
+
+
+def test_bulk_equivale_a_endpoint_individual(client, app, maquina_id):
+    resp = client.post('/api/ordenes', json=_payload("OP-SINGLE", maquina_id))
+    assert resp.status_code == 201
+
+    resp = client.post('/api/ordenes/bulk', json={'ordenes': [_payload("OP-BULK", maquina_id)]})
+    assert resp.status_code == 201
+    assert resp.get_json()['resultados'][0]['success'] is True
+
+    single = client.get('/api/ordenes/OP-SINGLE').get_json()
+    bulk = client.get('/api/ordenes/OP-BULK').get_json()
+    assert _sin_volatiles(bulk) == _sin_volatiles(single)
+
+
+def test_catalogos_se_resuelven_y_reutilizan(client, app, maquina_id):
+    payloads = [_payload(f"OP-CAT-{i}", maquina_id, color=c) for i, c in enumerate(["rojo", "ROJO", "VERDE"])]
+    resp = client.post('/api/ordenes/bulk', json={'ordenes': payloads})
+    assert resp.status_code == 201
+
+    with app.app_context():
+        # "azul" se resolvió contra el color existente "Azul"; ROJO/VERDE se crearon una sola vez
+        nombres = sorted(c.nombre for c in ColorProducto.query.all())
+        assert nombres == ["Azul", "ROJO", "VERDE"]
+        codigos = sorted(c.codigo for c in ColorProducto.query.filter(ColorProducto.nombre != "Azul"))
+        assert codigos == [8, 9]
+
+        assert MateriaPrima.query.count() == 2
+        assert MateriaPrima.query.filter_by(nombre="MOLIDO").one().tipo == "SEGUNDA"
+        assert Colorante.query.count() == 2
+
+        op = db.session.get(OrdenProduccion, "OP-CAT-2")
+        assert op.lotes[0].color_rel.nombre == "VERDE"
+        assert op.lotes[0].materias_primas[0].calculo_peso_kg > 0
+
+
+def test_errores_por_orden(client, app, maquina_id):
+    client.post('/api/ordenes/bulk', json={'ordenes': [_payload("OP-EXISTE", maquina_id)]})
+
+    sin_comp = _payload("OP-SIN-COMP", maquina_id)
+    sin_comp.pop("snapshot_composicion")
+    resp = client.post('/api/ordenes/bulk', json={'ordenes': [
+        _payload("OP-OK-1", maquina_id),
+        _payload("OP-EXISTE", maquina_id),
+        _payload("OP-OK-1", maquina_id),
+        _payload("OP-MAQ-MALA", 9999),
+        sin_comp,
+        {**_payload("OP-FECHA", maquina_id), "fecha_inicio": "ayer"},
+        _payload("OP-OK-2", maquina_id),
+    ]})
+    assert resp.status_code == 201
+    data = resp.get_json()
+    assert data['success'] is False
+    assert [r['success'] for r in data['resultados']] == [True, False, False, False, False, False, True]
+    assert 'ya existe' in data['resultados'][1]['error']
+    assert 'repetida' in data['resultados'][2]['error']
+    assert 'Máquina' in data['resultados'][3]['error']
+
+    with app.app_context():
+        assert db.session.get(OrdenProduccion, "OP-OK-2") is not None
+        assert db.session.get(OrdenProduccion, "OP-MAQ-MALA") is None
+
+
+def test_referencias_inexistentes(client, app, maquina_id):
+    with app.app_context():
+        azul_id = ColorProducto.query.filter_by(nombre="Azul").one().id
+
+    def _con_color(numero_op, color_id):
+        payload = _payload(numero_op, maquina_id)
+        payload["lotes"][1] = {**payload["lotes"][1], "color_id": color_id}
+        return payload
+
+    resp = client.post('/api/ordenes/bulk', json={'ordenes': [
+        _con_color("OP-REF-OK", azul_id),
+        _con_color("OP-REF-COLOR", 9999),
+        {**_payload("OP-REF-MOLDE", maquina_id), "molde_id": "MOL-NO-EXISTE"},
+        {**_payload("OP-REF-PROD", maquina_id), "producto_sku": "PT-NO-EXISTE"},
+    ]})
+    assert resp.status_code == 201
+    resultados = resp.get_json()['resultados']
+    assert [r['success'] for r in resultados] == [True, False, False, False]
+    assert resultados[1]['error'] == 'Color 9999 no encontrado'
+    assert resultados[2]['error'] == 'Molde MOL-NO-EXISTE no encontrado'
+    assert resultados[3]['error'] == 'Producto PT-NO-EXISTE no encontrado'
+
+    with app.app_context():
+        assert db.session.get(OrdenProduccion, "OP-REF-OK").lotes[1].color_id == azul_id
+        assert db.session.get(OrdenProduccion, "OP-REF-COLOR") is None
+
+
+def test_payload_invalido(client, app):
+    assert client.post('/api/ordenes/bulk', json={'ordenes': []}).status_code == 400
+    assert client.post('/api/ordenes/bulk', json={'foo': 1}).status_code == 400
+
+
+def test_queries_no_dependen_de_la_cantidad_de_ordenes(app, maquina_id):
+    def _contar(ops):
+        statements = []
+        listener = lambda conn, cur, stmt, *a: statements.append(stmt)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            resultados, creadas = crear_ordenes_bulk(ops)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert all(r['success'] for r in resultados)
+        # SQLite inserta fila a fila las tablas con PK autoincremental (INSERT ... RETURNING);
+        # en PostgreSQL el mismo flush va en lotes (insertmanyvalues). Se cuentan el resto.
+        return len([s for s in statements if 'RETURNING' not in s])
+
+    with app.app_context():
+        # Primera corrida crea los catálogos; las siguientes solo los leen
+        _contar([_payload("OP-WARM", maquina_id)])
+        pocas = _contar([_payload(f"OP-Q2-{i}", maquina_id) for i in range(2)])
+        muchas = _contar([_payload(f"OP-Q20-{i}", maquina_id) for i in range(20)])
+        assert muchas == pocas
+        assert pocas <= 10
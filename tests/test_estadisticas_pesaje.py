@@ -0,0 +1,151 @@
+"""
+Tests de las estadísticas de pesaje en línea (RegistroDiarioProduccion.pesaje_*):
+  1. Sync por lotes + bultos manuales == estadística de las filas (Welford)
+  2. Borrar bultos: Welford inverso, min / max se releen solo si hace falta
+  3. El sync no vuelve a sumar control_peso ni imprime DEBUG
+  4. `flask verificar-pesajes` detecta y corrige la deriva; los totales (y el
+     avance de la OP) solo con --recalcular-totales
+"""
+import random
+import statistics
+
+import pytest
+
+from app.extensions import db
+from app.models.control_peso import ControlPeso
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+from tests.test_ordenes_listado import contar_queries
+from tests.test_sync_pesajes_lote import _setup, _pesaje
+
+
+def _registro():
+    db.session.expire_all()
+    return RegistroDiarioProduccion.query.one()
+
+
+def _assert_coincide(registro):
+    pesos = [c.peso_real_kg for c in ControlPeso.query.filter_by(registro_id=registro.id)]
+    assert registro.pesaje_n == len(pesos)
+    assert registro.pesaje_suma_kg == pytest.approx(sum(pesos))
+    assert (registro.pesaje_min_kg, registro.pesaje_max_kg) == (min(pesos), max(pesos))
+    assert registro.pesaje_media_kg == pytest.approx(statistics.fmean(pesos))
+    assert registro.pesaje_varianza_kg == pytest.approx(statistics.variance(pesos) if len(pesos) > 1 else 0.0)
+
+
+def test_sync_y_bultos_equivalen_a_las_filas(client, app):
+    rnd = random.Random(7)
+    with app.app_context():
+        _setup()
+
+    local_id = 0
+    for tamano in (1, 40, 7):
+        lote = []
+        for _ in range(tamano):
+            lote.append(_pesaje(local_id, "OP-SYNC-0", kg=round(rnd.uniform(8, 30), 3)))
+            local_id += 1
+        client.post('/api/sync/pesajes', json={'pesajes': lote})
+        # Reenviar el mismo lote no cambia nada
+        client.post('/api/sync/pesajes', json={'pesajes': lote})
+
+    with app.app_context():
+        registro = _registro()
+        _assert_coincide(registro)
+        assert registro.total_kg_real == pytest.approx(registro.pesaje_suma_kg)
+        registro_id = registro.id
+
+    for peso in (2.5, 45.0):
+        assert client.post(f'/api/registros/{registro_id}/bultos', json={'peso': peso}).status_code == 201
+    with app.app_context():
+        registro = _registro()
+        _assert_coincide(registro)
+        assert (registro.pesaje_min_kg, registro.pesaje_max_kg) == (2.5, 45.0)
+
+    val = client.get(f'/api/registros/{registro_id}/validacion-peso').get_json()
+    assert val['pesajes']['n'] == 50
+    assert val['total_pesado_kg'] == round(val['pesajes']['suma_kg'], 2)
+
+
+def test_borrar_bultos(client, app):
+    with app.app_context():
+        _setup()
+    client.post('/api/sync/pesajes', json={'pesajes': [
+        _pesaje(i, "OP-SYNC-0", kg=kg) for i, kg in enumerate((10.0, 4.0, 12.0, 20.0, 7.0))
+    ]})
+    with app.app_context():
+        bultos = {c.peso_real_kg: c.id for c in ControlPeso.query}
+
+    # Un bulto intermedio: min / max no cambian y no se relee control_peso
+    with app.app_context():
+        with contar_queries() as queries:
+            assert client.delete(f'/api/bultos/{bultos[10.0]}').status_code == 200
+        assert not [q for q in queries if 'min(control_peso' in q.lower()]
+        _assert_coincide(_registro())
+
+    # El mínimo y el máximo: se releen de las filas restantes
+    client.delete(f'/api/bultos/{bultos[4.0]}')
+    client.delete(f'/api/bultos/{bultos[20.0]}')
+    with app.app_context():
+        registro = _registro()
+        _assert_coincide(registro)
+        assert (registro.pesaje_min_kg, registro.pesaje_max_kg) == (7.0, 12.0)
+
+    client.delete(f'/api/bultos/{bultos[12.0]}')
+    client.delete(f'/api/bultos/{bultos[7.0]}')
+    with app.app_context():
+        assert _registro().estadisticas_pesaje() == {
+            'n': 0, 'suma_kg': 0.0, 'min_kg': None, 'max_kg': None, 'media_kg': None, 'varianza_kg': 0.0,
+        }
+
+
+def test_sync_no_suma_control_peso(client, app, capsys):
+    with app.app_context():
+        _setup()
+        with contar_queries() as queries:
+            client.post('/api/sync/pesajes', json={'pesajes': [_pesaje(i, "OP-SYNC-0") for i in range(20)]})
+    assert not [q for q in queries if 'sum(control_peso' in q.lower()]
+    assert 'DEBUG' not in capsys.readouterr().out
+
+
+def test_verificar_pesajes(client, app, runner):
+    with app.app_context():
+        _setup()
+    client.post('/api/sync/pesajes', json={'pesajes': [_pesaje(i, "OP-SYNC-0", kg=5.0) for i in range(4)]})
+
+    result = runner.invoke(args=['verificar-pesajes'])
+    assert 'consistentes' in result.output
+
+    with app.app_context():
+        # Un bulto que entró por fuera de la API: las estadísticas quedaron viejas
+        registro = _registro()
+        db.session.execute(db.insert(ControlPeso), [{'registro_id': registro.id, 'peso_real_kg': 9.0}])
+        db.session.commit()
+
+    result = runner.invoke(args=['verificar-pesajes', '--dry-run'])
+    assert 'n 4 -> 5' in result.output
+    assert 'dry-run' in result.output
+    with app.app_context():
+        assert _registro().pesaje_n == 4
+
+    result = runner.invoke(args=['verificar-pesajes'])
+    assert result.exit_code == 0
+    assert '1 registros corregidos' in result.output
+    with app.app_context():
+        registro = _registro()
+        _assert_coincide(registro)
+        # Solo las columnas pesaje_*: total_kg_real y el avance no cambian
+        assert registro.total_kg_real == pytest.approx(20.0)
+        assert db.session.get(OrdenProduccion, "OP-SYNC-0").calculo_avance_real_kg == pytest.approx(20.0)
+
+    assert 'consistentes' in runner.invoke(args=['verificar-pesajes']).output
+
+    with app.app_context():
+        db.session.execute(db.insert(ControlPeso), [{'registro_id': registro.id, 'peso_real_kg': 1.0}])
+        db.session.commit()
+    result = runner.invoke(args=['verificar-pesajes', '--recalcular-totales'])
+    assert '1 registros corregidos' in result.output
+    with app.app_context():
+        registro = _registro()
+        _assert_coincide(registro)
+        assert registro.total_kg_real == pytest.approx(30.0)
+        assert db.session.get(OrdenProduccion, "OP-SYNC-0").calculo_avance_real_kg == pytest.approx(30.0)
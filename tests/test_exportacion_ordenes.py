@@ -0,0 +1,88 @@
+"""
+Tests de GET /api/ordenes/export (NDJSON / CSV en streaming):
+  1. NDJSON: una OP por línea, mismo árbol que GET /api/ordenes/<op>
+  2. CSV: una fila por ítem de receta, con OPs sin lotes incluidas
+  3. Filtros de fecha / máquina
+  4. La sesión no acumula objetos: memoria acotada por bloque
+"""
+import csv
+import io
+import json
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.services.exportacion_service import iterar_ordenes, COLUMNAS_CSV
+from tests.test_ordenes_listado import _poblar
+
+
+def test_export_ndjson(client, app):
+    with app.app_context():
+        _poblar(7)
+
+    resp = client.get('/api/ordenes/export')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    assert resp.is_streamed
+
+    lineas = resp.get_data(as_text=True).splitlines()
+    assert len(lineas) == 7
+    ordenes = [json.loads(l) for l in lineas]
+    assert [o['numero_op'] for o in ordenes] == [f"OP-L{i:03d}" for i in range(7)]
+
+    detalle = client.get('/api/ordenes/OP-L004').get_json()
+    assert ordenes[4] == detalle
+
+
+def test_export_csv_una_fila_por_item_de_receta(client, app):
+    with app.app_context():
+        _poblar(3)
+        db.session.add(OrdenProduccion(numero_op="OP-VACIA", maquina_id=None))
+        db.session.commit()
+
+    resp = client.get('/api/ordenes/export?format=csv')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert 'ordenes.csv' in resp.headers['Content-Disposition']
+
+    filas = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert list(filas[0]) == COLUMNAS_CSV
+
+    # 3 OPs × 2 lotes × (1 material + 1 pigmento) + 1 fila de la OP sin lotes
+    assert len(filas) == 13
+    op0 = [f for f in filas if f['numero_op'] == 'OP-L000']
+    assert {f['item_tipo'] for f in op0} == {'MATERIAL', 'PIGMENTO'}
+    material = next(f for f in op0 if f['item_tipo'] == 'MATERIAL')
+    assert material['item_nombre'] == 'PP-LIST'
+    assert material['maquina'] == 'MAQ-LIST-0'
+    assert float(material['fraccion']) == 1.0
+
+    vacia = [f for f in filas if f['numero_op'] == 'OP-VACIA']
+    assert len(vacia) == 1 and vacia[0]['lote_id'] == ''
+
+
+def test_export_filtros(client, app):
+    with app.app_context():
+        maq_ids = _poblar(12)
+
+    resp = client.get(f'/api/ordenes/export?maquina_id={maq_ids[1]}&desde=2025-01-02&hasta=2025-01-03')
+    ops = [json.loads(l)['numero_op'] for l in resp.get_data(as_text=True).splitlines()]
+    # fechas 2025-01-02/03 → OP-L003..OP-L008; máquina 1 → impares
+    assert ops == ["OP-L003", "OP-L005", "OP-L007"]
+
+    assert client.get('/api/ordenes/export?format=xml').status_code == 400
+    assert client.get('/api/ordenes/export?desde=ayer').status_code == 400
+
+
+def test_iterar_ordenes_libera_la_sesion_por_bloque(app):
+    with app.app_context():
+        _poblar(30)
+        db.session.expunge_all()
+
+        maximo, vistas = 0, 0
+        for _ in iterar_ordenes(bloque=5):
+            vistas += 1
+            maximo = max(maximo, len(db.session.identity_map))
+
+        assert vistas == 30
+        # 5 OPs con su árbol (snapshot, lotes, recetas, catálogos) ≈ 45 objetos; nunca las 30 OPs
+        assert maximo < 60
@@ -0,0 +1,127 @@
+"""
+Tests del recálculo incremental de métricas (metricas_service):
+  1. El grafo de dependencias cubre todas las columnas calculo_*
+  2. Tras editar una entrada, el resultado incremental == recálculo completo
+  3. PUT /ordenes/<op>/metricas solo recalcula / devuelve lo afectado
+"""
+import random
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.services.metricas_service import DEPENDENCIAS, salidas_afectadas, recalcular_incremental
+from tests.test_recalculo_masivo import _poblar_aleatorio, _leer_resultados, COLS_ORDEN, COLS_LOTE
+from tests.test_ordenes_listado import contar_queries
+
+
+def test_grafo_cubre_todas_las_salidas():
+    declaradas = set(DEPENDENCIAS)
+    esperadas = (
+        {f'orden.{c}' for c in COLS_ORDEN}
+        | {f'lote.{c}' for c in COLS_LOTE}
+        | {'componente.calculo_peso_kg'}
+    )
+    assert declaradas == esperadas
+
+
+def test_tiempo_ciclo_solo_afecta_tiempos():
+    assert salidas_afectadas(['orden.snapshot_tiempo_ciclo']) == {
+        'orden.calculo_horas', 'orden.calculo_dias', 'orden.calculo_fecha_fin',
+        'lote.calculo_horas_hombre',
+    }
+    afectadas_colada = salidas_afectadas(['orden.snapshot_peso_colada_gr'])
+    assert 'componente.calculo_peso_kg' in afectadas_colada
+    assert 'lote.calculo_coladas' not in afectadas_colada  # coladas dependen del peso neto, no del tiro
+
+
+def test_incremental_identico_a_recalculo_completo(app):
+    rnd = random.Random(11)
+    entradas = {
+        'snapshot_tiempo_ciclo':   [0.0, 12.5, 33.3, None],
+        'snapshot_horas_turno':    [0.0, 8.0, 22.5, 24.0],
+        'snapshot_peso_colada_gr': [0.0, 1.5, 27.9],
+    }
+
+    with app.app_context():
+        _poblar_aleatorio(40, seed=3)
+        for op in OrdenProduccion.query.all():
+            op.actualizar_metricas()
+        db.session.commit()
+
+        ediciones = {}
+        for op in OrdenProduccion.query.order_by(OrdenProduccion.numero_op):
+            campos = rnd.sample(sorted(entradas), rnd.randint(1, 3))
+            ediciones[op.numero_op] = {c: rnd.choice(entradas[c]) for c in campos}
+
+        # Incremental
+        for numero_op, cambios in ediciones.items():
+            op = db.session.get(OrdenProduccion, numero_op)
+            for campo, valor in cambios.items():
+                setattr(op, campo, valor)
+            recalcular_incremental(op, [f'orden.{c}' for c in cambios])
+        db.session.commit()
+        incremental = _leer_resultados()
+
+        # Completo, sobre las mismas entradas
+        for op in OrdenProduccion.query.all():
+            op.actualizar_metricas()
+        db.session.commit()
+        completo = _leer_resultados()
+
+        assert incremental[0] == completo[0]   # igualdad exacta, sin tolerancia
+        assert incremental[1] == completo[1]
+        assert incremental[2] == completo[2]
+
+
+def test_put_metricas_devuelve_solo_lo_que_cambia(client, app):
+    with app.app_context():
+        _poblar_aleatorio(8, seed=5)
+        for op in OrdenProduccion.query.all():
+            op.actualizar_metricas()
+        db.session.commit()
+
+        # OP con composición, lotes y materiales para que todo el árbol aplique
+        op = next(
+            o for o in OrdenProduccion.query.order_by(OrdenProduccion.numero_op)
+            if o.calculo_peso_tiro_gr > 0 and o.snapshot_horas_turno
+            and any(l.materias_primas for l in o.lotes)
+        )
+        numero_op = op.numero_op
+        ciclo_nuevo = (op.snapshot_tiempo_ciclo or 0.0) + 5.0
+        merma_antes = op.calculo_merma_pct
+        db.session.expire_all()
+
+        with contar_queries() as queries:
+            resp = client.put(f'/api/ordenes/{numero_op}/metricas', json={'snapshot_tiempo_ciclo': ciclo_nuevo})
+        assert resp.status_code == 200
+        data = resp.get_json()
+
+        assert data['campos_modificados'] == ['snapshot_tiempo_ciclo']
+        assert set(data['cambios']['orden']) <= {'calculo_horas', 'calculo_dias', 'calculo_fecha_fin'}
+        assert 'calculo_horas' in data['cambios']['orden']
+        assert all(set(c) == {'calculo_horas_hombre'} for c in data['cambios']['lotes'].values())
+        assert data['cambios']['materiales'] == {}
+
+        # Las recetas de materiales ni siquiera se leen
+        assert not any('se_compone' in q for q in queries)
+
+        op = db.session.get(OrdenProduccion, numero_op)
+        assert op.snapshot_tiempo_ciclo == ciclo_nuevo
+        assert op.calculo_merma_pct == merma_antes
+        assert data['cambios']['orden']['calculo_horas'] == op.calculo_horas
+
+
+def test_put_metricas_sin_cambios_reales(client, app):
+    with app.app_context():
+        _poblar_aleatorio(2, seed=5)
+        op = OrdenProduccion.query.first()
+        op.actualizar_metricas()
+        db.session.commit()
+        numero_op, ciclo = op.numero_op, op.snapshot_tiempo_ciclo
+
+    resp = client.put(f'/api/ordenes/{numero_op}/metricas', json={'snapshot_tiempo_ciclo': ciclo})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['campos_modificados'] == []
+    assert data['cambios'] == {'orden': {}, 'lotes': {}, 'materiales': {}}
+
+    assert client.put('/api/ordenes/NO-EXISTE/metricas', json={'snapshot_tiempo_ciclo': 1}).status_code == 404
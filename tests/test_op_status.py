@@ -160,14 +160,14 @@ class TestRegistrosEndpoint:
         response = client.get("/api/registros")
         assert response.status_code == 200
         data = response.get_json()
-        assert isinstance(data, list)
+        assert isinstance(data['registros'], list)
     
     def test_get_registros_with_limit(self, client, app):
         """Should respect limit parameter"""
         response = client.get("/api/registros?limit=5")
         assert response.status_code == 200
         data = response.get_json()
-        assert len(data) <= 5
+        assert len(data['registros']) <= 5
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+"""
+Tests de ?fields= / ?include= en GET /api/ordenes y GET /api/ordenes/<op>:
+  1. Sin parámetros la respuesta es el árbol completo (compatibilidad)
+  2. Solo se serializan los campos / relaciones pedidas
+  3. Las relaciones no pedidas no se consultan
+"""
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from tests.test_ordenes_listado import _poblar, contar_queries
+
+
+def test_sin_parametros_devuelve_arbol_completo(client, app):
+    with app.app_context():
+        _poblar(3)
+        completo = db.session.get(OrdenProduccion, "OP-L000").to_dict(
+            fields=OrdenProduccion.CAMPOS_CABECERA, include=OrdenProduccion.INCLUDES)
+
+    data = client.get('/api/ordenes/OP-L000').get_json()
+    assert data == completo
+    assert {'lotes', 'avance_real_kg', 'resumen_totales'} <= set(data)
+    assert 'composicion' in data['snapshot_tecnico']
+
+
+def test_fields_solo_cabecera_no_carga_relaciones(client, app):
+    with app.app_context():
+        _poblar(10)
+
+        with contar_queries() as queries:
+            resp = client.get('/api/ordenes?fields=numero_op,activa&limit=10')
+        assert resp.status_code == 200
+
+        ordenes = resp.get_json()['ordenes']
+        assert len(ordenes) == 10
+        assert all(set(o) == {'numero_op', 'activa'} for o in ordenes)
+
+        # Un único SELECT sobre orden_produccion: ni máquina, ni lotes, ni snapshot
+        assert len(queries) == 1
+        assert 'JOIN' not in queries[0]
+
+
+def test_include_selectivo(client, app):
+    with app.app_context():
+        _poblar(2)
+
+        with contar_queries() as queries:
+            data = client.get('/api/ordenes/OP-L001?fields=numero_op,maquina&include=avance').get_json()
+        assert set(data) == {'numero_op', 'maquina', 'avance_real_kg', 'avance_real_coladas'}
+        assert data['maquina'] == "MAQ-LIST-1"
+        assert data['avance_real_coladas'] == 300
+        assert not any('lote_color' in q or 'snapshot_composicion' in q for q in queries)
+
+    data = client.get('/api/ordenes/OP-L001?include=composicion').get_json()
+    # Con include y sin fields: toda la cabecera + solo la relación pedida
+    assert 'lotes' not in data and 'avance_real_kg' not in data
+    assert data['snapshot_tecnico']['es_multipieza'] is False
+    assert data['snapshot_tecnico']['composicion'][0]['cavidades'] == 2
+
+    data = client.get('/api/ordenes?fields=numero_op&include=lotes').get_json()
+    assert data['ordenes'][0]['lotes'][0]['materiales'][0]['nombre'] == "PP-LIST"
+
+
+def test_campos_desconocidos_retornan_400(client, app):
+    assert client.get('/api/ordenes?fields=numero_op,password').status_code == 400
+    assert client.get('/api/ordenes?include=registros').status_code == 400
+    assert client.get('/api/ordenes/OP-X?include=foo').status_code == 400
@@ -0,0 +1,141 @@
+"""
+Tests para GET /api/ordenes:
+  1. Paginación por cursor (keyset) sobre fecha_creacion, numero_op
+  2. Filtros activa / maquina_id / rango de fechas
+  3. Número de queries fijo, sin importar el tamaño de la página
+"""
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, date
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone, SeColorea
+from app.models.materiales import MateriaPrima, Colorante
+from app.models.maquina import Maquina
+from app.models.producto import ColorProducto
+from app.models.registro import RegistroDiarioProduccion
+
+
+@contextmanager
+def contar_queries():
+    """Cuenta los SELECT/INSERT/UPDATE emitidos dentro del bloque."""
+    statements = []
+
+    def _listener(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _listener)
+
+
+def _poblar(n_ordenes, maquinas=2):
+    """Crea n_ordenes con composición, 2 lotes con receta completa y 3 registros cada una."""
+    maqs = [Maquina(nombre=f"MAQ-LIST-{i}", tipo="INYECTORA") for i in range(maquinas)]
+    color = ColorProducto(nombre="ROJO-LIST", codigo=501)
+    mp = MateriaPrima(nombre="PP-LIST", tipo="VIRGEN")
+    pig = Colorante(nombre="PIG-LIST")
+    db.session.add_all(maqs + [color, mp, pig])
+    db.session.flush()
+
+    for i in range(n_ordenes):
+        numero_op = f"OP-L{i:03d}"
+        op = OrdenProduccion(
+            numero_op=numero_op,
+            maquina_id=maqs[i % maquinas].id,
+            fecha_creacion=datetime(2025, 1, 1 + (i // 3), 8, 0, 0),
+            snapshot_tiempo_ciclo=30.0,
+            activa=(i % 2 == 0),
+        )
+        db.session.add(op)
+        db.session.add(SnapshotComposicionMolde(orden_id=numero_op, cavidades=2, peso_unit_gr=50.0))
+        for _ in range(2):
+            lote = LoteColor(numero_op=numero_op, color_id=color.id, meta_kg=100.0)
+            db.session.add(lote)
+            db.session.flush()
+            db.session.add(SeCompone(lote_id=lote.id, materia_prima_id=mp.id, fraccion=1.0))
+            db.session.add(SeColorea(lote_id=lote.id, colorante_id=pig.id, gramos=25.0))
+        for t in range(3):
+            db.session.add(RegistroDiarioProduccion(
+                orden_id=numero_op, maquina_id=op.maquina_id, fecha=date(2025, 2, 1 + t),
+                turno="DIURNO", total_kg_real=10.0, total_coladas_calculada=100,
+            ))
+        db.session.flush()
+        op.actualizar_metricas()
+    db.session.commit()
+    return [m.id for m in maqs]
+
+
+def test_paginacion_cursor_recorre_todas_las_ordenes(client, app):
+    with app.app_context():
+        _poblar(12)
+
+    vistos = []
+    cursor = None
+    while True:
+        url = '/api/ordenes?limit=5' + (f'&cursor={cursor}' if cursor else '')
+        resp = client.get(url)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        vistos.extend(o['numero_op'] for o in data['ordenes'])
+        cursor = data['pagination']['next_cursor']
+        if not data['pagination']['has_more']:
+            assert cursor is None
+            break
+
+    # Sin duplicados ni huecos, en orden fecha_creacion DESC, numero_op DESC
+    esperado = sorted(
+        [f"OP-L{i:03d}" for i in range(12)],
+        key=lambda op: (datetime(2025, 1, 1 + (int(op[4:]) // 3)), op),
+        reverse=True,
+    )
+    assert vistos == esperado
+
+
+def test_filtros_activa_maquina_y_fechas(client, app):
+    with app.app_context():
+        maq_ids = _poblar(12)
+
+    data = client.get('/api/ordenes?activa=false&limit=200').get_json()
+    assert data['pagination']['count'] == 6
+    assert all(o['activa'] is False for o in data['ordenes'])
+
+    data = client.get(f'/api/ordenes?maquina_id={maq_ids[1]}').get_json()
+    assert {o['maquina'] for o in data['ordenes']} == {"MAQ-LIST-1"}
+
+    data = client.get('/api/ordenes?desde=2025-01-02&hasta=2025-01-03').get_json()
+    assert sorted(o['numero_op'] for o in data['ordenes']) == [f"OP-L{i:03d}" for i in range(3, 9)]
+
+
+def test_cursor_invalido_retorna_400(client, app):
+    resp = client.get('/api/ordenes?cursor=no-es-un-cursor')
+    assert resp.status_code == 400
+
+
+def test_numero_de_queries_no_depende_del_tamano_de_pagina(client, app):
+    with app.app_context():
+        _poblar(20)
+
+        with contar_queries() as q_chica:
+            resp = client.get('/api/ordenes?limit=2')
+        assert resp.status_code == 200
+
+        with contar_queries() as q_grande:
+            resp = client.get('/api/ordenes?limit=20')
+        assert resp.status_code == 200
+
+        assert len(resp.get_json()['ordenes']) == 20
+        assert len(q_chica) == len(q_grande)
+
+        # Los datos serializados siguen completos
+        orden = resp.get_json()['ordenes'][0]
+        assert orden['avance_real_kg'] == pytest.approx(30.0)
+        assert orden['avance_real_coladas'] == 300
+        assert orden['lotes'][0]['materiales'][0]['nombre'] == "PP-LIST"
+        assert orden['lotes'][0]['pigmentos'][0]['nombre'] == "PIG-LIST"
+        assert orden['lotes'][0]['Color'] == "ROJO-LIST"
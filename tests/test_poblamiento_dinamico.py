@@ -9,6 +9,7 @@ from app.models.receta_color import RecetaColorNormalizada
 from app.models.molde import Molde, Pieza
 from app.models.producto import ColorProducto, FamiliaColor, PiezaColor, Linea, Familia
 from app.models.materiales import Colorante
+from app.services.aprendizaje_service import procesar_trabajos
 from app.extensions import db
 
 
@@ -122,7 +123,7 @@ class TestMoldeOnTheFly:
         """
         Cuando se crea una OP con un molde_id que NO existe en el catálogo,
         el side-effect debe crear el Molde (y no romperse).
-        El molde_id referenciado no necesita existir — _aprender_de_op lo crea.
+        El molde_id referenciado no necesita existir — el worker de aprendizaje lo crea.
         """
         with app.app_context():
             # Confirmar que el molde no existe aún
@@ -149,14 +150,18 @@ class TestMoldeOnTheFly:
         assert resp.status_code == 201
 
         with app.app_context():
-            # El molde debe haber sido creado por _aprender_de_op
+            # La OP solo encola el aprendizaje: el molde aún no existe
+            assert db.session.get(Molde, "MOL-OTF-01") is None
+            procesar_trabajos()
+
+            # El molde debe haber sido creado por el worker de aprendizaje
             molde = db.session.get(Molde, "MOL-OTF-01")
             assert molde is not None
             assert molde.activo is True
 
     def test_molde_existente_no_es_sobreescrito(self, client, app):
         """
-        Si el molde YA EXISTE en el catálogo, _aprender_de_op NO lo toca.
+        Si el molde YA EXISTE en el catálogo, el worker de aprendizaje NO lo toca.
         El peso_tiro_gr original se preserva aunque el snapshot diga otro valor.
         """
         with app.app_context():
@@ -201,6 +206,7 @@ class TestMoldeOnTheFly:
         assert resp.status_code == 201
 
         with app.app_context():
+            procesar_trabajos()
             mp = Pieza.query.filter_by(molde_id="MOL-ORIG-01", pieza_sku="PIEZA-ORIG").first()
             # Debe mantenerse el valor original (45g), no el del snapshot (999g)
             assert mp.peso_unitario_gr == 45.0
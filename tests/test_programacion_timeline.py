@@ -0,0 +1,173 @@
+"""
+Tests del timeline de programación (GET /api/programacion/timeline):
+  1. Cola por máquina: inicio / fin proyectado y retraso
+  2. Conflictos del plan original y huecos ociosos en la ventana
+  3. Índice de intervalos == búsqueda lineal
+  4. Escala: cientos de máquinas y miles de OPs en menos de un segundo
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.maquina import Maquina
+from app.services.programacion_service import IndiceIntervalos, programar_planta
+from tests.test_ordenes_listado import contar_queries
+
+
+T0 = datetime(2025, 6, 2, 0, 0)
+
+
+def _op(numero_op, maquina, inicio_h, horas, horas_turno=24.0, activa=True):
+    return OrdenProduccion(
+        numero_op=numero_op, producto='PROD', molde='MOLDE', maquina_id=maquina.id,
+        fecha_inicio=T0 + timedelta(hours=inicio_h) if inicio_h is not None else None,
+        calculo_horas=horas, snapshot_horas_turno=horas_turno, activa=activa,
+    )
+
+
+def _poblar():
+    m1, m2, m3 = Maquina(nombre='PROG-1'), Maquina(nombre='PROG-2'), Maquina(nombre='PROG-3')
+    db.session.add_all([m1, m2, m3])
+    db.session.flush()
+    db.session.add_all([
+        # PROG-1: A [0,10) y B [5,15) se solapan → B se corre a 10; C arranca a 20 (hueco 15..20)
+        _op('OP-PA', m1, 0, 10),
+        _op('OP-PB', m1, 5, 10),
+        _op('OP-PC', m1, 20, 4),
+        _op('OP-PX', m1, 1, 100, activa=False),  # cerrada: no entra
+        # PROG-2: 12 h máquina con turno de 12 h/día → 24 h calendario; sin fecha → después
+        _op('OP-PD', m2, 0, 12, horas_turno=12.0),
+        _op('OP-PE', m2, None, 6),
+    ])
+    db.session.flush()
+    # fecha_inicio tiene default al insertar: se deja en NULL después
+    db.session.execute(db.update(OrdenProduccion).where(OrdenProduccion.numero_op == 'OP-PE')
+                       .values(fecha_inicio=None))
+    db.session.commit()
+    return m1, m2, m3
+
+
+def _maquina(data, nombre):
+    return next(m for m in data['maquinas'] if m['maquina'] == nombre)
+
+
+def test_cola_conflictos_y_huecos(client, app):
+    with app.app_context():
+        _poblar()
+
+    resp = client.get('/api/programacion/timeline?desde=2025-06-02T00:00&hasta=2025-06-03T00:00')
+    assert resp.status_code == 200
+    data = resp.get_json()
+
+    p1 = _maquina(data, 'PROG-1')
+    assert [o['numero_op'] for o in p1['ordenes']] == ['OP-PA', 'OP-PB', 'OP-PC']
+    pb = p1['ordenes'][1]
+    assert pb['posicion'] == 2
+    assert pb['inicio_proyectado'] == '2025-06-02T10:00:00'
+    assert pb['fin_proyectado'] == '2025-06-02T20:00:00'
+    assert pb['retraso_horas'] == 5.0
+    # C arranca justo cuando termina B: sin retraso ni hueco
+    assert p1['ordenes'][2]['inicio_proyectado'] == '2025-06-02T20:00:00'
+    assert p1['ordenes'][2]['retraso_horas'] == 0.0
+
+    assert p1['conflictos'] == [{
+        'op_a': 'OP-PA', 'op_b': 'OP-PB',
+        'desde': '2025-06-02T05:00:00', 'hasta': '2025-06-02T10:00:00', 'horas': 5.0,
+    }]
+    assert p1['huecos'] == []
+    assert p1['ocupacion_pct'] == 100.0
+
+    p2 = _maquina(data, 'PROG-2')
+    assert [o['numero_op'] for o in p2['ordenes']] == ['OP-PD']
+    assert p2['ordenes'][0]['fin_proyectado'] == '2025-06-03T00:00:00'
+    assert p2['ordenes_en_cola'] == 2
+    assert p2['conflictos'] == []
+
+    # Con `ahora` fijo, OP-PE (sin fecha) va detrás de OP-PD y la máquina queda libre al terminarla
+    with app.app_context():
+        from app.services.programacion_service import timeline_planta
+        data = timeline_planta(desde=T0, hasta=T0 + timedelta(days=1), ahora=T0)
+    p2 = _maquina(data, 'PROG-2')
+    assert p2['libre_desde'] == '2025-06-03T06:00:00'
+    assert _maquina(data, 'PROG-1')['libre_desde'] == '2025-06-03T00:00:00'
+    assert _maquina(data, 'PROG-3')['libre_desde'] == '2025-06-02T00:00:00'
+
+    data = resp.get_json()
+    p3 = _maquina(data, 'PROG-3')
+    assert p3['ordenes'] == []
+    assert p3['huecos'] == [{'desde': '2025-06-02T00:00:00', 'hasta': '2025-06-03T00:00:00', 'horas': 24.0}]
+    assert p3['ocupacion_pct'] == 0.0
+
+    assert data['resumen']['conflictos'] == 1
+    assert data['resumen']['ordenes'] == 5
+
+
+def test_hueco_entre_ordenes_y_filtro_maquina(client, app):
+    with app.app_context():
+        m1, _, _ = _poblar()
+        db.session.add(_op('OP-PF', m1, 30, 2))
+        db.session.commit()
+        m1_id = m1.id
+
+    resp = client.get(f'/api/programacion/timeline?maquina_id={m1_id}'
+                      f'&desde=2025-06-02T00:00&hasta=2025-06-03T12:00')
+    data = resp.get_json()
+    assert [m['maquina'] for m in data['maquinas']] == ['PROG-1']
+    assert data['maquinas'][0]['huecos'] == [
+        {'desde': '2025-06-03T00:00:00', 'hasta': '2025-06-03T06:00:00', 'horas': 6.0},
+        {'desde': '2025-06-03T08:00:00', 'hasta': '2025-06-03T12:00:00', 'horas': 4.0},
+    ]
+
+
+def test_timeline_dos_queries(client, app):
+    with app.app_context():
+        _poblar()
+        with contar_queries() as queries:
+            resp = client.get('/api/programacion/timeline?desde=2025-06-01')
+        assert resp.status_code == 200
+        assert len(queries) == 2
+
+
+def test_validaciones(client):
+    assert client.get('/api/programacion/timeline?desde=ayer').status_code == 400
+    assert client.get('/api/programacion/timeline?desde=2025-06-02&hasta=2025-06-01').status_code == 400
+    assert client.get('/api/programacion/timeline?desde=2025-01-01&hasta=2027-01-01').status_code == 400
+
+
+def test_indice_intervalos_equivale_a_busqueda_lineal():
+    rnd = random.Random(7)
+    intervalos = []
+    for i in range(400):
+        ini = T0 + timedelta(hours=rnd.uniform(0, 500))
+        intervalos.append((ini, ini + timedelta(hours=rnd.uniform(0, 40)), i))
+    indice = IndiceIntervalos(intervalos)
+
+    for _ in range(200):
+        a = T0 + timedelta(hours=rnd.uniform(-20, 520))
+        b = a + timedelta(hours=rnd.uniform(0.1, 60))
+        obtenidos = sorted(indice.datos[k] for k in indice.solapados(a, b))
+        esperados = sorted(d for ini, fin, d in intervalos if ini < b and fin > a)
+        assert obtenidos == esperados
+
+
+def test_escala_cientos_de_maquinas_miles_de_ops():
+    rnd = random.Random(3)
+    maquinas = [(i, f'M-{i:03d}') for i in range(300)]
+    ordenes = [
+        {
+            'numero_op': f'OP-{i:05d}', 'maquina_id': rnd.randrange(300),
+            'fecha_inicio': T0 + timedelta(hours=rnd.uniform(0, 24 * 60)) if rnd.random() > 0.05 else None,
+            'fecha_creacion': T0, 'horas': rnd.uniform(4, 120), 'horas_turno': rnd.choice([12.0, 22.0, 24.0]),
+        }
+        for i in range(5000)
+    ]
+    inicio = time.perf_counter()
+    data = programar_planta(maquinas, ordenes, T0, T0 + timedelta(days=30), T0)
+    assert time.perf_counter() - inicio < 1.0
+    assert data['resumen']['ordenes'] == 5000
+    # Las proyecciones nunca se solapan dentro de una máquina
+    for m in data['maquinas']:
+        fines = [(o['inicio_proyectado'], o['fin_proyectado']) for o in m['ordenes']]
+        assert all(fines[k][1] <= fines[k + 1][0] for k in range(len(fines) - 1))
@@ -0,0 +1,174 @@
+"""
+Tests de `flask recalcular-registros` (recalculo_service.recalcular_totales_registros):
+  1. Deja los totales que daría actualizar_totales con los bultos de control_peso
+     y el avance de las OPs consistente
+  2. Dry-run solo reporta diferencias
+  3. Checkpoint: tras un corte la siguiente ejecución sigue desde el último bloque
+  4. Número de consultas fijo por bloque, sin importar cuántos registros cambian
+"""
+import random
+
+import pytest
+
+from app.extensions import db
+from app.models.checkpoint_proceso import CheckpointProceso
+from app.models.control_peso import ControlPeso
+from app.models.registro import RegistroDiarioProduccion
+from app.services import recalculo_service
+from app.services.produccion_service import reconstruir_avance_ordenes
+from app.services.recalculo_service import PROCESO_TOTALES_REGISTROS, recalcular_totales_registros
+from tests.test_ordenes_listado import contar_queries
+from tests.test_registros_bulk import _setup, _hojas
+
+
+def _crear_con_deriva(client, app, n=30, seed=7):
+    """
+    Hojas cargadas por API + bultos insertados por fuera del ORM (sin pasar por
+    actualizar_totales) y avance de las OPs alineado a esos totales viejos.
+    """
+    with app.app_context():
+        maquina_ids = _setup()
+    assert client.post('/api/registros/bulk', json={'registros': _hojas(n, maquina_ids, seed=seed)}).status_code == 201
+
+    rnd = random.Random(seed)
+    with app.app_context():
+        ids = db.session.scalars(db.select(RegistroDiarioProduccion.id)).all()
+        bultos = [
+            {'registro_id': rid, 'peso_real_kg': round(rnd.uniform(5, 25), 3)}
+            for rid in rnd.sample(ids, n // 2) for _ in range(rnd.randint(1, 3))
+        ]
+        db.session.execute(db.insert(ControlPeso), bultos)
+        # Totales corrompidos a mano en algunos registros
+        db.session.execute(
+            db.update(RegistroDiarioProduccion)
+            .where(RegistroDiarioProduccion.id.in_(rnd.sample(ids, 5)))
+            .values(total_coladas_calculada=RegistroDiarioProduccion.total_coladas_calculada + 7)
+        )
+        db.session.commit()
+        reconstruir_avance_ordenes()
+
+
+def _esperado():
+    pesos = dict(db.session.execute(
+        db.select(ControlPeso.registro_id, db.func.sum(ControlPeso.peso_real_kg)).group_by(ControlPeso.registro_id)
+    ).all())
+    return {
+        r.id: RegistroDiarioProduccion.calcular_totales(
+            r.colada_inicial, r.colada_final, [d.coladas_realizadas for d in r.detalles],
+            r.snapshot_cavidades, r.snapshot_peso_neto_gr, r.snapshot_peso_colada_gr, pesos.get(r.id, 0.0),
+        )
+        for r in RegistroDiarioProduccion.query
+    }
+
+
+def _totales():
+    db.session.expire_all()
+    return {
+        r.id: (r.total_coladas_calculada, r.total_piezas_buenas, r.total_kg_real)
+        for r in RegistroDiarioProduccion.query
+    }
+
+
+def _aprox(totales):
+    return {rid: (c, p, pytest.approx(kg)) for rid, (c, p, kg) in totales.items()}
+
+
+def test_recalcula_como_actualizar_totales(client, app):
+    _crear_con_deriva(client, app)
+    with app.app_context():
+        esperado = _esperado()
+        assert _totales() != _aprox(esperado)
+
+        stats, diferencias = recalcular_totales_registros(chunk_size=7)
+        assert (stats['registros'], stats['bloques'], stats['desde_id']) == (30, 5, 0)
+        assert stats['corregidos'] == len(diferencias) >= 15
+        assert _totales() == _aprox(esperado)
+        # El avance de las OPs sigue a los registros corregidos
+        assert reconstruir_avance_ordenes(aplicar=False) == []
+
+        checkpoint = db.session.get(CheckpointProceso, PROCESO_TOTALES_REGISTROS)
+        assert (checkpoint.estado, checkpoint.procesados, checkpoint.corregidos) == ('COMPLETADO', 30, stats['corregidos'])
+
+        # Idempotente
+        assert recalcular_totales_registros()[0]['corregidos'] == 0
+
+
+def test_dry_run_no_modifica(client, app):
+    _crear_con_deriva(client, app)
+    with app.app_context():
+        antes = _totales()
+        stats, diferencias = recalcular_totales_registros(chunk_size=10, aplicar=False)
+        assert stats['corregidos'] == len(diferencias) > 0
+        assert _totales() == antes
+        assert db.session.get(CheckpointProceso, PROCESO_TOTALES_REGISTROS) is None
+
+        esperado = _esperado()
+        for d in diferencias:
+            coladas, piezas, kg = esperado[d['registro_id']]
+            assert (d['real']['coladas'], d['real']['piezas'], d['real']['kg']) == (coladas, piezas, pytest.approx(kg))
+            assert d['persistido']['coladas'] == antes[d['registro_id']][0]
+
+
+def test_reanuda_desde_el_checkpoint(client, app, monkeypatch):
+    _crear_con_deriva(client, app)
+    with app.app_context():
+        esperado = _esperado()
+
+        # Se corta en el tercer bloque: los dos primeros quedan commiteados
+        original = recalculo_service.sumar_avance_ordenes
+        llamadas = []
+
+        def _falla(session, deltas):
+            llamadas.append(1)
+            if len(llamadas) == 3:
+                raise RuntimeError('corte')
+            original(session, deltas)
+
+        monkeypatch.setattr(recalculo_service, 'sumar_avance_ordenes', _falla)
+        with pytest.raises(RuntimeError):
+            recalcular_totales_registros(chunk_size=5)
+        db.session.rollback()
+        monkeypatch.undo()
+
+        checkpoint = db.session.get(CheckpointProceso, PROCESO_TOTALES_REGISTROS)
+        assert checkpoint.estado == 'EN_CURSO'
+        assert checkpoint.ultimo_id > 0
+        corte = checkpoint.ultimo_id
+
+        stats, _ = recalcular_totales_registros(chunk_size=5)
+        assert stats['desde_id'] == corte
+        assert stats['registros'] == RegistroDiarioProduccion.query.filter(RegistroDiarioProduccion.id > corte).count()
+        assert _totales() == _aprox(esperado)
+        assert reconstruir_avance_ordenes(aplicar=False) == []
+
+        # Con el checkpoint COMPLETADO la siguiente ejecución recorre todo
+        assert recalcular_totales_registros()[0]['desde_id'] == 0
+
+
+def test_consultas_constantes_por_bloque(client, app):
+    _crear_con_deriva(client, app, n=24)
+    with app.app_context():
+        with contar_queries() as queries:
+            stats, _ = recalcular_totales_registros(chunk_size=12)
+        assert stats['bloques'] == 2
+        # Por bloque: ids, totales y claves del resumen de los corregidos; + el bloque vacío
+        por_bloque = [q for q in queries if 'registro_diario_produccion' in q and q.lstrip().upper().startswith('SELECT')]
+        assert len(por_bloque) == 2 * 3 + 1
+        assert not [q for q in queries if 'detalle_produccion_hora' in q and 'GROUP BY' not in q]
+
+
+def test_comando(client, app, runner):
+    _crear_con_deriva(client, app, n=10)
+
+    result = runner.invoke(args=['recalcular-registros', '--dry-run', '--chunk-size', '4'])
+    assert result.exit_code == 0
+    assert 'dry-run' in result.output
+    assert 'Registro ' in result.output
+
+    result = runner.invoke(args=['recalcular-registros', '--chunk-size', '4'])
+    assert result.exit_code == 0
+    assert 'registros corregidos en 3 bloques' in result.output
+
+    result = runner.invoke(args=['recalcular-registros', '--desde-cero'])
+    assert result.exit_code == 0
+    assert '10 registros consistentes' in result.output
@@ -0,0 +1,145 @@
+"""
+Tests del motor de recálculo masivo vectorizado (recalculo_service):
+los calculo_* deben ser idénticos a la cascada por objeto
+OrdenProduccion.actualizar_metricas() → LoteColor → SeCompone.
+"""
+import random
+from datetime import datetime
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion, SnapshotComposicionMolde
+from app.models.lote import LoteColor
+from app.models.recetas import SeCompone
+from app.models.materiales import MateriaPrima
+from app.models.producto import ProductoTerminado, FamiliaColor, ColorProducto
+from app.services.recalculo_service import recalcular_metricas_masivo
+from tests.conftest import get_or_create_test_dependencies
+
+
+COLS_ORDEN = [
+    'calculo_peso_neto_golpe', 'calculo_peso_tiro_gr', 'calculo_cavidades_totales',
+    'calculo_colores_activos', 'calculo_peso_produccion', 'calculo_merma_pct',
+    'calculo_peso_inc_merma', 'calculo_merma_natural_kg', 'calculo_horas',
+    'calculo_dias', 'calculo_fecha_fin', 'calculo_familia_color',
+]
+COLS_LOTE = ['calculo_coladas', 'calculo_kg_real', 'calculo_horas_hombre']
+
+
+def _poblar_aleatorio(n_ordenes, seed=7):
+    """OPs con casos variados: multipieza, sin colada, sin ciclo, turno 0, sin lotes, con familia."""
+    rnd = random.Random(seed)
+    fam = FamiliaColor(nombre="SOLIDO-RECALC")
+    db.session.add(fam)
+    db.session.flush()
+    linea_id, familia_id = get_or_create_test_dependencies()
+    db.session.add_all([
+        ProductoTerminado(cod_sku_pt="PT-REL", linea_id=linea_id, familia_id=familia_id,
+                          familia_color_id=fam.id),
+        ProductoTerminado(cod_sku_pt="PT-LEG", linea_id=linea_id, familia_id=familia_id,
+                          familia_color="CARAMELO"),
+    ])
+    color = ColorProducto(nombre="ROJO-RECALC", codigo=701)
+    mps = [MateriaPrima(nombre=f"MP-{i}", tipo="VIRGEN") for i in range(3)]
+    db.session.add_all([color] + mps)
+    db.session.flush()
+
+    for i in range(n_ordenes):
+        numero_op = f"OP-R{i:04d}"
+        op = OrdenProduccion(
+            numero_op=numero_op,
+            producto_sku=rnd.choice([None, "PT-REL", "PT-LEG"]),
+            fecha_inicio=datetime(2025, 1, 1, 7, 30) if i % 5 else None,
+            snapshot_tiempo_ciclo=rnd.choice([0.0, 17.3, 30.0, 41.7]),
+            snapshot_horas_turno=rnd.choice([24.0, 23.0, 0.0, 8.5]),
+            snapshot_peso_colada_gr=rnd.choice([0.0, 2.0, 13.7]),
+        )
+        db.session.add(op)
+        for _ in range(rnd.randint(0, 3)):
+            db.session.add(SnapshotComposicionMolde(
+                orden_id=numero_op,
+                cavidades=rnd.randint(1, 8),
+                peso_unit_gr=round(rnd.uniform(5, 300), 3),
+            ))
+        for _ in range(rnd.randint(0, 4)):
+            lote = LoteColor(numero_op=numero_op, color_id=color.id,
+                             meta_kg=round(rnd.uniform(0, 900), 3), personas=rnd.randint(1, 3))
+            db.session.add(lote)
+            db.session.flush()
+            for mp in rnd.sample(mps, rnd.randint(0, 3)):
+                db.session.add(SeCompone(lote_id=lote.id, materia_prima_id=mp.id,
+                                         fraccion=round(rnd.random(), 4)))
+    db.session.commit()
+
+
+def _leer_resultados():
+    db.session.expire_all()
+    ordenes = {
+        o.numero_op: tuple(getattr(o, c) for c in COLS_ORDEN)
+        for o in OrdenProduccion.query.all()
+    }
+    lotes = {l.id: tuple(getattr(l, c) for c in COLS_LOTE) for l in LoteColor.query.all()}
+    comps = {c.id: c.calculo_peso_kg for c in SeCompone.query.all()}
+    return ordenes, lotes, comps
+
+
+def _resetear_calculos():
+    db.session.execute(db.update(OrdenProduccion).values({c: None for c in COLS_ORDEN}))
+    db.session.execute(db.update(LoteColor).values({c: None for c in COLS_LOTE}))
+    db.session.execute(db.update(SeCompone).values(calculo_peso_kg=None))
+    db.session.commit()
+
+
+def test_vectorizado_identico_a_cascada_por_objeto(app):
+    with app.app_context():
+        _poblar_aleatorio(60)
+
+        # Referencia: cascada ORM por objeto (leyendo desde la BD)
+        db.session.expire_all()
+        for op in OrdenProduccion.query.all():
+            op.actualizar_metricas()
+        db.session.commit()
+        esperado = _leer_resultados()
+
+        _resetear_calculos()
+        stats = recalcular_metricas_masivo(chunk_size=7)
+        assert stats['ordenes'] == 60
+        assert stats['bloques'] == 9
+
+        obtenido = _leer_resultados()
+        assert obtenido[0] == esperado[0]   # igualdad exacta, sin tolerancia
+        assert obtenido[1] == esperado[1]
+        assert obtenido[2] == esperado[2]
+
+
+def test_dry_run_no_escribe_y_filtro_por_op(app):
+    with app.app_context():
+        _poblar_aleatorio(10)
+        _resetear_calculos()
+
+        stats = recalcular_metricas_masivo(aplicar=False)
+        assert stats['ordenes'] == 10
+        assert db.session.get(OrdenProduccion, "OP-R0001").calculo_merma_pct is None
+
+        recalcular_metricas_masivo(numero_ops=["OP-R0001"])
+        db.session.expire_all()
+        assert db.session.get(OrdenProduccion, "OP-R0001").calculo_merma_pct is not None
+        assert db.session.get(OrdenProduccion, "OP-R0002").calculo_merma_pct is None
+
+
+def test_comando_y_endpoint(app, client, runner):
+    with app.app_context():
+        _poblar_aleatorio(5)
+        _resetear_calculos()
+
+    result = runner.invoke(args=['recalcular-metricas', '--op', 'OP-R0000', '--chunk-size', '2'])
+    assert result.exit_code == 0
+    assert '1 órdenes' in result.output
+
+    resp = client.post('/api/admin/recalcular-metricas', json={'chunk_size': 2})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['ordenes'] == 5
+    assert data['bloques'] == 3
+
+    resp = client.post('/api/admin/recalcular-metricas', json={'numero_ops': 'OP-R0000'})
+    assert resp.status_code == 400
@@ -0,0 +1,125 @@
+"""
+Tests de RecetaColorNormalizada.absorber_muestras (upsert por conjunto):
+  1. Claves nuevas: mismo valor bit a bit que upsert() muestra a muestra
+  2. Claves existentes: se parte de la fila guardada, bit a bit == secuencial
+  3. Recetas genéricas (producto_sku NULL) no se duplican
+  4. Número de sentencias fijo, sin importar la cantidad de muestras
+"""
+import random
+
+import pytest
+
+from app.extensions import db
+from app.models.materiales import Colorante
+from app.models.producto import ColorProducto, ProductoTerminado, Linea, Familia
+from app.models.receta_color import RecetaColorNormalizada
+from tests.test_ordenes_listado import contar_queries
+
+
+@pytest.fixture
+def catalogo(app):
+    with app.app_context():
+        colores = [ColorProducto(nombre=f"COLOR BULK {i}", codigo=600 + i) for i in range(3)]
+        colorantes = [Colorante(nombre=f"PIG BULK {i}") for i in range(4)]
+        linea, familia = Linea.query.first(), Familia.query.first()
+        productos = [
+            ProductoTerminado(cod_sku_pt=f"PT-BULK-{i}", producto=f"PROD BULK {i}",
+                              linea_id=linea.id, familia_id=familia.id)
+            for i in range(2)
+        ]
+        db.session.add_all(colores + colorantes + productos)
+        db.session.commit()
+        return [c.id for c in colores], [c.id for c in colorantes], [p.cod_sku_pt for p in productos]
+
+
+def _muestras(catalogo, n, seed):
+    colores, colorantes, skus = catalogo
+    rnd = random.Random(seed)
+    return [
+        (rnd.choice(colores), rnd.choice(colorantes), rnd.choice(skus + [None]), rnd.uniform(0.01, 2.0))
+        for _ in range(n)
+    ]
+
+
+def _estado():
+    return {
+        (r.color_id, r.colorante_id, r.producto_sku): (r.gr_por_kg, r.n_muestras)
+        for r in RecetaColorNormalizada.query.all()
+    }
+
+
+def _secuencial(muestras):
+    """Referencia: upsert() clásico, una muestra a la vez."""
+    for color_id, colorante_id, sku, gr in muestras:
+        RecetaColorNormalizada.upsert(db.session, color_id, colorante_id, sku, gr)
+    db.session.flush()
+    estado = _estado()
+    db.session.rollback()
+    return estado
+
+
+def test_claves_nuevas_identicas_a_secuencial(app, catalogo):
+    muestras = _muestras(catalogo, 400, seed=5)
+    with app.app_context():
+        esperado = _secuencial(muestras)
+
+        afectadas = RecetaColorNormalizada.absorber_muestras(db.session, muestras)
+        db.session.commit()
+
+        assert afectadas == len(esperado)
+        assert _estado() == esperado
+
+
+def test_claves_existentes_identicas_a_secuencial(app, catalogo):
+    previas = _muestras(catalogo, 150, seed=1)
+    nuevas = _muestras(catalogo, 300, seed=2)
+    with app.app_context():
+        esperado = _secuencial(previas + nuevas)
+
+        RecetaColorNormalizada.absorber_muestras(db.session, previas)
+        db.session.commit()
+        RecetaColorNormalizada.absorber_muestras(db.session, nuevas)
+        db.session.commit()
+
+        assert _estado() == esperado
+
+
+def test_una_muestra_por_clave_es_la_formula_exacta(app, catalogo):
+    colores, colorantes, skus = catalogo
+    with app.app_context():
+        RecetaColorNormalizada.upsert(db.session, colores[0], colorantes[0], None, 0.3)
+        RecetaColorNormalizada.upsert(db.session, colores[0], colorantes[0], skus[0], 0.7)
+        db.session.commit()
+        receta = RecetaColorNormalizada.query.filter_by(producto_sku=None).one()
+        receta.absorber_nueva_muestra(0.45)
+        esperado = receta.gr_por_kg
+        db.session.rollback()
+
+        RecetaColorNormalizada.absorber_muestras(db.session, [
+            (colores[0], colorantes[0], None, 0.45),
+            (colores[0], colorantes[0], skus[0], 0.1),
+        ])
+        db.session.commit()
+
+        # La instancia cargada antes del upsert se refresca
+        assert receta.gr_por_kg == esperado
+        assert receta.n_muestras == 2
+        assert RecetaColorNormalizada.query.filter_by(producto_sku=None).count() == 1
+        assert RecetaColorNormalizada.query.count() == 2
+
+
+def test_sentencias_constantes(app, catalogo):
+    with app.app_context():
+        for n in (5, 500):
+            with contar_queries() as queries:
+                RecetaColorNormalizada.absorber_muestras(db.session, _muestras(catalogo, n, seed=n))
+            # SELECT ... FOR UPDATE de las filas existentes, un INSERT ... ON
+            # CONFLICT para específicas, otro para genéricas y el UPDATE de
+            # version_receta de los colores afectados
+            assert len(queries) == 4
+            assert queries[0].startswith('SELECT')
+            assert all('ON CONFLICT' in q for q in queries[1:3])
+            assert 'version_receta' in queries[3]
+            db.session.commit()
+
+        assert RecetaColorNormalizada.absorber_muestras(db.session, []) == 0
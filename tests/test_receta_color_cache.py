@@ -0,0 +1,153 @@
+"""
+Tests de la caché de prefill de /api/catalogo/receta-color:
+  1. Un acierto solo consulta color_producto (nombre + version_receta)
+  2. upsert / absorber_muestras / reconstrucción invalidan solo el color tocado
+  3. Otro worker que sube version_receta en la base invalida esta caché
+  4. Varios color_ids en una llamada: dos consultas en total
+"""
+import pytest
+
+from app.extensions import db
+from app.models.producto import ColorProducto, ProductoTerminado, Linea, Familia
+from app.models.receta_color import RecetaColorNormalizada
+from app.services.receta_color_service import cache_recetas, reconstruir_recetas
+from tests.test_ordenes_listado import contar_queries
+from tests.test_poblamiento_dinamico import _make_color, _make_colorante
+
+
+@pytest.fixture
+def recetas(app):
+    """Dos colores con receta genérica y una específica para PT-CACHE en el primero."""
+    rojo = _make_color(app, "ROJO CACHE", 801)
+    azul = _make_color(app, "AZUL CACHE", 802)
+    p1 = _make_colorante(app, "PIG CACHE 1")
+    p2 = _make_colorante(app, "PIG CACHE 2")
+    with app.app_context():
+        db.session.add(ProductoTerminado(cod_sku_pt="PT-CACHE", producto="PROD CACHE",
+                                         linea_id=Linea.query.first().id,
+                                         familia_id=Familia.query.first().id))
+        RecetaColorNormalizada.upsert(db.session, rojo, p1, None, 0.5)
+        RecetaColorNormalizada.upsert(db.session, rojo, p2, None, 0.2)
+        RecetaColorNormalizada.upsert(db.session, rojo, p1, "PT-CACHE", 0.9)
+        RecetaColorNormalizada.upsert(db.session, azul, p2, None, 1.5)
+        db.session.commit()
+    return rojo, azul, p1, p2
+
+
+def _get(client, query):
+    resp = client.get(f'/api/catalogo/receta-color?{query}')
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def _gr_por_kg(data):
+    return {p['colorante_id']: p['gr_por_kg'] for p in data['pigmentos']}
+
+
+def test_acierto_solo_consulta_la_version(app, client, recetas):
+    rojo, _, p1, p2 = recetas
+    with app.app_context():
+        with contar_queries() as queries:
+            primera = _get(client, f'color_id={rojo}&meta_kg=100')
+        assert len(queries) == 2
+
+        with contar_queries() as queries:
+            segunda = _get(client, f'color_id={rojo}&meta_kg=100')
+        assert len(queries) == 1
+        assert 'receta_color_normalizada' not in queries[0]
+
+    assert segunda == primera
+    assert _gr_por_kg(primera) == {p1: 0.5, p2: 0.2}
+    assert {p['colorante_id']: p['gramos'] for p in primera['pigmentos']} == {p1: 50.0, p2: 20.0}
+
+    # Específica primero, genérica como fallback (misma regla que antes)
+    data = _get(client, f'color_id={rojo}&producto_sku=PT-CACHE')
+    assert data['producto_sku'] == 'PT-CACHE'
+    assert _gr_por_kg(data) == {p1: 0.9, p2: 0.2}
+
+    assert client.get('/api/catalogo/receta-color?color_id=999999').status_code == 404
+
+
+def test_upsert_invalida_solo_el_color_tocado(app, client, recetas):
+    rojo, azul, p1, _ = recetas
+    _get(client, f'color_ids={rojo},{azul}')
+
+    with app.app_context():
+        versiones = {c.id: c.version_receta for c in ColorProducto.query.filter(ColorProducto.id.in_([rojo, azul]))}
+        RecetaColorNormalizada.upsert(db.session, rojo, p1, None, 1.5)  # promedio 0.5 → 1.0
+        db.session.commit()
+        assert db.session.get(ColorProducto, rojo).version_receta == versiones[rojo] + 1
+        assert db.session.get(ColorProducto, azul).version_receta == versiones[azul]
+
+        with contar_queries() as queries:
+            data = _get(client, f'color_ids={rojo},{azul}')
+        # Versión + recarga del rojo (el azul sigue en caché)
+        assert len(queries) == 2
+        assert len(cache_recetas()) == 2
+
+    rojo_data, azul_data = data['recetas']
+    assert _gr_por_kg(rojo_data)[p1] == pytest.approx(1.0)
+    assert rojo_data['n_muestras_min'] == 1
+    assert [p['n_muestras'] for p in rojo_data['pigmentos'] if p['colorante_id'] == p1] == [2]
+    assert azul_data['tiene_receta'] is True
+
+
+def test_absorber_muestras_y_reconstruccion_invalidan(app, client, recetas):
+    rojo, azul, p1, p2 = recetas
+    with app.app_context():
+        version_azul = db.session.get(ColorProducto, azul).version_receta
+
+    _get(client, f'color_id={rojo}')
+    with app.app_context():
+        RecetaColorNormalizada.absorber_muestras(db.session, [(rojo, p2, None, 0.4)])
+        db.session.commit()
+        assert db.session.get(ColorProducto, azul).version_receta == version_azul
+    assert _gr_por_kg(_get(client, f'color_id={rojo}'))[p2] == pytest.approx(0.3)
+
+    # Sin OPs en el histórico la reconstrucción vacía la tabla: ambos colores cambian
+    with app.app_context():
+        reconstruir_recetas()
+    for color_id in (rojo, azul):
+        data = _get(client, f'color_id={color_id}')
+        assert (data['tiene_receta'], data['pigmentos']) == (False, [])
+
+
+def test_otro_worker_invalida_por_version(app, client, recetas):
+    rojo, _, p1, _ = recetas
+    _get(client, f'color_id={rojo}')
+
+    with app.app_context():
+        # Lo que haría otro proceso: escribir la receta y subir la versión en la base
+        db.session.execute(
+            db.update(RecetaColorNormalizada)
+            .where(RecetaColorNormalizada.color_id == rojo, RecetaColorNormalizada.producto_sku.is_(None),
+                   RecetaColorNormalizada.colorante_id == p1)
+            .values(gr_por_kg=0.75)
+        )
+        db.session.commit()
+        # Sin subir la versión la caché de este worker no se entera
+        assert _gr_por_kg(_get(client, f'color_id={rojo}'))[p1] == 0.5
+
+        db.session.execute(
+            db.update(ColorProducto).where(ColorProducto.id == rojo)
+            .values(version_receta=ColorProducto.version_receta + 1)
+        )
+        db.session.commit()
+    assert _gr_por_kg(_get(client, f'color_id={rojo}'))[p1] == 0.75
+
+
+def test_varios_colores_en_una_llamada(app, client, recetas):
+    rojo, azul, _, _ = recetas
+    sin_receta = _make_color(app, "VERDE CACHE", 803)
+
+    with app.app_context():
+        with contar_queries() as queries:
+            data = _get(client, f'color_ids={azul},{rojo},999999,{sin_receta}&producto_sku=PT-CACHE')
+        assert len(queries) == 2
+
+    assert [r['color_id'] for r in data['recetas']] == [azul, rojo, sin_receta]
+    assert data['no_encontrados'] == [999999]
+    assert [r['producto_sku'] for r in data['recetas']] == [None, 'PT-CACHE', None]
+    assert data['recetas'][2]['tiene_receta'] is False
+
+    assert client.get('/api/catalogo/receta-color?color_ids=1,x').status_code == 400
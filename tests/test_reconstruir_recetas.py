@@ -0,0 +1,145 @@
+"""
+Tests de la reconstrucción de RecetaColorNormalizada desde el histórico:
+  1. Sin cambios en el histórico reproduce exactamente lo aprendido
+  2. Corrige la deriva tras editar / borrar pigmentos (dry-run solo reporta)
+  3. Las OPs con aprendizaje pendiente quedan fuera (las suma el worker)
+  4. Streaming por bloques: mismo resultado con cualquier chunk_size
+  5. Diferencias de redondeo no cuentan como deriva ni invalidan la caché
+"""
+import random
+
+import pytest
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.producto import ColorProducto
+from app.models.recetas import SeColorea
+from app.models.receta_color import RecetaColorNormalizada
+from app.services.aprendizaje_service import procesar_trabajos
+from app.services.receta_color_service import reconstruir_recetas
+from tests.test_aprendizaje_async import _payload
+
+
+@pytest.fixture
+def maquina_id(app):
+    with app.app_context():
+        maq = Maquina(nombre="INY-RECONS", tipo="INYECTORA")
+        db.session.add(maq)
+        db.session.commit()
+        return maq.id
+
+
+def _crear_historico(client, maquina_id, n=30, prefijo="OP-RC", seed=3):
+    rnd = random.Random(seed)
+    ordenes = [
+        _payload(f"{prefijo}-{i:03d}", maquina_id, [
+            (rnd.choice(["RC ROJO", "RC AZUL"]), rnd.choice([80.0, 150.0, 400.0]),
+             [(p, round(rnd.uniform(1, 60), 2)) for p in rnd.sample(["RC P1", "RC P2", "RC P3"], 2)])
+            for _ in range(rnd.randint(1, 3))
+        ])
+        for i in range(n)
+    ]
+    assert client.post('/api/ordenes/bulk', json={'ordenes': ordenes}).get_json()['success']
+
+
+def _recetas():
+    return {
+        (r.color_id, r.colorante_id, r.producto_sku): (r.gr_por_kg, r.n_muestras)
+        for r in RecetaColorNormalizada.query.all()
+    }
+
+
+def test_reconstruir_reproduce_lo_aprendido(client, app, maquina_id):
+    _crear_historico(client, maquina_id)
+    with app.app_context():
+        procesar_trabajos()
+        aprendido = _recetas()
+
+        stats = reconstruir_recetas(chunk_size=7)
+        assert stats['bloques'] > 1
+        assert (stats['nuevas'], stats['modificadas'], stats['eliminadas']) == (0, 0, 0)
+        assert stats['recetas'] == len(aprendido)
+        assert stats['muestras'] == sum(n for _, n in aprendido.values())
+        assert _recetas() == aprendido
+
+
+def test_reconstruir_corrige_deriva(client, app, maquina_id):
+    _crear_historico(client, maquina_id)
+    with app.app_context():
+        procesar_trabajos()
+        antes = _recetas()
+
+        # Se edita un pigmento y se borra otro: las recetas acumuladas quedaron viejas
+        pigmentos = SeColorea.query.order_by(SeColorea.id).all()
+        pigmentos[0].gramos *= 3
+        db.session.delete(pigmentos[1])
+        db.session.commit()
+
+        stats = reconstruir_recetas(aplicar=False)
+        assert stats['modificadas'] >= 1
+        assert _recetas() == antes  # dry-run no toca la tabla
+
+        reconstruir_recetas()
+        despues = _recetas()
+        assert despues != antes
+        assert sum(n for _, n in despues.values()) == stats['muestras']
+
+        # La reconstrucción es idempotente
+        assert reconstruir_recetas()['modificadas'] == 0
+        assert _recetas() == despues
+
+
+def test_redondeo_no_es_deriva(client, app, maquina_id):
+    _crear_historico(client, maquina_id)
+    with app.app_context():
+        procesar_trabajos()
+        # Mismo promedio salvo el último bit (orden distinto de las sumas)
+        db.session.execute(db.update(RecetaColorNormalizada).values(
+            gr_por_kg=RecetaColorNormalizada.gr_por_kg * (1 + 1e-15)
+        ))
+        db.session.commit()
+        versiones = dict(db.session.execute(db.select(ColorProducto.id, ColorProducto.version_receta)).all())
+
+        stats = reconstruir_recetas()
+        assert (stats['nuevas'], stats['modificadas'], stats['eliminadas']) == (0, 0, 0)
+        assert dict(db.session.execute(db.select(ColorProducto.id, ColorProducto.version_receta)).all()) == versiones
+
+
+def test_excluye_ops_con_aprendizaje_pendiente(client, app, maquina_id):
+    _crear_historico(client, maquina_id, n=10)
+    with app.app_context():
+        procesar_trabajos()
+    _crear_historico(client, maquina_id, n=5, prefijo="OP-RC-NUEVA", seed=9)
+
+    with app.app_context():
+        aprendido = _recetas()
+        reconstruir_recetas()
+        assert _recetas() == aprendido  # las 5 nuevas aún no cuentan
+
+        procesar_trabajos()
+        tras_worker = _recetas()
+        reconstruir_recetas()
+        # El worker siguió el promedio desde lo existente: mismo valor bit a bit
+        assert _recetas() == tras_worker
+
+
+def test_endpoint_y_comando(client, app, runner, maquina_id):
+    _crear_historico(client, maquina_id, n=8)
+    with app.app_context():
+        procesar_trabajos()
+        db.session.execute(db.update(RecetaColorNormalizada).values(n_muestras=999))
+        db.session.commit()
+
+    resp = client.post('/api/catalogo/receta-color/reconstruir', json={'dry_run': True})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['dry_run'] is True
+    assert data['modificadas'] == data['recetas'] > 0
+
+    assert client.post('/api/catalogo/receta-color/reconstruir', json={'chunk_size': 0}).status_code == 400
+
+    result = runner.invoke(args=['reconstruir-recetas-color', '--chunk-size', '3'])
+    assert result.exit_code == 0
+    assert f"{data['modificadas']} modificadas" in result.output
+    with app.app_context():
+        assert max(n for _, n in _recetas().values()) < 999
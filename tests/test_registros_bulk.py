@@ -0,0 +1,163 @@
+"""
+Tests de POST /api/registros/bulk (talonario de hojas RDP):
+  1. Equivale a cargar cada hoja con POST /ordenes/<op>/registros
+     (totales, detalles, avance real y versión de las OPs)
+  2. Errores por hoja: OP cerrada / inexistente, máquina, datos inválidos
+  3. Validación por conjunto: consultas fijas sin importar la cantidad de hojas
+"""
+import random
+
+import pytest
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from tests.test_ordenes_listado import contar_queries
+
+
+def _setup():
+    maquinas = [Maquina(nombre=f"INY-BULK-{i}", tipo="INYECTORA") for i in range(2)]
+    db.session.add_all(maquinas)
+    db.session.flush()
+    for k in range(3):
+        db.session.add(OrdenProduccion(
+            numero_op=f"OP-BULK-{k}", maquina_id=maquinas[0].id, activa=k < 2,
+            calculo_cavidades_totales=2 + k, calculo_peso_neto_golpe=40.0 + k, snapshot_peso_colada_gr=6.0,
+        ))
+    db.session.commit()
+    return [m.id for m in maquinas]
+
+
+def _hojas(n, maquina_ids, seed=3):
+    rnd = random.Random(seed)
+    hojas = []
+    for i in range(n):
+        ini = rnd.choice([0, 1000])
+        detalles = [
+            {"hora": f"{7 + h:02d}:00", "coladas": rnd.randint(0, 60), "maquinista": "OPE", "color": "ROJO"}
+            for h in range(rnd.randint(0, 11))
+        ]
+        hojas.append({
+            "numero_op": f"OP-BULK-{rnd.randrange(2)}",
+            "maquina_id": rnd.choice(maquina_ids),
+            "fecha": f"2025-05-{1 + i % 28:02d}",
+            "turno": rnd.choice(["DIURNO", "NOCTURNO"]),
+            "hora_inicio": "07:00",
+            # Sin contadores el total sale de los detalles
+            "colada_inicial": ini,
+            "colada_final": ini + rnd.randint(0, 500) if ini else 0,
+            "tiempo_ciclo": 25.0,
+            "detalles": detalles,
+        })
+    return hojas
+
+
+def _estado():
+    db.session.expire_all()
+    registros = [
+        (r.orden_id, r.maquina_id, r.fecha, r.turno, r.colada_inicial, r.colada_final,
+         r.total_coladas_calculada, r.total_piezas_buenas, pytest.approx(r.total_kg_real),
+         r.snapshot_cavidades, r.tiempo_ciclo_reportado,
+         [(d.hora, d.coladas_realizadas, d.cantidad_piezas, pytest.approx(d.kg_producidos))
+          for d in sorted(r.detalles, key=lambda d: d.id)])
+        for r in RegistroDiarioProduccion.query.order_by(RegistroDiarioProduccion.id)
+    ]
+    ordenes = {
+        o.numero_op: (pytest.approx(o.calculo_avance_real_kg or 0.0), o.calculo_avance_real_coladas or 0)
+        for o in OrdenProduccion.query
+    }
+    return registros, ordenes
+
+
+def test_bulk_equivale_a_hoja_por_hoja(client, app):
+    with app.app_context():
+        maquina_ids = _setup()
+        versiones = {o.numero_op: o.version for o in OrdenProduccion.query}
+    hojas = _hojas(40, maquina_ids)
+
+    for hoja in hojas:
+        assert client.post(f"/api/ordenes/{hoja['numero_op']}/registros", json=hoja).status_code == 201
+    with app.app_context():
+        esperado = _estado()
+        db.session.execute(db.delete(DetalleProduccionHora))
+        db.session.execute(db.delete(RegistroDiarioProduccion))
+        db.session.execute(db.update(OrdenProduccion).values(calculo_avance_real_kg=0.0, calculo_avance_real_coladas=0))
+        db.session.commit()
+        versiones_antes = {o.numero_op: o.version for o in OrdenProduccion.query}
+
+    resp = client.post('/api/registros/bulk', json={'registros': hojas})
+    assert resp.status_code == 201
+    data = resp.get_json()
+    assert data['success'] is True
+    assert [r['index'] for r in data['resultados']] == list(range(40))
+
+    with app.app_context():
+        assert _estado() == esperado
+        # Hojas sin contadores: el total sale de los detalles
+        sin_contadores = [r for r in esperado[0] if r[4] == 0]
+        assert sin_contadores and all(r[6] == sum(d[1] for d in r[11]) for r in sin_contadores)
+        # La versión sube una vez por OP tocada (ETag de sus vistas)
+        for o in OrdenProduccion.query:
+            tocada = o.numero_op in {h['numero_op'] for h in hojas}
+            assert o.version == versiones_antes[o.numero_op] + (1 if tocada else 0)
+        assert versiones['OP-BULK-2'] == versiones_antes['OP-BULK-2']
+        ids = {r['id'] for r in data['resultados']}
+        assert ids == {r.id for r in RegistroDiarioProduccion.query}
+
+
+def test_errores_por_hoja(client, app):
+    with app.app_context():
+        maquina_ids = _setup()
+    base = _hojas(1, maquina_ids)[0]
+    hojas = [
+        base,
+        {**base, 'numero_op': 'OP-BULK-2'},
+        {**base, 'numero_op': 'OP-NO-EXISTE'},
+        {**base, 'maquina_id': 9999},
+        {**base, 'fecha': '31/05/2025'},
+        {**base, 'colada_final': 'mucho'},
+        {**base, 'detalles': [{'coladas': 5}]},
+        {k: v for k, v in base.items() if k != 'numero_op'},
+        'hoja',
+        {**base, 'turno': 'NOCTURNO'},
+    ]
+    data = client.post('/api/registros/bulk', json={'registros': hojas}).get_json()
+    assert data['success'] is False
+    assert data['message'] == "Creados 2 registros, 8 con errores"
+    assert [(r['success'], r.get('error')) for r in data['resultados']] == [
+        (True, None),
+        (False, 'No se pueden crear registros para una Orden cerrada'),
+        (False, 'Orden no encontrada'),
+        (False, 'Máquina 9999 no encontrada'),
+        (False, "fecha inválida: '31/05/2025'"),
+        (False, "colada_final debe ser entero: 'mucho'"),
+        (False, 'Detalle 0: hora requerida'),
+        (False, 'Número de OP requerido'),
+        (False, 'Cada hoja debe ser un objeto JSON'),
+        (True, None),
+    ]
+    with app.app_context():
+        assert RegistroDiarioProduccion.query.count() == 2
+
+    # Todas inválidas: 400 y nada escrito
+    resp = client.post('/api/registros/bulk', json={'registros': hojas[1:4]})
+    assert resp.status_code == 400
+    assert client.post('/api/registros/bulk', json={'registros': []}).status_code == 400
+    with app.app_context():
+        assert RegistroDiarioProduccion.query.count() == 2
+
+
+def test_consultas_fijas(client, app):
+    with app.app_context():
+        maquina_ids = _setup()
+
+        def _medir(hojas):
+            with contar_queries() as queries:
+                assert client.post('/api/registros/bulk', json={'registros': hojas}).status_code == 201
+            selects = [q for q in queries if q.lstrip().upper().startswith('SELECT')]
+            detalles = [q for q in queries if 'INSERT INTO detalle_produccion_hora' in q]
+            updates = [q for q in queries if q.lstrip().upper().startswith('UPDATE')]
+            return len(selects), len(detalles), len(updates)
+
+        assert _medir(_hojas(3, maquina_ids, seed=1)) == _medir(_hojas(80, maquina_ids, seed=2)) == (2, 1, 1)
@@ -0,0 +1,151 @@
+"""
+Tests de GET /api/registros (vista global del dashboard):
+  1. Paginación por cursor sobre fecha DESC, id DESC: recorre todo sin repetir
+  2. Filtros por rango de fechas, máquina, turno, OP y OP activa
+  3. Una sola consulta por página (orden.activa va en el JOIN)
+  4. ?aggregate=dia|maquina|orden: totales calculados en SQL
+"""
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+from tests.test_ordenes_listado import contar_queries
+
+
+def _poblar(n=60, seed=8):
+    """n registros repartidos en 3 OPs (la última inactiva), 2 máquinas, 10 días y 2 turnos."""
+    rnd = random.Random(seed)
+    maquinas = [Maquina(nombre=f"INY-REG-{i}", tipo="INYECTORA") for i in range(2)]
+    db.session.add_all(maquinas)
+    db.session.flush()
+    for k in range(3):
+        db.session.add(OrdenProduccion(numero_op=f"OP-REG-{k}", maquina_id=maquinas[0].id, activa=k < 2))
+    db.session.flush()
+    db.session.execute(db.insert(RegistroDiarioProduccion), [
+        {
+            'orden_id': f"OP-REG-{rnd.randrange(3)}",
+            'maquina_id': rnd.choice(maquinas).id,
+            'fecha': date(2025, 3, 1) + timedelta(days=rnd.randrange(10)),
+            'turno': rnd.choice(["DIURNO", "NOCTURNO"]),
+            'total_coladas_calculada': rnd.randint(0, 500),
+            'total_piezas_buenas': rnd.randint(0, 2000),
+            'total_kg_real': round(rnd.uniform(0, 80), 3),
+        }
+        for _ in range(n)
+    ])
+    db.session.commit()
+    return {
+        r.id: r
+        for r in db.session.scalars(db.select(RegistroDiarioProduccion).options(
+            db.joinedload(RegistroDiarioProduccion.orden), db.joinedload(RegistroDiarioProduccion.maquina)))
+    }
+
+
+def _paginas(client, query=''):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        url = f'/api/registros?{query}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        ids.extend(r['id'] for r in data['registros'])
+        paginas += 1
+        cursor = data['pagination']['next_cursor']
+        assert data['pagination']['has_more'] is (cursor is not None)
+        if not cursor:
+            return ids, paginas
+
+
+def test_paginacion_por_cursor(client, app):
+    with app.app_context():
+        registros = _poblar()
+        esperado = [r.id for r in sorted(registros.values(), key=lambda r: (r.fecha, r.id), reverse=True)]
+
+    ids, paginas = _paginas(client, 'limit=7')
+    assert ids == esperado
+    assert paginas == 9
+
+    fila = client.get('/api/registros?limit=1').get_json()['registros'][0]
+    assert set(fila) == {'id', 'orden_id', 'fecha', 'turno', 'maquina_id', 'total_coladas',
+                         'total_kg', 'total_piezas', 'orden_activa'}
+
+    assert client.get('/api/registros?cursor=basura').status_code == 400
+    assert client.get('/api/registros?desde=ayer').status_code == 400
+
+
+def test_filtros(client, app):
+    with app.app_context():
+        registros = _poblar()
+        maquina_id = next(iter(registros.values())).maquina_id
+
+    def _esperado(pred):
+        return sorted((r.id for r in registros.values() if pred(r)),
+                      key=lambda i: (registros[i].fecha, i), reverse=True)
+
+    casos = {
+        'desde=2025-03-03&hasta=2025-03-05': lambda r: date(2025, 3, 3) <= r.fecha <= date(2025, 3, 5),
+        'fecha=2025-03-04': lambda r: r.fecha == date(2025, 3, 4),
+        f'maquina_id={maquina_id}&turno=NOCTURNO': lambda r: r.maquina_id == maquina_id and r.turno == 'NOCTURNO',
+        'orden_id=OP-REG-1': lambda r: r.orden_id == 'OP-REG-1',
+        'activa=false': lambda r: not r.orden.activa,
+        'activa=true&desde=2025-03-06': lambda r: r.orden.activa and r.fecha >= date(2025, 3, 6),
+    }
+    for query, pred in casos.items():
+        ids, _ = _paginas(client, f'{query}&limit=5')
+        assert ids == _esperado(pred), query
+
+    filas = client.get('/api/registros?activa=false').get_json()['registros']
+    assert filas and {f['orden_activa'] for f in filas} == {False}
+
+
+def test_una_consulta_por_pagina(client, app):
+    with app.app_context():
+        _poblar(n=120)
+        for limit in (5, 100):
+            with contar_queries() as queries:
+                assert client.get(f'/api/registros?limit={limit}').status_code == 200
+            assert len(queries) == 1
+
+
+def test_agregados_en_sql(client, app):
+    with app.app_context():
+        registros = _poblar()
+
+    def _esperado(clave, pred=lambda r: True):
+        grupos = defaultdict(lambda: [0, 0.0, 0, 0])
+        for r in registros.values():
+            if pred(r):
+                g = grupos[clave(r)]
+                g[0] += 1
+                g[1] += r.total_kg_real
+                g[2] += r.total_coladas_calculada
+                g[3] += r.total_piezas_buenas
+        return grupos
+
+    with app.app_context():
+        with contar_queries() as queries:
+            data = client.get('/api/registros?aggregate=dia').get_json()
+        assert len(queries) == 1
+    esperado = _esperado(lambda r: r.fecha.isoformat())
+    assert [g['fecha'] for g in data['grupos']] == sorted(esperado)
+    for g in data['grupos']:
+        n, kg, coladas, piezas = esperado[g['fecha']]
+        assert (g['registros'], g['total_coladas'], g['total_piezas']) == (n, coladas, piezas)
+        assert g['total_kg'] == pytest.approx(kg)
+    assert data['totales']['registros'] == len(registros)
+
+    data = client.get('/api/registros?aggregate=maquina&activa=true').get_json()
+    esperado = _esperado(lambda r: r.maquina.nombre, lambda r: r.orden.activa)
+    assert {g['maquina']: g['registros'] for g in data['grupos']} == {k: v[0] for k, v in esperado.items()}
+
+    data = client.get('/api/registros?aggregate=orden&desde=2025-03-05').get_json()
+    esperado = _esperado(lambda r: r.orden_id, lambda r: r.fecha >= date(2025, 3, 5))
+    assert {g['orden_id']: g['total_kg'] for g in data['grupos']} == {
+        k: pytest.approx(v[1]) for k, v in esperado.items()
+    }
+
+    assert client.get('/api/registros?aggregate=semana').status_code == 400
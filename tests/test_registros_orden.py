@@ -0,0 +1,100 @@
+"""
+Tests de GET /api/ordenes/<op>/registros (vista por OP):
+  1. Consultas fijas: versión + registros/máquina (JOIN) + detalles (un IN),
+     sin importar cuántos turnos y detalles tenga la OP
+  2. Paginación por rango de fechas con X-Siguiente-Desde
+  3. detalles=false omite los detalles (y su consulta)
+"""
+from datetime import date, timedelta
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from tests.test_ordenes_listado import contar_queries
+
+
+def _poblar(numero_op, dias, detalles_por_turno=11):
+    """Dos turnos por día, cada uno con sus detalles horarios."""
+    maquina = Maquina.query.filter_by(nombre="INY-VISTA").first()
+    if maquina is None:
+        maquina = Maquina(nombre="INY-VISTA", tipo="INYECTORA")
+        db.session.add(maquina)
+        db.session.flush()
+    db.session.add(OrdenProduccion(numero_op=numero_op, maquina_id=maquina.id))
+    db.session.flush()
+    for k in range(dias):
+        for turno in ("DIURNO", "NOCTURNO"):
+            registro = RegistroDiarioProduccion(
+                orden_id=numero_op, maquina_id=maquina.id, fecha=date(2025, 4, 1) + timedelta(days=2 * k),
+                turno=turno, colada_inicial=0, colada_final=10 * detalles_por_turno,
+            )
+            registro.detalles = [
+                DetalleProduccionHora(hora=f"{7 + h:02d}:00", coladas_realizadas=10)
+                for h in range(detalles_por_turno)
+            ]
+            db.session.add(registro)
+    db.session.commit()
+
+
+def _medir(client, url):
+    with contar_queries() as queries:
+        resp = client.get(url)
+    assert resp.status_code == 200
+    return resp, len(queries)
+
+
+def test_consultas_fijas(client, app):
+    with app.app_context():
+        _poblar("OP-VISTA-CHICA", dias=1, detalles_por_turno=1)
+        _poblar("OP-VISTA-LARGA", dias=300)
+
+        resp, chica = _medir(client, '/api/ordenes/OP-VISTA-CHICA/registros')
+        resp, larga = _medir(client, '/api/ordenes/OP-VISTA-LARGA/registros')
+        assert chica == larga == 3
+
+        data = resp.get_json()
+        assert len(data) == 600
+        assert all(len(fila['detalles']) == 11 for fila in data)
+        assert data[0]['Maquina'] == "INY-VISTA"
+        assert [d['hora'] for d in data[0]['detalles']][:2] == ["07:00", "08:00"]
+        fechas = [(fila['FECHA'], fila['ID Registro']) for fila in data]
+        assert fechas == sorted(fechas)
+
+        resp, sin_detalles = _medir(client, '/api/ordenes/OP-VISTA-LARGA/registros?detalles=false')
+        assert sin_detalles == 2
+        assert 'detalles' not in resp.get_json()[0]
+
+
+def test_paginacion_por_fechas(client, app):
+    with app.app_context():
+        _poblar("OP-VISTA-PAG", dias=10, detalles_por_turno=2)
+
+    ids, desde, paginas = [], "2025-04-01", 0
+    while desde:
+        hasta = (date.fromisoformat(desde) + timedelta(days=4)).isoformat()
+        resp = client.get(f'/api/ordenes/OP-VISTA-PAG/registros?desde={desde}&hasta={hasta}')
+        filas = resp.get_json()
+        assert filas and all(desde <= f['FECHA'] <= hasta for f in filas)
+        ids.extend(f['ID Registro'] for f in filas)
+        desde = resp.headers.get('X-Siguiente-Desde')
+        paginas += 1
+    assert paginas == 4   # días 1,3,5 | 7,9,11 | 13,15,17 | 19
+    assert len(ids) == len(set(ids)) == 20
+
+    # Cada rango tiene su propio ETag
+    completa = client.get('/api/ordenes/OP-VISTA-PAG/registros')
+    parcial = client.get('/api/ordenes/OP-VISTA-PAG/registros?hasta=2025-04-03')
+    assert completa.headers['ETag'] != parcial.headers['ETag']
+    assert 'X-Siguiente-Desde' not in completa.headers
+
+    # El frontend (otro origen) puede leer los headers de paginación / versión
+    cors = client.get('/api/ordenes/OP-VISTA-PAG/registros?hasta=2025-04-03',
+                      headers={'Origin': 'http://frontend.local'})
+    expuestos = {h.strip() for h in cors.headers['Access-Control-Expose-Headers'].split(',')}
+    assert {'ETag', 'X-Siguiente-Desde'} <= expuestos
+    resp = client.get('/api/ordenes/OP-VISTA-PAG/registros?hasta=2025-04-03',
+                      headers={'If-None-Match': parcial.headers['ETag']})
+    assert resp.status_code == 304
+
+    assert client.get('/api/ordenes/OP-VISTA-PAG/registros?desde=mañana').status_code == 400
@@ -0,0 +1,118 @@
+"""
+Tests de GET /api/dashboard/oee (rendimiento por máquina desde los registros):
+  1. Disponibilidad, rendimiento y calidad sobre sumas, con valores a mano
+  2. Agrupación por turno / día y filtros
+  3. Una sola consulta, sin importar la cantidad de registros
+"""
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from tests.test_ordenes_listado import contar_queries
+
+
+def _registro(op, maquina_id, fecha, turno, horas, ciclo=25.0, pesado_kg=0.0):
+    """Registro con un detalle por hora (coladas por hora en `horas`) y bultos opcionales."""
+    coladas = sum(horas)
+    registro = RegistroDiarioProduccion(
+        orden_id=op, maquina_id=maquina_id, fecha=fecha, turno=turno, colada_inicial=0, colada_final=0,
+        tiempo_ciclo_reportado=ciclo, cantidad_por_hora_meta=100,
+        snapshot_cavidades=2, snapshot_peso_neto_gr=90.0, snapshot_peso_colada_gr=10.0,
+        total_coladas_calculada=coladas, total_piezas_buenas=coladas * 2, total_kg_real=coladas * 0.1,
+        pesaje_n=2 if pesado_kg else 0, pesaje_suma_kg=pesado_kg,
+    )
+    registro.detalles = [
+        DetalleProduccionHora(hora=f"{7 + h:02d}:00", coladas_realizadas=c) for h, c in enumerate(horas)
+    ]
+    db.session.add(registro)
+
+
+@pytest.fixture
+def planta(app):
+    with app.app_context():
+        maquinas = [Maquina(nombre=f"INY-OEE-{i}", tipo="INYECTORA") for i in range(2)]
+        db.session.add_all(maquinas)
+        db.session.flush()
+        db.session.add(OrdenProduccion(numero_op="OP-OEE-1", maquina_id=maquinas[0].id, snapshot_tiempo_ciclo=36.0))
+        db.session.add(OrdenProduccion(numero_op="OP-OEE-2", maquina_id=maquinas[1].id, snapshot_tiempo_ciclo=0.0))
+        m1, m2 = maquinas[0].id, maquinas[1].id
+        # Máquina 1: 4 horas de hoja, 3 con producción; estándar 36 s → 100 coladas/hora
+        _registro("OP-OEE-1", m1, date(2025, 3, 1), "DIURNO", [100, 80, 0, 60], pesado_kg=22.0)
+        _registro("OP-OEE-1", m1, date(2025, 3, 2), "NOCTURNO", [50, 0], ciclo=40.0)
+        # Máquina 2: OP sin ciclo estándar (sin rendimiento)
+        _registro("OP-OEE-2", m2, date(2025, 3, 1), "DIURNO", [10, 10])
+        # Fuera de rango
+        _registro("OP-OEE-1", m1, date(2025, 4, 1), "DIURNO", [100])
+        db.session.commit()
+        return m1, m2
+
+
+def _get(client, query):
+    resp = client.get(f'/api/dashboard/oee?{query}')
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_indicadores_por_maquina(client, planta):
+    m1, m2 = planta
+    data = _get(client, 'desde=2025-03-01&hasta=2025-03-31')
+    assert data['agrupar'] == ['maquina']
+    primera, segunda = data['grupos']
+
+    assert (primera['maquina_id'], primera['maquina'], primera['registros']) == (m1, 'INY-OEE-0', 2)
+    assert (primera['horas_planificadas'], primera['horas_produccion']) == (6, 4)
+    assert primera['disponibilidad'] == pytest.approx(4 / 6)
+    assert primera['coladas_reales'] == 290
+    assert primera['coladas_teoricas'] == pytest.approx(400)
+    assert primera['rendimiento'] == pytest.approx(290 / 400)
+    # Calidad solo con los registros pesados: 22 kg pesados vs 240 coladas × 100 g
+    assert (primera['kg_teorico'], primera['kg_teorico_pesado']) == (pytest.approx(29.0), pytest.approx(24.0))
+    assert primera['calidad'] == pytest.approx(22 / 24)
+    assert primera['oee'] == pytest.approx(4 / 6 * 290 / 400 * 22 / 24)
+    assert (primera['ciclo_reportado'], primera['ciclo_estandar']) == (pytest.approx(32.5), pytest.approx(36.0))
+    assert (primera['piezas'], primera['piezas_meta']) == (580, 600)
+
+    assert segunda['maquina_id'] == m2
+    assert (segunda['coladas_teoricas'], segunda['rendimiento'], segunda['oee']) == (0, None, None)
+    assert segunda['disponibilidad'] == 1.0
+
+    totales = data['totales']
+    assert totales['registros'] == 3
+    assert totales['disponibilidad'] == pytest.approx(6 / 8)
+    assert totales['rendimiento'] == pytest.approx(290 / 400)
+
+
+def test_agrupacion_y_filtros(client, planta):
+    m1, _ = planta
+    por_turno = _get(client, f'desde=2025-03-01&hasta=2025-03-31&maquina_id={m1}&agrupar=turno')
+    assert por_turno['agrupar'] == ['maquina', 'turno']
+    assert [(g['turno'], g['horas_produccion']) for g in por_turno['grupos']] == [('DIURNO', 3), ('NOCTURNO', 1)]
+    assert por_turno['grupos'][1]['calidad'] is None
+
+    por_dia = _get(client, f'maquina_id={m1}&agrupar=dia,maquina')
+    assert [g['fecha'] for g in por_dia['grupos']] == ['2025-03-01', '2025-03-02', '2025-04-01']
+
+    solo_diurno = _get(client, 'hasta=2025-03-31&turno=DIURNO')
+    assert solo_diurno['totales']['registros'] == 2
+
+    assert client.get('/api/dashboard/oee?agrupar=semana').status_code == 400
+    assert client.get('/api/dashboard/oee?desde=marzo').status_code == 400
+
+
+def test_una_consulta(client, app, planta):
+    m1, _ = planta
+    with app.app_context():
+        with contar_queries() as queries:
+            _get(client, 'agrupar=turno,dia')
+        assert len(queries) == 1
+
+        for d in range(1, 29):
+            _registro("OP-OEE-1", m1, date(2025, 2, d), "DIURNO", [100] * 12)
+        db.session.commit()
+        with contar_queries() as queries:
+            assert _get(client, 'agrupar=turno,dia')['totales']['registros'] == 32
+        assert len(queries) == 1
@@ -0,0 +1,171 @@
+"""
+Tests del resumen de producción (día × máquina × OP × turno):
+  1. Se mantiene en línea con cada alta / edición / baja de registros,
+     detalles y bultos, también en las escrituras por lote (sync,
+     recalcular-registros): igual a reconstruirlo desde cero
+  2. Backfill por ventanas de fechas; dry-run solo reporta
+  3. GET /api/dashboard/produccion lee solo el rollup
+"""
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from app.models.resumen_produccion import ResumenProduccion
+from app.services.resumen_service import reconstruir_resumen
+from tests.test_ordenes_listado import contar_queries
+from tests.test_registros_bulk import _setup, _hojas
+from tests.test_sync_pesajes_lote import _pesaje
+
+
+def _resumen():
+    db.session.expire_all()
+    return {
+        (r.fecha, r.maquina_id, r.orden_id, r.turno): (
+            r.registros, r.coladas, r.piezas, pytest.approx(r.kg_teorico), pytest.approx(r.kg_pesado),
+            r.bultos, r.horas_produccion,
+        )
+        for r in ResumenProduccion.query
+    }
+
+
+def _sin_diferencias():
+    stats = reconstruir_resumen(aplicar=False)
+    return (stats['nuevas'], stats['modificadas'], stats['eliminadas']) == (0, 0, 0)
+
+
+def _cargar(client, app, n=30, seed=5):
+    with app.app_context():
+        maquina_ids = _setup()
+    assert client.post('/api/registros/bulk', json={'registros': _hojas(n, maquina_ids, seed=seed)}).status_code == 201
+    return maquina_ids
+
+
+def test_mantenido_en_linea(client, app):
+    maquina_ids = _cargar(client, app)
+    with app.app_context():
+        assert ResumenProduccion.query.count() > 0
+        assert _sin_diferencias()
+        registro_ids = [r.id for r in RegistroDiarioProduccion.query.order_by(RegistroDiarioProduccion.id)]
+
+    # Hoja suelta y bultos (alta y baja)
+    hoja = {**_hojas(1, maquina_ids, seed=9)[0], 'fecha': '2025-06-15', 'turno': 'DIURNO'}
+    assert client.post(f"/api/ordenes/{hoja['numero_op']}/registros", json=hoja).status_code == 201
+    for peso in (12.5, 7.25):
+        assert client.post(f'/api/registros/{registro_ids[0]}/bultos', json={'peso': peso}).status_code == 201
+    bulto_id = client.get(f'/api/registros/{registro_ids[0]}/bultos').get_json()[0]['id']
+    assert client.delete(f'/api/bultos/{bulto_id}').status_code == 200
+    with app.app_context():
+        assert _sin_diferencias()
+        registro = db.session.get(RegistroDiarioProduccion, registro_ids[0])
+        fila = db.session.get(ResumenProduccion, (registro.fecha, registro.maquina_id, registro.orden_id, registro.turno))
+        assert fila.bultos >= 1 and fila.kg_pesado == pytest.approx(registro.pesaje_suma_kg)
+
+    # Edición por ORM: cambio de turno / fecha (la clave vieja se recalcula),
+    # detalle horario editado y registro borrado con sus detalles
+    with app.app_context():
+        movido = db.session.get(RegistroDiarioProduccion, registro_ids[1])
+        clave_vieja = (movido.fecha, movido.maquina_id, movido.orden_id, movido.turno)
+        movido.turno, movido.fecha = 'EXTRA', date(2025, 7, 1)
+        db.session.commit()
+        assert _sin_diferencias()
+        assert db.session.get(ResumenProduccion, (date(2025, 7, 1), clave_vieja[1], clave_vieja[2], 'EXTRA')).registros == 1
+
+        detalle = DetalleProduccionHora.query.filter(DetalleProduccionHora.coladas_realizadas > 0).first()
+        detalle.coladas_realizadas = 0
+        db.session.commit()
+        assert _sin_diferencias()
+
+        db.session.delete(db.session.get(RegistroDiarioProduccion, registro_ids[2]))
+        db.session.commit()
+        assert _sin_diferencias()
+
+        # Un rollback descarta las claves marcadas en esa transacción
+        db.session.get(RegistroDiarioProduccion, registro_ids[3]).turno = 'EXTRA'
+        db.session.flush()
+        db.session.rollback()
+        assert not db.session.info.get('resumen_registros')
+        assert _sin_diferencias()
+
+
+def test_sync_y_recalculo_por_lote(client, app):
+    _cargar(client, app, n=12)
+    # Pesajes por lote: RDPs nuevos (INSERT Core) y existentes
+    pesajes = [
+        _pesaje(i, f"OP-BULK-{i % 2}", maquina="INY-BULK-0", fecha=f"2025-05-0{1 + i % 4}", kg=3.0 + i)
+        for i in range(20)
+    ]
+    assert len(client.post('/api/sync/pesajes', json={'pesajes': pesajes}).get_json()['synced']) == 20
+    with app.app_context():
+        assert _sin_diferencias()
+        assert sum(r.bultos for r in ResumenProduccion.query) == 20
+
+        # UPDATE por lote: recalcular-registros marca sus registros
+        db.session.execute(db.update(RegistroDiarioProduccion).values(total_coladas_calculada=0))
+        db.session.commit()
+        assert not _sin_diferencias()
+        reconstruir_resumen()
+        from app.services.recalculo_service import recalcular_totales_registros
+        recalcular_totales_registros(chunk_size=5)
+        assert _sin_diferencias()
+
+
+def test_backfill(client, app, runner):
+    _cargar(client, app)
+    with app.app_context():
+        esperado = _resumen()
+        # Rollup vacío + una clave huérfana + una fila alterada
+        filas = ResumenProduccion.query.all()
+        huerfana = filas[0]
+        db.session.execute(db.delete(ResumenProduccion).where(ResumenProduccion.fecha != huerfana.fecha))
+        db.session.execute(db.update(ResumenProduccion).values(coladas=ResumenProduccion.coladas + 1))
+        db.session.add(ResumenProduccion(fecha=date(2024, 1, 1), maquina_id=huerfana.maquina_id,
+                                         orden_id=huerfana.orden_id, turno='', registros=1))
+        db.session.commit()
+        alteradas = ResumenProduccion.query.count() - 1
+
+        stats = reconstruir_resumen(dias_por_bloque=7, aplicar=False)
+        assert stats['bloques'] > 1
+        assert (stats['nuevas'], stats['modificadas'], stats['eliminadas']) == (len(esperado) - alteradas, alteradas, 1)
+        assert ResumenProduccion.query.count() == alteradas + 1
+
+        reconstruir_resumen(dias_por_bloque=7)
+        assert _resumen() == esperado
+
+    result = runner.invoke(args=['reconstruir-resumen'])
+    assert result.exit_code == 0
+    assert f'Resumen consistente: {len(esperado)} claves' in result.output
+
+
+def test_dashboard_lee_solo_el_rollup(client, app):
+    maquina_ids = _cargar(client, app, n=40)
+    with app.app_context():
+        registros = RegistroDiarioProduccion.query.filter(
+            RegistroDiarioProduccion.fecha.between(date(2025, 5, 1), date(2025, 5, 15))
+        ).all()
+
+        with contar_queries() as queries:
+            resp = client.get('/api/dashboard/produccion?agrupar=dia,maquina&desde=2025-05-01&hasta=2025-05-15')
+        assert resp.status_code == 200
+        assert len(queries) == 1
+        assert 'registro_diario_produccion' not in queries[0]
+        assert 'detalle_produccion_hora' not in queries[0]
+
+    data = resp.get_json()
+    assert data['agrupar'] == ['dia', 'maquina']
+    assert (data['desde'], data['hasta']) == ('2025-05-01', '2025-05-15')
+    assert data['totales']['registros'] == len(registros)
+    assert data['totales']['coladas'] == sum(r.total_coladas_calculada for r in registros)
+    assert data['totales']['piezas'] == sum(r.total_piezas_buenas for r in registros)
+    assert data['totales']['kg_teorico'] == pytest.approx(sum(r.total_kg_real for r in registros))
+    assert {g['maquina_id'] for g in data['grupos']} <= set(maquina_ids)
+    assert [g['fecha'] for g in data['grupos']] == sorted(g['fecha'] for g in data['grupos'])
+
+    por_turno = client.get(f'/api/dashboard/produccion?agrupar=turno&maquina_id={maquina_ids[0]}').get_json()
+    assert {g['turno'] for g in por_turno['grupos']} <= {'DIURNO', 'NOCTURNO'}
+    por_orden = client.get('/api/dashboard/produccion?agrupar=orden&orden_id=OP-BULK-0').get_json()
+    assert [g['orden_id'] for g in por_orden['grupos']] == ['OP-BULK-0']
+
+    assert client.get('/api/dashboard/produccion?agrupar=semana').status_code == 400
+    assert client.get('/api/dashboard/produccion?desde=ayer').status_code == 400
@@ -0,0 +1,139 @@
+"""
+Tests del núcleo de cálculo puro (calculo_orden) y POST /api/ordenes/simular:
+  1. calcular_orden() == cascada de los modelos, bit a bit
+  2. La simulación evalúa miles de escenarios sin ejecutar SQL
+  3. Orden / límite / validaciones
+"""
+import pytest
+
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.services.calculo_orden import ParametrosOrden, ParametrosLote, calcular_orden
+from tests.test_recalculo_masivo import _poblar_aleatorio
+from tests.test_ordenes_listado import contar_queries
+
+
+BASE = {
+    "snapshot_composicion": [{"cavidades": 4, "peso_unit_gr": 35.0}, {"cavidades": 4, "peso_unit_gr": 12.5}],
+    "snapshot_peso_colada_gr": 18.0,
+    "snapshot_tiempo_ciclo": 32.0,
+    "snapshot_horas_turno": 23.0,
+    "fecha_inicio": "2025-06-02T07:00:00",
+    "lotes": [
+        {"meta_kg": 600.0, "personas": 2, "materiales": [{"fraccion": 0.9}, {"fraccion": 0.1}]},
+        {"meta_kg": 400.0, "materiales": [{"fraccion": 1.0}]},
+    ],
+}
+
+
+def _parametros_desde_orm(op):
+    return ParametrosOrden(
+        composicion=[(s.cavidades, s.peso_unit_gr) for s in op.snapshot_composicion],
+        peso_colada_gr=op.snapshot_peso_colada_gr,
+        tiempo_ciclo=op.snapshot_tiempo_ciclo,
+        horas_turno=op.snapshot_horas_turno,
+        fecha_inicio=op.fecha_inicio,
+        lotes=[
+            ParametrosLote(l.meta_kg, l.personas, tuple(m.fraccion for m in l.materias_primas))
+            for l in op.lotes
+        ],
+    )
+
+
+def test_nucleo_identico_a_cascada_de_modelos(app):
+    with app.app_context():
+        _poblar_aleatorio(50, seed=21)
+        for op in OrdenProduccion.query.all():
+            op.actualizar_metricas()
+
+            r = calcular_orden(_parametros_desde_orm(op))
+            assert (r.peso_neto_golpe, r.peso_tiro_gr, r.cavidades_totales, r.colores_activos) == (
+                op.calculo_peso_neto_golpe, op.calculo_peso_tiro_gr,
+                op.calculo_cavidades_totales, op.calculo_colores_activos)
+            assert (r.peso_produccion, r.merma_pct, r.peso_inc_merma, r.merma_natural_kg) == (
+                op.calculo_peso_produccion, op.calculo_merma_pct,
+                op.calculo_peso_inc_merma, op.calculo_merma_natural_kg)
+            assert (r.horas, r.dias, r.fecha_fin) == (op.calculo_horas, op.calculo_dias, op.calculo_fecha_fin)
+            for rl, lote in zip(r.lotes, op.lotes):
+                assert (rl.coladas, rl.kg_real, rl.horas_hombre) == (
+                    lote.calculo_coladas, lote.calculo_kg_real, lote.calculo_horas_hombre)
+                assert rl.pesos_material_kg == [m.calculo_peso_kg for m in lote.materias_primas]
+        db.session.rollback()
+
+
+def test_estructuras_usan_slots():
+    p = ParametrosOrden()
+    with pytest.raises(AttributeError):
+        p.otro_campo = 1
+    assert not hasattr(calcular_orden(p), '__dict__')
+
+
+def test_simular_miles_de_escenarios_sin_tocar_la_bd(client, app):
+    payload = {
+        "base": BASE,
+        "variaciones": {
+            "tiempo_ciclo": [26.0 + i for i in range(10)],
+            "cavidades": [2, 3, 4, 6, 8],
+            "peso_colada_gr": [10.0, 14.0, 18.0, 22.0],
+            "metas_kg": [[600.0, 400.0], [800.0, 200.0], [1000.0], [300.0, 300.0, 300.0], [500.0, 500.0]],
+        },
+        "incluir_lotes": False,
+    }
+    with app.app_context():
+        with contar_queries() as queries:
+            resp = client.post('/api/ordenes/simular', json=payload)
+        assert queries == []
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['count'] == 1000
+    assert 'lotes' not in data['resultados'][0]
+
+    # Un escenario cualquiera == evaluar directamente la OP equivalente
+    fila = next(r for r in data['resultados'] if r['parametros'] == {
+        "tiempo_ciclo": 30.0, "cavidades": 6, "peso_colada_gr": 14.0, "metas_kg": [800.0, 200.0]})
+    esperado = calcular_orden(ParametrosOrden(
+        composicion=[(6, 35.0), (6, 12.5)], peso_colada_gr=14.0, tiempo_ciclo=30.0, horas_turno=23.0,
+        lotes=[ParametrosLote(800.0, 2, (0.9, 0.1)), ParametrosLote(200.0, 1, (1.0,))],
+    ))
+    assert fila['horas'] == esperado.horas
+    assert fila['dias'] == esperado.dias
+    assert fila['merma_pct'] == esperado.merma_pct
+    assert fila['cavidades_totales'] == 12
+
+
+def test_simular_escenarios_ordenados_y_limite(client):
+    resp = client.post('/api/ordenes/simular', json={
+        "base": BASE,
+        "escenarios": [{"tiempo_ciclo": 40.0}, {"tiempo_ciclo": 25.0}, {"cavidades": [6, 2]}, {}],
+        "ordenar_por": "dias",
+        "limite": 2,
+    })
+    assert resp.status_code == 200
+    resultados = resp.get_json()['resultados']
+    assert len(resultados) == 2
+    assert resultados[0]['dias'] <= resultados[1]['dias']
+    # dias ∝ ciclo / peso_tiro: 25/208 < 32/253 < 32/208 < 40/208
+    assert resultados[0]['parametros'] == {"tiempo_ciclo": 25.0}
+    assert resultados[1]['parametros'] == {"cavidades": [6, 2]}
+    assert len(resultados[0]['lotes']) == 2
+    assert resultados[0]['lotes'][0]['pesos_material_kg'][0] == pytest.approx(
+        600.0 * (1 + resultados[0]['merma_pct']) * 0.9)
+
+
+def test_simular_validaciones(client):
+    assert client.post('/api/ordenes/simular', json={}).status_code == 400
+    assert client.post('/api/ordenes/simular', json={
+        "base": BASE, "escenarios": [{"molde": "X"}]}).status_code == 400
+    assert client.post('/api/ordenes/simular', json={
+        "base": BASE, "escenarios": [{"tiempo_ciclo": "rapido"}]}).status_code == 400
+    assert client.post('/api/ordenes/simular', json={
+        "base": BASE, "ordenar_por": "color"}).status_code == 400
+    for limite in (-1, 0, 2.5, True, "dos"):
+        assert client.post('/api/ordenes/simular', json={"base": BASE, "limite": limite}).status_code == 400
+    resp = client.post('/api/ordenes/simular', json={
+        "base": BASE, "escenarios": [{}, {"tiempo_ciclo": 25.0}, {"tiempo_ciclo": 40.0}], "limite": "2"})
+    assert resp.get_json()['count'] == 2
+    assert client.post('/api/ordenes/simular', json={
+        "base": BASE, "variaciones": {"tiempo_ciclo": list(range(200)), "cavidades": list(range(1, 100))},
+    }).status_code == 400
@@ -0,0 +1,138 @@
+"""
+Tests de la sincronización async de pesajes (?async=1 + worker):
+  1. El request solo acepta en staging (202 + job_id), no crea ControlPeso
+  2. El worker deja en cada ítem el mismo resultado que el modo síncrono
+  3. GET /api/sync/jobs/<id>: resultado por pesaje en el orden enviado
+  4. Reintentos con backoff, FALLIDO, purga y comando CLI
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.extensions import db
+from app.models.control_peso import ControlPeso
+from app.models.trabajo_sincronizacion import TrabajoSincronizacion, PesajeEnCola
+from app.services import sincronizacion_service
+from app.services.sincronizacion_service import (
+    MAX_INTENTOS_SYNC, procesar_trabajos_sync, purgar_trabajos_sync,
+)
+from tests.test_ordenes_listado import contar_queries
+from tests.test_sync_pesajes_lote import _setup, _lote, _pesaje, _totales
+
+
+def _encolar(client, pesajes, **extra):
+    resp = client.post('/api/sync/pesajes?async=1', json={'pesajes': pesajes, **extra})
+    assert resp.status_code == 202
+    return resp.get_json()
+
+
+def test_acepta_sin_procesar(client, app):
+    with app.app_context():
+        _setup()
+        with contar_queries() as queries:
+            data = _encolar(client, _lote(200, seed=2), dispositivo_id='PC-A')
+        # Trabajo + staging multi-fila: no se tocan RDPs ni ControlPeso
+        assert not [q for q in queries if 'registro_diario' in q or 'control_peso' in q]
+        assert ControlPeso.query.count() == 0
+        assert PesajeEnCola.query.count() == 200
+
+    assert data['status_url'] == f"/api/sync/jobs/{data['job_id']}"
+    estado = client.get(data['status_url']).get_json()
+    assert (estado['estado'], estado['total_pesajes'], estado['dispositivo_id']) == ('PENDIENTE', 200, 'PC-A')
+    assert {p['estado'] for p in estado['pesajes']} == {'PENDIENTE'}
+    assert [p['local_id'] for p in estado['pesajes']] == list(range(200))
+
+    # async también como campo del body
+    assert client.post('/api/sync/pesajes', json={'pesajes': [], 'async': True}).status_code == 202
+    assert client.post('/api/sync/pesajes?async=1', json={'pesajes': 'x'}).status_code == 400
+    assert client.get('/api/sync/jobs/9999').status_code == 404
+
+
+def test_worker_equivale_al_modo_sincrono(client, app):
+    pesajes = _lote(150, seed=5)
+    with app.app_context():
+        _setup()
+    client.post('/api/sync/pesajes', json={'pesajes': pesajes, 'dispositivo_id': 'PC-B'})
+    with app.app_context():
+        esperado = _totales()
+        db.session.execute(db.delete(ControlPeso))
+        db.session.execute(db.delete(db.metadata.tables['registro_diario_produccion']))
+        db.session.commit()
+
+    primero = _encolar(client, pesajes[:100], dispositivo_id='PC-B')
+    segundo = _encolar(client, pesajes[50:], dispositivo_id='PC-B')   # se superpone con el primero
+    with app.app_context():
+        stats = procesar_trabajos_sync()
+        assert (stats['procesados'], stats['completados'], stats['pesajes']) == (2, 2, 200)
+        assert _totales() == esperado
+        assert procesar_trabajos_sync()['procesados'] == 0
+
+    estado = client.get(primero['status_url']).get_json()
+    assert (estado['estado'], estado['sincronizados'], estado['errores']) == ('COMPLETADO', 100, 0)
+    estado = client.get(segundo['status_url']).get_json()
+    assert (estado['sincronizados'], estado['ya_sincronizados']) == (50, 50)
+    assert [p['estado'] for p in estado['pesajes']] == ['YA_SINCRONIZADO'] * 50 + ['SINCRONIZADO'] * 50
+
+
+def test_errores_por_item_en_orden(client, app):
+    with app.app_context():
+        _setup()
+    data = _encolar(client, [
+        _pesaje(1, "OP-SYNC-0"),
+        _pesaje(2, "OP-SYNC-0", maquina="NO-EXISTE"),
+        7,
+        _pesaje(3, "OP-INEXISTENTE"),
+        _pesaje(4, "OP-SYNC-1"),
+    ])
+    with app.app_context():
+        procesar_trabajos_sync()
+
+    estado = client.get(data['status_url']).get_json()
+    assert estado['errores'] == 3
+    assert [(p['local_id'], p['estado'], p.get('error')) for p in estado['pesajes']] == [
+        (1, 'SINCRONIZADO', None),
+        (2, 'ERROR', "Maquina NO-EXISTE no encontrada en Central"),
+        (None, 'ERROR', "'int' object is not subscriptable"),
+        (3, 'ERROR', "Orden OP-INEXISTENTE no encontrada"),
+        (4, 'SINCRONIZADO', None),
+    ]
+
+
+def test_reintentos_fallido_purga_y_comando(client, app, runner, monkeypatch):
+    with app.app_context():
+        _setup()
+    data = _encolar(client, [_pesaje(1, "OP-SYNC-0")])
+
+    original = sincronizacion_service._sincronizar
+
+    def _falla(pesajes, dispositivo_id):
+        original(pesajes, dispositivo_id)
+        raise RuntimeError("base ocupada")
+
+    monkeypatch.setattr(sincronizacion_service, '_sincronizar', _falla)
+    with app.app_context():
+        ahora = datetime.now(timezone.utc)
+        assert procesar_trabajos_sync(ahora=ahora)['reintentar'] == 1
+        # Se revirtió todo el trabajo, incluso lo que alcanzó a insertar
+        assert ControlPeso.query.count() == 0
+        trabajo = db.session.get(TrabajoSincronizacion, data['job_id'])
+        assert (trabajo.estado, trabajo.intentos, trabajo.ultimo_error) == ('PENDIENTE', 1, 'base ocupada')
+        assert procesar_trabajos_sync(ahora=ahora)['procesados'] == 0   # backoff
+
+        for k in range(1, MAX_INTENTOS_SYNC):
+            procesar_trabajos_sync(ahora=ahora + timedelta(days=k))
+        db.session.expire_all()
+        assert db.session.get(TrabajoSincronizacion, data['job_id']).estado == 'FALLIDO'
+
+    assert {p['estado'] for p in client.get(data['status_url']).get_json()['pesajes']} == {'PENDIENTE'}
+
+    monkeypatch.setattr(sincronizacion_service, '_sincronizar', original)
+    _encolar(client, [_pesaje(2, "OP-SYNC-0")])
+    result = runner.invoke(args=['procesar-sync'])
+    assert result.exit_code == 0
+    assert '1 completados (1 pesajes)' in result.output
+    assert 'Cola de sincronización vacía' in runner.invoke(args=['procesar-sync']).output
+
+    with app.app_context():
+        assert purgar_trabajos_sync(dias=1) == 0
+        assert purgar_trabajos_sync(dias=1, ahora=datetime.now(timezone.utc) + timedelta(days=2)) == 2
+        assert (TrabajoSincronizacion.query.count(), PesajeEnCola.query.count()) == (0, 0)
+        assert ControlPeso.query.count() == 1
@@ -0,0 +1,122 @@
+"""
+Tests de la sincronización idempotente de pesajes (dispositivo_id + local_id):
+  1. Reenviar el lote completo no duplica bultos ni infla total_kg_real
+  2. Reenvío parcial mezclado con pesajes nuevos: solo se insertan los nuevos
+  3. El mismo local_id en distintos dispositivos son pesajes distintos
+  4. Un reenvío completo cuesta una sola búsqueda por índice
+  5. Carrera entre dos reenvíos: el índice único descarta el segundo
+"""
+import pytest
+
+from app.extensions import db
+from app.models.control_peso import ControlPeso
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+from app.services import sincronizacion_service
+from tests.test_ordenes_listado import contar_queries
+from tests.test_sync_pesajes_lote import _setup, _pesaje
+
+
+def _post(client, pesajes, **extra):
+    resp = client.post('/api/sync/pesajes', json={'pesajes': pesajes, **extra})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def _estado():
+    db.session.expire_all()
+    return (
+        ControlPeso.query.count(),
+        sorted(r.total_kg_real for r in RegistroDiarioProduccion.query.all()),
+        db.session.get(OrdenProduccion, "OP-SYNC-0").calculo_avance_real_kg,
+    )
+
+
+def test_reenvio_completo_no_duplica(client, app):
+    with app.app_context():
+        _setup()
+    pesajes = [_pesaje(i, "OP-SYNC-0", kg=5.0) for i in range(4)]
+
+    primera = _post(client, pesajes, dispositivo_id="BALANZA-1")
+    assert primera['ya_sincronizados'] == 0
+    with app.app_context():
+        antes = _estado()
+        assert antes == (4, [20.0], pytest.approx(20.0))
+        assert {c.dispositivo_id for c in ControlPeso.query} == {"BALANZA-1"}
+
+    segunda = _post(client, pesajes, dispositivo_id="BALANZA-1")
+    assert segunda['synced'] == [{'local_id': i, 'ya_sincronizado': True} for i in range(4)]
+    assert segunda['ya_sincronizados'] == 4
+    with app.app_context():
+        assert _estado() == antes
+
+
+def test_reenvio_parcial_con_nuevos(client, app):
+    with app.app_context():
+        _setup()
+    _post(client, [_pesaje(1, "OP-SYNC-0", kg=3.0), _pesaje(2, "OP-SYNC-0", kg=4.0)])
+
+    data = _post(client, [
+        _pesaje(3, "OP-SYNC-0", kg=1.0),
+        _pesaje(2, "OP-SYNC-0", kg=4.0),
+        _pesaje(4, "OP-SYNC-0", maquina="NO-EXISTE"),
+        _pesaje(3, "OP-SYNC-0", kg=1.0),   # repetido dentro del lote
+        _pesaje(1, "OP-SYNC-0", kg=3.0),
+    ])
+    assert data['synced'] == [
+        {'local_id': 3},
+        {'local_id': 2, 'ya_sincronizado': True},
+        {'local_id': 3, 'ya_sincronizado': True},
+        {'local_id': 1, 'ya_sincronizado': True},
+    ]
+    assert [e['local_id'] for e in data['errors']] == [4]
+    with app.app_context():
+        assert _estado() == (3, [8.0], pytest.approx(8.0))
+
+
+def test_mismo_local_id_en_distintos_dispositivos(client, app):
+    with app.app_context():
+        _setup()
+    _post(client, [_pesaje(1, "OP-SYNC-0", kg=2.0)], dispositivo_id="BALANZA-1")
+    _post(client, [_pesaje(1, "OP-SYNC-0", kg=2.0)], dispositivo_id="BALANZA-2")
+    # Por pesaje manda sobre el del lote; sin ninguno cuenta como cliente anónimo ('')
+    data = _post(client, [
+        {**_pesaje(1, "OP-SYNC-0", kg=2.0), 'dispositivo_id': "BALANZA-2"},
+        _pesaje(1, "OP-SYNC-0", kg=2.0),
+    ], dispositivo_id="BALANZA-1")
+    assert data['ya_sincronizados'] == 2
+    _post(client, [_pesaje(1, "OP-SYNC-0", kg=2.0)])
+
+    with app.app_context():
+        assert sorted((c.dispositivo_id, c.origen_id) for c in ControlPeso.query) == [
+            ("", "1"), ("BALANZA-1", "1"), ("BALANZA-2", "1"),
+        ]
+        assert _estado()[1] == [6.0]
+
+
+def test_reenvio_cuesta_una_busqueda(client, app):
+    with app.app_context():
+        _setup()
+    pesajes = [_pesaje(i, f"OP-SYNC-{i % 3}", turno=("DIURNO", "NOCTURNO")[i % 2]) for i in range(300)]
+    _post(client, pesajes, dispositivo_id="BALANZA-1")
+
+    with app.app_context():
+        with contar_queries() as queries:
+            data = _post(client, pesajes, dispositivo_id="BALANZA-1")
+        assert data['ya_sincronizados'] == 300
+        assert len(queries) == 1
+        assert 'FROM control_peso' in queries[0]
+
+
+def test_carrera_entre_reenvios(client, app, monkeypatch):
+    with app.app_context():
+        _setup()
+    pesajes = [_pesaje(i, "OP-SYNC-0", kg=5.0) for i in range(3)]
+    _post(client, pesajes, dispositivo_id="BALANZA-1")
+
+    # Otro worker guardó el lote entre la búsqueda y el INSERT de este
+    monkeypatch.setattr(sincronizacion_service, '_ya_sincronizados', lambda origenes: set())
+    data = _post(client, pesajes, dispositivo_id="BALANZA-1")
+    assert data['success'] is True
+    with app.app_context():
+        assert _estado() == (3, [15.0], pytest.approx(15.0))
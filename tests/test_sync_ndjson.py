@@ -0,0 +1,117 @@
+"""
+Tests de la subida NDJSON / gzip en POST /api/sync/pesajes:
+  1. gzip NDJSON en bloques equivale al lote JSON
+  2. Cada bloque se commitea; un stream truncado devuelve el cursor confirmado
+  3. Reanudar con el mismo upload_id (archivo entero o desde el cursor)
+  4. Líneas inválidas se reportan con su número; cursor con hueco → 409
+"""
+import gzip
+import json
+
+from app.extensions import db
+from app.models.control_peso import ControlPeso
+from tests.test_sync_pesajes_lote import _setup, _lote, _pesaje, _totales
+
+
+def _ndjson(pesajes):
+    return ''.join(json.dumps(p) + '\n' for p in pesajes).encode()
+
+
+def _subir(client, cuerpo, comprimido=True, **params):
+    query = '&'.join(f'{k}={v}' for k, v in params.items())
+    return client.post(
+        f'/api/sync/pesajes?{query}',
+        data=gzip.compress(cuerpo) if comprimido else cuerpo,
+        content_type='application/x-ndjson',
+        headers={'Content-Encoding': 'gzip'} if comprimido else {},
+    )
+
+
+def test_gzip_equivale_al_lote_json(client, app):
+    pesajes = _lote(95, seed=7)
+    with app.app_context():
+        _setup()
+    assert len(client.post('/api/sync/pesajes', json={'pesajes': pesajes}).get_json()['synced']) == 95
+    with app.app_context():
+        esperado = _totales()
+        db.session.execute(db.delete(ControlPeso))
+        db.session.execute(db.delete(db.metadata.tables['registro_diario_produccion']))
+        db.session.commit()
+
+    resp = _subir(client, _ndjson(pesajes), chunk_size=20, dispositivo_id='PC-1')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert (data['completo'], data['cursor'], data['bloques'], data['synced']) == (True, 95, 5, 95)
+    assert data['errors'] == [] and data['carga'] is None
+
+    with app.app_context():
+        assert _totales() == esperado
+        assert {c.dispositivo_id for c in ControlPeso.query} == {'PC-1'}
+
+    # Sin gzip también se acepta
+    resp = _subir(client, _ndjson(pesajes[:3]), comprimido=False, dispositivo_id='PC-1')
+    assert (resp.get_json()['synced'], resp.get_json()['ya_sincronizados']) == (0, 3)
+
+
+def test_stream_truncado_y_reanudacion(client, app):
+    pesajes = _lote(300, seed=11)
+    with app.app_context():
+        _setup()
+    # Sin compresión el gzip no puede adivinar el final: queda cortado a mitad de bloque
+    comprimido = gzip.compress(_ndjson(pesajes), compresslevel=0)
+    cortado = comprimido[:len(comprimido) * 2 // 3]
+
+    resp = client.post('/api/sync/pesajes?upload_id=carga-1&chunk_size=50&dispositivo_id=PC-2',
+                       data=cortado, content_type='application/x-ndjson',
+                       headers={'Content-Encoding': 'gzip'})
+    assert resp.status_code == 400
+    data = resp.get_json()
+    assert data['completo'] is False
+    assert data['cursor'] in (150, 200) and data['cursor'] == data['synced']
+
+    # Lo confirmado quedó commiteado y el progreso es consultable
+    with app.app_context():
+        assert ControlPeso.query.count() == data['cursor']
+    carga = client.get('/api/sync/cargas/carga-1').get_json()
+    assert (carga['estado'], carga['cursor'], carga['dispositivo_id']) == ('EN_CURSO', data['cursor'], 'PC-2')
+    assert client.get('/api/sync/cargas/no-existe').status_code == 404
+
+    # Reanudar enviando solo la cola desde el cursor (el dispositivo sale de la carga)
+    cursor = data['cursor']
+    cola = _ndjson(pesajes[cursor:cursor + 30])
+    data = _subir(client, cola, upload_id='carga-1', cursor=cursor, chunk_size=50).get_json()
+    assert (data['cursor'], data['synced'], data['completo']) == (cursor + 30, 30, True)
+
+    # ... o el archivo entero: las líneas confirmadas se saltean sin tocarlas
+    data = _subir(client, _ndjson(pesajes), upload_id='carga-1', chunk_size=50).get_json()
+    assert (data['cursor'], data['synced'], data['ya_sincronizados']) == (300, 300 - cursor - 30, 0)
+
+    carga = client.get('/api/sync/cargas/carga-1').get_json()
+    assert (carga['estado'], carga['cursor'], carga['sincronizados']) == ('COMPLETADA', 300, 300)
+    with app.app_context():
+        assert ControlPeso.query.count() == 300
+
+    # Un cursor más allá de lo confirmado dejaría un hueco
+    resp = _subir(client, _ndjson(pesajes[:1]), upload_id='carga-1', cursor=301)
+    assert resp.status_code == 409
+    assert resp.get_json()['cursor'] == 300
+
+
+def test_lineas_invalidas_y_parametros(client, app):
+    with app.app_context():
+        _setup()
+    cuerpo = b''.join([
+        _ndjson([_pesaje(1, "OP-SYNC-0")]),
+        b'{no es json\n',
+        b'\n',
+        b'[1, 2]\n',
+        _ndjson([_pesaje(2, "OP-SYNC-0", maquina="NO-EXISTE"), _pesaje(3, "OP-SYNC-1")]),
+    ])
+    data = _subir(client, cuerpo, chunk_size=2).get_json()
+    assert (data['completo'], data['cursor'], data['synced'], data['bloques']) == (True, 6, 2, 3)
+    assert [(e['local_id'], e.get('linea')) for e in data['errors']] == [(None, 2), (None, 4), (2, None)]
+    assert data['errors'][0]['error'].startswith('Línea inválida')
+
+    assert _subir(client, b'', chunk_size=0).status_code == 400
+    assert _subir(client, b'', cursor='x').status_code == 400
+    assert _subir(client, b'', cursor=-1).status_code == 400
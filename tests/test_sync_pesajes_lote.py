@@ -0,0 +1,159 @@
+"""
+Tests de POST /api/sync/pesajes procesado por conjunto:
+  1. Agrupa por (OP, máquina, fecha, turno): un RDP por grupo, reusa los existentes
+  2. Errores por pesaje iguales al proceso uno a uno y en el orden del payload
+  3. Un lote grande equivale a subir los pesajes de a uno (totales y avance)
+  4. Número de consultas fijo, sin importar la cantidad de pesajes
+"""
+import random
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models.control_peso import ControlPeso
+from app.models.maquina import Maquina
+from app.models.orden import OrdenProduccion
+from app.models.registro import RegistroDiarioProduccion
+from tests.test_ordenes_listado import contar_queries
+
+
+def _setup(n_ops=3):
+    for nombre in ("INY-SYNC-A", "INY-SYNC-B"):
+        db.session.add(Maquina(nombre=nombre, tipo="INYECTORA"))
+    db.session.flush()
+    for k in range(n_ops):
+        db.session.add(OrdenProduccion(
+            numero_op=f"OP-SYNC-{k}", maquina_id=1, snapshot_tiempo_ciclo=20.0,
+            snapshot_peso_colada_gr=5.0, calculo_cavidades_totales=2, calculo_peso_neto_golpe=100.0,
+        ))
+    db.session.commit()
+
+
+def _pesaje(local_id, op, maquina="iny-sync-a", fecha="2025-06-01", turno="DIURNO", kg=10.0):
+    return {'local_id': local_id, 'peso_kg': kg, 'nro_op': op, 'turno': turno,
+            'fecha_ot': fecha, 'maquina': maquina, 'color': 'ROJO',
+            'fecha_hora': f'{fecha}T08:00:00'}
+
+
+def _totales():
+    db.session.expire_all()
+    return {
+        (r.orden_id, r.maquina.nombre, r.fecha, r.turno): (round(r.total_kg_real, 6), len(r.controles_peso))
+        for r in RegistroDiarioProduccion.query.all()
+    }
+
+
+def _lote(n, seed):
+    rnd = random.Random(seed)
+    return [
+        _pesaje(i, f"OP-SYNC-{rnd.randrange(3)}", rnd.choice(["INY-SYNC-A", "INY-SYNC-B"]),
+                f"2025-06-0{rnd.randint(1, 3)}", rnd.choice(["DIURNO", "NOCTURNO"]),
+                round(rnd.uniform(5, 25), 3))
+        for i in range(n)
+    ]
+
+
+def test_agrupa_y_reusa_rdp_existente(client, app):
+    with app.app_context():
+        _setup()
+        existente = RegistroDiarioProduccion(
+            orden_id="OP-SYNC-0", maquina_id=1, fecha=date(2025, 6, 1), turno="DIURNO",
+            colada_inicial=0, colada_final=10,
+        )
+        db.session.add(existente)
+        db.session.commit()
+        existente_id = existente.id
+
+    resp = client.post('/api/sync/pesajes', json={'pesajes': [
+        _pesaje(1, "OP-SYNC-0", kg=4.0),
+        _pesaje(2, "OP-SYNC-0", kg=6.0),
+        _pesaje(3, "OP-SYNC-1", kg=2.5),
+        _pesaje(4, "OP-SYNC-1", turno="NOCTURNO", kg=1.5),
+    ]})
+    assert resp.status_code == 200
+    assert resp.get_json()['synced'] == [{'local_id': i} for i in (1, 2, 3, 4)]
+
+    with app.app_context():
+        assert _totales() == {
+            ("OP-SYNC-0", "INY-SYNC-A", date(2025, 6, 1), "DIURNO"): (10.0, 2),
+            ("OP-SYNC-1", "INY-SYNC-A", date(2025, 6, 1), "DIURNO"): (2.5, 1),
+            ("OP-SYNC-1", "INY-SYNC-A", date(2025, 6, 1), "NOCTURNO"): (1.5, 1),
+        }
+        assert ControlPeso.query.filter_by(registro_id=existente_id).count() == 2
+        # Los contadores del RDP existente se conservan; el kg pasa a ser el pesado
+        rdp = db.session.get(RegistroDiarioProduccion, existente_id)
+        assert (rdp.total_coladas_calculada, rdp.total_piezas_buenas) == (10, 10)
+        nuevo = RegistroDiarioProduccion.query.filter_by(orden_id="OP-SYNC-1", turno="NOCTURNO").one()
+        assert (nuevo.snapshot_cavidades, nuevo.snapshot_peso_neto_gr, nuevo.hora_inicio) == (2, 100.0, "00:00")
+        assert db.session.get(OrdenProduccion, "OP-SYNC-1").calculo_avance_real_kg == pytest.approx(4.0)
+
+
+def test_errores_por_pesaje_en_orden(client, app):
+    with app.app_context():
+        _setup()
+
+    pesajes = [
+        _pesaje(1, "OP-SYNC-0"),
+        _pesaje(2, "OP-SYNC-0", maquina="NO-EXISTE"),
+        _pesaje(3, "OP-INEXISTENTE"),
+        {**_pesaje(4, "OP-SYNC-1"), 'peso_kg': 'pesado'},
+        _pesaje(5, "OP-SYNC-1"),
+        {**_pesaje(6, "OP-SYNC-1"), 'fecha_ot': 'ayer'},
+        {k: v for k, v in _pesaje(7, "OP-SYNC-1").items() if k != 'local_id'},
+    ]
+    data = client.post('/api/sync/pesajes', json={'pesajes': pesajes}).get_json()
+
+    assert data['success'] is True
+    assert data['synced'] == [{'local_id': 1}, {'local_id': 5}]
+    assert [(e['local_id'], e['error']) for e in data['errors'][:3]] == [
+        (2, "Maquina NO-EXISTE no encontrada en Central"),
+        (3, "Orden OP-INEXISTENTE no encontrada"),
+        (4, "could not convert string to float: 'pesado'"),
+    ]
+    assert [e['local_id'] for e in data['errors'][3:]] == [6, None]
+
+    with app.app_context():
+        assert ControlPeso.query.count() == 2
+        assert RegistroDiarioProduccion.query.count() == 2
+
+
+def test_lote_equivale_a_uno_por_uno(client, app):
+    pesajes = _lote(120, seed=4)
+    with app.app_context():
+        _setup()
+    for p in pesajes:
+        client.post('/api/sync/pesajes', json={'pesajes': [p]})
+    with app.app_context():
+        uno_a_uno = _totales()
+        avance = {o.numero_op: o.calculo_avance_real_kg for o in OrdenProduccion.query.all()}
+        db.session.execute(db.delete(ControlPeso))
+        db.session.execute(db.delete(RegistroDiarioProduccion))
+        db.session.execute(db.update(OrdenProduccion).values(calculo_avance_real_kg=0.0))
+        db.session.commit()
+
+    data = client.post('/api/sync/pesajes', json={'pesajes': pesajes}).get_json()
+    assert len(data['synced']) == 120
+
+    with app.app_context():
+        assert _totales() == uno_a_uno
+        for o in OrdenProduccion.query.all():
+            assert o.calculo_avance_real_kg == pytest.approx(avance[o.numero_op])
+
+
+def test_consultas_constantes(client, app):
+    with app.app_context():
+        _setup()
+
+    def _medir(pesajes):
+        with app.app_context():
+            with contar_queries() as queries:
+                resp = client.post('/api/sync/pesajes', json={'pesajes': pesajes})
+            assert len(resp.get_json()['synced']) == len(pesajes)
+            return len(queries)
+
+    # Mismos grupos (RDPs nuevos en ambos casos), distinta cantidad de pesajes
+    grupos = [("OP-SYNC-0", "DIURNO"), ("OP-SYNC-1", "DIURNO"), ("OP-SYNC-2", "NOCTURNO")]
+    chico = [_pesaje(i, op, fecha="2025-07-01", turno=t) for i, (op, t) in enumerate(grupos)]
+    grande = [_pesaje(100 + i, op, fecha="2025-07-02", turno=t) for i, (op, t) in ((i, grupos[i % 3]) for i in range(600))]
+    assert _medir(chico) == _medir(grande)
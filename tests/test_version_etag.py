@@ -0,0 +1,140 @@
+"""
+Tests de OrdenProduccion.version + ETag / If-None-Match:
+  1. La versión sube con cambios en la OP, lotes, recetas, registros, detalles y pesajes
+  2. GET /ordenes/<op> y /ordenes/<op>/registros responden 304 solo desde la versión
+  3. Los UPDATE por lotes (recalcular-metricas) también mueven la versión
+"""
+from app.extensions import db
+from app.models.orden import OrdenProduccion
+from app.models.lote import LoteColor
+from app.models.recetas import SeColorea
+from app.models.materiales import Colorante
+from app.models.registro import RegistroDiarioProduccion, DetalleProduccionHora
+from app.models.control_peso import ControlPeso
+from tests.test_ordenes_listado import _poblar, contar_queries
+
+
+def _version(numero_op="OP-L000"):
+    db.session.expire_all()
+    return db.session.get(OrdenProduccion, numero_op).version
+
+
+def test_version_sube_con_cambios_en_el_arbol(app):
+    with app.app_context():
+        _poblar(2)
+        v = _version()
+
+        def _cambia(accion):
+            nonlocal v
+            accion()
+            db.session.commit()
+            nueva = _version()
+            assert nueva == v + 1
+            v = nueva
+
+        op = lambda: db.session.get(OrdenProduccion, "OP-L000")
+        lote = lambda: op().lotes[0]
+        registro = lambda: RegistroDiarioProduccion.query.filter_by(orden_id="OP-L000").first()
+
+        _cambia(lambda: setattr(op(), 'snapshot_tiempo_ciclo', 45.0))
+        _cambia(lambda: setattr(lote(), 'meta_kg', 250.0))
+        _cambia(lambda: setattr(lote().materias_primas[0], 'fraccion', 0.5))
+        _cambia(lambda: db.session.add(SeColorea(
+            lote_id=lote().id, colorante_id=Colorante.query.first().id, gramos=3.0)))
+        _cambia(lambda: db.session.delete(lote().colorantes[0]))
+        _cambia(lambda: db.session.add(DetalleProduccionHora(
+            registro_id=registro().id, hora="07:00", coladas_realizadas=5)))
+        _cambia(lambda: db.session.add(ControlPeso(registro_id=registro().id, peso_real_kg=12.0)))
+        _cambia(lambda: setattr(registro(), 'colada_final', 999))
+        _cambia(lambda: db.session.delete(registro()))
+
+        # Leer no mueve la versión, y la otra OP no se enteró de nada
+        db.session.get(OrdenProduccion, "OP-L000").to_dict()
+        db.session.commit()
+        assert _version() == v
+        assert _version("OP-L001") == 1
+
+
+def test_registro_que_cambia_de_op_mueve_ambas_versiones(app):
+    with app.app_context():
+        _poblar(2)
+        v0, v1 = _version("OP-L000"), _version("OP-L001")
+
+        reg = RegistroDiarioProduccion.query.filter_by(orden_id="OP-L000").first()
+        reg.orden_id = "OP-L001"
+        db.session.commit()
+
+        assert _version("OP-L000") == v0 + 1
+        assert _version("OP-L001") == v1 + 1
+
+
+def test_get_orden_responde_304_sin_cargar_el_arbol(client, app):
+    with app.app_context():
+        _poblar(1)
+
+        resp = client.get('/api/ordenes/OP-L000')
+        assert resp.status_code == 200
+        etag = resp.headers['ETag']
+
+        with contar_queries() as queries:
+            resp = client.get('/api/ordenes/OP-L000', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
+        assert resp.headers['ETag'] == etag
+        assert len(queries) == 1 and 'lote_color' not in queries[0]
+
+        # Otra vista de la misma OP tiene su propio ETag
+        resp = client.get('/api/ordenes/OP-L000?fields=numero_op', headers={'If-None-Match': etag})
+        assert resp.status_code == 200
+
+        # Un cambio invalida el ETag
+        lote = LoteColor.query.filter_by(numero_op="OP-L000").first()
+        lote.personas = 4
+        db.session.commit()
+        resp = client.get('/api/ordenes/OP-L000', headers={'If-None-Match': etag})
+        assert resp.status_code == 200
+        assert resp.headers['ETag'] != etag
+
+    assert client.get('/api/ordenes/NO-EXISTE', headers={'If-None-Match': etag}).status_code == 404
+
+
+def test_get_registros_responde_304_y_se_invalida_con_pesajes(client, app):
+    with app.app_context():
+        _poblar(1)
+
+    resp = client.get('/api/ordenes/OP-L000/registros')
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+    assert client.get('/api/ordenes/OP-L000/registros', headers={'If-None-Match': etag}).status_code == 304
+
+    # El ETag de registros no sirve para el detalle de la OP
+    assert client.get('/api/ordenes/OP-L000', headers={'If-None-Match': etag}).status_code == 200
+
+    resp = client.post('/api/sync/pesajes', json={'pesajes': [{
+        'local_id': 1, 'peso_kg': 8.0, 'nro_op': 'OP-L000', 'turno': 'DIURNO',
+        'fecha_ot': '2025-02-01', 'maquina': 'MAQ-LIST-0',
+    }]})
+    assert resp.get_json()['synced'] == [{'local_id': 1}]
+
+    resp = client.get('/api/ordenes/OP-L000/registros', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+
+
+def test_recalculo_masivo_mueve_la_version(app, runner):
+    with app.app_context():
+        _poblar(3)
+        antes = _version("OP-L001")
+
+    result = runner.invoke(args=['recalcular-metricas', '--op', 'OP-L001'])
+    assert result.exit_code == 0
+
+    with app.app_context():
+        assert _version("OP-L001") == antes + 1
+        assert _version("OP-L000") == 1
+
+
+def test_creacion_no_sube_version(client, app):
+    with app.app_context():
+        _poblar(1)
+        assert _version() == 1